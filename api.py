@@ -1,14 +1,17 @@
-from flask import Flask, jsonify, request, render_template, send_from_directory, redirect
+from flask import Flask, Response, jsonify, request, render_template, send_from_directory, redirect
 from flask_cors import CORS
-from blockchain import Blockchain
-from node import Node
+from blockchain import Blockchain, InvalidBlockError, MiningCancelledError
+from node import Node, MAX_LOCATOR_SIZE, MAX_HEADERS_PER_REQUEST, MAX_BLOCKS_PER_REQUEST
 from wallet import Wallet
 from transaction import Transaction
 from jewelry_certification import JewelryCertificationSystem, JewelryItem, JewelryCertificate
 from evm_rpc import create_evm_rpc_blueprint, get_evm_config
+from binary_codec import BINARY_CONTENT_TYPE, CodecError, decode_block
+from block import transaction_hash, transaction_signing_data
+from chain_export import stream_chain
+from smart_contract import contract_address
 import os
 import json
-import hashlib
 import threading
 import time
 from datetime import datetime
@@ -31,14 +34,16 @@ class BlockchainAPI:
     # Ruta del archivo de persistencia
     PERSISTENCE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'blockchain_state.json')
     CERTIFICATES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'certificates.json')
+    BLOCKS_DIR = os.getenv('BLOCK_STORE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'blocks'))
     AUTO_SAVE_INTERVAL = 60  # Guardar cada 60 segundos
     
-    def __init__(self, port=5000):
+    def __init__(self, port=5000, difficulty=4):
         """
         Inicializa la API.
         
         Args:
             port (int): Puerto en el que correrá la API
+            difficulty (int): Dificultad de génesis; después la fija la cadena
         """
         # Configurar Flask con rutas de templates y static
         template_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates')
@@ -87,9 +92,10 @@ class BlockchainAPI:
         print(f"✅ CORS configurado con orígenes: {validated_origins}")
         
         self.port = port
-        self.blockchain = Blockchain(difficulty=4)
+        self.blockchain = Blockchain(difficulty=difficulty, data_dir=self.BLOCKS_DIR)
         self.node = Node(self.blockchain)
         self.wallet = Wallet()  # Wallet del nodo
+        self._wallet_lock = threading.Lock()  # Un nonce por operación firmada por el nodo
         
         # Sistema de certificación de joyería
         self.jewelry_system = JewelryCertificationSystem(self.blockchain)
@@ -147,7 +153,20 @@ class BlockchainAPI:
                         'retry_after': self.rate_limiter.window
                     }), 429
             # Minar bloque con la dirección de la wallet del nodo
-            block = self.blockchain.mine_pending_transactions(self.wallet.address)
+            try:
+                block = self.blockchain.mine_pending_transactions(self.wallet.address)
+            except MiningCancelledError as e:
+                return jsonify({
+                    'error': 'Minería cancelada',
+                    'reason': str(e)
+                }), 409
+            except InvalidBlockError as e:
+                # La punta cambió mientras se minaba (otro /mine o un bloque
+                # de un peer): el bloque ya no encaja en la cadena
+                return jsonify({
+                    'error': 'Bloque minado rechazado',
+                    'reason': str(e)
+                }), 409
             
             # Transmitir el bloque a los peers
             self.node.broadcast_block(block)
@@ -176,7 +195,8 @@ class BlockchainAPI:
                 sender=values['sender'],
                 recipient=values['recipient'],
                 amount=values['amount'],
-                token=token
+                token=token,
+                fee=values.get('fee')
             )
             
             response = {
@@ -184,10 +204,105 @@ class BlockchainAPI:
             }
             return jsonify(response), 201
         
+        @self.app.route('/api/transactions/batch', methods=['POST'])
+        def new_transactions_batch():
+            """
+            Admite un lote de transacciones firmadas (firmas verificadas en paralelo).
+            
+            Cada una firma block.transaction_signing_data: también su nonce
+            (ver /api/transactions/nonce/<address>), token y fee.
+            """
+            values = request.get_json(silent=True) or {}
+            transactions = values.get('transactions')
+            
+            if not isinstance(transactions, list) or not transactions:
+                return jsonify({'error': 'Se requiere una lista de transacciones'}), 400
+            if len(transactions) > self.blockchain.MAX_TRANSACTIONS_PER_BLOCK:
+                return jsonify({
+                    'error': f'Máximo {self.blockchain.MAX_TRANSACTIONS_PER_BLOCK} transacciones por lote'
+                }), 400
+            if not all(isinstance(tx, dict) for tx in transactions):
+                return jsonify({'error': 'Cada transacción debe ser un objeto'}), 400
+            
+            results = self.blockchain.add_transactions(transactions)
+            accepted = sum(1 for result in results if result['accepted'])
+            
+            # Las admitidas se reenvían a los peers para que estén en su
+            # mempool cuando llegue el bloque compacto que las incluya
+            admitted = [self.blockchain.find_pending_transaction(result['hash'])
+                        for result in results if result['accepted']]
+            self.node.broadcast_transactions([tx for tx in admitted if tx is not None])
+            
+            response = {
+                'accepted': accepted,
+                'rejected': len(results) - accepted,
+                'results': [{'index': i, **result} for i, result in enumerate(results)]
+            }
+            return jsonify(response), 201 if accepted else 400
+        
         @self.app.route('/chain', methods=['GET'])
         def get_chain():
-            """Obtiene la cadena completa."""
-            response = self.blockchain.to_dict()
+            """
+            Obtiene la cadena completa en streaming.
+            
+            Acepta from_height/to_height o 'Range: blocks=A-B', y NDJSON
+            (?format=ndjson) o binario según Accept.
+            """
+            return stream_chain(self.blockchain, head=lambda start, end: self.blockchain.summary_dict())
+        
+        @self.app.route('/chain/tip', methods=['GET'])
+        def get_chain_tip():
+            """Obtiene la punta de la cadena (primer paso de la sincronización)."""
+            tip = self.blockchain.get_latest_block()
+            response = {
+                'height': tip.index,
+                'hash': tip.hash,
+                'length': len(self.blockchain.chain),
+                'work': self.blockchain.chain_work()
+            }
+            return jsonify(response), 200
+        
+        @self.app.route('/headers', methods=['POST'])
+        def get_headers():
+            """Devuelve cabeceras a partir del último bloque común con el localizador del peer."""
+            values = request.get_json(silent=True) or {}
+            locator = values.get('locator', [])
+            
+            if not isinstance(locator, list) or len(locator) > MAX_LOCATOR_SIZE:
+                return jsonify({'error': 'Localizador inválido'}), 400
+            
+            limit = min(int(values.get('limit', MAX_HEADERS_PER_REQUEST)), MAX_HEADERS_PER_REQUEST)
+            fork_height = self.blockchain.find_fork_point(locator)
+            headers = self.blockchain.get_headers(fork_height + 1, fork_height + 1 + limit)
+            
+            response = {
+                'fork_height': fork_height,
+                'fork_hash': self.blockchain.hash_at(fork_height),
+                'headers': headers,
+                'length': len(self.blockchain.chain)
+            }
+            return jsonify(response), 200
+        
+        @self.app.route('/blocks/range', methods=['GET'])
+        def get_blocks_range():
+            """Devuelve los bloques completos con altura en [start, end)."""
+            start = request.args.get('start', type=int)
+            end = request.args.get('end', type=int)
+            
+            if start is None or end is None or start < 0 or end <= start:
+                return jsonify({'error': 'Rango inválido'}), 400
+            if end - start > MAX_BLOCKS_PER_REQUEST:
+                return jsonify({'error': f'Máximo {MAX_BLOCKS_PER_REQUEST} bloques por petición'}), 400
+            
+            end = min(end, len(self.blockchain.chain))
+            if self._wants_binary():
+                return Response(self.blockchain.get_encoded_blocks(start, end),
+                                mimetype=BINARY_CONTENT_TYPE)
+            response = {
+                'blocks': [block.to_dict() for block in self.blockchain.chain[start:end]],
+                'start': start,
+                'end': end
+            }
             return jsonify(response), 200
         
         @self.app.route('/balance/<address>', methods=['GET'])
@@ -253,24 +368,24 @@ class BlockchainAPI:
             replaced = self.node.resolve_conflicts()
             
             if replaced:
-                response = {
-                    'message': 'Nuestra cadena fue reemplazada',
-                    'new_chain': self.blockchain.to_dict()
-                }
+                message, key = 'Nuestra cadena fue reemplazada', 'new_chain'
             else:
-                response = {
-                    'message': 'Nuestra cadena es autoritativa',
-                    'chain': self.blockchain.to_dict()
-                }
+                message, key = 'Nuestra cadena es autoritativa', 'chain'
             
-            return jsonify(response), 200
+            # Misma forma que antes ({'message', key: to_dict()}), emitida en streaming
+            return stream_chain(
+                self.blockchain,
+                head=lambda start, end: self.blockchain.summary_dict(),
+                wrap=(f'{{"message":{json.dumps(message)},"{key}":', '}')
+            )
         
         @self.app.route('/nodes', methods=['GET'])
         def get_nodes():
             """Obtiene la lista de nodos conectados."""
             response = {
                 'nodes': self.node.get_peers(),
-                'total': len(self.node.peers)
+                'total': len(self.node.peers),
+                'stats': self.node.get_peer_stats()
             }
             return jsonify(response), 200
         
@@ -280,37 +395,58 @@ class BlockchainAPI:
             Recibe un nuevo bloque de otro nodo.
             PARCHE 2.1: Validación completa de bloques recibidos
             """
+            if request.mimetype == BINARY_CONTENT_TYPE:
+                try:
+                    values = decode_block(request.get_data()).to_dict()
+                except CodecError as e:
+                    return jsonify({'error': 'Bloque inválido', 'reason': str(e)}), 400
+            else:
+                values = request.get_json()
+            
+            if not values:
+                return jsonify({'error': 'No se recibieron datos'}), 400
+            
+            return self._accept_block(values)
+        
+        @self.app.route('/blocks/compact', methods=['POST'])
+        def receive_compact_block():
+            """
+            Recibe un bloque compacto (cabecera + IDs cortos de transacción).
+            
+            Si el mempool no tiene todas las transacciones responde 202 con
+            las posiciones que faltan, que el emisor envía a
+            /blocks/compact/transactions.
+            """
             values = request.get_json()
             
             if not values:
                 return jsonify({'error': 'No se recibieron datos'}), 400
             
-            # Validar el bloque recibido
-            is_valid, error_msg = self.node.validate_received_block(values)
+            try:
+                block_dict, missing = self.node.receive_compact_block(values)
+            except ValueError as e:
+                return jsonify({'error': 'Bloque compacto inválido', 'reason': str(e)}), 400
             
-            if not is_valid:
-                return jsonify({
-                    'error': 'Bloque inválido',
-                    'reason': error_msg
-                }), 400
+            if block_dict is None:
+                return jsonify({'hash': values.get('hash'), 'missing': missing}), 202
+            return self._accept_block(block_dict)
+        
+        @self.app.route('/blocks/compact/transactions', methods=['POST'])
+        def receive_compact_transactions():
+            """Recibe las transacciones que faltaban para completar un bloque compacto."""
+            values = request.get_json()
+            
+            if not values or 'hash' not in values or not isinstance(values.get('transactions'), list):
+                return jsonify({'error': 'Se requieren hash y transactions'}), 400
             
-            # Si es válido, agregarlo a la blockchain
             try:
-                from block import Block
-                block = Block.from_dict(values)
-                self.blockchain.chain.append(block)
-                
-                response = {
-                    'message': 'Bloque aceptado y agregado',
-                    'block_index': block.index
-                }
-                return jsonify(response), 201
-                
-            except Exception as e:
-                return jsonify({
-                    'error': 'Error al agregar bloque',
-                    'reason': str(e)
-                }), 500
+                block_dict, missing = self.node.fill_compact_block(values['hash'], values['transactions'])
+            except ValueError as e:
+                return jsonify({'error': 'Bloque compacto inválido', 'reason': str(e)}), 400
+            
+            if block_dict is None:
+                return jsonify({'hash': values['hash'], 'missing': missing}), 202
+            return self._accept_block(block_dict)
         
         @self.app.route('/tokens', methods=['GET'])
         def get_tokens():
@@ -323,97 +459,37 @@ class BlockchainAPI:
             """
             Intercambia tokens entre ORX y VRX.
             PARCHE 2.3: Con protección de slippage
-            """
-            values = request.get_json()
-            required = ['from_token', 'to_token', 'amount', 'address']
-            if not all(k in values for k in required):
-                return jsonify({'error': 'Faltan campos requeridos'}), 400
             
-            # PARCHE 2.3: Obtener max_slippage del request (default 5%)
-            max_slippage = values.get('max_slippage', 0.05)
-            
-            success, message, amount_received = self.blockchain.token_manager.swap(
-                from_token=values['from_token'].upper(),
-                to_token=values['to_token'].upper(),
-                amount=values['amount'],
-                user_address=values['address'],
-                max_slippage=max_slippage
-            )
-            
-            if success:
-                response = {
-                    'message': message,
-                    'success': True,
-                    'amount_sent': values['amount'],
-                    'amount_received': amount_received,
-                    'from_token': values['from_token'].upper(),
-                    'to_token': values['to_token'].upper()
-                }
-                return jsonify(response), 200
-            else:
-                return jsonify({
-                    'error': message,
-                    'success': False
-                }), 400
+            Recibe una transacción firmada a LIQUIDITY_POOL con
+            data = {'op': 'swap', 'to_token': ..., 'max_slippage': ...}, o
+            la petición anterior {address, from_token, to_token, amount} si
+            address es la wallet del nodo.
+            """
+            return self._submit_operation(request.get_json(silent=True), 'swap')
         
         @self.app.route('/staking/stake', methods=['POST'])
         def stake_tokens():
             """
             Stakea tokens.
             PARCHE 2.4: Con lock period de 7 días
-            """
-            values = request.get_json()
-            required = ['address', 'amount', 'token']
-            if not all(k in values for k in required):
-                return jsonify({'error': 'Faltan campos requeridos'}), 400
             
-            success, message = self.blockchain.staking_pool.stake(
-                address=values['address'],
-                amount=values['amount'],
-                token=values['token'].upper()
-            )
-            
-            if success:
-                response = {
-                    'message': message,
-                    'success': True,
-                    'lock_period_days': 7
-                }
-                return jsonify(response), 200
-            else:
-                return jsonify({'error': message, 'success': False}), 400
+            Recibe una transacción firmada a STAKING_POOL con data = {'op': 'stake'},
+            o la petición anterior {address, amount, token} si address es la
+            wallet del nodo.
+            """
+            return self._submit_operation(request.get_json(silent=True), 'stake')
         
         @self.app.route('/staking/unstake', methods=['POST'])
         def unstake_tokens():
             """
             Retira tokens stakeados.
             PARCHE 2.4: Con validación de lock period y penalidad
-            """
-            values = request.get_json()
-            required = ['address', 'amount', 'token']
-            if not all(k in values for k in required):
-                return jsonify({'error': 'Faltan campos requeridos'}), 400
-            
-            # PARCHE 2.4: Obtener parámetro force
-            force = values.get('force', False)
             
-            success, message, amount_received, penalty = self.blockchain.staking_pool.unstake(
-                address=values['address'],
-                amount=values['amount'],
-                token=values['token'].upper(),
-                force=force
-            )
-            
-            if success:
-                response = {
-                    'message': message,
-                    'success': True,
-                    'amount_received': amount_received,
-                    'penalty': penalty
-                }
-                return jsonify(response), 200
-            else:
-                return jsonify({'error': message, 'success': False}), 400
+            Recibe una transacción firmada a STAKING_POOL con
+            data = {'op': 'unstake', 'force': bool}, o la petición anterior
+            {address, amount, token, force} si address es la wallet del nodo.
+            """
+            return self._submit_operation(request.get_json(silent=True), 'unstake')
         
         @self.app.route('/staking/<address>', methods=['GET'])
         def get_staking_info(address):
@@ -437,48 +513,27 @@ class BlockchainAPI:
         
         @self.app.route('/contracts/deploy', methods=['POST'])
         def deploy_contract():
-            """Despliega un nuevo smart contract."""
-            values = request.get_json()
-            required = ['owner', 'bytecode', 'abi']
-            if not all(k in values for k in required):
-                return jsonify({'error': 'Faltan campos requeridos'}), 400
+            """
+            Despliega un nuevo smart contract.
             
-            try:
-                contract = self.blockchain.deploy_contract(
-                    owner=values['owner'],
-                    bytecode=values['bytecode'],
-                    abi=values['abi'],
-                    constructor_params=values.get('constructor_params')
-                )
-                response = {
-                    'message': 'Contrato desplegado exitosamente',
-                    'contract': contract.to_dict()
-                }
-                return jsonify(response), 201
-            except Exception as e:
-                return jsonify({'error': str(e)}), 400
+            Recibe una transacción firmada a CONTRACTS con data = {'op':
+            'contract_deploy', 'bytecode': ..., 'abi': ..., 'constructor_params': ...},
+            o la petición anterior {owner, bytecode, abi, constructor_params}
+            si owner es la wallet del nodo.
+            """
+            return self._submit_operation(request.get_json(silent=True), 'contract_deploy')
         
         @self.app.route('/contracts/deploy/template', methods=['POST'])
         def deploy_contract_template():
-            """Despliega un contrato desde un template."""
-            values = request.get_json()
-            required = ['owner', 'template', 'params']
-            if not all(k in values for k in required):
-                return jsonify({'error': 'Faltan campos requeridos'}), 400
+            """
+            Despliega un contrato desde un template.
             
-            try:
-                contract = self.blockchain.deploy_contract_from_template(
-                    owner=values['owner'],
-                    template_name=values['template'],
-                    params=values['params']
-                )
-                response = {
-                    'message': f'Contrato {values["template"]} desplegado exitosamente',
-                    'contract': contract.to_dict()
-                }
-                return jsonify(response), 201
-            except Exception as e:
-                return jsonify({'error': str(e)}), 400
+            Recibe una transacción firmada a CONTRACTS con
+            data = {'op': 'contract_deploy', 'template': ..., 'params': ...},
+            o la petición anterior {owner, template, params} si owner es la
+            wallet del nodo.
+            """
+            return self._submit_operation(request.get_json(silent=True), 'contract_deploy')
         
         @self.app.route('/contracts/<contract_address>', methods=['GET'])
         def get_contract(contract_address):
@@ -490,18 +545,33 @@ class BlockchainAPI:
         
         @self.app.route('/contracts/<contract_address>/call', methods=['POST'])
         def call_contract(contract_address):
-            """Llama a una función de un contrato."""
+            """
+            Llama a una función de un contrato.
+            
+            Recibe una transacción firmada al contrato con
+            data = {'op': 'contract_call', 'function': ..., 'params': ...};
+            el amount es el valor enviado. También acepta la petición anterior
+            {function, params, sender, value} si sender es la wallet del nodo.
+            """
+            values = request.get_json(silent=True)
+            if isinstance(values, dict) and 'signature' in values \
+                    and values.get('recipient') != contract_address:
+                return jsonify({'error': 'El destinatario debe ser el contrato'}), 400
+            return self._submit_operation(values, 'contract_call', contract_address)
+        
+        @self.app.route('/contracts/<contract_address>/view', methods=['POST'])
+        def view_contract(contract_address):
+            """Consulta una función de un contrato sin modificar su estado."""
             values = request.get_json()
-            required = ['function', 'params', 'sender']
+            required = ['function', 'params']
             if not all(k in values for k in required):
                 return jsonify({'error': 'Faltan campos requeridos'}), 400
             
-            result = self.blockchain.call_contract(
+            result = self.blockchain.view_contract(
                 contract_address=contract_address,
                 function_name=values['function'],
                 params=values['params'],
-                sender=values['sender'],
-                value=values.get('value', 0)
+                sender=values.get('sender')
             )
             return jsonify(result), 200
         
@@ -647,7 +717,7 @@ class BlockchainAPI:
         def get_transactions():
             """Obtiene las transacciones pendientes."""
             response = {
-                'pending_transactions': [tx.to_dict() for tx in self.blockchain.pending_transactions],
+                'pending_transactions': list(self.blockchain.pending_transactions),
                 'count': len(self.blockchain.pending_transactions)
             }
             return jsonify(response), 200
@@ -696,93 +766,122 @@ class BlockchainAPI:
         @self.app.route('/api/block/hash/<hash>', methods=['GET'])
         def get_block_by_hash(hash):
             """Busca un bloque por su hash."""
-            for block in self.blockchain.chain:
-                if block.hash == hash or block.hash.startswith(hash):
-                    response = block.to_dict()
-                    return jsonify(response), 200
+            block = self.blockchain.get_block_by_hash(hash, allow_prefix=True)
+            if block:
+                return jsonify(block.to_dict()), 200
             return jsonify({'error': 'Bloque no encontrado'}), 404
         
+        @self.app.route('/api/proof/tx/<tx_hash>', methods=['GET'])
+        def get_transaction_proof(tx_hash):
+            """Obtiene la prueba de inclusión Merkle de una transacción."""
+            proof = self.blockchain.get_transaction_proof(tx_hash)
+            if proof:
+                return jsonify(proof), 200
+            return jsonify({'error': 'Transacción no encontrada'}), 404
+        
+        @self.app.route('/api/state/root', methods=['GET'])
+        def get_state_root():
+            """Raíz del estado confirmado, para comparar con otros nodos."""
+            tip = self.blockchain.get_latest_block()
+            return jsonify({
+                'height': self.blockchain.state_height - 1,
+                'block_hash': tip.hash,
+                'state_root': self.blockchain.state_trie.root,
+                'tip_state_root': tip.state_root,
+                'entries': len(self.blockchain.state_trie)
+            }), 200
+        
+        @self.app.route('/api/proof/state/<path:key>', methods=['GET'])
+        def get_state_proof(key):
+            """Prueba de inclusión de una entrada del estado (p. ej. balances/<dirección>)."""
+            proof = self.blockchain.get_state_proof(key)
+            if proof:
+                return jsonify(proof), 200
+            return jsonify({'error': 'Entrada de estado no encontrada'}), 404
+        
         @self.app.route('/api/blockchain/export', methods=['GET'])
         def export_blockchain():
-            """Exporta la blockchain completa en formato JSON."""
-            response = {
-                'chain': [block.to_dict() for block in self.blockchain.chain],
+            """
+            Exporta la blockchain en streaming (JSON por trozos o NDJSON).
+            
+            Admite rangos con from_height/to_height o 'Range: blocks=A-B'
+            para reanudar una exportación interrumpida.
+            """
+            return stream_chain(self.blockchain, head=lambda start, end: {
                 'length': len(self.blockchain.chain),
                 'difficulty': self.blockchain.difficulty,
-                'exported_at': time.time()
-            }
-            return jsonify(response), 200
+                'exported_at': time.time(),
+                'from_height': start,
+                'to_height': end - 1
+            })
         
         @self.app.route('/api/transactions/pending', methods=['GET'])
         def get_pending_transactions():
             """Obtiene todas las transacciones pendientes."""
-            transactions = [tx.to_dict() for tx in self.blockchain.pending_transactions]
+            transactions = list(self.blockchain.pending_transactions)
             response = {
                 'transactions': transactions,
                 'count': len(transactions)
             }
             return jsonify(response), 200
         
+        @self.app.route('/api/transactions/nonce/<address>', methods=['GET'])
+        def get_next_nonce(address):
+            """Nonce que debe firmar la siguiente transacción de una dirección."""
+            response = {
+                'address': address,
+                'nonce': self.blockchain.get_next_nonce(address)
+            }
+            return jsonify(response), 200
+        
         @self.app.route('/api/transactions/history', methods=['GET'])
         def get_transaction_history():
-            """Obtiene el historial completo de transacciones confirmadas."""
-            page = request.args.get('page', 1, type=int)
-            per_page = request.args.get('per_page', 20, type=int)
-            
-            all_transactions = []
-            for block in self.blockchain.chain:
-                for tx in block.transactions:
-                    tx_dict = tx.to_dict()
-                    tx_dict['block_index'] = block.index
-                    tx_dict['block_hash'] = block.hash
-                    tx_dict['confirmed'] = True
-                    all_transactions.append(tx_dict)
-            
-            # Ordenar por timestamp descendente
-            all_transactions.sort(key=lambda x: x.get('timestamp', 0), reverse=True)
+            """Obtiene el historial de transacciones confirmadas, paginado por cursor."""
+            limit = min(request.args.get('limit', request.args.get('per_page', 20, type=int), type=int), 100)
             
-            # Paginación
-            total = len(all_transactions)
-            start_idx = (page - 1) * per_page
-            end_idx = start_idx + per_page
+            try:
+                response = self.blockchain.get_transaction_history(
+                    cursor=request.args.get('cursor'),
+                    limit=limit
+                )
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
             
-            response = {
-                'transactions': all_transactions[start_idx:end_idx],
-                'total': total,
-                'page': page,
-                'per_page': per_page,
-                'total_pages': (total + per_page - 1) // per_page
-            }
+            response['limit'] = limit
             return jsonify(response), 200
         
         @self.app.route('/api/transactions/address/<address>', methods=['GET'])
         def get_transactions_by_address(address):
-            """Obtiene todas las transacciones de una dirección específica."""
-            transactions = []
+            """Obtiene las transacciones de una dirección, paginadas por cursor."""
+            limit = min(request.args.get('limit', 20, type=int), 100)
+            cursor = request.args.get('cursor')
             
-            # Buscar en bloques confirmados
-            for block in self.blockchain.chain:
-                for tx in block.transactions:
-                    if tx.sender == address or tx.recipient == address:
-                        tx_dict = tx.to_dict()
-                        tx_dict['block_index'] = block.index
-                        tx_dict['confirmed'] = True
-                        transactions.append(tx_dict)
-            
-            # Buscar en pendientes
-            for tx in self.blockchain.pending_transactions:
-                if tx.sender == address or tx.recipient == address:
-                    tx_dict = tx.to_dict()
-                    tx_dict['confirmed'] = False
-                    transactions.append(tx_dict)
-            
-            # Ordenar por timestamp
-            transactions.sort(key=lambda x: x.get('timestamp', 0), reverse=True)
+            try:
+                history = self.blockchain.get_transaction_history(
+                    address=address,
+                    cursor=cursor,
+                    limit=limit
+                )
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+            
+            transactions = history['transactions']
+            
+            # Las pendientes solo van en la primera página
+            if not cursor:
+                pending = [
+                    {**tx, 'confirmed': False}
+                    for tx in self.blockchain.pending_transactions
+                    if tx.get('sender') == address or tx.get('recipient') == address
+                ]
+                transactions = pending + transactions
             
             response = {
                 'address': address,
                 'transactions': transactions,
-                'count': len(transactions)
+                'count': len(transactions),
+                'total': history['total'],
+                'next_cursor': history['next_cursor']
             }
             return jsonify(response), 200
         
@@ -820,7 +919,8 @@ class BlockchainAPI:
                     sender=data['sender'],
                     recipient=data['recipient'],
                     amount=amount,
-                    token=token
+                    token=token,
+                    fee=data.get('fee')
                 )
                 
                 response = {
@@ -967,6 +1067,178 @@ class BlockchainAPI:
             }
             return jsonify(response), 200
     
+    def _wants_binary(self):
+        """True si el cliente pidió explícitamente el formato binario del codec."""
+        return BINARY_CONTENT_TYPE in request.headers.get('Accept', '')
+    
+    def _accept_block(self, values):
+        """
+        Valida y añade a la cadena un bloque recibido de otro nodo.
+        
+        Un bloque de una rama competidora se guarda en el árbol de bloques
+        y la cadena cambia a esa rama cuando acumula más trabajo.
+        
+        Args:
+            values (dict): Bloque completo en formato to_dict
+            
+        Returns:
+            tuple: Respuesta JSON y código HTTP
+        """
+        if isinstance(values.get('hash'), str) and self.blockchain.has_block(values['hash']):
+            return jsonify({'message': 'Bloque ya conocido'}), 200
+        
+        # Validar el bloque recibido
+        is_valid, error_msg = self.node.validate_received_block(values)
+        
+        if not is_valid:
+            return jsonify({
+                'error': 'Bloque inválido',
+                'reason': error_msg
+            }), 400
+        
+        # Si es válido, agregarlo a la blockchain
+        try:
+            from block import Block
+            block = Block.from_dict(values)
+            status = self.blockchain.accept_block(block)
+        except Exception as e:
+            return jsonify({
+                'error': 'Error al agregar bloque',
+                'reason': str(e)
+            }), 500
+        
+        if status == 'known':
+            return jsonify({'message': 'Bloque ya conocido'}), 200
+        if status == 'side':
+            return jsonify({'message': 'Bloque guardado en rama lateral', 'block_index': block.index}), 202
+        
+        # La punta cambió: el bloque que se esté minando ya no encajaría
+        self.blockchain.cancel_mining()
+        
+        # En modo gossip el bloque se reenvía a otros peers
+        self.node.relay_block(block)
+        
+        response = {
+            'message': 'Bloque aceptado y agregado' if status == 'extended' else 'Cadena reorganizada',
+            'block_index': block.index
+        }
+        return jsonify(response), 201
+    
+    def _submit_operation(self, values, operation, contract=None):
+        """
+        Admite una transacción firmada que pide una operación de estado.
+        
+        El estado no cambia aquí sino al aplicarse el bloque que la incluya,
+        igual en todos los nodos; la respuesta lleva el hash para seguirla.
+        Una petición sin firma con la forma anterior de la ruta se admite si
+        la pide la wallet del nodo, que firma la transacción.
+        
+        Args:
+            values (dict): Transacción firmada (data.op debe ser operation) o
+                petición anterior sin firmar
+            operation (str): Operación que espera la ruta
+            contract (str): Contrato llamado, en las llamadas a contrato
+            
+        Returns:
+            tuple: Respuesta JSON y código HTTP (202 si se admitió)
+        """
+        if isinstance(values, dict) and 'signature' not in values:
+            # El nonce se reserva al entrar en el mempool: firmar y admitir juntos
+            with self._wallet_lock:
+                transaction, error = self._node_operation(values, operation, contract)
+                if error:
+                    return jsonify({'error': error, 'success': False}), 400
+                return self._admit_operation(transaction, operation)
+        
+        if not isinstance(values, dict) or not isinstance(values.get('data'), dict) \
+                or values['data'].get('op') != operation:
+            return jsonify({
+                'error': f"Se requiere una transacción firmada con data.op = '{operation}'"
+            }), 400
+        return self._admit_operation(values, operation)
+    
+    def _node_operation(self, values, operation, contract=None):
+        """
+        Transacción firmada por la wallet del nodo a partir de una petición
+        con la forma anterior de las rutas de operaciones.
+        
+        Args:
+            values (dict): Petición sin firmar
+            operation (str): Operación que espera la ruta
+            contract (str): Contrato llamado, en las llamadas a contrato
+            
+        Returns:
+            tuple: (dict | None, str | None) - (transacción firmada, error)
+        """
+        if operation in ('swap', 'stake', 'unstake'):
+            required = ['from_token', 'to_token', 'amount', 'address'] if operation == 'swap' \
+                else ['address', 'amount', 'token']
+            sender_field = 'address'
+        elif operation == 'contract_deploy':
+            required = ['owner', 'template', 'params'] if 'template' in values \
+                else ['owner', 'bytecode', 'abi']
+            sender_field = 'owner'
+        else:
+            required = ['function', 'params', 'sender']
+            sender_field = 'sender'
+        if not all(k in values for k in required):
+            return None, 'Faltan campos requeridos'
+        
+        sender = values[sender_field]
+        if sender != self.wallet.address:
+            return None, (f"Solo la wallet del nodo firma peticiones sin firmar; "
+                          f"{sender} debe enviar una transacción firmada con data.op = '{operation}'")
+        
+        amount, token = 0, 'VRX'
+        data = {'op': operation}
+        if operation == 'swap':
+            amount, token = values['amount'], str(values['from_token']).upper()
+            data['to_token'] = str(values['to_token']).upper()
+            data['max_slippage'] = values.get('max_slippage', 0.05)
+        elif operation in ('stake', 'unstake'):
+            amount, token = values['amount'], str(values['token']).upper()
+            if operation == 'unstake':
+                data['force'] = bool(values.get('force', False))
+        elif operation == 'contract_deploy' and 'template' in values:
+            data.update(template=values['template'], params=values['params'])
+        elif operation == 'contract_deploy':
+            data.update(bytecode=values['bytecode'], abi=values['abi'],
+                        constructor_params=values.get('constructor_params'))
+        else:
+            amount = values.get('value', 0)
+            data.update(function=values['function'], params=values['params'])
+        
+        transaction = {
+            'sender': sender,
+            'recipient': contract or self.blockchain.OPERATION_RECIPIENTS[operation],
+            'amount': amount,
+            'token': token,
+            'timestamp': time.time(),
+            'data': data,
+            'nonce': self.blockchain.get_next_nonce(sender),
+            'public_key': self.wallet.export_keys()['public_key']
+        }
+        transaction['signature'] = self.wallet.sign_transaction(transaction_signing_data(transaction))
+        return transaction, None
+    
+    def _admit_operation(self, values, operation):
+        """Admite y difunde una transacción de operación ya firmada."""
+        result = self.blockchain.add_transactions([values])[0]
+        if not result['accepted']:
+            return jsonify({'error': result['error'], 'success': False}), 400
+        
+        transaction = self.blockchain.find_pending_transaction(result['hash'])
+        response = {
+            'message': 'Operación admitida; se aplicará al minarse su bloque',
+            'success': True,
+            'hash': result['hash']
+        }
+        if transaction is not None:
+            self.node.broadcast_transactions([transaction])
+            if operation == 'contract_deploy':
+                response['contract_address'] = contract_address(transaction['sender'], transaction['nonce'])
+        return jsonify(response), 202
+    
     def _calculate_avg_block_time(self):
         """Calcula el tiempo promedio entre bloques."""
         if len(self.blockchain.chain) < 2:
@@ -1091,6 +1363,22 @@ class BlockchainAPI:
                 'history': history
             }), 200
         
+        @self.app.route('/api/jewelry/proof/<certificate_id>', methods=['GET'])
+        def jewelry_proof(certificate_id):
+            """Obtiene la prueba Merkle de la certificación de una joya."""
+            proof = self.jewelry_system.get_certificate_proof(certificate_id)
+            
+            if proof:
+                return jsonify({
+                    'success': True,
+                    'proof': proof
+                }), 200
+            else:
+                return jsonify({
+                    'success': False,
+                    'error': 'Certificado no encontrado en bloques confirmados'
+                }), 404
+        
         @self.app.route('/api/jewelry/report', methods=['POST'])
         def report_jewelry():
             """Reporta una joya como perdida o robada."""
@@ -1250,20 +1538,16 @@ class BlockchainAPI:
         @self.app.route('/explorer/tx/<tx_hash>')
         def explorer_transaction(tx_hash):
             """Ver detalles de una transacción por hash."""
-            # Buscar en todos los bloques
-            for block in self.blockchain.chain:
-                for tx in block.transactions:
-                    # Generar hash de la transacción para comparar
-                    tx_data = json.dumps(tx.get('data', {}), sort_keys=True) if tx.get('data') else ''
-                    calculated_hash = hashlib.sha256(tx_data.encode()).hexdigest() if tx_data else ''
-                    
-                    if tx_hash in [f"0x{calculated_hash}", calculated_hash, tx.get('hash', '')]:
-                        return render_template('explorer_tx.html', 
-                            transaction=tx, 
-                            block_index=block.index,
-                            block_hash=block.hash,
-                            tx_hash=tx_hash
-                        )
+            # Buscar en el índice (hash de la transacción o de su data)
+            found = self.blockchain.find_transaction(tx_hash)
+            if found:
+                block, position = found
+                return render_template('explorer_tx.html', 
+                    transaction=block.transactions[position], 
+                    block_index=block.index,
+                    block_hash=block.hash,
+                    tx_hash=tx_hash
+                )
             
             # Buscar en certificados de joyería
             for cert_id, cert in self.jewelry_system.certificates.items():
@@ -1289,16 +1573,16 @@ class BlockchainAPI:
                     verified=True
                 )
             
-            # Si no está en memoria, buscar por patrón en transacciones
-            for block in self.blockchain.chain:
-                for tx in block.transactions:
-                    if tx.get('data', {}).get('certificate_id') == certificate_id:
-                        return render_template('explorer_certificate.html',
-                            certificate=tx.get('data'),
-                            tx_hash=tx.get('hash', ''),
-                            block_index=block.index,
-                            verified=True
-                        )
+            # Si no está en memoria, buscar sus eventos en el índice de la cadena
+            for block, position in self.blockchain.get_certificate_events(certificate_id):
+                tx = block.transactions[position]
+                if tx.get('data', {}).get('certificate_id') == certificate_id:
+                    return render_template('explorer_certificate.html',
+                        certificate=tx.get('data'),
+                        tx_hash=transaction_hash(tx),
+                        block_index=block.index,
+                        verified=True
+                    )
             
             return render_template('explorer_error.html', 
                 error=f'Certificado {certificate_id} no encontrado'), 404
@@ -1306,16 +1590,14 @@ class BlockchainAPI:
         @self.app.route('/explorer/address/<address>')
         def explorer_address(address):
             """Ver transacciones de una dirección."""
-            transactions = []
-            
-            for block in self.blockchain.chain:
-                for tx in block.transactions:
-                    if tx.get('sender') == address or tx.get('recipient') == address:
-                        transactions.append({
-                            **tx,
-                            'block_index': block.index,
-                            'block_hash': block.hash
-                        })
+            try:
+                history = self.blockchain.get_transaction_history(
+                    address=address,
+                    cursor=request.args.get('cursor'),
+                    limit=min(request.args.get('limit', 50, type=int), 100)
+                )
+            except ValueError:
+                return render_template('explorer_error.html', error='Cursor inválido'), 400
             
             # Obtener balance
             balance = self.blockchain.get_balance(address)
@@ -1323,8 +1605,9 @@ class BlockchainAPI:
             return render_template('explorer_address.html',
                 address=address,
                 balance=balance,
-                transactions=transactions,
-                tx_count=len(transactions)
+                transactions=history['transactions'],
+                tx_count=history['total'],
+                next_cursor=history['next_cursor']
             )
         
         @self.app.route('/explorer/search')
@@ -1509,6 +1792,7 @@ class BlockchainAPI:
                 with open(self.CERTIFICATES_FILE, 'r') as f:
                     certs_data = json.load(f)
                     self.jewelry_system.certificates = certs_data.get('certificates', {})
+                    self.jewelry_system.rebuild_index()
                     print(f"✅ {len(self.jewelry_system.certificates)} certificados restaurados")
                     
         except Exception as e:
@@ -9,6 +9,7 @@ from blockchain import Blockchain
 from node import Node
 from wallet import Wallet
 from jewelry_certification import JewelryCertificationSystem, JewelryItem, JewelryCertificate
+from chain_export import stream_chain
 import os
 
 app = Flask(__name__)
@@ -991,23 +992,21 @@ def get_stats():
 
 @app.route('/api/chain', methods=['GET'])
 def get_chain():
-    """Obtiene la cadena completa"""
-    chain_data = []
-    for block in blockchain.chain:
-        chain_data.append({
+    """Obtiene la cadena completa (en streaming; admite from_height/to_height y NDJSON)"""
+    def serialize(block):
+        return {
             'index': block.index,
             'timestamp': block.timestamp,
             'transactions': block.transactions,
             'previous_hash': block.previous_hash,
             'hash': block.hash,
             'nonce': block.proof
-        })
+        }
     
-    return jsonify({
+    return stream_chain(blockchain, serialize=serialize, head=lambda start, end: {
         'success': True,
-        'length': len(chain_data),
-        'chain': chain_data
-    }), 200
+        'length': end - start
+    })
 
 # ============================================================================
 # ENDPOINTS DE CERTIFICACIÓN DE JOYERÍA
@@ -31,15 +31,22 @@ class BackupManager:
             # Crear directorio de backup
             os.makedirs(backup_path, exist_ok=True)
             
-            # Guardar blockchain
+            # Guardar blockchain (con block store se copian sus segmentos en vez de
+            # serializar cada bloque a JSON)
+            block_store = getattr(blockchain, 'block_store', None)
+            state = {
+                'pending_transactions': list(blockchain.pending_transactions),
+                'difficulty': blockchain.difficulty,
+                'timestamp': timestamp
+            }
+            if block_store is not None:
+                block_store.copy_to(os.path.join(backup_path, 'blocks'))
+            else:
+                state['chain'] = [block.to_dict() for block in blockchain.chain]
+            
             chain_file = os.path.join(backup_path, 'blockchain.json')
             with open(chain_file, 'w') as f:
-                json.dump({
-                    'chain': [block.to_dict() for block in blockchain.chain],
-                    'pending_transactions': [tx.to_dict() for tx in blockchain.pending_transactions],
-                    'difficulty': blockchain.difficulty,
-                    'timestamp': timestamp
-                }, f, indent=2)
+                json.dump(state, f, indent=2)
             
             # Guardar tokens
             tokens_file = os.path.join(backup_path, 'tokens.json')
@@ -83,6 +90,15 @@ class BackupManager:
             with open(chain_file, 'r') as f:
                 data = json.load(f)
             
+            blocks_dir = os.path.join(extract_dir, 'blocks')
+            if 'chain' not in data and os.path.isdir(blocks_dir):
+                from block_store import BlockStore
+                store = BlockStore(blocks_dir)
+                try:
+                    data['chain'] = [block.to_dict() for block in store]
+                finally:
+                    store.close()
+            
             # Limpiar
             shutil.rmtree(extract_dir)
             
@@ -0,0 +1,426 @@
+"""
+ORILUXCHAIN - Binary Codec
+Codificación binaria versionada de bloques y transacciones para la red
+y el almacenamiento en disco
+"""
+
+import base64
+import re
+import struct
+from functools import lru_cache
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+from block import Block
+
+# Formato
+CODEC_MAGIC = b'OXC'
+CODEC_VERSION = 3  # v2: los bloques llevan state_root; v3: también difficulty
+READABLE_VERSIONS = (1, 2, 3)
+BINARY_CONTENT_TYPE = 'application/vnd.oriluxchain+binary'
+
+KIND_BLOCK = b'B'
+KIND_BLOCKS = b'L'
+KIND_TRANSACTION = b'T'
+
+_FRAME = struct.Struct('>3sBc')  # magic, versión, tipo de contenido
+_BLOCK_FIXED = struct.Struct('>IQ32s')  # índice, proof, hash
+_U32 = struct.Struct('>I')
+_I64 = struct.Struct('>q')
+_F64 = struct.Struct('>d')
+
+# Etiquetas de tipo de los valores
+_NONE, _FALSE, _TRUE, _UINT8, _INT64, _BIGINT, _FLOAT, _STR, _HEX, _PEM, _LIST, _DICT = range(12)
+
+# Claves frecuentes de las transacciones; se codifican con un byte.
+# Solo se pueden añadir claves al final: el índice forma parte del formato.
+KEY_TABLE = (
+    'sender', 'recipient', 'amount', 'token', 'timestamp', 'nonce', 'signature',
+    'public_key', 'data', 'fee', 'priority', 'hash', 'type', 'certificate_id',
+    'certificate', 'id', 'owner', 'jeweler', 'status', 'value', 'name',
+    'jewelry_type', 'material', 'previous_owner', 'new_owner', 'reason',
+    'contract_address', 'gas', 'gas_price', 'input', 'to', 'from',
+)
+_KEY_CODES = {key: code for code, key in enumerate(KEY_TABLE)}
+_KEY_TABLE_SIZE = len(KEY_TABLE)
+_INLINE_KEY = 255
+
+_MIN_HEX_LENGTH = 16  # Cadenas hex más cortas no compensan la conversión
+_HEX_RE = re.compile(r'[0-9a-f]+\Z')
+_PEM_HEADER = '-----BEGIN PUBLIC KEY-----\n'
+_PEM_FOOTER = '\n-----END PUBLIC KEY-----'
+
+
+class CodecError(ValueError):
+    """Datos que no se pueden codificar o decodificar en binario"""
+    pass
+
+
+def is_binary(data: bytes) -> bool:
+    """True si data empieza por la cabecera del codec."""
+    return data[:len(CODEC_MAGIC)] == CODEC_MAGIC
+
+
+# ==================== API PÚBLICA ====================
+
+def encode_transaction(transaction: Dict) -> bytes:
+    """Codifica una transacción."""
+    out = bytearray(_FRAME.pack(CODEC_MAGIC, CODEC_VERSION, KIND_TRANSACTION))
+    _write_value(out, transaction)
+    return bytes(out)
+
+
+def decode_transaction(data: bytes) -> Dict:
+    """
+    Decodifica una transacción.
+
+    Raises:
+        CodecError: Si los datos no son una transacción válida
+    """
+    offset = _read_frame(data, KIND_TRANSACTION)
+    transaction, offset = _read_checked(data, offset)
+    _expect_end(data, offset)
+    if not isinstance(transaction, dict):
+        raise CodecError("Payload is not a transaction")
+    return transaction
+
+
+def encode_block(block: Block) -> bytes:
+    """
+    Codifica un bloque.
+
+    El merkle root no se guarda: se recalcula a partir de las transacciones.
+
+    Raises:
+        CodecError: Si índice o proof no caben en sus campos de tamaño fijo
+    """
+    out = bytearray(_FRAME.pack(CODEC_MAGIC, CODEC_VERSION, KIND_BLOCK))
+    _write_block(out, block)
+    return bytes(out)
+
+
+def decode_block(data: bytes) -> Block:
+    """
+    Decodifica un bloque y comprueba su hash.
+
+    Raises:
+        CodecError: Si los datos están corruptos o el hash no coincide
+    """
+    offset = _read_frame(data, KIND_BLOCK)
+    block, offset = _read_block(data, offset, _frame_version(data))
+    _expect_end(data, offset)
+    return block
+
+
+def encode_blocks(blocks: Sequence[Block]) -> bytes:
+    """Codifica una secuencia de bloques (rangos de sincronización, exportaciones)."""
+    out = bytearray(_FRAME.pack(CODEC_MAGIC, CODEC_VERSION, KIND_BLOCKS))
+    out += _U32.pack(len(blocks))
+    for block in blocks:
+        _write_block(out, block)
+    return bytes(out)
+
+
+def join_blocks(payloads: Sequence[bytes]) -> bytes:
+    """
+    Une varios payloads de encode_block en uno de encode_blocks sin decodificarlos.
+
+    Raises:
+        CodecError: Si algún payload no es un bloque codificado
+    """
+    return b''.join(iter_join_blocks(len(payloads), payloads))
+
+
+def iter_join_blocks(count: int, payloads: Iterable[bytes]) -> Iterator[bytes]:
+    """
+    Versión en streaming de join_blocks para respuestas por trozos.
+
+    Args:
+        count: Número de bloques que producirá payloads
+        payloads: Payloads de encode_block
+
+    Yields:
+        Trozos del payload de encode_blocks
+    """
+    yield _FRAME.pack(CODEC_MAGIC, CODEC_VERSION, KIND_BLOCKS) + _U32.pack(count)
+    for payload in payloads:
+        offset = _read_frame(payload, KIND_BLOCK)
+        if _frame_version(payload) != CODEC_VERSION:
+            # Registros de una versión anterior: se recodifican al formato actual
+            payload = encode_block(decode_block(payload))
+        yield payload[offset:]
+
+
+def decode_blocks(data: bytes) -> List[Block]:
+    """
+    Decodifica una secuencia de bloques.
+
+    Raises:
+        CodecError: Si los datos están corruptos o algún hash no coincide
+    """
+    offset = _read_frame(data, KIND_BLOCKS)
+    version = _frame_version(data)
+    (count,), offset = _unpack(_U32, data, offset)
+    blocks = []
+    for _ in range(count):
+        block, offset = _read_block(data, offset, version)
+        blocks.append(block)
+    _expect_end(data, offset)
+    return blocks
+
+
+# ==================== BLOQUES ====================
+
+def _write_block(out: bytearray, block: Block) -> None:
+    try:
+        out += _BLOCK_FIXED.pack(block.index, block.proof, bytes.fromhex(block.hash))
+    except (struct.error, ValueError, TypeError) as e:
+        raise CodecError(f"Block {block.index} cannot be encoded: {e}")
+    # El timestamp conserva su tipo (int o float) porque forma parte del hash
+    _write_value(out, block.timestamp)
+    _write_value(out, block.previous_hash)
+    _write_value(out, block.state_root)
+    _write_value(out, block.difficulty)
+    out += _U32.pack(len(block.transactions))
+    for transaction in block.transactions:
+        _write_value(out, transaction)
+
+
+def _read_block(data: bytes, offset: int, version: int) -> Tuple[Block, int]:
+    (index, proof, block_hash), offset = _unpack(_BLOCK_FIXED, data, offset)
+    timestamp, offset = _read_checked(data, offset)
+    previous_hash, offset = _read_checked(data, offset)
+    state_root = difficulty = None
+    if version >= 2:
+        state_root, offset = _read_checked(data, offset)
+    if version >= 3:
+        difficulty, offset = _read_checked(data, offset)
+    (count,), offset = _unpack(_U32, data, offset)
+    transactions = []
+    for _ in range(count):
+        transaction, offset = _read_checked(data, offset)
+        transactions.append(transaction)
+
+    block = Block(index, timestamp, transactions, proof, previous_hash, state_root, difficulty)
+    if block.hash != block_hash.hex():
+        raise CodecError(f"Hash mismatch decoding block {index}")
+    return block, offset
+
+
+# ==================== VALORES ====================
+
+def _write_value(out: bytearray, value: Any) -> None:
+    kind = type(value)
+    if kind is str:
+        _write_str(out, value)
+    elif kind is dict:
+        _write_dict(out, value)
+    elif kind is int:
+        _write_int(out, value)
+    elif kind is float:
+        out.append(_FLOAT)
+        out += _F64.pack(value)
+    elif value is None:
+        out.append(_NONE)
+    elif value is True:
+        out.append(_TRUE)
+    elif value is False:
+        out.append(_FALSE)
+    elif kind is list or kind is tuple:
+        out.append(_LIST)
+        out += _U32.pack(len(value))
+        for item in value:
+            _write_value(out, item)
+    # Subclases (IntEnum, OrderedDict...): se codifican como el tipo base, igual que json
+    elif isinstance(value, str):
+        _write_str(out, str(value))
+    elif isinstance(value, int):
+        _write_int(out, int(value))
+    elif isinstance(value, float):
+        _write_value(out, float(value))
+    elif isinstance(value, dict):
+        _write_dict(out, dict(value))
+    elif isinstance(value, (list, tuple)):
+        _write_value(out, list(value))
+    else:
+        raise CodecError(f"Unsupported type: {kind.__name__}")
+
+
+def _write_int(out: bytearray, value: int) -> None:
+    if 0 <= value < 256:
+        out.append(_UINT8)
+        out.append(value)
+    elif -(1 << 63) <= value < (1 << 63):
+        out.append(_INT64)
+        out += _I64.pack(value)
+    else:
+        raw = value.to_bytes((value.bit_length() + 8) // 8, 'big', signed=True)
+        out.append(_BIGINT)
+        out += _U32.pack(len(raw))
+        out += raw
+
+
+def _write_dict(out: bytearray, value: Dict) -> None:
+    out.append(_DICT)
+    out += _U32.pack(len(value))
+    for key, item in value.items():
+        code = _KEY_CODES.get(key)
+        if code is not None:
+            out.append(code)
+        elif isinstance(key, str):
+            out.append(_INLINE_KEY)
+            _write_raw_str(out, key)
+        else:
+            raise CodecError(f"Dictionary keys must be strings, got {type(key).__name__}")
+        if type(item) is str and len(item) < _MIN_HEX_LENGTH:
+            # Camino rápido para las cadenas cortas (tokens, tipos, IDs)
+            out.append(_STR)
+            _write_raw_str(out, item)
+        else:
+            _write_value(out, item)
+
+
+def _write_str(out: bytearray, value: str) -> None:
+    if len(value) >= _MIN_HEX_LENGTH:
+        # Hashes y firmas en hex viajan como bytes crudos (la mitad de tamaño)
+        if len(value) % 2 == 0 and _HEX_RE.match(value):
+            out.append(_HEX)
+            out += _U32.pack(len(value) // 2)
+            out += bytes.fromhex(value)
+            return
+
+        # Claves públicas PEM viajan como DER si se pueden reconstruir exactamente
+        if value.startswith(_PEM_HEADER):
+            der = _pem_to_der(value)
+            if der is not None:
+                out.append(_PEM)
+                out += _U32.pack(len(der))
+                out += der
+                return
+
+    out.append(_STR)
+    _write_raw_str(out, value)
+
+
+def _write_raw_str(out: bytearray, value: str) -> None:
+    raw = value.encode('utf-8')
+    out += _U32.pack(len(raw))
+    out += raw
+
+
+@lru_cache(maxsize=1024)
+def _pem_to_der(pem: str) -> Optional[bytes]:
+    """DER de una clave PEM, o None si la conversión no es reversible byte a byte."""
+    if not pem.endswith(_PEM_FOOTER):
+        return None
+    try:
+        der = base64.b64decode(pem[len(_PEM_HEADER):-len(_PEM_FOOTER)])
+    except ValueError:
+        return None
+    return der if _der_to_pem(der) == pem else None
+
+
+@lru_cache(maxsize=1024)
+def _der_to_pem(der: bytes) -> str:
+    body = base64.b64encode(der).decode('ascii')
+    lines = [body[position:position + 64] for position in range(0, len(body), 64)]
+    return _PEM_HEADER + '\n'.join(lines) + _PEM_FOOTER
+
+
+def _read_checked(data: bytes, offset: int) -> Tuple[Any, int]:
+    try:
+        return _read_value(data, offset)
+    except (IndexError, struct.error, UnicodeDecodeError) as e:
+        raise CodecError(f"Truncated or corrupt payload at offset {offset}: {e}")
+
+
+def _read_bytes(data: bytes, offset: int) -> Tuple[bytes, int]:
+    length = _U32.unpack_from(data, offset)[0]
+    offset += 4
+    end = offset + length
+    if end > len(data):
+        raise IndexError("value extends past the end of the payload")
+    return data[offset:end], end
+
+
+def _read_value(data: bytes, offset: int) -> Tuple[Any, int]:
+    tag = data[offset]
+    offset += 1
+    if tag == _STR:
+        raw, offset = _read_bytes(data, offset)
+        return raw.decode('utf-8'), offset
+    if tag == _DICT:
+        count = _U32.unpack_from(data, offset)[0]
+        offset += 4
+        result = {}
+        for _ in range(count):
+            code = data[offset]
+            offset += 1
+            if code < _KEY_TABLE_SIZE:
+                key = KEY_TABLE[code]
+            elif code == _INLINE_KEY:
+                raw, offset = _read_bytes(data, offset)
+                key = raw.decode('utf-8')
+            else:
+                raise CodecError(f"Unknown key code {code}")
+            result[key], offset = _read_value(data, offset)
+        return result, offset
+    if tag == _UINT8:
+        return data[offset], offset + 1
+    if tag == _HEX:
+        raw, offset = _read_bytes(data, offset)
+        return raw.hex(), offset
+    if tag == _FLOAT:
+        return _F64.unpack_from(data, offset)[0], offset + 8
+    if tag == _INT64:
+        return _I64.unpack_from(data, offset)[0], offset + 8
+    if tag == _PEM:
+        raw, offset = _read_bytes(data, offset)
+        return _der_to_pem(raw), offset
+    if tag == _NONE:
+        return None, offset
+    if tag == _TRUE:
+        return True, offset
+    if tag == _FALSE:
+        return False, offset
+    if tag == _LIST:
+        count = _U32.unpack_from(data, offset)[0]
+        offset += 4
+        items = []
+        for _ in range(count):
+            item, offset = _read_value(data, offset)
+            items.append(item)
+        return items, offset
+    if tag == _BIGINT:
+        raw, offset = _read_bytes(data, offset)
+        return int.from_bytes(raw, 'big', signed=True), offset
+    raise CodecError(f"Unknown value tag {tag}")
+
+
+# ==================== MARCO ====================
+
+def _read_frame(data: bytes, kind: bytes) -> int:
+    if len(data) < _FRAME.size:
+        raise CodecError("Payload too short")
+    magic, version, payload_kind = _FRAME.unpack_from(data, 0)
+    if magic != CODEC_MAGIC:
+        raise CodecError("Not a binary payload")
+    if version not in READABLE_VERSIONS:
+        raise CodecError(f"Unsupported codec version {version}")
+    if payload_kind != kind:
+        raise CodecError(f"Expected payload kind {kind!r}, got {payload_kind!r}")
+    return _FRAME.size
+
+
+def _frame_version(data: bytes) -> int:
+    return data[len(CODEC_MAGIC)]
+
+
+def _unpack(layout: struct.Struct, data: bytes, offset: int) -> Tuple[tuple, int]:
+    try:
+        return layout.unpack_from(data, offset), offset + layout.size
+    except struct.error as e:
+        raise CodecError(f"Truncated payload at offset {offset}: {e}")
+
+
+def _expect_end(data: bytes, offset: int) -> None:
+    if offset != len(data):
+        raise CodecError(f"{len(data) - offset} trailing byte(s) after payload")
@@ -1,6 +1,110 @@
 import hashlib
 import json
+import secrets
 from time import time
+from merkle import MerkleTree
+
+# Campos de la cabecera que cubre el hash de los bloques con raíz de estado
+HEADER_HASH_FIELDS = ('index', 'timestamp', 'merkle_root', 'proof', 'previous_hash', 'state_root',
+                      'difficulty')
+
+
+def compute_transaction_hash(transaction):
+    """
+    Calcula el hash canónico de una transacción.
+    
+    Es el SHA-256 de su JSON canónico sin el propio campo 'hash', así que
+    coincide con el hash de las transacciones antiguas que no lo guardaban.
+    
+    Args:
+        transaction (dict): Transacción
+        
+    Returns:
+        str: Hash hexadecimal
+    """
+    if 'hash' in transaction:
+        transaction = {key: value for key, value in transaction.items() if key != 'hash'}
+    return hashlib.sha256(json.dumps(transaction, sort_keys=True).encode()).hexdigest()
+
+
+def transaction_hash(transaction):
+    """
+    Obtiene el hash de una transacción.
+    
+    Las transacciones guardan su hash canónico al admitirse, así que
+    normalmente no se recalcula.
+    
+    Args:
+        transaction (dict): Transacción
+        
+    Returns:
+        str: Hash guardado en la transacción o su hash canónico
+    """
+    return transaction.get('hash') or compute_transaction_hash(transaction)
+
+
+def transaction_signing_data(transaction):
+    """
+    Datos que firma el remitente de una transacción.
+    
+    Cubren todo lo que decide su efecto: remitente, destinatario, cantidad,
+    token, nonce, timestamp, el fee si lo lleva y data si pide una operación
+    de estado. Con el nonce firmado, una transacción confirmada no se puede
+    reenviar con otro nonce, y nadie puede cambiarle el fee o el token.
+    
+    Args:
+        transaction (dict): Transacción
+        
+    Returns:
+        str: JSON canónico que se firma
+    """
+    signed = {
+        key: transaction.get(key)
+        for key in ('sender', 'recipient', 'amount', 'token', 'nonce', 'timestamp')
+    }
+    if 'fee' in transaction:
+        signed['fee'] = transaction['fee']
+    data = transaction.get('data')
+    if isinstance(data, dict) and 'op' in data:
+        signed['data'] = data
+    return json.dumps(signed, sort_keys=True)
+
+
+def required_difficulty(block, base_difficulty):
+    """
+    Dificultad exigida a un bloque.
+    
+    Los bloques con raíz de estado llevan su dificultad en el hash; los
+    antiguos no la guardaban y se les exige la dificultad base de la cadena.
+    
+    Args:
+        block (Block): Bloque
+        base_difficulty (int): Dificultad de génesis de la cadena
+        
+    Returns:
+        int: Número de ceros hexadecimales iniciales exigidos
+    """
+    if block.state_root is None or block.difficulty is None:
+        return base_difficulty
+    return block.difficulty
+
+
+def block_work(difficulty):
+    """
+    Trabajo que exige una dificultad.
+    
+    Encontrar un hash con n ceros hexadecimales iniciales requiere de media
+    16 ** n intentos; es lo que suma la elección de rama por trabajo
+    acumulado. Cuenta la dificultad exigida y no los ceros que el hash tenga
+    por suerte, igual que Bitcoin cuenta el objetivo y no el hash.
+    
+    Args:
+        difficulty (int): Dificultad exigida al bloque
+        
+    Returns:
+        int: Trabajo esperado
+    """
+    return 16 ** difficulty
 
 
 class Block:
@@ -9,7 +113,8 @@ class Block:
     Cada bloque contiene un índice, timestamp, transacciones, proof y el hash del bloque anterior.
     """
     
-    def __init__(self, index, timestamp, transactions, proof, previous_hash):
+    def __init__(self, index, timestamp, transactions, proof, previous_hash, state_root=None,
+                 difficulty=None):
         """
         Inicializa un nuevo bloque.
         
@@ -19,31 +124,152 @@ class Block:
             transactions (list): Lista de transacciones incluidas en el bloque
             proof (int): Proof of work (nonce)
             previous_hash (str): Hash del bloque anterior
+            state_root (str): Raíz del estado tras aplicar las transacciones
+                del bloque (None en bloques anteriores a la raíz de estado)
+            difficulty (int): Dificultad exigida al bloque; forma parte del hash
+                en los bloques con raíz de estado (None en los antiguos)
         """
         self.index = index
         self.timestamp = timestamp
         self.transactions = transactions
         self.proof = proof
         self.previous_hash = previous_hash
+        self.state_root = state_root
+        self.difficulty = difficulty
         self.hash = self.calculate_hash()
     
-    def calculate_hash(self):
+    def hash_content(self):
         """
-        Calcula el hash SHA-256 del bloque.
+        Campos que cubre el hash del bloque.
+        
+        Los bloques con raíz de estado comprometen sus transacciones a través
+        del merkle root, así que el hash se puede verificar solo con la
+        cabecera y las pruebas de inclusión quedan ancladas al hash. Sin raíz
+        de estado se conserva el formato antiguo, que serializa las
+        transacciones completas.
         
         Returns:
-            str: Hash hexadecimal del bloque
+            dict: Contenido serializado por calculate_hash
         """
-        block_string = json.dumps({
+        if self.state_root is None:
+            return {
+                'index': self.index,
+                'timestamp': self.timestamp,
+                'transactions': self.transactions,
+                'proof': self.proof,
+                'previous_hash': self.previous_hash
+            }
+        return {
             'index': self.index,
             'timestamp': self.timestamp,
-            'transactions': self.transactions,
+            'merkle_root': self.merkle_root,
             'proof': self.proof,
-            'previous_hash': self.previous_hash
-        }, sort_keys=True)
+            'previous_hash': self.previous_hash,
+            'state_root': self.state_root,
+            'difficulty': self.difficulty
+        }
+    
+    def calculate_hash(self):
+        """
+        Calcula el hash SHA-256 del bloque.
+        
+        Reutiliza el árbol de Merkle en caché, así que minar (que recalcula el
+        hash con cada proof) no vuelve a hashear las transacciones.
+        
+        Returns:
+            str: Hash hexadecimal del bloque
+        """
+        block_string = json.dumps(self.hash_content(), sort_keys=True)
         
         return hashlib.sha256(block_string.encode()).hexdigest()
     
+    @staticmethod
+    def header_hash(header):
+        """
+        Recalcula el hash de un bloque a partir de su cabecera.
+        
+        Args:
+            header (dict): Cabecera en el formato de Block.header()
+            
+        Returns:
+            str: Hash hexadecimal, o None si el bloque es del formato antiguo
+                (su hash cubre las transacciones, que la cabecera no lleva)
+        """
+        if header.get('state_root') is None:
+            return None
+        content = {key: header[key] for key in HEADER_HASH_FIELDS}
+        return hashlib.sha256(json.dumps(content, sort_keys=True).encode()).hexdigest()
+    
+    @property
+    def transactions(self):
+        """Transacciones del bloque en orden."""
+        return self._transactions
+    
+    @transactions.setter
+    def transactions(self, transactions):
+        self._transactions = transactions
+        self._merkle_tree = None
+    
+    def invalidate_merkle_tree(self):
+        """
+        Descarta el árbol de Merkle en caché.
+        
+        Asignar transactions ya lo descarta; esto solo hace falta si se
+        modifican en sitio la lista o sus transacciones.
+        """
+        self._merkle_tree = None
+    
+    @property
+    def merkle_tree(self):
+        """
+        Árbol de Merkle de las transacciones, calculado una sola vez mientras
+        no se asignen otras transacciones.
+        
+        Returns:
+            MerkleTree: Árbol sobre los hashes de las transacciones
+        """
+        if self._merkle_tree is None:
+            self._merkle_tree = MerkleTree(
+                [transaction_hash(tx) for tx in self.transactions]
+            )
+        return self._merkle_tree
+    
+    @property
+    def merkle_root(self):
+        """Raíz de Merkle de las transacciones del bloque."""
+        return self.merkle_tree.root
+    
+    def get_transaction_proof(self, position):
+        """
+        Genera la prueba de inclusión de una transacción del bloque.
+        
+        Args:
+            position (int): Posición de la transacción en el bloque
+            
+        Returns:
+            dict: Hash de la transacción, raíz, pasos de la prueba y cabecera
+        """
+        tree = self.merkle_tree
+        return {
+            'tx_hash': tree.leaves[position],
+            'block_index': self.index,
+            'block_hash': self.hash,
+            'merkle_root': tree.root,
+            'position': position,
+            'proof': tree.get_proof(position),
+            # Con la cabecera se comprueba que merkle_root está en block_hash
+            'header': self.header()
+        }
+    
+    def mining_template(self):
+        """
+        Crea la plantilla pre-serializada del bloque para minar.
+        
+        Returns:
+            BlockHeaderTemplate: Plantilla con prefijo/sufijo fijos alrededor del proof
+        """
+        return BlockHeaderTemplate(self.hash_content())
+    
     def to_dict(self):
         """
         Convierte el bloque a un diccionario.
@@ -57,7 +283,29 @@ class Block:
             'transactions': self.transactions,
             'proof': self.proof,
             'previous_hash': self.previous_hash,
-            'hash': self.hash
+            'hash': self.hash,
+            'merkle_root': self.merkle_root,
+            'state_root': self.state_root,
+            'difficulty': self.difficulty
+        }
+    
+    def header(self):
+        """
+        Cabecera del bloque (sin transacciones) para la sincronización.
+        
+        Returns:
+            dict: Campos de enlace y resumen del bloque
+        """
+        return {
+            'index': self.index,
+            'timestamp': self.timestamp,
+            'proof': self.proof,
+            'previous_hash': self.previous_hash,
+            'hash': self.hash,
+            'merkle_root': self.merkle_root,
+            'state_root': self.state_root,
+            'difficulty': self.difficulty,
+            'tx_count': len(self.transactions)
         }
     
     @staticmethod
@@ -76,8 +324,44 @@ class Block:
             timestamp=block_dict['timestamp'],
             transactions=block_dict['transactions'],
             proof=block_dict['proof'],
-            previous_hash=block_dict['previous_hash']
+            previous_hash=block_dict['previous_hash'],
+            state_root=block_dict.get('state_root'),
+            difficulty=block_dict.get('difficulty')
         )
     
     def __repr__(self):
         return f"Block(index={self.index}, hash={self.hash[:10]}..., transactions={len(self.transactions)})"
+
+
+class BlockHeaderTemplate:
+    """
+    Serialización del bloque partida alrededor del proof.
+    
+    json.dumps(sort_keys=True) serializa las claves en orden alfabético, así
+    que todo lo anterior al proof es un prefijo fijo. Los workers del minero
+    calculan su estado SHA-256 una sola vez y en cada intento solo añaden los
+    bytes del nonce y el sufijo ya serializado, produciendo exactamente el
+    mismo hash que Block.calculate_hash.
+    """
+    
+    def __init__(self, content):
+        """
+        Serializa el bloque una sola vez.
+        
+        Args:
+            content (dict): Contenido del hash (Block.hash_content)
+            
+        Raises:
+            ValueError: Si no se puede aislar el proof en la serialización
+        """
+        marker = f"\x00proof-{secrets.token_hex(8)}\x00"
+        content = dict(content, proof=marker)
+        block_string = json.dumps(content, sort_keys=True)
+        
+        marker_json = json.dumps(marker)
+        if block_string.count(marker_json) != 1:
+            raise ValueError("Could not isolate proof in block serialization")
+        
+        prefix, suffix = block_string.split(marker_json)
+        self.prefix = prefix.encode()
+        self.suffix = suffix.encode()
@@ -0,0 +1,471 @@
+"""
+ORILUXCHAIN - Block Store
+Almacenamiento append-only de bloques en archivos de segmento,
+con índice por altura y por hash y recuperación ante caídas
+"""
+
+import json
+import logging
+import os
+import shutil
+import struct
+import threading
+import zlib
+from array import array
+from collections import OrderedDict
+from typing import Dict, Iterator, List, Optional
+from binary_codec import CodecError, decode_block, encode_block, is_binary
+from block import Block
+
+logger = logging.getLogger(__name__)
+
+# Formato en disco
+RECORD_MAGIC = b'ORXB'
+RECORD_HEADER = struct.Struct('>4sII')  # magic, longitud del payload, crc32
+INDEX_ENTRY = struct.Struct('>QIQI32s')  # altura, segmento, offset, longitud, hash
+INDEX_FILE = 'index.dat'
+SEGMENT_PATTERN = 'blk{:05d}.dat'
+
+# Configuración
+SEGMENT_SIZE = 64 * 1024 * 1024  # 64 MB por segmento
+CACHE_SIZE = 512  # Bloques decodificados en memoria
+STORE_ENCODING = os.getenv('BLOCK_STORE_ENCODING', 'binary')  # 'binary' o 'json'
+
+
+class BlockStoreError(Exception):
+    """Error del almacenamiento de bloques"""
+    pass
+
+
+class BlockStore:
+    """
+    Cadena de bloques persistida en disco.
+
+    Cada bloque se escribe como un registro con prefijo de longitud y CRC en
+    el segmento actual; después se añade una entrada de tamaño fijo al
+    índice. Ambos archivos se sincronizan con fsync antes de confirmar.
+    Al arrancar solo se lee el índice; los bloques se cargan bajo demanda
+    y se mantiene un LRU acotado de bloques decodificados.
+
+    Se comporta como una secuencia de Block (len, índices, slices,
+    iteración, append) para poder usarse como Blockchain.chain.
+    """
+
+    def __init__(self, directory: str, segment_size: int = SEGMENT_SIZE,
+                 cache_size: int = CACHE_SIZE, encoding: str = STORE_ENCODING):
+        """
+        Abre (o crea) el almacenamiento.
+
+        Los registros se leen en cualquiera de los dos formatos, así que
+        cambiar de codificación no requiere migrar los segmentos existentes.
+
+        Args:
+            directory: Directorio de los segmentos y el índice
+            segment_size: Tamaño máximo de cada segmento en bytes
+            cache_size: Número de bloques decodificados a mantener en memoria
+            encoding: Formato de los registros nuevos ('binary' o 'json')
+        """
+        if encoding not in ('binary', 'json'):
+            raise BlockStoreError(f"Unknown block store encoding: {encoding}")
+        self.directory = directory
+        self.segment_size = segment_size
+        self.cache_size = cache_size
+        self.encoding = encoding
+        os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.RLock()
+        self._cache: OrderedDict = OrderedDict()
+        self._readers: Dict[int, object] = {}
+        self._writer = None
+        self._writer_segment = -1
+
+        # Índice en memoria (arrays compactos indexados por altura)
+        self._segments = array('I')
+        self._offsets = array('Q')
+        self._lengths = array('I')
+        self._hashes = bytearray()
+        self._height_by_hash: Dict[str, int] = {}
+
+        self._index_path = os.path.join(directory, INDEX_FILE)
+        self._load_index()
+        self._recover()
+        self._index_file = open(self._index_path, 'ab')
+
+        logger.info(f"Block store opened at {directory} ({len(self)} blocks)")
+
+    # ==================== SECUENCIA ====================
+
+    def __len__(self) -> int:
+        return len(self._offsets)
+
+    def __bool__(self) -> bool:
+        return len(self) > 0
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            return [self.get(height) for height in range(*item.indices(len(self)))]
+        if item < 0:
+            item += len(self)
+        if not 0 <= item < len(self):
+            raise IndexError("block height out of range")
+        return self.get(item)
+
+    def __iter__(self) -> Iterator[Block]:
+        return self.iter_blocks()
+
+    def __reversed__(self) -> Iterator[Block]:
+        for height in range(len(self) - 1, -1, -1):
+            yield self.get(height)
+
+    # ==================== LECTURA ====================
+
+    def get(self, height: int) -> Block:
+        """
+        Obtiene un bloque por altura.
+
+        Args:
+            height: Altura del bloque
+
+        Returns:
+            Bloque decodificado
+
+        Raises:
+            BlockStoreError: Si el registro está corrupto
+        """
+        with self._lock:
+            block = self._cache.get(height)
+            if block is not None:
+                self._cache.move_to_end(height)
+                return block
+
+            block = self._decode(self._read_record(height))
+            self._cache[height] = block
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+            return block
+
+    def get_by_hash(self, block_hash: str) -> Optional[Block]:
+        """Obtiene un bloque por hash, o None si no existe."""
+        height = self.height_of(block_hash)
+        return self.get(height) if height is not None else None
+
+    def height_of(self, block_hash: str) -> Optional[int]:
+        """Altura de un bloque a partir de su hash."""
+        return self._height_by_hash.get(block_hash)
+
+    def hash_at(self, height: int) -> str:
+        """Hash del bloque a una altura sin cargarlo desde disco."""
+        return bytes(self._hashes[height * 32:(height + 1) * 32]).hex()
+
+    def iter_blocks(self, start: int = 0, end: Optional[int] = None) -> Iterator[Block]:
+        """
+        Itera los bloques en orden de altura sin llenar la caché.
+
+        Args:
+            start: Primera altura (incluida)
+            end: Última altura (excluida); por defecto la punta actual
+        """
+        end = len(self) if end is None else min(end, len(self))
+        for height in range(max(0, start), end):
+            with self._lock:
+                if height >= len(self):
+                    return  # truncado durante la iteración
+                block = self._cache.get(height)
+                if block is None:
+                    block = self._decode(self._read_record(height))
+            yield block
+
+    def iter_encoded(self, start: int, end: int) -> Iterator[bytes]:
+        """
+        Bloques [start, end) en el formato binario del codec.
+
+        Los registros que ya están en binario se devuelven tal cual, sin
+        decodificarlos; así servir rangos a otros nodos apenas cuesta CPU.
+
+        Args:
+            start: Primera altura (incluida)
+            end: Última altura (excluida)
+
+        Yields:
+            Un payload de binary_codec.encode_block por bloque
+        """
+        for height in range(max(0, start), min(end, len(self))):
+            with self._lock:
+                if height >= len(self):
+                    return  # truncado durante la iteración
+                payload = self._read_record(height)
+            if not is_binary(payload):
+                payload = encode_block(self._decode(payload))
+            yield payload
+
+    def files(self) -> List[str]:
+        """Rutas de todos los archivos del almacenamiento (índice y segmentos)."""
+        segments = sorted(
+            name for name in os.listdir(self.directory)
+            if name.startswith('blk') and name.endswith('.dat')
+        )
+        return [self._index_path] + [os.path.join(self.directory, name) for name in segments]
+
+    def copy_to(self, destination: str) -> None:
+        """Copia un estado consistente del almacenamiento a otro directorio."""
+        os.makedirs(destination, exist_ok=True)
+        with self._lock:
+            for path in self.files():
+                shutil.copy2(path, os.path.join(destination, os.path.basename(path)))
+
+    # ==================== ESCRITURA ====================
+
+    def append(self, block: Block) -> None:
+        """
+        Añade un bloque al final y lo confirma en disco.
+
+        Args:
+            block: Bloque cuya altura debe ser len(self)
+
+        Raises:
+            BlockStoreError: Si la altura no es la siguiente esperada
+        """
+        payload = self._encode(block)
+        record = RECORD_HEADER.pack(RECORD_MAGIC, len(payload), zlib.crc32(payload)) + payload
+
+        with self._lock:
+            height = len(self)
+            if block.index != height:
+                raise BlockStoreError(f"Expected block height {height}, got {block.index}")
+
+            segment, offset = self._write_position(len(record))
+            writer = self._get_writer(segment)
+            writer.write(record)
+            writer.flush()
+            os.fsync(writer.fileno())
+
+            block_hash = bytes.fromhex(block.hash)
+            self._index_file.write(
+                INDEX_ENTRY.pack(height, segment, offset, len(record), block_hash)
+            )
+            self._index_file.flush()
+            os.fsync(self._index_file.fileno())
+
+            self._add_entry(segment, offset, len(record), block_hash)
+            self._cache[height] = block
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def truncate(self, height: int) -> None:
+        """
+        Elimina todos los bloques con altura >= height (reorganizaciones).
+
+        Args:
+            height: Nueva longitud de la cadena
+        """
+        with self._lock:
+            if height >= len(self):
+                return
+            height = max(0, height)
+
+            segment = self._segments[height]
+            offset = self._offsets[height]
+            self._close_handles()
+
+            # Recortar segmento y borrar los posteriores
+            with open(self._segment_path(segment), 'r+b') as f:
+                f.truncate(offset)
+                os.fsync(f.fileno())
+            for path in self.files()[1:]:
+                if self._segment_number(path) > segment:
+                    os.remove(path)
+
+            self._index_file.close()
+            with open(self._index_path, 'r+b') as f:
+                f.truncate(height * INDEX_ENTRY.size)
+                os.fsync(f.fileno())
+            self._index_file = open(self._index_path, 'ab')
+
+            for h in range(height, len(self)):
+                self._height_by_hash.pop(self.hash_at(h), None)
+                self._cache.pop(h, None)
+            del self._segments[height:]
+            del self._offsets[height:]
+            del self._lengths[height:]
+            del self._hashes[height * 32:]
+
+            logger.info(f"Block store truncated to {height} blocks")
+
+    def close(self) -> None:
+        """Cierra todos los archivos abiertos."""
+        with self._lock:
+            self._close_handles()
+            self._index_file.close()
+
+    # ==================== INTERNOS ====================
+
+    def _encode(self, block: Block) -> bytes:
+        if self.encoding == 'binary':
+            try:
+                return encode_block(block)
+            except CodecError as e:
+                logger.warning(f"Storing block {block.index} as JSON: {e}")
+        return json.dumps(block.to_dict(), separators=(',', ':')).encode()
+
+    @staticmethod
+    def _decode(payload: bytes) -> Block:
+        if is_binary(payload):
+            return decode_block(payload)
+        return Block.from_dict(json.loads(payload))
+
+    def _segment_path(self, segment: int) -> str:
+        return os.path.join(self.directory, SEGMENT_PATTERN.format(segment))
+
+    @staticmethod
+    def _segment_number(path: str) -> int:
+        return int(os.path.basename(path)[3:-4])
+
+    def _add_entry(self, segment: int, offset: int, length: int, block_hash: bytes) -> None:
+        self._height_by_hash[block_hash.hex()] = len(self)
+        self._segments.append(segment)
+        self._offsets.append(offset)
+        self._lengths.append(length)
+        self._hashes += block_hash
+
+    def _end_position(self):
+        """(segmento, offset) inmediatamente después del último registro indexado."""
+        if not self:
+            return 0, 0
+        return self._segments[-1], self._offsets[-1] + self._lengths[-1]
+
+    def _write_position(self, record_length: int):
+        segment, offset = self._end_position()
+        if offset > 0 and offset + record_length > self.segment_size:
+            return segment + 1, 0
+        return segment, offset
+
+    def _get_writer(self, segment: int):
+        if self._writer_segment != segment:
+            if self._writer:
+                self._writer.close()
+            self._writer = open(self._segment_path(segment), 'ab')
+            self._writer_segment = segment
+        return self._writer
+
+    def _read_record(self, height: int) -> bytes:
+        segment = self._segments[height]
+        reader = self._readers.get(segment)
+        if reader is None:
+            reader = open(self._segment_path(segment), 'rb')
+            self._readers[segment] = reader
+
+        reader.seek(self._offsets[height])
+        record = reader.read(self._lengths[height])
+        payload = self._parse_record(record)
+        if payload is None:
+            raise BlockStoreError(f"Corrupted record for block {height}")
+        return payload
+
+    @staticmethod
+    def _parse_record(record: bytes) -> Optional[bytes]:
+        """Devuelve el payload si el registro está completo e íntegro."""
+        if len(record) < RECORD_HEADER.size:
+            return None
+        magic, length, crc = RECORD_HEADER.unpack_from(record)
+        payload = record[RECORD_HEADER.size:RECORD_HEADER.size + length]
+        if magic != RECORD_MAGIC or len(payload) != length or zlib.crc32(payload) != crc:
+            return None
+        return payload
+
+    def _close_handles(self) -> None:
+        for reader in self._readers.values():
+            reader.close()
+        self._readers.clear()
+        if self._writer:
+            self._writer.close()
+        self._writer = None
+        self._writer_segment = -1
+
+    def _load_index(self) -> None:
+        """Carga el índice, descartando una entrada final incompleta."""
+        if not os.path.exists(self._index_path):
+            open(self._index_path, 'wb').close()
+            return
+
+        with open(self._index_path, 'rb') as f:
+            data = f.read()
+
+        valid = len(data) - len(data) % INDEX_ENTRY.size
+        segment_sizes: Dict[int, int] = {}
+        for pos in range(0, valid, INDEX_ENTRY.size):
+            height, segment, offset, length, block_hash = INDEX_ENTRY.unpack_from(data, pos)
+            if segment not in segment_sizes:
+                path = self._segment_path(segment)
+                segment_sizes[segment] = os.path.getsize(path) if os.path.exists(path) else 0
+            # Entradas que apuntan más allá del segmento no llegaron a confirmarse
+            if height != len(self) or offset + length > segment_sizes[segment]:
+                valid = pos
+                break
+            self._add_entry(segment, offset, length, block_hash)
+
+        if valid != len(data):
+            logger.warning(f"Discarding {len(data) - valid} bytes from block index tail")
+            with open(self._index_path, 'r+b') as f:
+                f.truncate(valid)
+                os.fsync(f.fileno())
+
+    def _recover(self) -> None:
+        """
+        Re-indexa registros completos escritos tras la última entrada del
+        índice y recorta un registro final parcial.
+        """
+        segment, offset = self._end_position()
+        recovered = 0
+        damaged = False
+
+        with open(self._index_path, 'ab') as index_file:
+            while not damaged and os.path.exists(self._segment_path(segment)):
+                with open(self._segment_path(segment), 'r+b') as f:
+                    f.seek(offset)
+                    while True:
+                        record = f.read(RECORD_HEADER.size)
+                        if not record:
+                            break
+                        if len(record) == RECORD_HEADER.size:
+                            record += f.read(RECORD_HEADER.unpack(record)[1])
+                        block = self._decode_recovered(record)
+
+                        if block is None or block.index != len(self):
+                            logger.warning(
+                                f"Truncating partial block record in segment {segment} at {offset}"
+                            )
+                            f.truncate(offset)
+                            os.fsync(f.fileno())
+                            damaged = True
+                            break
+
+                        block_hash = bytes.fromhex(block.hash)
+                        index_file.write(
+                            INDEX_ENTRY.pack(len(self), segment, offset, len(record), block_hash)
+                        )
+                        self._add_entry(segment, offset, len(record), block_hash)
+                        offset += len(record)
+                        recovered += 1
+
+                if not damaged:
+                    segment, offset = segment + 1, 0
+
+            index_file.flush()
+            os.fsync(index_file.fileno())
+
+        # Nada escrito después del punto de corte puede ser válido
+        for path in self.files()[1:]:
+            if self._segment_number(path) > segment:
+                os.remove(path)
+
+        if recovered:
+            logger.warning(f"Recovered {recovered} block(s) missing from the index")
+
+    def _decode_recovered(self, record: bytes) -> Optional[Block]:
+        payload = self._parse_record(record)
+        if payload is None:
+            return None
+        try:
+            return self._decode(payload)
+        except (ValueError, KeyError, TypeError):
+            return None
@@ -0,0 +1,92 @@
+"""
+ORILUXCHAIN - Block Tree
+Ramas laterales recientes en memoria, indexadas por hash, para cambiar de
+rama sin volver a descargar bloques
+"""
+
+import logging
+import os
+from typing import Dict, List, Optional
+from block import Block
+
+logger = logging.getLogger(__name__)
+
+# Máximo de bloques fuera de la cadena principal que se conservan
+MAX_SIDE_BLOCKS = int(os.getenv('MAX_SIDE_BLOCKS', '256'))
+
+
+class BlockTree:
+    """
+    Bloques válidos que no están en la cadena principal.
+
+    Cada bloque cuelga de su padre, que es otro bloque del árbol o uno de
+    la cadena principal. Aquí acaban los bloques de ramas competidoras y
+    los que una reorganización saca de la cadena principal, así volver a
+    cambiar de rama no requiere descargarlos otra vez.
+
+    No tiene lock propio: Blockchain lo usa siempre bajo su _chain_lock.
+    """
+
+    def __init__(self, max_blocks: int = MAX_SIDE_BLOCKS):
+        """
+        Inicializa el árbol vacío.
+
+        Args:
+            max_blocks: Número máximo de bloques conservados
+        """
+        self.max_blocks = max(1, max_blocks)
+        self._blocks: Dict[str, Block] = {}
+
+    def __len__(self) -> int:
+        return len(self._blocks)
+
+    def __contains__(self, block_hash: str) -> bool:
+        return block_hash in self._blocks
+
+    def get(self, block_hash: str) -> Optional[Block]:
+        """Bloque lateral con ese hash, o None."""
+        return self._blocks.get(block_hash)
+
+    def add(self, block: Block) -> None:
+        """
+        Guarda un bloque ya verificado contra su padre.
+
+        Si el árbol se llena se descartan los bloques de menor altura, que
+        son los que antes salen de la ventana de reorganización.
+        """
+        self._blocks[block.hash] = block
+        while len(self._blocks) > self.max_blocks:
+            lowest = min(self._blocks.values(), key=lambda side: side.index)
+            del self._blocks[lowest.hash]
+
+    def branch(self, block_hash: str) -> List[Block]:
+        """
+        Rama lateral que termina en un bloque.
+
+        Returns:
+            Bloques del árbol desde el primero de la rama hasta block_hash;
+            el padre del primero es el punto de enganche (vacía si el bloque
+            no está en el árbol)
+        """
+        blocks = []
+        block = self._blocks.get(block_hash)
+        while block is not None:
+            blocks.append(block)
+            block = self._blocks.get(block.previous_hash)
+        blocks.reverse()
+        return blocks
+
+    def discard(self, blocks: List[Block]) -> None:
+        """Quita bloques (los que acaban de entrar en la cadena principal)."""
+        for block in blocks:
+            self._blocks.pop(block.hash, None)
+
+    def prune(self, min_height: int) -> None:
+        """Quita los bloques con altura menor que min_height."""
+        if not self._blocks:
+            return
+        stale = [block_hash for block_hash, block in self._blocks.items() if block.index < min_height]
+        for block_hash in stale:
+            del self._blocks[block_hash]
+        if stale:
+            logger.debug(f"Pruned {len(stale)} side blocks below height {min_height}")
@@ -3,14 +3,27 @@ ORILUXCHAIN - Blockchain Core Mejorado
 Versión optimizada con validaciones robustas, manejo de errores y logging
 """
 
+import copy
 import hashlib
 import json
 import logging
+import os
+import threading
 from time import time
-from typing import List, Dict, Optional, Tuple
-from block import Block
+from typing import Iterable, Iterator, List, Dict, Optional, Tuple
+from binary_codec import encode_block, join_blocks
+from block import (Block, block_work, compute_transaction_hash, required_difficulty,
+                   transaction_signing_data)
+from block_store import BlockStore
+from block_tree import BlockTree
+from chain_index import ChainIndex, format_cursor, normalize_hash, parse_cursor
+from mempool import Mempool
 from token_system import TokenManager, StakingPool
-from smart_contract import ContractManager
+from smart_contract import ContractManager, SmartContract, contract_address
+from miner import ParallelMiner
+from state_snapshot import SNAPSHOT_INTERVAL, SnapshotStore, StateSnapshot
+from state_trie import StateTrie, state_entries
+from wallet import address_from_public_key
 
 # Configurar logging
 logging.basicConfig(
@@ -19,6 +32,9 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Valor de una entrada del estado que no existe (p. ej. un balance nunca tocado)
+_MISSING = object()
+
 
 class BlockchainError(Exception):
     """Excepción base para errores de blockchain"""
@@ -40,6 +56,11 @@ class InsufficientBalanceError(BlockchainError):
     pass
 
 
+class MiningCancelledError(BlockchainError):
+    """Error cuando la minería se cancela (p. ej. llegó un bloque de un peer)"""
+    pass
+
+
 class Blockchain:
     """
     Implementación mejorada de la blockchain Oriluxchain.
@@ -53,67 +74,1340 @@ class Blockchain:
     - Smart contracts integrados
     """
     
-    # Constantes
-    MAX_TRANSACTIONS_PER_BLOCK = 1000
-    MIN_DIFFICULTY = 1
-    MAX_DIFFICULTY = 10
-    BLOCK_TIME_TARGET = 60  # segundos
+    # Constantes
+    MAX_TRANSACTIONS_PER_BLOCK = 1000
+    MIN_DIFFICULTY = 1
+    MAX_DIFFICULTY = 10
+    BLOCK_TIME_TARGET = 60  # segundos
+    DIFFICULTY_INTERVAL = 10  # bloques entre reajustes de dificultad
+    GENESIS_TIMESTAMP = 1735689600  # 2025-01-01 00:00 UTC, fijo para que todos los nodos compartan génesis
+    SYSTEM_SENDERS = ('NETWORK', 'GENESIS', 'MINING_POOL', 'BRIDGE_LOCK', 'BRIDGE_UNLOCK')
+    MAX_REORG_DEPTH = 10  # profundidad de las ramas laterales, los diarios de deshacer y la sincronización
+    # Operaciones de estado que viajan como transacciones firmadas (data.op)
+    OPERATIONS = ('stake', 'unstake', 'swap', 'contract_deploy', 'contract_call')
+    OPERATION_RECIPIENTS = {
+        'stake': 'STAKING_POOL',
+        'unstake': 'STAKING_POOL',
+        'swap': 'LIQUIDITY_POOL',
+        'contract_deploy': 'CONTRACTS'
+    }
+    FREE_OPERATIONS = ('contract_deploy', 'contract_call')  # admiten amount 0
+    
+    def __init__(self, difficulty: int = 4, data_dir: Optional[str] = None):
+        """
+        Inicializa una nueva blockchain.
+        
+        Args:
+            difficulty: Número de ceros iniciales requeridos en el hash (1-10) en
+                génesis y en los bloques antiguos que no guardan su dificultad
+            data_dir: Directorio del block store y de los snapshots de estado; sin él
+                la cadena vive solo en memoria
+            
+        Raises:
+            ValueError: Si la dificultad está fuera de rango
+        """
+        if not self.MIN_DIFFICULTY <= difficulty <= self.MAX_DIFFICULTY:
+            raise ValueError(
+                f"Difficulty must be between {self.MIN_DIFFICULTY} and {self.MAX_DIFFICULTY}"
+            )
+        
+        # Cadena: block store en disco o lista en memoria
+        self.block_store = BlockStore(data_dir) if data_dir else None
+        self._chain = self.block_store if self.block_store is not None else []
+        self._chain_lock = threading.RLock()
+        self.index = ChainIndex(base_difficulty=difficulty)
+        self.block_tree = BlockTree()  # ramas laterales recientes
+        
+        # Validación incremental: los bloques [0, validated_height) ya están verificados
+        self.validated_height = 0
+        self._chain_valid = True
+        
+        self.pending_transactions = Mempool()
+        self.base_difficulty = difficulty
+        self.difficulty = difficulty  # la que se exigirá al siguiente bloque
+        self.mining_reward = 50  # 50 VRX por bloque minado
+        
+        # Sistema de tokens (VRX como token nativo)
+        self.token_manager = TokenManager()
+        self.staking_pool = StakingPool(self.token_manager)
+        
+        # Sistema de smart contracts
+        self.contract_manager = ContractManager()
+        
+        # Minero multiproceso
+        self.miner = ParallelMiner()
+        
+        # Métricas
+        self.total_transactions = 0
+        self.total_blocks_mined = 0
+        
+        # Siguiente nonce de cada remitente según los bloques aplicados; los
+        # nonces reservados por transacciones pendientes los lleva el mempool
+        self.transaction_nonces = {}
+        
+        # Estado de cuentas: bloques [0, state_height) aplicados
+        self.state_height = 0
+        self.state_trie = StateTrie()  # compromiso del estado confirmado
+        self._state_entries: Dict[str, object] = {}  # contenido actual de state_trie
+        self._undo_journals: Dict[int, Dict] = {}  # altura -> diario de deshacer del bloque
+        self.snapshots = SnapshotStore(os.path.join(data_dir, 'snapshots')) if data_dir else None
+        
+        # Crear el bloque génesis (o reutilizar la cadena persistida)
+        if self.chain:
+            self.index.rebuild(self.chain)
+            self.difficulty = self.expected_difficulty(self._chain[-1])
+            # Checkpoint de confianza: el block store solo recibe bloques ya validados
+            self.validated_height = len(self.chain)
+            self.token_manager.initialize_tokens('GENESIS')
+            self._genesis_state = self.capture_state()
+            self._rebuild_state(len(self.chain) - 1)
+            logger.info(f"Loaded {len(self.chain)} blocks from block store")
+        else:
+            self.create_genesis_block()
+        
+        logger.info(f"Blockchain initialized with difficulty={difficulty}")
+    
+    def create_genesis_block(self) -> None:
+        """
+        Crea el primer bloque de la cadena (bloque génesis).
+        
+        Es determinista: timestamp fijo, el estado inicial de los tokens
+        como raíz de estado y la dificultad base. Dos nodos arrancados por
+        separado con la misma dificultad tienen el mismo bloque 0 y pueden
+        sincronizarse.
+        """
+        # Inicializar tokens: su estado es la raíz que compromete génesis
+        self.token_manager.initialize_tokens('GENESIS')
+        self._genesis_state = self.capture_state()
+        self._commit_state()
+        
+        genesis_block = Block(
+            index=0,
+            timestamp=self.GENESIS_TIMESTAMP,
+            transactions=[],
+            proof=100,
+            previous_hash="0",
+            state_root=self.state_trie.root,
+            difficulty=self.base_difficulty
+        )
+        self.add_block(genesis_block)
+        
+        logger.info(f"Genesis block created ({genesis_block.hash[:16]}...)")
+    
+    @property
+    def chain(self):
+        """Secuencia de bloques (BlockStore o lista en memoria)."""
+        return self._chain
+    
+    @chain.setter
+    def chain(self, blocks: List[Block]) -> None:
+        self.replace_chain(blocks)
+    
+    def add_block(self, block: Block) -> None:
+        """
+        Añade un bloque que extiende la punta de la cadena.
+        
+        Args:
+            block: Bloque ya validado
+            
+        Raises:
+            InvalidBlockError: Si el bloque no extiende la punta actual
+        """
+        with self._chain_lock:
+            if block.index != len(self._chain):
+                raise InvalidBlockError(
+                    f"Block index {block.index} does not extend chain of length {len(self._chain)}"
+                )
+            error = self._check_block(block, self._chain[-1] if self._chain else None)
+            if error:
+                raise InvalidBlockError(error)
+            
+            self._append_block(block)
+    
+    def replace_chain(self, blocks: List[Block]) -> None:
+        """
+        Reemplaza la cadena conservando el prefijo común.
+        
+        Solo se reescriben los bloques a partir del primer hash distinto,
+        así el block store no vuelve a escribir la historia compartida.
+        
+        Args:
+            blocks: Nueva cadena completa (desde génesis)
+        """
+        with self._chain_lock:
+            fork_height = 0
+            limit = min(len(blocks), len(self._chain))
+            while fork_height < limit and blocks[fork_height].hash == self.hash_at(fork_height):
+                fork_height += 1
+            
+            self.reorganize(fork_height - 1, blocks[fork_height:])
+    
+    def reorganize(self, fork_height: int, blocks: List[Block]) -> None:
+        """
+        Sustituye los bloques por encima de fork_height por una nueva rama.
+        
+        Las cabeceras se verifican antes de tocar la cadena. Las transacciones
+        de la rama solo se pueden ejecutar sobre el estado del punto de
+        bifurcación; si alguna falla, se deshace lo aplicado y se vuelven a
+        añadir los bloques desplazados, así que un fallo deja la cadena y el
+        estado como estaban.
+        
+        Args:
+            fork_height: Altura del último bloque común (-1 para reemplazar génesis)
+            blocks: Bloques de la nueva rama, empezando en fork_height + 1
+            
+        Raises:
+            InvalidBlockError: Si la rama no enlaza o algún bloque es inválido
+        """
+        with self._chain_lock:
+            if not -1 <= fork_height < len(self._chain):
+                raise InvalidBlockError(f"Fork height {fork_height} is outside the chain")
+            
+            previous = self._chain[fork_height] if fork_height >= 0 else None
+            pending = {block.hash: block for block in blocks}
+            for block in blocks:
+                error = self._check_block(block, previous, pending)
+                if error:
+                    raise InvalidBlockError(error)
+                previous = block
+            
+            displaced = list(self.iter_blocks(fork_height + 1))
+            self._truncate_chain(fork_height + 1)
+            self._reset_state(fork_height)
+            try:
+                for block in blocks:
+                    self._append_block(block)
+            except InvalidBlockError as e:
+                self._truncate_chain(fork_height + 1)
+                self._reset_state(fork_height)
+                for block in displaced:
+                    self._append_block(block)
+                self.block_tree.discard(blocks)
+                logger.warning(f"Reorganization from height {fork_height + 1} aborted: {e}")
+                raise
+            
+            # Los bloques desplazados se guardan por si su rama vuelve a ganar
+            self.block_tree.discard(blocks)
+            if len(displaced) <= self.MAX_REORG_DEPTH:
+                for block in displaced:
+                    self.block_tree.add(block)
+            
+            logger.info(f"Chain reorganized from height {fork_height + 1} ({len(self._chain)} blocks)")
+    
+    def accept_block(self, block: Block) -> str:
+        """
+        Añade un bloque recibido que puede no extender la punta.
+        
+        Un bloque que enlaza con un bloque reciente de la cadena principal
+        (dentro de MAX_REORG_DEPTH) o con una rama lateral se guarda en el
+        árbol de bloques. Si su rama acumula más trabajo que la cadena
+        principal, la cadena cambia a ella sin descargar nada; a igual
+        trabajo se queda la rama vista primero.
+        
+        Args:
+            block: Bloque recibido
+            
+        Returns:
+            'known', 'extended', 'side' o 'reorganized'
+            
+        Raises:
+            InvalidBlockError: Si el padre es desconocido o el bloque es inválido
+        """
+        with self._chain_lock:
+            if self.has_block(block.hash):
+                return 'known'
+            if block.previous_hash == self._chain[-1].hash:
+                self.add_block(block)
+                return 'extended'
+            
+            parent = self.find_branch_parent(block.previous_hash)
+            if parent is None:
+                raise InvalidBlockError(
+                    f"Block {block.index} does not link to a recent block (parent {block.previous_hash[:16]}...)"
+                )
+            error = self._check_block(block, parent)
+            if error:
+                raise InvalidBlockError(error)
+            self.block_tree.add(block)
+            
+            branch = self.block_tree.branch(block.hash)
+            fork_height = self.index.block_height(branch[0].previous_hash)
+            if fork_height is None or fork_height < len(self._chain) - 1 - self.MAX_REORG_DEPTH:
+                return 'side'
+            branch_work = self.index.chain_work(fork_height) + sum(
+                block_work(self.block_difficulty(side)) for side in branch
+            )
+            if branch_work <= self.index.chain_work():
+                logger.info(f"Side block #{block.index} stored ({len(self.block_tree)} side blocks)")
+                return 'side'
+            
+            self.reorganize(fork_height, branch)
+            return 'reorganized'
+    
+    def has_block(self, block_hash: str) -> bool:
+        """True si el bloque está en la cadena principal o en una rama lateral."""
+        return self.index.block_height(block_hash) is not None or block_hash in self.block_tree
+    
+    def find_branch_parent(self, block_hash: str) -> Optional[Block]:
+        """
+        Bloque del que puede colgar un bloque recibido.
+        
+        Args:
+            block_hash: Hash del padre
+            
+        Returns:
+            El bloque de la cadena principal dentro de la ventana de
+            reorganización o de una rama lateral, o None
+        """
+        height = self.index.block_height(block_hash)
+        if height is None:
+            return self.block_tree.get(block_hash)
+        if height < len(self._chain) - 1 - self.MAX_REORG_DEPTH:
+            return None
+        return self._chain[height]
+    
+    def chain_work(self, height: Optional[int] = None) -> int:
+        """Trabajo acumulado de la cadena principal hasta height (por defecto la punta)."""
+        return self.index.chain_work(height)
+    
+    def iter_blocks(self, start: int = 0, end: Optional[int] = None) -> Iterator[Block]:
+        """
+        Itera los bloques con altura en [start, end) de uno en uno.
+        
+        No copia la cadena ni llena la caché del block store. Si una
+        reorganización acorta la cadena mientras tanto, la iteración se
+        detiene en la nueva punta.
+        
+        Args:
+            start: Primera altura
+            end: Altura final (exclusiva); por defecto la punta actual
+        """
+        if self.block_store is not None:
+            yield from self.block_store.iter_blocks(start, end)
+            return
+        end = len(self._chain) if end is None else end
+        for height in range(max(0, start), end):
+            try:
+                block = self._chain[height]
+            except IndexError:
+                return
+            yield block
+    
+    def get_headers(self, start: int, end: int) -> List[Dict]:
+        """
+        Cabeceras de los bloques con altura en [start, end).
+        
+        Args:
+            start: Primera altura
+            end: Altura final (exclusiva)
+            
+        Returns:
+            Lista de cabeceras
+        """
+        end = min(end, len(self.chain))
+        if self.block_store is not None:
+            return [block.header() for block in self.block_store.iter_blocks(start, end)]
+        return [self.chain[height].header() for height in range(max(0, start), end)]
+    
+    def get_encoded_blocks(self, start: int, end: int) -> bytes:
+        """
+        Bloques con altura en [start, end) en el formato binario del codec.
+        
+        Args:
+            start: Primera altura
+            end: Altura final (exclusiva)
+            
+        Returns:
+            Payload de binary_codec.encode_blocks
+        """
+        return join_blocks(self.snapshot_encoded_blocks(start, end))
+    
+    def snapshot_encoded_blocks(self, start: int, end: int) -> List[bytes]:
+        """
+        Copia los bloques [start, end) codificados bajo el lock de la cadena.
+        
+        Una reorganización a mitad de la lectura mezclaría bloques de dos
+        ramas; con la copia el rango es siempre un tramo de una sola cadena.
+        
+        Args:
+            start: Primera altura
+            end: Altura final (exclusiva)
+            
+        Returns:
+            Un payload de binary_codec.encode_block por bloque
+        """
+        with self._chain_lock:
+            return list(self.iter_encoded_blocks(start, end))
+    
+    def iter_encoded_blocks(self, start: int, end: int) -> Iterator[bytes]:
+        """
+        Itera los bloques [start, end) codificados con binary_codec.encode_block.
+        
+        Con block store los registros binarios se copian sin decodificar.
+        """
+        if self.block_store is not None:
+            yield from self.block_store.iter_encoded(start, end)
+            return
+        for block in self.iter_blocks(start, end):
+            yield encode_block(block)
+    
+    def find_fork_point(self, locator: List[str]) -> int:
+        """
+        Primer hash del localizador que está en la cadena principal.
+        
+        Args:
+            locator: Hashes de bloques de un peer, de la punta hacia génesis
+            
+        Returns:
+            Altura del último bloque común (0 si solo coincide génesis o nada)
+        """
+        for block_hash in locator:
+            height = self.index.block_height(block_hash)
+            if height is not None:
+                return height
+        return 0
+    
+    def _append_block(self, block: Block) -> None:
+        """
+        Aplica el estado de un bloque ya verificado, lo escribe en la cadena y lo indexa.
+        
+        El estado va primero: si alguna transacción no es válida, o la raíz
+        del estado resultante no es la que declara el bloque, el bloque se
+        rechaza sin haber tocado la cadena, el índice ni el estado.
+        
+        Raises:
+            InvalidBlockError: Si sus transacciones no son válidas sobre el
+                estado actual o su raíz de estado no coincide
+        """
+        self._discard_uncommitted_contracts()
+        root = self.state_trie.root
+        undo = self._apply_block(block)
+        previous, created = self._commit_state(undo)
+        if block.state_root is not None and self.state_trie.root != block.state_root:
+            self._revert_state(undo, previous, created)
+            self.state_height = block.index
+            raise InvalidBlockError(f"Invalid state root at block {block.index}")
+        
+        self._chain.append(block)
+        self.index.add_block(block)
+        if self._chain_valid and self.validated_height == len(self._chain) - 1:
+            self.validated_height = len(self._chain)
+        
+        # Las transacciones confirmadas, y cualquier otra versión de sus
+        # nonces, dejan de reservar su nonce en el mempool
+        self.pending_transactions.remove_many(block.transactions)
+        self.pending_transactions.remove_confirmed({
+            tx['sender']: self.transaction_nonces.get(tx['sender'], 0)
+            for tx in block.transactions if tx.get('sender') not in self.SYSTEM_SENDERS
+        })
+        self._undo_journals[block.index] = {'root': root, 'previous': previous, 'created': created}
+        self._undo_journals.pop(block.index - self.MAX_REORG_DEPTH, None)
+        self.block_tree.prune(block.index - self.MAX_REORG_DEPTH)
+        self.difficulty = self.expected_difficulty(block)
+        if self.snapshots is not None and SNAPSHOT_INTERVAL > 0 and block.index \
+                and block.index % SNAPSHOT_INTERVAL == 0:
+            try:
+                self.save_snapshot()
+            except OSError as e:
+                logger.error(f"Could not save state snapshot at height {block.index}: {e}")
+    
+    def _check_block(self, block: Block, previous: Optional[Block],
+                     pending: Optional[Dict[str, Block]] = None) -> Optional[str]:
+        """
+        Verifica un bloque contra su predecesor.
+        
+        Args:
+            block: Bloque a verificar
+            previous: Bloque anterior (None para génesis)
+            pending: Bloques por hash de una rama aún no añadida (para
+                encontrar los antecesores que fijan la dificultad)
+            
+        Returns:
+            Motivo del fallo, o None si el bloque es válido
+        """
+        if previous is None:
+            return None if block.index == 0 else f"Block {block.index} has no predecessor"
+        
+        if block.index != previous.index + 1:
+            return f"Invalid index at block {block.index}"
+        
+        # Verificar enlace
+        if block.previous_hash != previous.hash:
+            return f"Invalid link at block {block.index}"
+        
+        # Tras un bloque con raíz de estado no se admite el formato antiguo
+        if block.state_root is None and previous.state_root is not None:
+            return f"Block {block.index} uses the legacy format"
+        
+        # Los bloques con raíz de estado llevan la dificultad en el hash: debe
+        # ser la que fija su rama y su timestamp no puede retroceder
+        if block.state_root is not None:
+            if block.difficulty != self.expected_difficulty(previous, pending):
+                return f"Invalid difficulty at block {block.index}"
+            if not isinstance(block.timestamp, (int, float)) or block.timestamp < previous.timestamp:
+                return f"Invalid timestamp at block {block.index}"
+        
+        # Verificar hash del bloque y proof of work con un solo cálculo
+        computed_hash = block.calculate_hash()
+        if block.hash != computed_hash:
+            return f"Invalid hash at block {block.index}"
+        if not computed_hash.startswith('0' * self.block_difficulty(block)):
+            return f"Invalid proof at block {block.index}"
+        
+        # El hash guardado en cada transacción es el que usan los índices
+        for tx in block.transactions:
+            if 'hash' in tx and tx['hash'] != compute_transaction_hash(tx):
+                return f"Invalid transaction hash at block {block.index}"
+        
+        if block.state_root is not None:
+            return self._check_block_transactions(block)
+        return None
+    
+    def _check_block_transactions(self, block: Block) -> Optional[str]:
+        """
+        Reglas de consenso de las transacciones que no dependen del estado.
+        
+        Todo bloque salvo génesis termina con exactamente una recompensa:
+        NETWORK, VRX y mining_reward. El resto de transacciones NETWORK son
+        eventos sin valor (amount 0), los demás remitentes de sistema no
+        pueden aparecer y las transacciones de usuario deben estar firmadas.
+        
+        Returns:
+            Motivo del fallo, o None si las transacciones son válidas
+        """
+        transactions = block.transactions
+        if block.index == 0:
+            return None if not transactions else "Genesis block cannot contain transactions"
+        if len(transactions) > self.MAX_TRANSACTIONS_PER_BLOCK:
+            return f"Too many transactions in block {block.index}"
+        if not all(isinstance(tx, dict) for tx in transactions):
+            return f"Malformed transaction in block {block.index}"
+        if not transactions or not self._is_reward(transactions[-1]):
+            return f"Block {block.index} must end with its mining reward"
+        
+        for tx in transactions[:-1]:
+            sender = tx.get('sender')
+            if sender == 'NETWORK':
+                if tx.get('amount') != 0:
+                    return f"Only the mining reward can issue coins (block {block.index})"
+                if self._operation(tx) is not None:
+                    return f"System transactions cannot carry operations (block {block.index})"
+            elif sender in self.SYSTEM_SENDERS:
+                return f"System sender {sender} cannot appear in block {block.index}"
+            else:
+                error = self._check_operation(tx)
+                if error:
+                    return f"{error} (block {block.index})"
+        
+        if not all(self.verify_signatures(transactions)):
+            return f"Invalid transaction signature at block {block.index}"
+        return None
+    
+    def _is_reward(self, tx: Dict) -> bool:
+        """True si la transacción es una recompensa de minería válida."""
+        amount = tx.get('amount')
+        return (
+            tx.get('sender') == 'NETWORK'
+            and tx.get('token') == 'VRX'
+            and isinstance(amount, (int, float)) and not isinstance(amount, bool)
+            and amount == self.mining_reward
+            and isinstance(tx.get('recipient'), str) and bool(tx['recipient'])
+        )
+    
+    def block_difficulty(self, block: Block) -> int:
+        """Dificultad exigida a un bloque (la base en los bloques antiguos)."""
+        return required_difficulty(block, self.base_difficulty)
+    
+    def expected_difficulty(self, parent: Block, pending: Optional[Dict[str, Block]] = None) -> int:
+        """
+        Dificultad que debe llevar el hijo de parent.
+        
+        Depende solo de la rama, así todos los nodos exigen lo mismo a cada
+        altura: se hereda del padre y cada DIFFICULTY_INTERVAL bloques sube o
+        baja un punto según el tiempo medio entre los últimos bloques frente
+        a BLOCK_TIME_TARGET. La primera ventana no se reajusta porque incluye
+        génesis, cuyo timestamp no es el de un bloque minado.
+        
+        Args:
+            parent: Bloque padre (de la cadena principal o de una rama)
+            pending: Bloques por hash de una rama aún no añadida
+            
+        Returns:
+            Dificultad del siguiente bloque
+        """
+        difficulty = self.block_difficulty(parent)
+        height = parent.index + 1
+        if height % self.DIFFICULTY_INTERVAL or height <= self.DIFFICULTY_INTERVAL:
+            return difficulty
+        
+        first = self._find_ancestor(parent, height - self.DIFFICULTY_INTERVAL, pending)
+        if first is None:
+            return difficulty
+        spacing = (parent.timestamp - first.timestamp) / (self.DIFFICULTY_INTERVAL - 1)
+        if spacing < self.BLOCK_TIME_TARGET * 0.5:
+            return min(difficulty + 1, self.MAX_DIFFICULTY)
+        if spacing > self.BLOCK_TIME_TARGET * 2:
+            return max(difficulty - 1, self.MIN_DIFFICULTY)
+        return difficulty
+    
+    def _find_ancestor(self, block: Block, height: int,
+                       pending: Optional[Dict[str, Block]] = None) -> Optional[Block]:
+        """
+        Antecesor de un bloque a una altura, siguiendo ramas laterales.
+        
+        En cuanto la rama llega a la cadena principal, el antecesor se lee
+        directamente a esa altura.
+        """
+        while block.index > height:
+            parent_height = self.index.block_height(block.previous_hash)
+            if parent_height is not None:
+                return self._chain[height]
+            block = (pending or {}).get(block.previous_hash) or self.block_tree.get(block.previous_hash)
+            if block is None:
+                return None
+        return block if block.index == height else None
+    
+    def hash_at(self, height: int) -> str:
+        """Hash del bloque a una altura sin decodificarlo si hay block store."""
+        if self.block_store is not None:
+            return self.block_store.hash_at(height)
+        return self._chain[height].hash
+    
+    def _truncate_chain(self, height: int) -> None:
+        """Elimina los bloques con altura >= height."""
+        self.index.truncate(height)
+        if height <= self.validated_height:
+            # Si había un bloque inválido en validated_height, ya no está en la cadena
+            self.validated_height = height
+            self._chain_valid = True
+        if self.block_store is not None:
+            self.block_store.truncate(height)
+        else:
+            del self._chain[height:]
+        self.difficulty = self.expected_difficulty(self._chain[-1]) if self._chain else self.base_difficulty
+    
+    def _apply_block(self, block: Block) -> Optional[Dict[str, object]]:
+        """
+        Aplica las transacciones de un bloque al estado de cuentas.
+        
+        Es la única transición de estado de la cadena: la usan los bloques
+        minados, los recibidos de peers (también al reorganizar) y la
+        reproducción de bloques tras cargar un snapshot, así el estado
+        depende solo de los bloques aplicados. Cada transacción se valida
+        contra el estado que dejan las anteriores del bloque; si una falla,
+        el bloque se rechaza entero y el estado queda como estaba.
+        
+        Returns:
+            Valores anteriores de las entradas que cambió el bloque, o None
+            en los bloques antiguos (no llevan la cuenta)
+        
+        Raises:
+            InvalidBlockError: Si alguna transacción no es válida
+        """
+        if block.state_root is None:
+            self._apply_legacy_block(block)
+            return None
+        
+        undo: Dict[str, object] = {}
+        # _check_block exige que termine en la recompensa (génesis no tiene transacciones)
+        miner = block.transactions[-1]['recipient'] if block.transactions else None
+        for position, tx in enumerate(block.transactions):
+            error = self._execute_transaction(tx, undo, block.timestamp, miner)
+            if error:
+                self._restore_entries(undo)
+                self._discard_uncommitted_contracts()
+                raise InvalidBlockError(
+                    f"Invalid transaction {position} in block {block.index}: {error}"
+                )
+        self.state_height = block.index + 1
+        return undo
+    
+    def _execute_transaction(self, tx: Dict, undo: Dict[str, object],
+                             timestamp: float, miner: Optional[str]) -> Optional[str]:
+        """
+        Ejecuta una transacción de un bloque sobre el estado actual.
+        
+        Las reglas que no dependen del estado (recompensa, remitentes de
+        sistema, firmas, forma de las operaciones) ya se comprobaron en
+        _check_block. Antes de modificar una entrada se guarda su valor
+        anterior en undo, y si la transacción no es válida no se modifica nada.
+        
+        Args:
+            tx: Transacción
+            undo: Valores anteriores de las entradas modificadas ('sección/clave')
+            timestamp: Timestamp del bloque, el reloj de las operaciones
+            miner: Destinatario de la recompensa del bloque, que cobra los fees
+            
+        Returns:
+            Motivo del fallo, o None si se aplicó
+        """
+        tx_undo: Dict[str, object] = {}
+        error = self._run_transaction(tx, tx_undo, timestamp, miner)
+        if error:
+            self._restore_entries(tx_undo)
+            return error
+        for key, value in tx_undo.items():
+            undo.setdefault(key, value)
+        return None
+    
+    def _run_transaction(self, tx: Dict, undo: Dict[str, object], timestamp: float,
+                         miner: Optional[str]) -> Optional[str]:
+        """Cuerpo de _execute_transaction; si falla, el llamador restaura undo."""
+        sender = tx.get('sender')
+        recipient = tx.get('recipient')
+        amount = tx.get('amount')
+        if sender == 'NETWORK':
+            if amount:
+                self._save_entries(undo, f"balances/{recipient}", 'token/total_supply', 'token/total_minted')
+                self.token_manager.vrx.issue(recipient, amount)
+            return None
+        
+        operation = self._operation(tx)
+        if not isinstance(amount, (int, float)) or isinstance(amount, bool) or amount < 0 \
+                or (amount == 0 and operation not in self.FREE_OPERATIONS):
+            return "Amount must be positive"
+        if tx.get('token') not in ('ORX', 'VRX'):
+            return f"Invalid token: {tx.get('token')}"
+        if not isinstance(recipient, str) or not recipient:
+            return "Invalid recipient"
+        fee = tx.get('fee', 0)
+        if not isinstance(fee, (int, float)) or isinstance(fee, bool) or fee < 0:
+            return "Fee must be a non-negative number"
+        
+        nonce = tx.get('nonce')
+        expected_nonce = self.transaction_nonces.get(sender, 0)
+        if not isinstance(nonce, int) or isinstance(nonce, bool) or nonce != expected_nonce:
+            return f"Invalid nonce. Expected {expected_nonce}, got {nonce}"
+        
+        # El fee se cobra en el token de la transacción aunque la operación
+        # no gaste del balance (unstake) o el contrato revierta
+        token_obj = self.token_manager.get_token(tx['token'])
+        balance = token_obj.balance_of(sender)
+        needed = fee if operation == 'unstake' else amount + fee
+        if balance < needed:
+            return f"Insufficient balance. Has {balance}, needs {needed}"
+        if fee:
+            self._save_entries(undo, f"balances/{sender}", f"balances/{miner}")
+            token_obj.transfer(sender, miner, fee)
+        
+        if operation is None:
+            self._save_entries(undo, f"balances/{sender}", f"balances/{recipient}")
+            token_obj.transfer(sender, recipient, amount)
+        else:
+            error = self._execute_operation(operation, tx, undo, timestamp)
+            if error:
+                return error
+        
+        self._save_entries(undo, f"nonces/{sender}")
+        self.transaction_nonces[sender] = nonce + 1
+        return None
+    
+    def _execute_operation(self, operation: str, tx: Dict, undo: Dict[str, object],
+                           timestamp: float) -> Optional[str]:
+        """
+        Ejecuta la operación de estado de una transacción (data.op).
+        
+        Staking, swaps y contratos solo cambian el estado así, dentro de un
+        bloque y con su timestamp como reloj, de modo que todos los nodos
+        llegan al mismo estado y a la misma raíz. El amount es lo que se
+        stakea, retira o intercambia; en los contratos, el valor que se les
+        envía. Una llamada a contrato que revierte se incluye igual: consume
+        el nonce sin cambiar el storage ni mover el valor.
+        
+        Returns:
+            Motivo del fallo, o None si se aplicó
+        """
+        sender, amount, token = tx['sender'], tx['amount'], tx['token']
+        data = tx['data']
+        
+        if operation in ('stake', 'unstake', 'swap'):
+            self._save_entries(undo, f"balances/{sender}", f"balances/{tx['recipient']}")
+            if operation == 'swap':
+                success, message, _ = self.token_manager.swap(
+                    token, data['to_token'], amount, sender, data.get('max_slippage', 0.05)
+                )
+                return None if success else message
+            
+            self._save_entries(undo, f"stakes/{sender}", 'staking/total_staked')
+            if operation == 'stake':
+                success, message = self.staking_pool.stake(sender, amount, token, now=timestamp)
+            else:
+                success, message, _, _ = self.staking_pool.unstake(
+                    sender, amount, token, force=bool(data.get('force')), now=timestamp
+                )
+            return None if success else message
+        
+        if operation == 'contract_deploy':
+            address = contract_address(sender, tx['nonce'])
+            if self.contract_manager.get_contract(address) is not None:
+                return f"Contract address {address} already in use"
+            self._save_entries(undo, f"contracts/{address}", 'contract_registry/contract_counter')
+            try:
+                if 'template' in data:
+                    self.contract_manager.deploy_from_template(
+                        sender, data['template'], data.get('params') or {},
+                        address=address, timestamp=timestamp
+                    )
+                else:
+                    self.contract_manager.deploy_contract(
+                        sender, data['bytecode'], data['abi'], data.get('constructor_params'),
+                        address=address, timestamp=timestamp
+                    )
+            except Exception as e:
+                return f"Contract deployment failed: {e}"
+            recipient = address
+        else:
+            contract = self.contract_manager.get_contract(tx['recipient'])
+            if contract is None:
+                return "Contract not found"
+            self._save_entries(undo, f"contracts/{contract.address}")
+            
+            # Los slots escritos quedan marcados en el diario del storage y
+            # _commit_state los recoge con take_dirty_storage
+            result = contract.execute(
+                data['function'], data.get('params') or {},
+                {'sender': sender, 'value': amount, 'timestamp': timestamp}
+            )
+            if not result['success']:
+                return None
+            recipient = contract.address
+        
+        if amount:
+            self._save_entries(undo, f"balances/{sender}", f"balances/{recipient}")
+            self.token_manager.get_token(token).transfer(sender, recipient, amount)
+        return None
+    
+    @staticmethod
+    def _operation(transaction: Dict) -> Optional[str]:
+        """Operación de estado que pide una transacción, o None si es una transferencia."""
+        data = transaction.get('data')
+        return data.get('op') if isinstance(data, dict) else None
+    
+    def _check_operation(self, transaction: Dict) -> Optional[str]:
+        """
+        Forma de la operación de una transacción (lo que no depende del estado).
+        
+        Returns:
+            Motivo del fallo, o None si no hay operación o está bien formada
+        """
+        operation = self._operation(transaction)
+        if operation is None:
+            return None
+        if operation not in self.OPERATIONS:
+            return f"Unknown operation: {operation}"
+        
+        data = transaction['data']
+        expected_recipient = self.OPERATION_RECIPIENTS.get(operation)
+        if expected_recipient is not None and transaction.get('recipient') != expected_recipient:
+            return f"Operation {operation} must be sent to {expected_recipient}"
+        if not isinstance(data.get('params', {}), dict) \
+                or not isinstance(data.get('constructor_params', {}), (dict, type(None))):
+            return "Operation params must be an object"
+        
+        if operation == 'swap':
+            if data.get('to_token') not in ('ORX', 'VRX'):
+                return "Swap needs a valid to_token"
+            slippage = data.get('max_slippage', 0.05)
+            if not isinstance(slippage, (int, float)) or isinstance(slippage, bool):
+                return "max_slippage must be a number"
+        elif operation == 'contract_deploy':
+            has_code = isinstance(data.get('bytecode'), str) and isinstance(data.get('abi'), dict)
+            if not has_code and not isinstance(data.get('template'), str):
+                return "Contract deployment needs bytecode and abi, or a template"
+        elif operation == 'contract_call':
+            if not isinstance(data.get('function'), str):
+                return "Contract call needs a function"
+        return None
+    
+    def _apply_legacy_block(self, block: Block) -> None:
+        """
+        Aplica un bloque del formato anterior (sin raíz de estado).
+        
+        Solo existen al principio de cadenas creadas antes de la raíz de
+        estado y se reproducen con las reglas de entonces: las recompensas se
+        emiten y una transferencia sin fondos se ignora.
+        """
+        for tx in block.transactions:
+            try:
+                token_obj = self.token_manager.get_token(tx.get('token', 'ORX'))
+                if tx['sender'] == 'NETWORK':
+                    if tx['amount'] > 0:
+                        token_obj.issue(tx['recipient'], tx['amount'])
+                elif not token_obj.transfer(tx['sender'], tx['recipient'], tx['amount']):
+                    logger.warning(f"Transfer without funds skipped in legacy block #{block.index}")
+            except Exception as e:
+                logger.error(f"Error processing transaction: {e}")
+            
+            sender = tx.get('sender')
+            nonce = tx.get('nonce')
+            if sender not in self.SYSTEM_SENDERS and isinstance(nonce, int) \
+                    and self.transaction_nonces.get(sender, 0) <= nonce:
+                self.transaction_nonces[sender] = nonce + 1
+        self.state_height = block.index + 1
+    
+    def _discard_uncommitted_contracts(self) -> None:
+        """
+        Devuelve al valor comprometido los contratos y slots aún sin comprometer.
+        
+        Fuera de un bloque los contratos solo cambian saltándose la cadena
+        (llamadas directas a ContractManager), y esos cambios no forman
+        parte del estado: si el siguiente compromiso los recogiera, la raíz
+        dejaría de ser la del bloque.
+        """
+        stale = self.contract_manager.take_dirty_storage()
+        # Los contratos antes que sus slots: un slot necesita su contrato
+        for key in sorted(stale, key=lambda entry: not entry.startswith('contracts/')):
+            self._write_entry(key, self._state_entries.get(key, _MISSING))
+        if stale:
+            logger.warning(f"Discarded {len(stale)} contract changes made outside a block")
+    
+    def _revert_state(self, undo: Dict[str, object], previous: Dict[str, object],
+                      created: List[str]) -> None:
+        """
+        Deshace un bloque ya aplicado y comprometido (raíz incorrecta o ejecución de prueba).
+        
+        Args:
+            undo: Diario de deshacer que devolvió _apply_block
+            previous, created: Lo que devolvió _commit_state
+        """
+        self._revert_commit(previous, created)
+        self._restore_entries(undo)
+        # Los slots de storage no están en undo: vuelven al valor comprometido
+        for key in [*previous, *created]:
+            if key.startswith('storage/'):
+                self._write_entry(key, self._state_entries.get(key, _MISSING))
+    
+    def _save_entries(self, undo: Dict[str, object], *keys: str) -> None:
+        """Guarda en undo el valor actual de las entradas que aún no tiene."""
+        for key in keys:
+            if key not in undo:
+                undo[key] = self._read_entry(key)
+    
+    def _restore_entries(self, undo: Dict[str, object]) -> None:
+        """Devuelve las entradas guardadas con _save_entries a su valor anterior."""
+        for key, value in undo.items():
+            self._write_entry(key, value)
+    
+    def _read_entry(self, key: str):
+        """
+        Copia del valor de una entrada del estado en vivo.
+        
+        Args:
+            key: Entrada con el formato de state_entries ('sección/clave')
+            
+        Returns:
+            El valor, o _MISSING si la entrada no existe
+        """
+        section, name = key.split('/', 1)
+        if section == 'storage':
+            address, slot = name.split('/', 1)
+            contract = self.contract_manager.get_contract(address)
+            value = contract.storage.get(slot, _MISSING) if contract is not None else _MISSING
+        elif section == 'contracts':
+            contract = self.contract_manager.get_contract(name)
+            return contract.metadata_state() if contract is not None else _MISSING
+        else:
+            owner = self._entry_owner(section)
+            if isinstance(owner, dict):
+                value = owner.get(name, _MISSING)
+            else:
+                value = getattr(owner, name)
+                value = sorted(value) if name == 'minters' else value
+        return _MISSING if value is _MISSING else copy.deepcopy(value)
+    
+    def _write_entry(self, key: str, value) -> None:
+        """
+        Escribe una entrada del estado en vivo (inversa de _read_entry).
+        
+        Args:
+            key: Entrada con el formato de state_entries ('sección/clave')
+            value: Nuevo valor, o _MISSING para eliminar la entrada
+        """
+        section, name = key.split('/', 1)
+        if value is not _MISSING:
+            value = copy.deepcopy(value)
+        
+        if section == 'storage':
+            address, slot = name.split('/', 1)
+            contract = self.contract_manager.get_contract(address)
+            if contract is None:
+                return  # el slot se fue con su contrato
+            if value is _MISSING:
+                contract.storage.pop(slot, None)
+            else:
+                contract.storage[slot] = value
+            contract.storage_version += 1  # invalida las vistas en caché
+            return
+        if section == 'contracts':
+            contracts = self.contract_manager.contracts
+            if value is _MISSING:
+                contracts.pop(name, None)
+            elif name in contracts:
+                contracts[name].restore_metadata(value)
+            else:
+                contracts[name] = SmartContract.from_state({**value, 'storage': {}})
+            return
+        
+        owner = self._entry_owner(section)
+        if not isinstance(owner, dict):
+            setattr(owner, name, set(value) if name == 'minters' else value)
+        elif value is _MISSING:
+            owner.pop(name, None)
+        else:
+            owner[name] = value
+    
+    def _entry_owner(self, section: str):
+        """Diccionario (o objeto, para los contadores) que guarda una sección del estado."""
+        vrx = self.token_manager.vrx
+        owners = {
+            'balances': vrx.balances,
+            'allowances': vrx.allowances,
+            'token': vrx,
+            'liquidity_pool': self.token_manager.liquidity_pool,
+            'stakes': self.staking_pool.stakes,
+            'staking': self.staking_pool,
+            'contract_registry': self.contract_manager,
+            'nonces': self.transaction_nonces
+        }
+        if section not in owners:
+            raise KeyError(f"Unknown state section: {section}")
+        return owners[section]
+    
+    def capture_state(self) -> Dict[str, Dict]:
+        """
+        Copia del estado de cuentas confirmado.
+        
+        Returns:
+            Secciones del estado (balances, allowances, stakes, nonces,
+            contratos...), cada una un diccionario clave -> valor
+        """
+        state = {}
+        state.update(self.token_manager.export_state())
+        state.update(self.staking_pool.export_state())
+        state.update(self.contract_manager.export_state())
+        state['nonces'] = dict(self.transaction_nonces)
+        return state
+    
+    def restore_state(self, state: Dict[str, Dict]) -> None:
+        """Sustituye el estado de cuentas por uno creado con capture_state."""
+        self.token_manager.import_state(state)
+        self.staking_pool.import_state(state)
+        self.contract_manager.import_state(state)
+        self.transaction_nonces.clear()
+        self.transaction_nonces.update(state['nonces'])
+    
+    def _commit_state(self, keys: Optional[Iterable[str]] = None
+                      ) -> Tuple[Dict[str, object], List[str]]:
+        """
+        Lleva el estado actual al árbol de estado.
+        
+        Con keys solo se leen esas entradas (las que guardó el diario de
+        deshacer del bloque) y los slots de storage confirmados desde el
+        último compromiso; sin keys se compara el estado entero (génesis,
+        bloques antiguos y reconstrucción). Solo se rehashean las entradas
+        cuyo valor cambió y las ramas de su camino.
+        
+        Args:
+            keys: Entradas que pueden haber cambiado ('sección/clave')
+        
+        Returns:
+            Tupla (valor anterior de las entradas modificadas o eliminadas,
+            entradas nuevas): lo necesario para deshacer el compromiso
+        """
+        previous = self._state_entries
+        dirty_storage = self.contract_manager.take_dirty_storage()
+        if keys is None:
+            current = state_entries(self.capture_state())
+            removed = [key for key in previous if key not in current]
+        else:
+            current = {}
+            removed = set()
+            for key in set(keys) | dirty_storage:
+                value = self._read_entry(key)
+                if value is not _MISSING:
+                    current[key] = value
+                    continue
+                if key in previous:
+                    removed.add(key)
+                if key.startswith('contracts/'):
+                    # Un contrato eliminado se lleva sus slots
+                    prefix = f"storage/{key[len('contracts/'):]}/"
+                    removed.update(entry for entry in previous if entry.startswith(prefix))
+            removed = list(removed)
+        
+        changed = {
+            key: value for key, value in current.items()
+            if key not in previous or previous[key] != value
+        }
+        if changed or removed:
+            self.state_trie.update(changed, removed)
+        
+        undo = {key: previous[key] for key in removed}
+        created = []
+        for key in changed:
+            if key in previous:
+                undo[key] = previous[key]
+            else:
+                created.append(key)
+        
+        if keys is None:
+            self._state_entries = current
+        else:
+            for key in removed:
+                del previous[key]
+            previous.update(changed)
+        return undo, created
+    
+    def _revert_commit(self, previous: Dict[str, object], created: List[str]) -> None:
+        """Deshace un _commit_state con lo que devolvió."""
+        self.state_trie.update(previous, created)
+        for key in created:
+            self._state_entries.pop(key, None)
+        self._state_entries.update(previous)
+    
+    def _reset_state(self, height: int) -> None:
+        """Lleva el estado de cuentas al posterior al bloque height."""
+        if self.state_height <= height + 1:
+            return
+        if self.snapshots is not None:
+            self.snapshots.discard_above(height)
+        if not self._rollback_state(height):
+            self._rebuild_state(height)
+    
+    def _rollback_state(self, height: int) -> bool:
+        """
+        Deshace los bloques aplicados por encima de height con sus diarios.
+        
+        Cada diario guarda el valor anterior de las entradas que cambió su
+        bloque (balances, nonces, stakes, slots de storage...). Esos valores
+        se escriben tal cual en el árbol y en el estado en vivo, así que el
+        coste depende de los cambios deshechos y no del tamaño del estado ni
+        de la longitud de la cadena. Los diarios viven en memoria y solo
+        cubren los últimos MAX_REORG_DEPTH bloques.
+        
+        Returns:
+            False si falta algún diario (el llamador debe reconstruir el estado)
+        """
+        if height < 0:
+            return False  # sin génesis no hay estado inicial que conservar
+        heights = range(self.state_height - 1, height, -1)
+        journals = [self._undo_journals.get(block_height) for block_height in heights]
+        if not journals or None in journals:
+            return False
+        
+        entries = self._state_entries
+        touched = set()
+        for journal in journals:
+            for key in journal['created']:
+                entries.pop(key, None)
+                touched.add(key)
+            entries.update(journal['previous'])
+            touched.update(journal['previous'])
+        
+        self.state_trie.update(
+            {key: entries[key] for key in touched if key in entries},
+            [key for key in touched if key not in entries]
+        )
+        for block_height in heights:
+            del self._undo_journals[block_height]
+        if self.state_trie.root != journals[-1]['root']:
+            logger.error(f"Undo journals did not restore the state root at height {height}")
+            return False
+        
+        # Los contratos antes que sus slots: un slot necesita su contrato
+        for key in sorted(touched, key=lambda entry: not entry.startswith('contracts/')):
+            self._write_entry(key, entries.get(key, _MISSING))
+        self.state_height = height + 1
+        
+        logger.info(f"State rolled back {len(journals)} blocks to height {height}")
+        return True
     
-    def __init__(self, difficulty: int = 4):
+    def get_state_proof(self, key: str) -> Optional[Dict]:
         """
-        Inicializa una nueva blockchain.
+        Prueba de inclusión de una entrada del estado confirmado.
+        
+        La raíz es la del estado tras el bloque height, la que registra ese
+        mismo bloque en su cabecera.
         
         Args:
-            difficulty: Número de ceros iniciales requeridos en el hash (1-10)
-            
+            key: Entrada del estado, p. ej. 'balances/<dirección>',
+                'nonces/<dirección>' o 'storage/<contrato>/<slot>'
+                
+        Returns:
+            Diccionario con key, value, state_root, height y proof, o None
+            si la entrada no existe
+        """
+        with self._chain_lock:
+            if key not in self._state_entries:
+                return None
+            return {
+                'key': key,
+                'value': self._state_entries[key],
+                'state_root': self.state_trie.root,
+                'height': self.state_height - 1,
+                'proof': self.state_trie.get_proof(key)
+            }
+    
+    def save_snapshot(self) -> Optional[StateSnapshot]:
+        """
+        Guarda un snapshot del estado tras el último bloque aplicado.
+        
+        Returns:
+            El snapshot guardado, o None si la cadena vive solo en memoria
+        
         Raises:
-            ValueError: Si la dificultad está fuera de rango
+            OSError: Si no se puede escribir
         """
-        if not self.MIN_DIFFICULTY <= difficulty <= self.MAX_DIFFICULTY:
-            raise ValueError(
-                f"Difficulty must be between {self.MIN_DIFFICULTY} and {self.MAX_DIFFICULTY}"
+        if self.snapshots is None:
+            return None
+        with self._chain_lock:
+            height = self.state_height - 1
+            block_hash = self.hash_at(height)
+            state = self.capture_state()
+        snapshot = StateSnapshot(height, block_hash, state)
+        self.snapshots.save(snapshot)
+        return snapshot
+    
+    def _rebuild_state(self, height: int) -> None:
+        """
+        Reconstruye el estado de cuentas tras el bloque height.
+        
+        Parte del snapshot válido más reciente en height o por debajo (o del
+        estado inicial si no hay ninguno) y aplica solo los bloques
+        posteriores.
+        """
+        snapshot = None
+        if self.snapshots is not None:
+            snapshot = self.snapshots.find_valid(
+                self.hash_at, len(self._chain), height,
+                recorded_root=lambda block_height: self._chain[block_height].state_root
             )
         
-        self.chain: List[Block] = []
-        self.pending_transactions: List[Dict] = []
-        self.difficulty = difficulty
-        self.mining_reward = 50  # 50 VRX por bloque minado
+        self._undo_journals.clear()
+        if snapshot is not None:
+            self.restore_state(snapshot.state)
+            self.state_height = snapshot.height + 1
+            # El árbol ya construido al verificar el snapshot se reutiliza
+            self.state_trie = snapshot.trie()
+            self._state_entries = snapshot.entries()
+        else:
+            # El estado inicial es el posterior al bloque génesis
+            self.restore_state(self._genesis_state)
+            self.state_height = min(1, height + 1)
+            self.state_trie = StateTrie()
+            self._state_entries = {}
         
-        # Sistema de tokens (VRX como token nativo)
-        self.token_manager = TokenManager()
-        self.staking_pool = StakingPool(self.token_manager)
+        replayed = 0
+        for block in self.iter_blocks(self.state_height, height + 1):
+            self._apply_block(block)
+            replayed += 1
+        self._commit_state()
         
-        # Sistema de smart contracts
-        self.contract_manager = ContractManager()
+        source = f"snapshot at height {snapshot.height}" if snapshot is not None else "genesis state"
+        logger.info(f"State rebuilt from {source} + {replayed} blocks")
+    
+    def get_block_by_hash(self, block_hash: str, allow_prefix: bool = False) -> Optional[Block]:
+        """
+        Busca un bloque por hash usando el índice.
         
-        # Métricas
-        self.total_transactions = 0
-        self.total_blocks_mined = 0
+        Args:
+            block_hash: Hash del bloque (con o sin prefijo 0x)
+            allow_prefix: Aceptar un prefijo si no hay coincidencia exacta
+            
+        Returns:
+            Bloque encontrado o None
+        """
+        height = self.index.block_height(block_hash)
+        if height is None and allow_prefix:
+            candidates = self.index.find_blocks_by_prefix(block_hash, limit=1)
+            height = candidates[0] if candidates else None
+        if height is None:
+            return None
+        return self.chain[height]
+    
+    def find_transaction(self, tx_hash: str) -> Optional[Tuple[Block, int]]:
+        """
+        Busca una transacción confirmada por hash usando el índice.
         
-        # SECURITY FIX: Protección double-spending
-        self.spent_transactions = set()  # IDs de transacciones ya gastadas
-        self.transaction_nonces = {}  # sender -> nonce counter
+        Args:
+            tx_hash: Hash de la transacción o de su data (con o sin prefijo 0x)
+            
+        Returns:
+            Tupla (bloque, posición) o None
+        """
+        location = self.index.locate_transaction(tx_hash)
+        if location is None:
+            return None
+        height, position = location
+        return self.chain[height], position
+    
+    def find_pending_transaction(self, tx_hash: str) -> Optional[Dict]:
+        """
+        Busca una transacción del mempool por hash.
         
-        # Crear el bloque génesis
-        self.create_genesis_block()
+        Args:
+            tx_hash: Hash de la transacción (con o sin prefijo 0x)
+            
+        Returns:
+            Transacción pendiente o None
+        """
+        return self.pending_transactions.get_by_hash(normalize_hash(tx_hash))
+    
+    def get_certificate_events(self, certificate_id: str) -> List[Tuple[Block, int]]:
+        """
+        Transacciones confirmadas de un certificado usando el índice.
         
-        logger.info(f"Blockchain initialized with difficulty={difficulty}")
+        Args:
+            certificate_id: ID del certificado
+            
+        Returns:
+            Lista de tuplas (bloque, posición) en orden de cadena
+        """
+        return [(self.chain[height], position)
+                for height, position in self.index.certificate_events(certificate_id)]
     
-    def create_genesis_block(self) -> None:
-        """Crea el primer bloque de la cadena (bloque génesis)."""
-        genesis_block = Block(
-            index=0,
-            timestamp=time(),
-            transactions=[],
-            proof=100,
-            previous_hash="0"
-        )
-        self.chain.append(genesis_block)
+    def get_transaction_history(self, address: Optional[str] = None, cursor: Optional[str] = None,
+                                limit: int = 20) -> Dict:
+        """
+        Página de transacciones confirmadas, de la más reciente a la más antigua.
         
-        # Inicializar tokens
-        self.token_manager.initialize_tokens('GENESIS')
+        Args:
+            address: Limitar a las transacciones de esta dirección
+            cursor: Cursor 'altura:posición' devuelto por la página anterior
+            limit: Tamaño de la página
+            
+        Returns:
+            Diccionario con transactions, total y next_cursor
+            
+        Raises:
+            ValueError: Si el cursor no es válido
+        """
+        before = parse_cursor(cursor)
+        limit = max(1, limit)
+        if address is None:
+            locations, next_location = self.index.history(before, limit)
+            total = self.index.transaction_count
+        else:
+            locations, next_location = self.index.address_history(address, before, limit)
+            total = self.index.address_transaction_count(address)
+        
+        transactions = []
+        block = None
+        for height, position in locations:
+            if block is None or block.index != height:
+                block = self.chain[height]
+            transactions.append({
+                **block.transactions[position],
+                'block_index': block.index,
+                'block_hash': block.hash,
+                'confirmed': True
+            })
         
-        logger.info("Genesis block created")
+        return {
+            'transactions': transactions,
+            'total': total,
+            'next_cursor': format_cursor(next_location) if next_location else None
+        }
     
     def get_latest_block(self) -> Block:
         """
@@ -129,47 +1423,22 @@ class Blockchain:
             raise BlockchainError("Blockchain is empty")
         return self.chain[-1]
     
-    def _generate_transaction_id(self, transaction: Dict) -> str:
+    def _get_next_nonce(self, sender: str) -> int:
+        """Siguiente nonce para un sender: tras los confirmados y los pendientes."""
+        return self.pending_transactions.next_nonce(sender, self.transaction_nonces.get(sender, 0))
+    
+    def get_next_nonce(self, sender: str) -> int:
         """
-        Genera un ID único para una transacción.
+        Nonce que debe firmar la siguiente transacción de un remitente.
         
         Args:
-            transaction: Diccionario con datos de la transacción
+            sender: Dirección del remitente
             
         Returns:
-            Hash SHA-256 de la transacción
+            El siguiente a los confirmados y a los que esperan en el mempool
         """
-        import json
-        tx_string = json.dumps({
-            'sender': transaction['sender'],
-            'recipient': transaction['recipient'],
-            'amount': transaction['amount'],
-            'token': transaction['token'],
-            'timestamp': transaction.get('timestamp', time()),
-            'nonce': transaction.get('nonce', 0)
-        }, sort_keys=True)
-        
-        return hashlib.sha256(tx_string.encode()).hexdigest()
-    
-    def _is_transaction_spent(self, tx_id: str) -> bool:
-        """Verifica si una transacción ya fue gastada."""
-        return tx_id in self.spent_transactions
-    
-    def _mark_transaction_spent(self, tx_id: str):
-        """Marca una transacción como gastada."""
-        self.spent_transactions.add(tx_id)
-    
-    def _get_next_nonce(self, sender: str) -> int:
-        """Obtiene el siguiente nonce para un sender."""
-        if sender not in self.transaction_nonces:
-            self.transaction_nonces[sender] = 0
-        return self.transaction_nonces[sender]
-    
-    def _increment_nonce(self, sender: str):
-        """Incrementa el nonce de un sender."""
-        if sender not in self.transaction_nonces:
-            self.transaction_nonces[sender] = 0
-        self.transaction_nonces[sender] += 1
+        with self._chain_lock:
+            return self._get_next_nonce(sender)
     
     def validate_transaction(self, transaction: Dict) -> Tuple[bool, Optional[str]]:
         """
@@ -191,72 +1460,82 @@ class Blockchain:
         if not isinstance(transaction['amount'], (int, float)):
             return False, "Amount must be a number"
         
-        # Permitir amount=0 solo para transacciones de sistema (NETWORK)
-        # Esto es necesario para eventos de certificación, transferencias de propiedad, etc.
+        # Permitir amount=0 solo para transacciones de sistema (NETWORK) y
+        # operaciones de contratos. Esto es necesario para eventos de
+        # certificación, transferencias de propiedad, etc.
         if transaction['amount'] < 0:
             return False, "Amount cannot be negative"
         
-        if transaction['amount'] == 0 and transaction['sender'] != 'NETWORK':
+        operation = self._operation(transaction)
+        if transaction['amount'] == 0 and transaction['sender'] != 'NETWORK' \
+                and operation not in self.FREE_OPERATIONS:
             return False, "Amount must be positive for non-system transactions"
         
+        # El fee es la prioridad en el mempool y se paga al minero del bloque
+        fee = transaction.get('fee', 0)
+        if not isinstance(fee, (int, float)) or isinstance(fee, bool) or fee < 0:
+            return False, "Fee must be a non-negative number"
+        
         # Validar token
         if transaction['token'] not in ['ORX', 'VRX']:
             return False, f"Invalid token: {transaction['token']}"
         
-        # SECURITY FIX: Verificar double-spending
-        if transaction['sender'] not in ['NETWORK', 'GENESIS', 'MINING_POOL', 'BRIDGE_LOCK', 'BRIDGE_UNLOCK']:
-            # Agregar nonce si no existe
-            if 'nonce' not in transaction:
-                transaction['nonce'] = self._get_next_nonce(transaction['sender'])
-            
-            # Generar ID de transacción
-            tx_id = self._generate_transaction_id(transaction)
-            
-            # Verificar si ya fue gastada
-            if self._is_transaction_spent(tx_id):
-                return False, "Transaction already spent (double-spending detected)"
-            
-            # Verificar nonce correcto
-            expected_nonce = self._get_next_nonce(transaction['sender'])
-            if transaction['nonce'] != expected_nonce:
-                return False, f"Invalid nonce. Expected {expected_nonce}, got {transaction['nonce']}"
+        # Las monedas solo se emiten con la recompensa del bloque: el sistema
+        # solo puede registrar eventos sin valor (NETWORK con amount 0)
+        is_system = transaction['sender'] in self.SYSTEM_SENDERS
+        if is_system and (transaction['sender'] != 'NETWORK' or transaction['amount'] != 0
+                          or fee or operation is not None):
+            return False, "System transactions cannot transfer or issue funds"
         
-        # Validar balance (excepto transacciones de red)
-        if transaction['sender'] != 'NETWORK':
-            balance = self.get_balance(transaction['sender'], transaction['token'])
-            if balance < transaction['amount']:
-                return False, f"Insufficient balance. Has {balance}, needs {transaction['amount']}"
+        error = self._check_operation(transaction)
+        if error:
+            return False, error
         
-        # SECURITY FIX: Validar firma digital
-        if transaction['sender'] not in ['NETWORK', 'GENESIS', 'MINING_POOL', 'BRIDGE_LOCK', 'BRIDGE_UNLOCK']:
+        if not is_system:
             if 'signature' not in transaction:
                 return False, "Missing transaction signature"
-            
             if 'public_key' not in transaction:
                 return False, "Missing public key"
+            # El nonce va firmado: sin él la transacción podría reenviarse
+            # con otro nonce y volver a ejecutarse
+            nonce = transaction.get('nonce')
+            if not isinstance(nonce, int) or isinstance(nonce, bool):
+                return False, "Missing transaction nonce"
+            if not self._key_matches_sender(transaction):
+                return False, "Public key does not match sender"
+        
+        # Hash canónico: se calcula una sola vez, ya con el nonce asignado, y
+        # queda guardado en la transacción para índices, RPC y explorador
+        transaction['hash'] = compute_transaction_hash(transaction)
+        
+        # Verificar si ya está confirmada
+        if self.index.locate_transaction(transaction['hash']) is not None:
+            return False, "Transaction already spent (double-spending detected)"
+        
+        if not is_system:
+            # SECURITY FIX: Verificar double-spending
+            # Verificar nonce correcto (o reemplazo de una pendiente con el mismo nonce)
+            nonce = transaction['nonce']
+            expected_nonce = self._get_next_nonce(transaction['sender'])
+            is_replacement = isinstance(nonce, int) and \
+                self.pending_transactions.get(transaction['sender'], nonce) is not None
+            if nonce != expected_nonce and not is_replacement:
+                return False, f"Invalid nonce. Expected {expected_nonce}, got {nonce}"
             
+            # Validar balance confirmado (el bloque vuelve a comprobarlo en orden);
+            # unstake solo gasta el fee
+            balance = self.get_balance(transaction['sender'], transaction['token'])
+            needed = fee if operation == 'unstake' else transaction['amount'] + fee
+            if balance < needed:
+                return False, f"Insufficient balance. Has {balance}, needs {needed}"
+        
+        # SECURITY FIX: Validar firma digital
+        if not is_system:
             # Verificar firma usando Wallet
             try:
                 from wallet import Wallet
-                from transaction import Transaction
-                
-                # Reconstruir datos para verificación
-                tx_data = {
-                    'sender': transaction['sender'],
-                    'recipient': transaction['recipient'],
-                    'amount': transaction['amount'],
-                    'timestamp': transaction.get('timestamp', time())
-                }
                 
-                # Verificar firma
-                import json
-                data_string = json.dumps(tx_data, sort_keys=True)
-                
-                if not Wallet.verify_signature(
-                    transaction['public_key'],
-                    data_string,
-                    transaction['signature']
-                ):
+                if not Wallet.verify_signature(*self._signature_payload(transaction)):
                     return False, "Invalid transaction signature"
                     
             except Exception as e:
@@ -265,13 +1544,111 @@ class Blockchain:
         
         return True, None
     
+    @staticmethod
+    def _signature_payload(transaction: Dict) -> Tuple[str, str, str]:
+        """
+        Reconstruye lo que firma el remitente de una transacción.
+        
+        Returns:
+            Tupla (clave pública PEM, datos firmados, firma)
+        """
+        return (
+            transaction.get('public_key'),
+            transaction_signing_data(transaction),
+            transaction.get('signature')
+        )
+    
+    @staticmethod
+    def _key_matches_sender(transaction: Dict) -> bool:
+        """True si la clave pública de la transacción corresponde a su remitente."""
+        try:
+            return address_from_public_key(transaction.get('public_key')) == transaction.get('sender')
+        except (ValueError, TypeError, IndexError):
+            return False
+    
+    def verify_signatures(self, transactions: List[Dict],
+                          stop_on_failure: bool = True) -> List[Optional[bool]]:
+        """
+        Verifica en lote las firmas de varias transacciones.
+        
+        Las transacciones de sistema no llevan firma y cuentan como válidas.
+        Las verificadas quedan en la caché de firmas, así que la llamada
+        posterior a validate_transaction ya no repite el trabajo RSA.
+        
+        Args:
+            transactions: Transacciones a verificar
+            stop_on_failure: Dejar de verificar tras la primera firma inválida
+            
+        Returns:
+            Lista paralela con True, False o None (no verificada por corte)
+        """
+        from signature_verifier import batch_verifier
+        
+        results: List[Optional[bool]] = [None] * len(transactions)
+        signed, payloads = [], []
+        for position, tx in enumerate(transactions):
+            sender = tx.get('sender') if isinstance(tx, dict) else None
+            if sender in self.SYSTEM_SENDERS:
+                results[position] = True
+            elif sender is None or not tx.get('signature') or not tx.get('public_key') \
+                    or not self._key_matches_sender(tx):
+                results[position] = False
+            else:
+                try:
+                    payloads.append(self._signature_payload(tx))
+                    signed.append(position)
+                except KeyError:
+                    results[position] = False
+        
+        if stop_on_failure and False in results:
+            return results
+        
+        verified = batch_verifier.verify(payloads, stop_on_failure=stop_on_failure)
+        for position, result in zip(signed, verified):
+            results[position] = result
+        return results
+    
+    def add_transactions(self, transactions: List[Dict]) -> List[Dict]:
+        """
+        Admite un lote de transacciones firmadas en el pool de pendientes.
+        
+        Las firmas se verifican todas a la vez en paralelo y luego cada
+        transacción pasa la validación completa en orden (nonces, balance).
+        
+        Args:
+            transactions: Transacciones completas (con firma, clave pública y timestamp)
+            
+        Returns:
+            Resultado por transacción: {'accepted': bool, 'error': str | None}
+            y, si se aceptó, su 'hash'
+        """
+        signatures = self.verify_signatures(transactions, stop_on_failure=False)
+        results = []
+        
+        for tx, signature_ok in zip(transactions, signatures):
+            if not signature_ok:
+                results.append({'accepted': False, 'error': "Invalid transaction signature"})
+                continue
+            
+            transaction = dict(tx)
+            transaction.setdefault('timestamp', time())
+            transaction.setdefault('data', None)
+            try:
+                tx_hash = self._admit_transaction(transaction)
+                results.append({'accepted': True, 'error': None, 'hash': tx_hash})
+            except InvalidTransactionError as e:
+                results.append({'accepted': False, 'error': str(e)})
+        
+        return results
+    
     def add_transaction(
         self,
         sender: str,
         recipient: str,
         amount: float,
         token: str = 'ORX',
-        data: Optional[Dict] = None  # Agregado soporte para data
+        data: Optional[Dict] = None,  # Agregado soporte para data
+        fee: Optional[float] = None
     ) -> int:
         """
         Añade una nueva transacción a la lista de transacciones pendientes.
@@ -282,10 +1659,41 @@ class Blockchain:
             amount: Cantidad a transferir
             token: Token a transferir (ORX o VRX)
             data: Datos adicionales opcionales (para certificados, smart contracts, etc.)
+            fee: Fee para el minero; es la prioridad en el mempool (mayor se mina antes)
             
         Returns:
             Índice del bloque que contendrá esta transacción
             
+        Raises:
+            InvalidTransactionError: Si la transacción es inválida
+        """
+        self.submit_transaction(sender, recipient, amount, token, data, fee)
+        
+        return self.get_latest_block().index + 1
+    
+    def submit_transaction(
+        self,
+        sender: str,
+        recipient: str,
+        amount: float,
+        token: str = 'ORX',
+        data: Optional[Dict] = None,
+        fee: Optional[float] = None
+    ) -> str:
+        """
+        Añade una nueva transacción a las pendientes y devuelve su hash.
+        
+        Args:
+            sender: Dirección del remitente
+            recipient: Dirección del destinatario
+            amount: Cantidad a transferir
+            token: Token a transferir (ORX o VRX)
+            data: Datos adicionales opcionales (para certificados, smart contracts, etc.)
+            fee: Fee para el minero; es la prioridad en el mempool (mayor se mina antes)
+            
+        Returns:
+            Hash canónico de la transacción
+            
         Raises:
             InvalidTransactionError: Si la transacción es inválida
         """
@@ -297,32 +1705,45 @@ class Blockchain:
             'timestamp': time(),
             'data': data  # Guardar data en la transacción
         }
+        if fee is not None:
+            transaction['fee'] = fee
         
-        # Validar transacción
-        is_valid, error_msg = self.validate_transaction(transaction)
-        if not is_valid:
-            logger.warning(f"Invalid transaction rejected: {error_msg}")
-            raise InvalidTransactionError(error_msg)
+        return self._admit_transaction(transaction)
+    
+    def _admit_transaction(self, transaction: Dict) -> str:
+        """
+        Valida una transacción y la añade a las pendientes.
         
-        # Verificar límite de transacciones pendientes
-        if len(self.pending_transactions) >= self.MAX_TRANSACTIONS_PER_BLOCK:
-            logger.warning("Max pending transactions reached, transaction queued")
+        Returns:
+            Hash canónico guardado en la transacción
+            
+        Raises:
+            InvalidTransactionError: Si la transacción es inválida
+        """
+        sender = transaction.get('sender')
         
-        # SECURITY FIX: Marcar transacción como gastada e incrementar nonce
-        if sender not in ['NETWORK', 'GENESIS', 'MINING_POOL', 'BRIDGE_LOCK', 'BRIDGE_UNLOCK']:
-            tx_id = self._generate_transaction_id(transaction)
-            self._mark_transaction_spent(tx_id)
-            self._increment_nonce(sender)
+        # Con el lock de la cadena ningún bloque confirma el nonce entre la
+        # validación y la entrada en el mempool
+        with self._chain_lock:
+            # Validar transacción
+            is_valid, error_msg = self.validate_transaction(transaction)
+            if not is_valid:
+                logger.warning(f"Invalid transaction rejected: {error_msg}")
+                raise InvalidTransactionError(error_msg)
+            
+            # El mempool reserva el nonce hasta que un bloque confirme la transacción
+            accepted, reason = self.pending_transactions.add(transaction)
+            if not accepted:
+                logger.warning(f"Transaction rejected by mempool: {reason}")
+                raise InvalidTransactionError(reason)
         
-        self.pending_transactions.append(transaction)
         self.total_transactions += 1
         
         logger.info(
-            f"Transaction added: {sender[:10]}... -> {recipient[:10]}... "
-            f"({amount} {token})"
+            f"Transaction added: {sender[:10]}... -> {transaction['recipient'][:10]}... "
+            f"({transaction['amount']} {transaction['token']})"
         )
-        
-        return self.get_latest_block().index + 1
+        return transaction['hash']
     
     def mine_pending_transactions(self, miner_address: str) -> Block:
         """
@@ -340,118 +1761,133 @@ class Blockchain:
         if not miner_address:
             raise BlockchainError("Miner address is required")
         
-        # Limitar transacciones por bloque
-        transactions_to_mine = self.pending_transactions[:self.MAX_TRANSACTIONS_PER_BLOCK]
-        
-        logger.info(f"Starting mining with {len(transactions_to_mine)} transactions")
-        
         start_time = time()
         
-        # Crear el bloque
-        block = Block(
-            index=len(self.chain),
-            timestamp=start_time,
-            transactions=transactions_to_mine,
-            proof=0,
-            previous_hash=self.get_latest_block().hash
-        )
+        # Punta, selección y ejecución de prueba con el lock, para que el
+        # bloque se construya sobre un único estado. La prueba de trabajo va
+        # sin lock: si mientras tanto otro bloque confirma alguno de sus
+        # nonces, add_block vuelve a ejecutar las transacciones y lo rechaza
+        with self._chain_lock:
+            parent = self.get_latest_block()
+            timestamp = max(start_time, parent.timestamp)
+            # Limitar transacciones por bloque (una plaza es para la recompensa)
+            candidates = self.pending_transactions.select(self.MAX_TRANSACTIONS_PER_BLOCK - 1)
+            transactions_to_mine, state_root = self._prepare_transactions(
+                candidates, self._reward_transaction(miner_address), timestamp
+            )
+            
+            # Crear el bloque con la dificultad que le corresponde en la cadena
+            block = Block(
+                index=parent.index + 1,
+                timestamp=timestamp,
+                transactions=transactions_to_mine,
+                proof=0,
+                previous_hash=parent.hash,
+                state_root=state_root,
+                difficulty=self.expected_difficulty(parent)
+            )
+        
+        logger.info(f"Starting mining with {len(transactions_to_mine) - 1} transactions")
         
         # Realizar proof of work
         block.proof = self.proof_of_work(block)
         block.hash = block.calculate_hash()
         
-        # Validar bloque antes de añadirlo
-        if not self.is_valid_block(block):
-            raise InvalidBlockError("Mined block failed validation")
-        
-        # Añadir el bloque a la cadena
-        self.chain.append(block)
+        # Añadir el bloque a la cadena (add_block lo valida contra la punta y aplica su estado)
+        self.add_block(block)
         self.total_blocks_mined += 1
         
-        # Procesar transacciones del bloque
-        for tx in block.transactions:
-            try:
-                token_obj = self.token_manager.get_token(tx.get('token', 'ORX'))
-                if tx['sender'] != 'NETWORK':
-                    token_obj.transfer(tx['sender'], tx['recipient'], tx['amount'])
-            except Exception as e:
-                logger.error(f"Error processing transaction: {e}")
-        
-        # Resetear transacciones pendientes
-        self.pending_transactions = self.pending_transactions[self.MAX_TRANSACTIONS_PER_BLOCK:]
-        
-        # Añadir recompensas de minería
-        self._add_mining_rewards(miner_address)
+        # Quitar del mempool las transacciones minadas
+        self.pending_transactions.remove_many(transactions_to_mine)
         
         mining_time = time() - start_time
         logger.info(
             f"Block #{block.index} mined in {mining_time:.2f}s "
-            f"(difficulty={self.difficulty}, proof={block.proof})"
+            f"(difficulty={block.difficulty}, proof={block.proof})"
         )
         
-        # Ajustar dificultad si es necesario
-        self._adjust_difficulty(mining_time)
-        
         return block
     
-    def _add_mining_rewards(self, miner_address: str) -> None:
-        """Añade las recompensas de minería al minero (solo VRX)."""
-        # Añadir transacción de recompensa VRX
-        self.pending_transactions.append({
-            'sender': 'NETWORK',
-            'recipient': miner_address,
-            'amount': self.mining_reward,
-            'token': 'VRX',
-            'timestamp': time()
-        })
+    def _prepare_transactions(self, transactions: List[Dict], reward: Dict,
+                              timestamp: float) -> Tuple[List[Dict], str]:
+        """
+        Transacciones del siguiente bloque y la raíz del estado que dejan.
+        
+        Se aplican de prueba sobre el estado confirmado, seguidas de la
+        recompensa, y se deshacen todos los cambios (también en el árbol de
+        estado). Las que fallan (sin fondos tras las anteriores, nonce fuera
+        de secuencia) se omiten y siguen pendientes, así el bloque minado
+        nunca se rechaza por sus transacciones.
         
-        # Acuñar recompensa VRX
-        self.token_manager.vrx.mint(miner_address, self.mining_reward)
+        Returns:
+            Tupla (transacciones ejecutables terminadas en la recompensa,
+            raíz de estado posterior al bloque)
+        """
+        executable = []
+        with self._chain_lock:
+            self._discard_uncommitted_contracts()
+            undo: Dict[str, object] = {}
+            for tx in transactions + [reward]:
+                error = self._execute_transaction(tx, undo, timestamp, reward['recipient'])
+                if error:
+                    logger.info(f"Pending transaction {str(tx.get('hash'))[:16]}... left out of block: {error}")
+                else:
+                    executable.append(tx)
+            
+            previous, created = self._commit_state(undo)
+            state_root = self.state_trie.root
+            self._revert_state(undo, previous, created)
+        return executable, state_root
     
-    def _adjust_difficulty(self, mining_time: float) -> None:
+    def _reward_transaction(self, miner_address: str) -> Dict:
         """
-        Ajusta la dificultad basándose en el tiempo de minería.
+        Transacción de recompensa de minería (solo VRX).
         
-        Args:
-            mining_time: Tiempo que tomó minar el último bloque
+        Va dentro del propio bloque minado y se emite al aplicarlo, así la
+        recompensa forma parte de la cadena y se reproduce igual al
+        reconstruir el estado.
         """
-        # Ajustar cada 10 bloques
-        if len(self.chain) % 10 != 0:
-            return
-        
-        if mining_time < self.BLOCK_TIME_TARGET * 0.5:
-            # Demasiado rápido, aumentar dificultad
-            if self.difficulty < self.MAX_DIFFICULTY:
-                self.difficulty += 1
-                logger.info(f"Difficulty increased to {self.difficulty}")
-        elif mining_time > self.BLOCK_TIME_TARGET * 2:
-            # Demasiado lento, disminuir dificultad
-            if self.difficulty > self.MIN_DIFFICULTY:
-                self.difficulty -= 1
-                logger.info(f"Difficulty decreased to {self.difficulty}")
+        reward = {
+            'sender': 'NETWORK',
+            'recipient': miner_address,
+            'amount': self.mining_reward,
+            'token': 'VRX',
+            'timestamp': time()
+        }
+        reward['hash'] = compute_transaction_hash(reward)
+        return reward
     
     def proof_of_work(self, block: Block) -> int:
         """
-        Algoritmo de Proof of Work optimizado.
+        Algoritmo de Proof of Work multiproceso.
         
         Args:
             block: Bloque a minar
             
         Returns:
             Proof (nonce) que satisface la dificultad
+            
+        Raises:
+            MiningCancelledError: Si la minería fue cancelada con cancel_mining()
         """
-        block.proof = 0
-        target = '0' * self.difficulty
+        # Serializar el bloque una sola vez; cada intento solo hashea el nonce y el sufijo
+        template = block.mining_template()
         
-        while True:
-            computed_hash = block.calculate_hash()
-            if computed_hash.startswith(target):
-                return block.proof
-            block.proof += 1
-            
-            # Log cada 100000 intentos
-            if block.proof % 100000 == 0:
-                logger.debug(f"Mining... proof={block.proof}")
+        proof = self.miner.mine(template, self.block_difficulty(block))
+        if proof is None:
+            raise MiningCancelledError(f"Mining of block {block.index} cancelled")
+        
+        block.proof = proof
+        return proof
+    
+    def cancel_mining(self) -> bool:
+        """
+        Cancela la minería en curso, si la hay.
+        
+        Returns:
+            True si se canceló una minería activa
+        """
+        return self.miner.cancel()
     
     def is_valid_block(self, block: Block) -> bool:
         """
@@ -483,47 +1919,87 @@ class Blockchain:
         return True
     
     def is_valid_proof(self, block: Block) -> bool:
-        """Verifica si el proof del bloque es válido."""
+        """Verifica si el proof del bloque cumple la dificultad que declara."""
+        difficulty = self.block_difficulty(block)
+        if not isinstance(difficulty, int) or difficulty < self.MIN_DIFFICULTY:
+            return False
         computed_hash = block.calculate_hash()
-        return computed_hash.startswith('0' * self.difficulty)
+        return computed_hash.startswith('0' * difficulty)
     
-    def is_chain_valid(self, chain: Optional[List[Block]] = None) -> bool:
+    def is_chain_valid(self, chain: Optional[List[Block]] = None, full: bool = False) -> bool:
         """
         Verifica si la blockchain es válida.
         
+        Sobre la cadena propia la validación es incremental: cada bloque se
+        verifica al añadirse y aquí solo se revisan los que queden por encima
+        de validated_height, así que normalmente es O(1). Si se detecta un
+        bloque inválido, validated_height queda en él y el resultado se
+        mantiene hasta que la cadena se trunque por debajo. Con full=True se
+        revalida desde génesis.
+        
         Args:
-            chain: Cadena a validar (por defecto, la cadena actual)
+            chain: Cadena a validar completa (por defecto, la cadena actual)
+            full: Revalidar la cadena actual desde génesis
             
         Returns:
             True si la cadena es válida
         """
-        if chain is None:
-            chain = self.chain
-        
-        if not chain:
-            return False
+        if chain is not None:
+            return self._validate_range(chain, 1, {block.hash: block for block in chain}) is None
         
-        for i in range(1, len(chain)):
-            current_block = chain[i]
-            previous_block = chain[i - 1]
-            
-            # Verificar hash del bloque
-            if current_block.hash != current_block.calculate_hash():
-                logger.error(f"Invalid hash at block {i}")
+        with self._chain_lock:
+            if not self._chain:
                 return False
             
-            # Verificar enlace
-            if current_block.previous_hash != previous_block.hash:
-                logger.error(f"Invalid link at block {i}")
-                return False
+            if full:
+                self.validated_height = 1
+                self._chain_valid = True
             
-            # Verificar proof of work
-            if not self.is_valid_proof(current_block):
-                logger.error(f"Invalid proof at block {i}")
-                return False
+            # Un fallo ya detectado se mantiene hasta truncar o revalidar completa
+            if self._chain_valid and self.validated_height < len(self._chain):
+                failed_at = self._validate_range(self._chain, max(1, self.validated_height),
+                                                 refresh=full)
+                if failed_at is None:
+                    self.validated_height = len(self._chain)
+                    self._chain_valid = True
+                    if full:
+                        logger.info("Blockchain validation passed")
+                else:
+                    self.validated_height = failed_at
+                    self._chain_valid = False
+            
+            return self._chain_valid
+    
+    def _validate_range(self, chain, start: int,
+                        pending: Optional[Dict[str, Block]] = None,
+                        refresh: bool = False) -> Optional[int]:
+        """
+        Valida los bloques desde start hasta el final.
         
-        logger.info("Blockchain validation passed")
-        return True
+        Args:
+            chain: Cadena a validar
+            start: Primera altura a validar
+            pending: Bloques por hash si chain no es la cadena propia
+            refresh: Recalcular los árboles de Merkle en caché, para detectar
+                transacciones modificadas en sitio
+            
+        Returns:
+            Altura del primer bloque inválido, o None si todos son válidos
+        """
+        if not chain:
+            return 0
+        
+        previous = chain[start - 1]
+        for height in range(start, len(chain)):
+            block = chain[height]
+            if refresh:
+                block.invalidate_merkle_tree()
+            error = self._check_block(block, previous, pending)
+            if error:
+                logger.error(error)
+                return height
+            previous = block
+        return None
     
     def get_balance(self, address: str, token: str = 'ORX') -> float:
         """
@@ -546,6 +2022,28 @@ class Blockchain:
         """Obtiene los balances de todos los tokens para una dirección."""
         return self.token_manager.get_balances(address)
     
+    def view_contract(self, contract_address: str, function_name: str, params: Dict,
+                      sender: Optional[str] = None) -> Dict:
+        """Consulta una función de un contrato en modo solo lectura (con caché)."""
+        with self._chain_lock:
+            return self.contract_manager.view_contract(contract_address, function_name, params, sender)
+    
+    def get_transaction_proof(self, tx_hash: str) -> Optional[Dict]:
+        """
+        Genera la prueba de inclusión Merkle de una transacción confirmada.
+        
+        Args:
+            tx_hash: Hash de la transacción (con o sin prefijo 0x)
+            
+        Returns:
+            Prueba con block_index, block_hash, merkle_root y pasos, o None
+        """
+        found = self.find_transaction(tx_hash)
+        if found is None:
+            return None
+        block, position = found
+        return block.get_transaction_proof(position)
+    
     def get_stats(self) -> Dict:
         """
         Obtiene estadísticas de la blockchain.
@@ -560,14 +2058,25 @@ class Blockchain:
             'difficulty': self.difficulty,
             'mining_reward': self.mining_reward,
             'native_token': 'VRX',
-            'is_valid': self.is_chain_valid()
+            'is_valid': self.is_chain_valid(),
+            'validated_height': self.validated_height
         }
     
     def to_dict(self) -> Dict:
         """Convierte la blockchain a un diccionario."""
+        data = {'chain': [block.to_dict() for block in self.chain]}
+        data.update(self.summary_dict())
+        return data
+    
+    def summary_dict(self) -> Dict:
+        """
+        Campos de to_dict salvo la cadena, para exportarla en streaming.
+        
+        Returns:
+            Diccionario con pendientes, dificultad, longitud, stats y contratos
+        """
         return {
-            'chain': [block.to_dict() for block in self.chain],
-            'pending_transactions': self.pending_transactions,
+            'pending_transactions': list(self.pending_transactions),
             'difficulty': self.difficulty,
             'length': len(self.chain),
             'stats': self.get_stats(),
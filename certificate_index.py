@@ -0,0 +1,181 @@
+"""
+ORILUXCHAIN - Certificate Index
+Índices secundarios en memoria para búsquedas de certificados
+"""
+
+import bisect
+import logging
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class CertificateIndex:
+    """
+    Índices secundarios sobre un conjunto de certificados.
+
+    Cada campo indexado tiene un índice hash valor -> IDs, y un campo
+    numérico opcional se mantiene en una lista ordenada para consultas
+    por rango con bisect. Las búsquedas intersectan primero los conjuntos
+    más pequeños, así que el coste depende del tamaño del resultado y no
+    del número total de certificados.
+
+    Los resultados se devuelven en orden de alta, igual que recorrer el
+    diccionario de certificados.
+    """
+
+    def __init__(self, fields: Dict[str, Callable[[Any], Any]],
+                 value_field: Optional[Callable[[Any], Optional[float]]] = None):
+        """
+        Inicializa el índice.
+
+        Args:
+            fields: Nombre del campo -> función que extrae su valor del certificado
+            value_field: Función que extrae el valor numérico para rangos
+        """
+        self._fields = fields
+        self._value_field = value_field
+        self._lock = threading.RLock()
+        self._hash_indexes: Dict[str, Dict[Any, Set[str]]] = {name: {} for name in fields}
+        self._values: List[float] = []
+        self._value_ids: List[str] = []
+        # Claves actuales de cada certificado, para poder desindexarlo
+        self._entries: Dict[str, Tuple[Dict[str, Any], Optional[float]]] = {}
+        self._order: Dict[str, int] = {}
+        self._sequence = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, certificate_id: str) -> bool:
+        return certificate_id in self._entries
+
+    # ==================== MANTENIMIENTO ====================
+
+    def add(self, certificate_id: str, certificate: Any) -> None:
+        """
+        Indexa un certificado (o lo reindexa si ya existía).
+
+        Args:
+            certificate_id: ID del certificado
+            certificate: Objeto del que se extraen los campos
+        """
+        with self._lock:
+            if certificate_id in self._entries:
+                self._unindex(certificate_id)
+            else:
+                self._order[certificate_id] = self._sequence
+                self._sequence += 1
+
+            keys = {name: extract(certificate) for name, extract in self._fields.items()}
+            for name, key in keys.items():
+                if key is not None:
+                    self._hash_indexes[name].setdefault(key, set()).add(certificate_id)
+
+            value = self._value_field(certificate) if self._value_field else None
+            if value is not None:
+                position = bisect.bisect_right(self._values, value)
+                self._values.insert(position, value)
+                self._value_ids.insert(position, certificate_id)
+
+            self._entries[certificate_id] = (keys, value)
+
+    def update(self, certificate_id: str, certificate: Any) -> None:
+        """Reindexa un certificado tras un cambio (transferencia, estado...)."""
+        self.add(certificate_id, certificate)
+
+    def remove(self, certificate_id: str) -> None:
+        """Elimina un certificado del índice."""
+        with self._lock:
+            if certificate_id in self._entries:
+                self._unindex(certificate_id)
+                del self._entries[certificate_id]
+                del self._order[certificate_id]
+
+    def rebuild(self, certificates: Dict[str, Any], accepts: Optional[type] = None) -> None:
+        """
+        Reconstruye el índice completo.
+
+        Args:
+            certificates: Diccionario ID -> certificado
+            accepts: Si se indica, solo se indexan instancias de esta clase
+        """
+        with self._lock:
+            self._hash_indexes = {name: {} for name in self._fields}
+            self._values, self._value_ids = [], []
+            self._entries, self._order = {}, {}
+            self._sequence = 0
+            for certificate_id, certificate in certificates.items():
+                if accepts is None or isinstance(certificate, accepts):
+                    self.add(certificate_id, certificate)
+        logger.info(f"Certificate index rebuilt: {len(self._entries)} certificates")
+
+    def _unindex(self, certificate_id: str) -> None:
+        keys, value = self._entries[certificate_id]
+        for name, key in keys.items():
+            if key is None:
+                continue
+            ids = self._hash_indexes[name].get(key)
+            if ids is not None:
+                ids.discard(certificate_id)
+                if not ids:
+                    del self._hash_indexes[name][key]
+
+        if value is not None:
+            start = bisect.bisect_left(self._values, value)
+            end = bisect.bisect_right(self._values, value)
+            for position in range(start, end):
+                if self._value_ids[position] == certificate_id:
+                    del self._values[position]
+                    del self._value_ids[position]
+                    break
+
+    # ==================== CONSULTAS ====================
+
+    def lookup(self, field: str, key: Any) -> List[str]:
+        """IDs con field == key, en orden de alta."""
+        return self.query(**{field: key})
+
+    def query(self, min_value: Optional[float] = None, max_value: Optional[float] = None,
+              **filters) -> List[str]:
+        """
+        IDs que cumplen todos los filtros.
+
+        Args:
+            min_value: Valor mínimo (inclusive) del campo numérico
+            max_value: Valor máximo (inclusive) del campo numérico
+            **filters: Campo indexado -> valor exacto
+
+        Returns:
+            IDs en orden de alta
+
+        Raises:
+            KeyError: Si se filtra por un campo no indexado
+        """
+        with self._lock:
+            candidates: List[Set[str]] = []
+            for name, key in filters.items():
+                if name not in self._hash_indexes:
+                    raise KeyError(f"Field not indexed: {name}")
+                candidates.append(self._hash_indexes[name].get(key, set()))
+
+            if min_value is not None or max_value is not None:
+                candidates.append(set(self._value_range(min_value, max_value)))
+
+            if not candidates:
+                result: Iterable[str] = self._entries.keys()
+            else:
+                candidates.sort(key=len)
+                result = set(candidates[0])
+                for ids in candidates[1:]:
+                    if not result:
+                        break
+                    result &= ids
+
+            return sorted(result, key=self._order.__getitem__)
+
+    def _value_range(self, min_value: Optional[float], max_value: Optional[float]) -> List[str]:
+        start = 0 if min_value is None else bisect.bisect_left(self._values, min_value)
+        end = len(self._values) if max_value is None else bisect.bisect_right(self._values, max_value)
+        return self._value_ids[start:end]
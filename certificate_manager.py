@@ -11,6 +11,7 @@ import re
 from time import time
 from typing import Dict, List, Optional, Tuple
 from datetime import datetime
+from certificate_index import CertificateIndex
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -205,6 +206,12 @@ class CertificateManager:
     def __init__(self, blockchain):
         self.blockchain = blockchain
         self.certificates: Dict[str, JewelryCertificate] = {}
+        self.index = CertificateIndex(fields={
+            'owner': lambda cert: cert.owner.get('wallet_address'),
+            'jeweler': lambda cert: cert.jeweler.get('name'),
+            'jewelry_type': lambda cert: cert.jewelry_type,
+            'material': lambda cert: cert.material
+        })
         logger.info("Certificate Manager initialized")
     
     def register_certificate(self, certificate: JewelryCertificate) -> Dict:
@@ -244,6 +251,7 @@ class CertificateManager:
             
             # Guardar certificado
             self.certificates[certificate.certificate_id] = certificate
+            self.index.add(certificate.certificate_id, certificate)
             
             logger.info(f"Certificate {certificate.certificate_id} registered, pending mining")
             
@@ -274,38 +282,42 @@ class CertificateManager:
         """
         certificate = self.certificates.get(certificate_id)
         
+        # Eventos del certificado desde el índice de la blockchain
+        events = [
+            (block, block.transactions[position])
+            for block, position in self.blockchain.get_certificate_events(certificate_id)
+            if block.transactions[position].get('certificate')
+        ]
+        
         if not certificate:
-            # Buscar en la blockchain
-            for block in self.blockchain.chain:
-                for tx in block.transactions:
-                    if isinstance(tx, dict) and tx.get('certificate', {}).get('id') == certificate_id:
-                        return {
-                            'found': True,
-                            'verified': True,
-                            'block_number': block.index,
-                            'timestamp': block.timestamp,
-                            'tx_hash': block.hash,
-                            'certificate_data': tx.get('certificate')
-                        }
+            if events:
+                block, tx = events[0]
+                return {
+                    'found': True,
+                    'verified': True,
+                    'block_number': block.index,
+                    'timestamp': block.timestamp,
+                    'tx_hash': block.hash,
+                    'certificate_data': tx.get('certificate')
+                }
             
             return None
         
-        # Buscar en qué bloque está el certificado
-        for block in self.blockchain.chain:
-            for tx in block.transactions:
-                if isinstance(tx, dict) and tx.get('certificate', {}).get('id') == certificate_id:
-                    certificate.blockchain_tx = block.hash
-                    certificate.block_number = block.index
-                    certificate.verified = True
-                    
-                    return {
-                        'found': True,
-                        'verified': True,
-                        'certificate': certificate.to_dict(),
-                        'block_number': block.index,
-                        'block_hash': block.hash,
-                        'timestamp': block.timestamp
-                    }
+        # Bloque en el que se minó el certificado
+        if events:
+            block, _ = events[0]
+            certificate.blockchain_tx = block.hash
+            certificate.block_number = block.index
+            certificate.verified = True
+            
+            return {
+                'found': True,
+                'verified': True,
+                'certificate': certificate.to_dict(),
+                'block_number': block.index,
+                'block_hash': block.hash,
+                'timestamp': block.timestamp
+            }
         
         # Certificado registrado pero no minado aún
         return {
@@ -321,23 +333,17 @@ class CertificateManager:
     
     def get_certificates_by_owner(self, wallet_address: str) -> List[Dict]:
         """Obtiene todos los certificados de un propietario"""
-        owner_certs = []
-        
-        for cert in self.certificates.values():
-            if cert.owner.get('wallet_address') == wallet_address:
-                owner_certs.append(cert.to_dict())
-        
-        return owner_certs
+        return [
+            self.certificates[cert_id].to_dict()
+            for cert_id in self.index.lookup('owner', wallet_address)
+        ]
     
     def get_certificates_by_jeweler(self, jeweler_name: str) -> List[Dict]:
         """Obtiene todos los certificados de una joyería"""
-        jeweler_certs = []
-        
-        for cert in self.certificates.values():
-            if cert.jeweler.get('name') == jeweler_name:
-                jeweler_certs.append(cert.to_dict())
-        
-        return jeweler_certs
+        return [
+            self.certificates[cert_id].to_dict()
+            for cert_id in self.index.lookup('jeweler', jeweler_name)
+        ]
     
     def get_recent_certificates(self, limit: int = 10) -> List[Dict]:
         """Obtiene los certificados más recientes"""
@@ -0,0 +1,226 @@
+"""
+ORILUXCHAIN - Chain Export
+Exportación de la cadena en streaming (NDJSON o JSON por trozos) con
+rangos de bloques para reanudar descargas
+"""
+
+import json
+import re
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from flask import Response, request, stream_with_context
+from binary_codec import BINARY_CONTENT_TYPE, iter_join_blocks
+from block import Block
+
+# Formato
+NDJSON_CONTENT_TYPE = 'application/x-ndjson'
+RANGE_UNIT = 'blocks'
+STREAM_CHUNK_SIZE = 64 * 1024  # bytes acumulados antes de cada escritura
+
+_RANGE_RE = re.compile(r'^\s*blocks\s*=\s*(\d*)\s*-\s*(\d*)\s*$')
+REORG_ERROR = 'Chain reorganized during export; resume from the last block received'
+
+
+class RangeNotSatisfiable(ValueError):
+    """Rango de bloques fuera de la cadena o mal formado"""
+    pass
+
+
+def parse_block_range(range_header: Optional[str], from_height: Optional[int],
+                      to_height: Optional[int], length: int) -> Tuple[int, int, bool]:
+    """
+    Resuelve el rango de alturas pedido.
+
+    El rango puede venir en la cabecera HTTP 'Range: blocks=A-B' (A o B
+    pueden omitirse, B incluido; 'blocks=-N' son los N últimos) o en los
+    parámetros from_height / to_height (ambos incluidos). La cabecera
+    tiene prioridad.
+
+    Args:
+        range_header: Valor de la cabecera Range, o None
+        from_height: Parámetro from_height, o None
+        to_height: Parámetro to_height, o None
+        length: Longitud actual de la cadena
+
+    Returns:
+        Tupla (inicio, fin exclusivo, es parcial)
+
+    Raises:
+        RangeNotSatisfiable: Si el rango está mal formado o fuera de la cadena
+    """
+    if range_header:
+        match = _RANGE_RE.match(range_header)
+        if not match or match.group(1) == match.group(2) == '':
+            raise RangeNotSatisfiable(f"Invalid range: {range_header}")
+        first, last = match.groups()
+        if first == '':
+            start, end = max(0, length - int(last)), length
+        else:
+            start = int(first)
+            end = length if last == '' else min(int(last) + 1, length)
+    elif from_height is not None or to_height is not None:
+        start = from_height or 0
+        end = length if to_height is None else min(to_height + 1, length)
+    else:
+        return 0, length, False
+
+    if start < 0 or start >= end:
+        raise RangeNotSatisfiable(f"Range {start}-{end - 1} outside chain of {length} blocks")
+    return start, end, True
+
+
+def linked_blocks(blocks: Iterable[Block], start: int, end: int,
+                  errors: List[str]) -> Iterator[Block]:
+    """
+    Itera los bloques de un rango mientras sigan formando una sola cadena.
+
+    Si una reorganización cambia la cadena durante la exportación, los
+    bloques dejan de enlazar (o el rango se acorta): la iteración se corta
+    y el motivo queda en errors para terminar la respuesta con un error
+    explícito en lugar de una lista incompleta o mezclada.
+
+    Args:
+        blocks: Bloques [start, end) leídos de la cadena
+        start: Primera altura del rango
+        end: Altura final (exclusiva)
+        errors: Lista donde se añade el error si la cadena cambió
+    """
+    previous_hash = None
+    height = start
+    for block in blocks:
+        if block.index != height or (previous_hash is not None and block.previous_hash != previous_hash):
+            break
+        yield block
+        previous_hash = block.hash
+        height += 1
+    if height != end:
+        errors.append(REORG_ERROR)
+
+
+def iter_ndjson(items: Iterable[Dict], errors: Optional[List[str]] = None) -> Iterator[str]:
+    """Un objeto JSON por línea; si hay errors, una última línea {"error": ...}."""
+    for item in items:
+        yield json.dumps(item, separators=(',', ':'))
+        yield '\n'
+    if errors:
+        yield json.dumps({'error': errors[0]})
+        yield '\n'
+
+
+def iter_json(head: Dict[str, Any], key: str, items: Iterable[Dict],
+              errors: Optional[List[str]] = None) -> Iterator[str]:
+    """
+    Un objeto JSON cuyo campo key es una lista que se emite elemento a elemento.
+
+    Args:
+        head: Campos que se emiten antes de la lista
+        key: Nombre del campo lista
+        items: Elementos de la lista
+        errors: Si al terminar la lista contiene algo, se añade el campo 'error'
+    """
+    yield '{'
+    for name, value in head.items():
+        yield f"{json.dumps(name)}:{json.dumps(value)},"
+    yield f"{json.dumps(key)}:["
+    first = True
+    for item in items:
+        if not first:
+            yield ','
+        first = False
+        yield json.dumps(item, separators=(',', ':'))
+    yield ']'
+    if errors:
+        yield f',"error":{json.dumps(errors[0])}'
+    yield '}'
+
+
+def buffered(parts: Iterable[str], chunk_size: int = STREAM_CHUNK_SIZE) -> Iterator[bytes]:
+    """Agrupa fragmentos pequeños en trozos de chunk_size bytes aprox."""
+    buffer = []
+    size = 0
+    for part in parts:
+        data = part.encode('utf-8')
+        buffer.append(data)
+        size += len(data)
+        if size >= chunk_size:
+            yield b''.join(buffer)
+            buffer, size = [], 0
+    if buffer:
+        yield b''.join(buffer)
+
+
+def wants_ndjson() -> bool:
+    """True si la petición actual pide NDJSON (?format=ndjson o Accept)."""
+    if request.args.get('format') == 'ndjson':
+        return True
+    return NDJSON_CONTENT_TYPE in request.headers.get('Accept', '')
+
+
+def stream_chain(blockchain, serialize: Callable[[Block], Dict] = Block.to_dict,
+                 head: Optional[Callable[[int, int], Dict[str, Any]]] = None,
+                 key: str = 'chain', wrap: Optional[Tuple[str, str]] = None) -> Response:
+    """
+    Respuesta Flask que emite los bloques de la cadena de uno en uno.
+
+    La memoria usada no depende de la longitud de la cadena. Soporta
+    rangos por cabecera Range (respuesta 206 con Content-Range) o por
+    from_height / to_height, así una descarga interrumpida se reanuda
+    pidiendo 'Range: blocks=<última altura recibida + 1>-'.
+
+    Args:
+        blockchain: Blockchain a exportar
+        serialize: Bloque -> diccionario
+        head: (inicio, fin) -> campos que acompañan a la lista en JSON
+        key: Nombre del campo con los bloques en JSON
+        wrap: Prefijo y sufijo que envuelven el objeto JSON (respuestas anidadas)
+
+    Returns:
+        Respuesta en NDJSON (un bloque por línea), JSON por trozos o el
+        formato binario del codec si se pide con Accept. El formato binario
+        declara el número de bloques al principio, así que el rango se copia
+        bajo el lock de la cadena; los formatos de texto se emiten según se
+        leen y terminan con un campo 'error' si la cadena se reorganiza
+        durante la exportación.
+    """
+    length = len(blockchain.chain)
+    try:
+        start, end, partial = parse_block_range(
+            request.headers.get('Range'),
+            request.args.get('from_height', type=int),
+            request.args.get('to_height', type=int),
+            length
+        )
+    except RangeNotSatisfiable as e:
+        return Response(json.dumps({'error': str(e)}), status=416, mimetype='application/json',
+                        headers={'Content-Range': f"{RANGE_UNIT} */{length}",
+                                 'Accept-Ranges': RANGE_UNIT})
+
+    headers = {'Accept-Ranges': RANGE_UNIT}
+    if partial:
+        headers['Content-Range'] = f"{RANGE_UNIT} {start}-{end - 1}/{length}"
+
+    if BINARY_CONTENT_TYPE in request.headers.get('Accept', ''):
+        payloads = blockchain.snapshot_encoded_blocks(start, end)
+        chunks = iter_join_blocks(len(payloads), payloads)
+        return Response(stream_with_context(chunks), status=206 if partial else 200,
+                        headers=headers, mimetype=BINARY_CONTENT_TYPE)
+
+    errors: List[str] = []
+    blocks = (serialize(block) for block in
+              linked_blocks(blockchain.iter_blocks(start, end), start, end, errors))
+    if wants_ndjson():
+        parts = iter_ndjson(blocks, errors)
+        mimetype = NDJSON_CONTENT_TYPE
+    else:
+        parts = iter_json(head(start, end) if head else {}, key, blocks, errors)
+        if wrap:
+            parts = _wrapped(wrap[0], parts, wrap[1])
+        mimetype = 'application/json'
+
+    return Response(stream_with_context(buffered(parts)), status=206 if partial else 200,
+                    headers=headers, mimetype=mimetype)
+
+
+def _wrapped(prefix: str, parts: Iterable[str], suffix: str) -> Iterator[str]:
+    yield prefix
+    yield from parts
+    yield suffix
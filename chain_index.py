@@ -0,0 +1,344 @@
+"""
+ORILUXCHAIN - Chain Index
+Índices en memoria de hash de bloque y de transacción para búsquedas O(1)
+"""
+
+import bisect
+import hashlib
+import json
+import logging
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+from block import Block, block_work, required_difficulty, transaction_hash
+
+logger = logging.getLogger(__name__)
+
+# Máximo de candidatos devueltos en una búsqueda por prefijo
+MAX_PREFIX_RESULTS = 20
+
+Location = Tuple[int, int]  # (altura, posición en el bloque)
+
+
+def format_cursor(location: Location) -> str:
+    """Cursor de paginación 'altura:posición'."""
+    return f"{location[0]}:{location[1]}"
+
+
+def parse_cursor(cursor: Optional[str]) -> Optional[Location]:
+    """
+    Interpreta un cursor 'altura:posición'.
+
+    Raises:
+        ValueError: Si el cursor no tiene el formato esperado
+    """
+    if not cursor:
+        return None
+    height, _, position = cursor.partition(':')
+    location = (int(height), int(position or 0))
+    if location[0] < 0 or location[1] < 0:
+        raise ValueError(f"Invalid cursor: {cursor}")
+    return location
+
+
+def normalize_hash(value: str) -> str:
+    """Quita el prefijo 0x y pasa a minúsculas."""
+    value = value.strip().lower()
+    return value[2:] if value.startswith('0x') else value
+
+
+def data_hash(tx: Dict) -> Optional[str]:
+    """
+    Hash del campo data de una transacción.
+
+    Es el identificador que muestran el explorador y las transacciones de
+    certificación de joyería, así que se indexa como alias.
+    """
+    data = tx.get('data')
+    if not data:
+        return None
+    return hashlib.sha256(json.dumps(data, sort_keys=True).encode()).hexdigest()
+
+
+def certificate_id_of(tx: Dict) -> Optional[str]:
+    """
+    ID del certificado al que se refiere una transacción.
+
+    Las transacciones de JewelryCertificationSystem lo llevan en
+    data.certificate_id y las de CertificateManager en certificate.id.
+    """
+    data = tx.get('data')
+    if isinstance(data, dict) and data.get('certificate_id'):
+        return data['certificate_id']
+    certificate = tx.get('certificate')
+    if isinstance(certificate, dict) and certificate.get('id'):
+        return certificate['id']
+    return None
+
+
+class ChainIndex:
+    """
+    Índices de la cadena principal.
+
+    - hash de bloque -> altura
+    - hash de transacción -> (altura, posición)
+    - prefijo de hash -> candidatos (listas ordenadas + bisect)
+    - dirección -> lista de ubicaciones ordenada por (altura, posición)
+    - transacciones acumuladas por altura, para paginar el historial global
+    - trabajo acumulado por altura, para la elección de rama
+    - certificado -> eventos on-chain (certificación, transferencia, reporte...)
+
+    Se mantienen al añadir bloques y al truncar la cadena en un reemplazo,
+    así que nunca hace falta recorrer los bloques para responder.
+    """
+
+    def __init__(self, base_difficulty: int = 1):
+        """
+        Args:
+            base_difficulty: Dificultad de los bloques antiguos que no la guardan
+        """
+        self.base_difficulty = base_difficulty
+        self._lock = threading.RLock()
+        self._block_heights: Dict[str, int] = {}
+        self._tx_locations: Dict[str, Location] = {}
+        self._aliases: Dict[str, Location] = {}
+        self._sorted_blocks: List[str] = []
+        self._sorted_txs: List[str] = []
+        # Claves registradas por altura, para poder deshacer un truncado
+        self._block_keys: List[str] = []
+        self._tx_keys: List[List[str]] = []
+        self._alias_keys: List[List[str]] = []
+        self._address_postings: Dict[str, List[Location]] = {}
+        self._address_keys: List[List[str]] = []
+        self._tx_totals: List[int] = []  # transacciones en los bloques 0..altura
+        self._chain_work: List[int] = []  # trabajo de los bloques 0..altura
+        self._certificate_events: Dict[str, List[Location]] = {}
+        self._certificate_keys: List[List[str]] = []
+
+    def __len__(self) -> int:
+        return len(self._block_keys)
+
+    # ==================== MANTENIMIENTO ====================
+
+    def add_block(self, block: Block) -> None:
+        """
+        Indexa un bloque que extiende la punta de la cadena.
+
+        Args:
+            block: Bloque con índice igual a la altura indexada actual
+        """
+        with self._lock:
+            height = len(self._block_keys)
+            if block.index != height:
+                raise ValueError(f"Block {block.index} does not extend index height {height}")
+
+            block_hash = normalize_hash(block.hash)
+            self._block_heights[block_hash] = height
+            bisect.insort(self._sorted_blocks, block_hash)
+            self._block_keys.append(block_hash)
+
+            tx_keys = []
+            alias_keys = []
+            address_keys = []
+            certificate_keys = []
+            for position, tx in enumerate(block.transactions):
+                key = normalize_hash(transaction_hash(tx))
+                if key not in self._tx_locations:
+                    self._tx_locations[key] = (height, position)
+                    bisect.insort(self._sorted_txs, key)
+                    tx_keys.append(key)
+
+                alias = data_hash(tx)
+                if alias and alias not in self._aliases:
+                    self._aliases[alias] = (height, position)
+                    alias_keys.append(alias)
+
+                for address in {tx.get('sender'), tx.get('recipient')}:
+                    if address:
+                        self._address_postings.setdefault(address, []).append((height, position))
+                        address_keys.append(address)
+
+                certificate_id = certificate_id_of(tx)
+                if certificate_id:
+                    self._certificate_events.setdefault(certificate_id, []).append((height, position))
+                    certificate_keys.append(certificate_id)
+
+            self._tx_keys.append(tx_keys)
+            self._alias_keys.append(alias_keys)
+            self._address_keys.append(address_keys)
+            self._certificate_keys.append(certificate_keys)
+            previous_total = self._tx_totals[-1] if self._tx_totals else 0
+            self._tx_totals.append(previous_total + len(block.transactions))
+            previous_work = self._chain_work[-1] if self._chain_work else 0
+            self._chain_work.append(
+                previous_work + block_work(required_difficulty(block, self.base_difficulty))
+            )
+
+    def truncate(self, height: int) -> None:
+        """
+        Elimina del índice los bloques con altura >= height.
+
+        Args:
+            height: Nueva altura de la cadena
+        """
+        with self._lock:
+            while len(self._block_keys) > height:
+                block_hash = self._block_keys.pop()
+                self._block_heights.pop(block_hash, None)
+                self._remove_sorted(self._sorted_blocks, block_hash)
+
+                for key in self._tx_keys.pop():
+                    self._tx_locations.pop(key, None)
+                    self._remove_sorted(self._sorted_txs, key)
+                for alias in self._alias_keys.pop():
+                    self._aliases.pop(alias, None)
+                for address in self._address_keys.pop():
+                    postings = self._address_postings[address]
+                    postings.pop()
+                    if not postings:
+                        del self._address_postings[address]
+                for certificate_id in self._certificate_keys.pop():
+                    events = self._certificate_events[certificate_id]
+                    events.pop()
+                    if not events:
+                        del self._certificate_events[certificate_id]
+                self._tx_totals.pop()
+                self._chain_work.pop()
+
+    def rebuild(self, blocks: Iterable[Block]) -> None:
+        """Reconstruye el índice completo (arranque con block store)."""
+        with self._lock:
+            self.truncate(0)
+            for block in blocks:
+                self.add_block(block)
+        logger.info(f"Chain index rebuilt: {len(self._block_keys)} blocks, "
+                    f"{len(self._tx_locations)} transactions")
+
+    @staticmethod
+    def _remove_sorted(values: List[str], key: str) -> None:
+        position = bisect.bisect_left(values, key)
+        if position < len(values) and values[position] == key:
+            del values[position]
+
+    # ==================== CONSULTAS ====================
+
+    def chain_work(self, height: Optional[int] = None) -> int:
+        """Trabajo acumulado de los bloques 0..height (por defecto hasta la punta)."""
+        with self._lock:
+            if not self._chain_work:
+                return 0
+            return self._chain_work[-1 if height is None else height]
+
+    def block_height(self, block_hash: str) -> Optional[int]:
+        """Altura del bloque con ese hash exacto, o None."""
+        return self._block_heights.get(normalize_hash(block_hash))
+
+    def locate_transaction(self, tx_hash: str) -> Optional[Location]:
+        """
+        Ubicación de una transacción por hash (o por hash de su data).
+
+        Returns:
+            Tupla (altura, posición) o None
+        """
+        key = normalize_hash(tx_hash)
+        location = self._tx_locations.get(key)
+        if location is None:
+            location = self._aliases.get(key)
+        return location
+
+    def find_blocks_by_prefix(self, prefix: str, limit: int = MAX_PREFIX_RESULTS) -> List[int]:
+        """Alturas de los bloques cuyo hash empieza por prefix."""
+        with self._lock:
+            return [self._block_heights[key]
+                    for key in self._match_prefix(self._sorted_blocks, prefix, limit)]
+
+    def find_transactions_by_prefix(self, prefix: str,
+                                    limit: int = MAX_PREFIX_RESULTS) -> List[Location]:
+        """Ubicaciones de las transacciones cuyo hash empieza por prefix."""
+        with self._lock:
+            return [self._tx_locations[key]
+                    for key in self._match_prefix(self._sorted_txs, prefix, limit)]
+
+    @staticmethod
+    def _match_prefix(values: List[str], prefix: str, limit: int) -> List[str]:
+        prefix = normalize_hash(prefix)
+        if not prefix:
+            return []
+        matches = []
+        position = bisect.bisect_left(values, prefix)
+        while position < len(values) and len(matches) < limit:
+            if not values[position].startswith(prefix):
+                break
+            matches.append(values[position])
+            position += 1
+        return matches
+
+    def certificate_events(self, certificate_id: str) -> List[Location]:
+        """Ubicaciones de las transacciones de un certificado, en orden de cadena."""
+        with self._lock:
+            return list(self._certificate_events.get(certificate_id, ()))
+
+    # ==================== HISTORIAL ====================
+
+    @property
+    def transaction_count(self) -> int:
+        """Número de transacciones confirmadas en la cadena."""
+        return self._tx_totals[-1] if self._tx_totals else 0
+
+    def address_transaction_count(self, address: str) -> int:
+        """Número de transacciones confirmadas en las que participa address."""
+        return len(self._address_postings.get(address, ()))
+
+    def address_history(self, address: str, before: Optional[Location] = None,
+                        limit: int = 20) -> Tuple[List[Location], Optional[Location]]:
+        """
+        Página del historial de una dirección, de la más reciente a la más antigua.
+
+        Args:
+            address: Dirección consultada
+            before: Cursor exclusivo; None empieza por la punta
+            limit: Tamaño de la página
+
+        Returns:
+            Tupla (ubicaciones, cursor siguiente o None si no hay más)
+        """
+        with self._lock:
+            postings = self._address_postings.get(address, [])
+            end = len(postings) if before is None else bisect.bisect_left(postings, before)
+            start = max(0, end - limit)
+            page = postings[start:end][::-1]
+        return page, (page[-1] if start > 0 and page else None)
+
+    def history(self, before: Optional[Location] = None,
+                limit: int = 20) -> Tuple[List[Location], Optional[Location]]:
+        """
+        Página del historial global, de la transacción más reciente a la más antigua.
+
+        Las ubicaciones se obtienen por bisect sobre los totales acumulados,
+        sin recorrer los bloques vacíos ni decodificar ningún bloque.
+
+        Args:
+            before: Cursor exclusivo; None empieza por la punta
+            limit: Tamaño de la página
+
+        Returns:
+            Tupla (ubicaciones, cursor siguiente o None si no hay más)
+        """
+        with self._lock:
+            end = self.transaction_count if before is None else self._ordinal(before)
+            start = max(0, end - limit)
+            page = [self._location(ordinal) for ordinal in range(end - 1, start - 1, -1)]
+        return page, (page[-1] if start > 0 and page else None)
+
+    def _ordinal(self, location: Location) -> int:
+        """Número de transacciones anteriores a location."""
+        height, position = location
+        if height >= len(self._tx_totals):
+            return self.transaction_count
+        before_block = self._tx_totals[height - 1] if height > 0 else 0
+        return min(before_block + position, self._tx_totals[height])
+
+    def _location(self, ordinal: int) -> Location:
+        """Ubicación de la transacción número ordinal (desde 0)."""
+        height = bisect.bisect_right(self._tx_totals, ordinal)
+        before_block = self._tx_totals[height - 1] if height > 0 else 0
+        return height, ordinal - before_block
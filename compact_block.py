@@ -0,0 +1,163 @@
+"""
+ORILUXCHAIN - Compact Blocks
+Difusión de bloques como cabecera + IDs cortos de transacción, reconstruidos
+en el receptor a partir de su mempool
+"""
+
+import hashlib
+from typing import Dict, Iterable, List, Optional
+from block import Block, transaction_hash
+
+# Configuración de los bloques compactos
+SHORT_ID_LENGTH = 12  # caracteres hex (6 bytes)
+PREFILLED_SENDERS = {'NETWORK'}  # transacciones que solo existen en el nodo que mina
+
+
+def short_id(block_hash: str, tx_hash: str) -> str:
+    """
+    ID corto de una transacción dentro de un bloque.
+
+    Se deriva también del hash del bloque para que un atacante no pueda
+    preparar de antemano transacciones que colisionen con las de otro.
+    """
+    return hashlib.sha256(f"{block_hash}:{tx_hash}".encode()).hexdigest()[:SHORT_ID_LENGTH]
+
+
+def build_compact_block(block: Block) -> Dict:
+    """
+    Mensaje compacto de un bloque.
+
+    Las transacciones del sistema (recompensas) se envían completas porque
+    el receptor nunca las tiene en su mempool; el resto viajan como ID corto.
+
+    Args:
+        block: Bloque a difundir
+
+    Returns:
+        Cabecera del bloque con short_ids (en orden, sin las prefijadas) y
+        prefilled (lista de {'index', 'tx'})
+    """
+    short_ids = []
+    prefilled = []
+    for position, tx in enumerate(block.transactions):
+        if tx.get('sender') in PREFILLED_SENDERS:
+            prefilled.append({'index': position, 'tx': tx})
+        else:
+            short_ids.append(short_id(block.hash, transaction_hash(tx)))
+
+    message = block.header()
+    message['short_ids'] = short_ids
+    message['prefilled'] = prefilled
+    return message
+
+
+class PartialBlock:
+    """
+    Bloque compacto en reconstrucción.
+
+    Los huecos que el mempool no cubre (o cubre de forma ambigua por una
+    colisión de ID corto) quedan pendientes hasta que el emisor envíe esas
+    transacciones.
+    """
+
+    def __init__(self, message: Dict):
+        """
+        Inicializa la reconstrucción.
+
+        Args:
+            message: Mensaje creado por build_compact_block
+
+        Raises:
+            ValueError: Si el mensaje está mal formado
+        """
+        self.header = {key: message[key] for key in
+                       ('index', 'timestamp', 'proof', 'previous_hash', 'hash')}
+        self.header['state_root'] = message.get('state_root')
+        self.header['difficulty'] = message.get('difficulty')
+        tx_count = message['tx_count']
+        short_ids = message['short_ids']
+        prefilled = message.get('prefilled', [])
+        if not isinstance(tx_count, int) or len(short_ids) + len(prefilled) != tx_count:
+            raise ValueError("Compact block counts do not match")
+
+        self.transactions: List[Optional[Dict]] = [None] * tx_count
+        self.short_ids: List[Optional[str]] = [None] * tx_count
+        for item in prefilled:
+            position = item['index']
+            if not 0 <= position < tx_count or self.transactions[position] is not None:
+                raise ValueError(f"Invalid prefilled position {position}")
+            self.transactions[position] = item['tx']
+
+        remaining = iter(short_ids)
+        for position in range(tx_count):
+            if self.transactions[position] is None:
+                self.short_ids[position] = next(remaining)
+
+    @property
+    def hash(self) -> str:
+        return self.header['hash']
+
+    @property
+    def missing(self) -> List[int]:
+        """Posiciones cuyas transacciones faltan."""
+        return [position for position, tx in enumerate(self.transactions) if tx is None]
+
+    def fill_from_pool(self, pending: Iterable[Dict]) -> int:
+        """
+        Rellena los huecos con transacciones del mempool.
+
+        Args:
+            pending: Transacciones pendientes locales
+
+        Returns:
+            Número de huecos rellenados
+        """
+        wanted = {sid: position for position, sid in enumerate(self.short_ids)
+                  if sid is not None and self.transactions[position] is None}
+        if not wanted:
+            return 0
+
+        matches: Dict[int, Optional[Dict]] = {}
+        for tx in pending:
+            position = wanted.get(short_id(self.hash, transaction_hash(tx)))
+            if position is not None:
+                # Dos transacciones locales con el mismo ID corto: pedirla al emisor
+                matches[position] = None if position in matches else tx
+
+        filled = 0
+        for position, tx in matches.items():
+            if tx is not None:
+                self.transactions[position] = tx
+                filled += 1
+        return filled
+
+    def fill(self, transactions: List[Dict]) -> None:
+        """
+        Rellena huecos con las transacciones enviadas por el emisor.
+
+        Args:
+            transactions: Lista de {'index', 'tx'}
+
+        Raises:
+            ValueError: Si una transacción no corresponde a su ID corto
+        """
+        for item in transactions:
+            position = item['index']
+            tx = item['tx']
+            if not 0 <= position < len(self.transactions) or self.short_ids[position] is None:
+                raise ValueError(f"Invalid transaction position {position}")
+            if short_id(self.hash, transaction_hash(tx)) != self.short_ids[position]:
+                raise ValueError(f"Transaction at position {position} does not match its short ID")
+            self.transactions[position] = tx
+
+    def reset(self) -> None:
+        """Vacía los huecos no prefijados (tras una reconstrucción con colisión)."""
+        for position, sid in enumerate(self.short_ids):
+            if sid is not None:
+                self.transactions[position] = None
+
+    def to_dict(self) -> Dict:
+        """Bloque completo en el formato de Block.to_dict (sin merkle_root)."""
+        block_dict = dict(self.header)
+        block_dict['transactions'] = list(self.transactions)
+        return block_dict
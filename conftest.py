@@ -0,0 +1,82 @@
+"""
+Utilidades compartidas por los tests: transacciones firmadas como las envía
+un cliente, copias de bloques como llegan de otro nodo y cadenas en memoria
+con fondos.
+"""
+
+import os
+import time
+
+# Un solo proceso para minar y verificar: los tests crean muchas cadenas
+os.environ.setdefault('MINING_WORKERS', '1')
+os.environ.setdefault('VERIFY_WORKERS', '1')
+
+import pytest
+
+from block import Block, transaction_signing_data
+from blockchain import Blockchain
+from wallet import Wallet
+
+
+def signed_transaction(chain, wallet, recipient, amount, nonce=None, data=None, fee=None):
+    """
+    Transacción VRX firmada por wallet.
+
+    Args:
+        chain: Cadena de la que se toma el siguiente nonce si no se indica
+        wallet: Wallet del remitente
+        recipient: Destinatario
+        amount: Cantidad
+        nonce: Nonce de la transacción
+        data: Operación de estado (data.op), si la hay
+        fee: Fee ofrecido, si lo hay
+    """
+    transaction = {
+        'sender': wallet.address,
+        'recipient': recipient,
+        'amount': amount,
+        'token': 'VRX',
+        'timestamp': time.time(),
+        'data': data,
+        'nonce': chain.get_next_nonce(wallet.address) if nonce is None else nonce,
+        'public_key': wallet.export_keys()['public_key']
+    }
+    if fee is not None:
+        transaction['fee'] = fee
+    transaction['signature'] = wallet.sign_transaction(transaction_signing_data(transaction))
+    return transaction
+
+
+def copy_block(block):
+    """Copia de un bloque tal como llega de otro nodo."""
+    return Block.from_dict(block.to_dict())
+
+
+def forge_block(chain, transactions, state_root=None):
+    """Bloque minado sobre la punta de chain con las transacciones dadas."""
+    parent = chain.get_latest_block()
+    block = Block(
+        index=parent.index + 1,
+        timestamp=time.time(),
+        transactions=transactions,
+        proof=0,
+        previous_hash=parent.hash,
+        state_root=state_root or parent.state_root,
+        difficulty=chain.expected_difficulty(parent)
+    )
+    chain.proof_of_work(block)
+    block.hash = block.calculate_hash()
+    return block
+
+
+@pytest.fixture(scope='session')
+def wallet():
+    return Wallet()
+
+
+@pytest.fixture
+def funded(wallet):
+    """Cadena en memoria en la que wallet tiene una recompensa de minería."""
+    chain = Blockchain(difficulty=1)
+    chain.mine_pending_transactions(wallet.address)
+    return chain
@@ -9,6 +9,7 @@ import time
 from flask import Blueprint, request, jsonify
 from functools import wraps
 import logging
+from block import compute_transaction_hash, transaction_hash
 
 logger = logging.getLogger(__name__)
 
@@ -80,14 +81,17 @@ def create_evm_rpc_blueprint(blockchain, wallet):
     def format_block(block, full_tx=False):
         """Format OriluxChain block to Ethereum block format"""
         block_dict = block.to_dict() if hasattr(block, 'to_dict') else block
+        merkle_root = getattr(block, 'merkle_root', None) or block_dict.get('merkle_root', '')
+        # Los hashes ya calculados para el árbol de Merkle evitan re-hashear cada tx
+        tree = getattr(block, 'merkle_tree', None)
+        tx_hashes = tree.leaves if tree else [transaction_hash(tx) for tx in block_dict.get('transactions', [])]
         
         transactions = []
         for i, tx in enumerate(block_dict.get('transactions', [])):
             if full_tx:
-                transactions.append(format_transaction(tx, block_dict, i))
+                transactions.append(format_transaction(tx, block_dict, i, tx_hashes[i]))
             else:
-                tx_hash = tx.get('hash') or hashlib.sha256(json.dumps(tx, sort_keys=True).encode()).hexdigest()
-                transactions.append(format_hash(tx_hash))
+                transactions.append(format_hash(tx_hashes[i]))
         
         return {
             'number': to_hex(block_dict.get('index', 0)),
@@ -96,11 +100,11 @@ def create_evm_rpc_blueprint(blockchain, wallet):
             'nonce': to_hex(block_dict.get('proof', 0)),
             'sha3Uncles': '0x' + '0' * 64,
             'logsBloom': '0x' + '0' * 512,
-            'transactionsRoot': format_hash(hashlib.sha256(json.dumps(transactions).encode()).hexdigest()),
-            'stateRoot': '0x' + '0' * 64,
+            'transactionsRoot': format_hash(merkle_root),
+            'stateRoot': format_hash(block_dict.get('state_root')),
             'receiptsRoot': '0x' + '0' * 64,
             'miner': format_address(block_dict.get('miner', '')),
-            'difficulty': to_hex(blockchain.difficulty if blockchain else 4),
+            'difficulty': to_hex(block_dict.get('difficulty') or (blockchain.difficulty if blockchain else 4)),
             'totalDifficulty': to_hex((block_dict.get('index', 0) + 1) * (blockchain.difficulty if blockchain else 4)),
             'extraData': '0x4f72696c7578436861696e',  # "OriluxChain" in hex
             'size': to_hex(len(json.dumps(block_dict))),
@@ -111,12 +115,10 @@ def create_evm_rpc_blueprint(blockchain, wallet):
             'uncles': []
         }
     
-    def format_transaction(tx, block=None, tx_index=0):
+    def format_transaction(tx, block=None, tx_index=0, tx_hash=None):
         """Format OriluxChain transaction to Ethereum transaction format"""
-        tx_hash = tx.get('hash') or hashlib.sha256(json.dumps(tx, sort_keys=True).encode()).hexdigest()
-        
         return {
-            'hash': format_hash(tx_hash),
+            'hash': format_hash(tx_hash or transaction_hash(tx)),
             'nonce': to_hex(tx.get('nonce', 0)),
             'blockHash': format_hash(block.get('hash', '')) if block else None,
             'blockNumber': to_hex(block.get('index', 0)) if block else None,
@@ -132,12 +134,10 @@ def create_evm_rpc_blueprint(blockchain, wallet):
             's': '0x' + '0' * 64
         }
     
-    def format_transaction_receipt(tx, block, tx_index, success=True):
+    def format_transaction_receipt(tx, block, tx_index, success=True, tx_hash=None):
         """Format transaction receipt"""
-        tx_hash = tx.get('hash') or hashlib.sha256(json.dumps(tx, sort_keys=True).encode()).hexdigest()
-        
         return {
-            'transactionHash': format_hash(tx_hash),
+            'transactionHash': format_hash(tx_hash or transaction_hash(tx)),
             'transactionIndex': to_hex(tx_index),
             'blockHash': format_hash(block.get('hash', '')),
             'blockNumber': to_hex(block.get('index', 0)),
@@ -306,15 +306,10 @@ def create_evm_rpc_blueprint(blockchain, wallet):
         block_hash = params[0]
         full_tx = params[1] if len(params) > 1 else False
         
-        # Remove 0x prefix for comparison
-        search_hash = block_hash[2:] if block_hash.startswith('0x') else block_hash
-        
-        for block in blockchain.chain:
-            block_dict = block.to_dict() if hasattr(block, 'to_dict') else block
-            if block_dict.get('hash', '').lower() == search_hash.lower():
-                return format_block(block, full_tx)
-        
-        return None
+        block = blockchain.get_block_by_hash(block_hash)
+        if block is None:
+            return None
+        return format_block(block, full_tx)
     
     def handle_get_block_tx_count(params):
         if not params or not blockchain:
@@ -339,31 +334,23 @@ def create_evm_rpc_blueprint(blockchain, wallet):
         if not params or not blockchain:
             return '0x0'
         
-        block_hash = params[0]
-        search_hash = block_hash[2:] if block_hash.startswith('0x') else block_hash
-        
-        for block in blockchain.chain:
-            block_dict = block.to_dict() if hasattr(block, 'to_dict') else block
-            if block_dict.get('hash', '').lower() == search_hash.lower():
-                return to_hex(len(block_dict.get('transactions', [])))
-        
-        return '0x0'
+        block = blockchain.get_block_by_hash(params[0])
+        if block is None:
+            return '0x0'
+        return to_hex(len(block.transactions))
     
     def handle_get_transaction(params):
         if not params or not blockchain:
             return None
         
-        tx_hash = params[0]
-        search_hash = tx_hash[2:] if tx_hash.startswith('0x') else tx_hash
-        
-        for block in blockchain.chain:
-            block_dict = block.to_dict() if hasattr(block, 'to_dict') else block
-            for i, tx in enumerate(block_dict.get('transactions', [])):
-                tx_h = tx.get('hash') or hashlib.sha256(json.dumps(tx, sort_keys=True).encode()).hexdigest()
-                if tx_h.lower() == search_hash.lower():
-                    return format_transaction(tx, block_dict, i)
-        
-        return None
+        found = blockchain.find_transaction(params[0])
+        if found is None:
+            # Las pendientes se devuelven sin bloque, como en Ethereum
+            pending = blockchain.find_pending_transaction(params[0])
+            return format_transaction(pending) if pending is not None else None
+        block, position = found
+        return format_transaction(block.transactions[position], block.to_dict(), position,
+                                  block.merkle_tree.leaves[position])
     
     def handle_get_tx_by_block_and_index(params):
         if len(params) < 2 or not blockchain:
@@ -392,17 +379,12 @@ def create_evm_rpc_blueprint(blockchain, wallet):
         if not params or not blockchain:
             return None
         
-        tx_hash = params[0]
-        search_hash = tx_hash[2:] if tx_hash.startswith('0x') else tx_hash
-        
-        for block in blockchain.chain:
-            block_dict = block.to_dict() if hasattr(block, 'to_dict') else block
-            for i, tx in enumerate(block_dict.get('transactions', [])):
-                tx_h = tx.get('hash') or hashlib.sha256(json.dumps(tx, sort_keys=True).encode()).hexdigest()
-                if tx_h.lower() == search_hash.lower():
-                    return format_transaction_receipt(tx, block_dict, i)
-        
-        return None
+        found = blockchain.find_transaction(params[0])
+        if found is None:
+            return None
+        block, position = found
+        return format_transaction_receipt(block.transactions[position], block.to_dict(), position,
+                                          tx_hash=block.merkle_tree.leaves[position])
     
     def handle_get_transaction_count(params):
         if not params:
@@ -456,7 +438,7 @@ def create_evm_rpc_blueprint(blockchain, wallet):
             'timestamp': time.time()
         }
         
-        tx_hash = hashlib.sha256(json.dumps(tx, sort_keys=True).encode()).hexdigest()
+        tx_hash = compute_transaction_hash(tx)
         tx['hash'] = tx_hash
         
         blockchain.pending_transactions.append(tx)
@@ -474,10 +456,43 @@ def create_evm_rpc_blueprint(blockchain, wallet):
         
         return format_hash(tx_hash)
     
+    def function_selector(name):
+        """4-byte selector of a contract function (same hash as web3_sha3)"""
+        return hashlib.sha3_256(name.encode()).digest()[:4]
+    
+    def encode_return_value(value):
+        """Encode a VM return value as eth_call result data"""
+        if value is None:
+            return '0x'
+        if isinstance(value, int):
+            return '0x' + (value % 2**256).to_bytes(32, 'big').hex()
+        return '0x' + json.dumps(value).encode().hex()
+    
     def handle_call(params):
-        # eth_call is used for read-only contract calls
-        # Return empty data for now
-        return '0x'
+        # eth_call runs a contract function in read-only mode.
+        # data = 4-byte selector of the function name, optionally followed
+        # by its params as UTF-8 JSON
+        if not params or not blockchain:
+            return '0x'
+        
+        call = params[0]
+        contract = blockchain.contract_manager.get_contract((call.get('to') or '').lower())
+        if contract is None:
+            return '0x'
+        
+        data = bytes.fromhex((call.get('data') or call.get('input') or '0x')[2:])
+        function_name = next(
+            (name for name in contract.abi.get('functions', {}) if function_selector(name) == data[:4]),
+            None
+        )
+        if function_name is None:
+            raise Exception('Unknown function selector')
+        call_params = json.loads(data[4:].decode()) if len(data) > 4 else {}
+        
+        result = blockchain.view_contract(contract.address, function_name, call_params, call.get('from'))
+        if not result['success']:
+            raise Exception(f"execution reverted: {result['error']}")
+        return encode_return_value(result['return_value'])
     
     def handle_sign(params):
         # Signing requires private key access
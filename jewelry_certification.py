@@ -11,6 +11,7 @@ from dataclasses import dataclass, asdict
 import qrcode
 from io import BytesIO
 import base64
+from certificate_index import CertificateIndex
 
 
 @dataclass
@@ -81,6 +82,16 @@ class JewelryCertificationSystem:
         self.veralix_connector = veralix_connector
         self.certificates = {}  # certificate_id -> JewelryCertificate
         self.item_to_cert = {}  # item_id -> certificate_id
+        self.index = CertificateIndex(
+            fields={
+                'jeweler': lambda cert: cert.item.jeweler,
+                'owner': lambda cert: cert.owner,
+                'jewelry_type': lambda cert: cert.item.jewelry_type,
+                'material': lambda cert: cert.item.material,
+                'status': lambda cert: cert.status
+            },
+            value_field=lambda cert: cert.item.estimated_value
+        )
         
     def create_certificate(
         self,
@@ -105,16 +116,13 @@ class JewelryCertificationSystem:
         }
         
         # Agregar transacción a blockchain (como evento de sistema)
-        block_index = self.blockchain.add_transaction(
+        tx_hash = self.blockchain.submit_transaction(
             sender='NETWORK',
             recipient=owner,
             amount=0.0,
             token='ORX',
             data=tx_data
         )
-        
-        # Generar hash de transacción basado en los datos
-        tx_hash = hashlib.sha256(json.dumps(tx_data, sort_keys=True).encode()).hexdigest()
         tx_hash = f"0x{tx_hash}"
         
         # URL de verificación
@@ -141,6 +149,7 @@ class JewelryCertificationSystem:
         # Guardar certificado
         self.certificates[certificate_id] = certificate
         self.item_to_cert[item.item_id] = certificate_id
+        self.index.add(certificate_id, certificate)
         
         # Sincronizar con Veralix si está conectado
         if self.veralix_connector:
@@ -196,7 +205,7 @@ class JewelryCertificationSystem:
             'timestamp': datetime.now().isoformat()
         }
         
-        tx_hash = self.blockchain.add_transaction(
+        tx_hash = self.blockchain.submit_transaction(
             sender='NETWORK',
             recipient=new_owner,
             amount=0.0,
@@ -206,7 +215,8 @@ class JewelryCertificationSystem:
         
         # Actualizar certificado
         certificate.owner = new_owner
-        certificate.blockchain_tx = tx_hash
+        certificate.blockchain_tx = f"0x{tx_hash}"
+        self.index.update(certificate_id, certificate)
         
         # Sincronizar con Veralix
         if self.veralix_connector:
@@ -228,6 +238,7 @@ class JewelryCertificationSystem:
         
         # Actualizar estado
         certificate.status = status
+        self.index.update(certificate_id, certificate)
         
         # Crear transacción de reporte
         tx_data = {
@@ -256,21 +267,31 @@ class JewelryCertificationSystem:
         """Obtiene el historial completo de un certificado"""
         history = []
         
-        # Buscar todas las transacciones relacionadas en blockchain
-        for block in self.blockchain.chain:
-            for tx in block.transactions:
-                if isinstance(tx, dict) and tx.get('data'):
-                    data = tx['data']
-                    if data.get('certificate_id') == certificate_id:
-                        history.append({
-                            'block': block.index,
-                            'timestamp': block.timestamp,
-                            'transaction': tx,
-                            'type': data.get('type')
-                        })
+        # Eventos del certificado desde el índice de la blockchain
+        for block, position in self.blockchain.get_certificate_events(certificate_id):
+            tx = block.transactions[position]
+            event_type = (tx.get('data') or {}).get('type') or (tx.get('certificate') or {}).get('type')
+            history.append({
+                'block': block.index,
+                'timestamp': block.timestamp,
+                'transaction': tx,
+                'type': event_type
+            })
         
         return sorted(history, key=lambda x: x['timestamp'])
     
+    def get_certificate_proof(self, certificate_id: str) -> Optional[Dict]:
+        """Obtiene la prueba Merkle de la transacción de certificación"""
+        for block, position in self.blockchain.get_certificate_events(certificate_id):
+            tx = block.transactions[position]
+            if (tx.get('data') or {}).get('type') == 'jewelry_certification':
+                proof = block.get_transaction_proof(position)
+                proof['certificate_id'] = certificate_id
+                proof['transaction'] = tx
+                return proof
+        
+        return None
+    
     def create_nft(self, certificate_id: str) -> Optional[str]:
         """Crea un NFT asociado al certificado"""
         certificate = self.certificates.get(certificate_id)
@@ -305,41 +326,26 @@ class JewelryCertificationSystem:
     
     def get_jeweler_certificates(self, jeweler: str) -> List[JewelryCertificate]:
         """Obtiene todos los certificados de un joyero"""
-        return [
-            cert for cert in self.certificates.values()
-            if cert.item.jeweler == jeweler
-        ]
+        return self._resolve(self.index.query(jeweler=jeweler))
     
     def get_owner_certificates(self, owner: str) -> List[JewelryCertificate]:
         """Obtiene todos los certificados de un propietario"""
-        return [
-            cert for cert in self.certificates.values()
-            if cert.owner == owner and cert.status == 'active'
-        ]
+        return self._resolve(self.index.query(owner=owner, status='active'))
     
     def search_certificates(self, **filters) -> List[JewelryCertificate]:
         """Busca certificados por filtros"""
-        results = []
-        
-        for cert in self.certificates.values():
-            match = True
-            
-            for key, value in filters.items():
-                if key == 'jewelry_type' and cert.item.jewelry_type != value:
-                    match = False
-                elif key == 'material' and cert.item.material != value:
-                    match = False
-                elif key == 'jeweler' and cert.item.jeweler != value:
-                    match = False
-                elif key == 'min_value' and cert.item.estimated_value < value:
-                    match = False
-                elif key == 'max_value' and cert.item.estimated_value > value:
-                    match = False
-            
-            if match:
-                results.append(cert)
-        
-        return results
+        query = {
+            key: value for key, value in filters.items()
+            if key in ('jewelry_type', 'material', 'jeweler', 'min_value', 'max_value')
+        }
+        return self._resolve(self.index.query(**query))
+    
+    def rebuild_index(self) -> None:
+        """Reconstruye los índices tras reemplazar el diccionario de certificados"""
+        self.index.rebuild(self.certificates, accepts=JewelryCertificate)
+    
+    def _resolve(self, certificate_ids: List[str]) -> List[JewelryCertificate]:
+        return [self.certificates[cert_id] for cert_id in certificate_ids]
     
     # Métodos privados para integración con Veralix
     
@@ -358,14 +364,8 @@ class JewelryCertificationSystem:
     
     def _verify_in_blockchain(self, certificate: JewelryCertificate) -> bool:
         """Verifica certificado en blockchain"""
-        # Buscar transacción original
-        for block in self.blockchain.chain:
-            for tx in block.transactions:
-                if isinstance(tx, dict) and tx.get('data'):
-                    data = tx['data']
-                    if data.get('certificate_id') == certificate.certificate_id:
-                        return True
-        return False
+        # Basta con que el índice tenga algún evento confirmado del certificado
+        return bool(self.blockchain.index.certificate_events(certificate.certificate_id))
     
     def _verify_in_veralix(self, certificate: JewelryCertificate) -> bool:
         """Verifica certificado en Veralix.io"""
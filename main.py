@@ -9,7 +9,7 @@ def main():
     """
     parser = argparse.ArgumentParser(description='Oriluxchain Node')
     parser.add_argument('--port', type=int, default=5000, help='Puerto para la API REST')
-    parser.add_argument('--difficulty', type=int, default=4, help='Dificultad de minería')
+    parser.add_argument('--difficulty', type=int, default=4, help='Dificultad de génesis (después la fija la cadena)')
     
     args = parser.parse_args()
     
@@ -26,8 +26,7 @@ def main():
     """)
     
     # Crear y ejecutar API
-    api = BlockchainAPI(port=args.port)
-    api.blockchain.difficulty = args.difficulty
+    api = BlockchainAPI(port=args.port, difficulty=args.difficulty)
     
     print(f"✓ Nodo iniciado en http://localhost:{args.port}")
     print(f"✓ Wallet del nodo: {api.wallet.address}\n")
@@ -0,0 +1,377 @@
+"""
+ORILUXCHAIN - Mempool
+Pool de transacciones pendientes con prioridad por fee y colas por nonce
+"""
+
+import heapq
+import itertools
+import logging
+import os
+import threading
+from typing import Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Configuración del mempool
+MEMPOOL_MAX_SIZE = int(os.getenv('MEMPOOL_MAX_SIZE', '100000'))
+
+
+def transaction_priority(tx: Dict) -> float:
+    """Prioridad de una transacción: su fee (firmado y cobrado por el minero), o 0."""
+    value = tx.get('fee', 0)
+    return value if isinstance(value, (int, float)) and not isinstance(value, bool) else 0
+
+
+class _Entry:
+    """Transacción pendiente junto con sus claves de ordenación."""
+
+    __slots__ = ('seq', 'tx', 'priority', 'sender', 'nonce', 'version')
+
+    def __init__(self, seq: int, tx: Dict):
+        self.seq = seq
+        self.tx = tx
+        self.priority = transaction_priority(tx)
+        self.sender = tx.get('sender')
+        nonce = tx.get('nonce')
+        self.nonce = nonce if isinstance(nonce, int) else None
+        self.version = 0
+
+
+class Mempool:
+    """
+    Transacciones pendientes ordenadas para el ensamblado de bloques.
+
+    - Montículo de máxima prioridad con solo la transacción "cabeza" de cada
+      remitente (su menor nonce pendiente), así un bloque nunca incluye un
+      nonce antes que los anteriores del mismo remitente.
+    - Montículo de mínima prioridad para expulsar lo peor cuando se llena.
+      Solo contiene la "cola" de cada remitente (su mayor nonce pendiente):
+      expulsar un nonce intermedio dejaría bloqueados los siguientes.
+    - Cola por remitente indexada por nonce, para reemplazos.
+    - Ambos montículos usan borrado perezoso: quitar una transacción minada
+      es O(1) y las entradas obsoletas se descartan al salir del montículo.
+
+    Las transacciones sin nonce (las de sistema) son independientes entre
+    sí y siempre son cabeza. A igual prioridad se respeta el orden de
+    llegada, igual que la lista que reemplaza. También se comporta como una
+    secuencia de solo lectura en orden de llegada (len, iter, [-1]) para el
+    código que trataba pending_transactions como una lista.
+    """
+
+    def __init__(self, max_size: int = MEMPOOL_MAX_SIZE):
+        """
+        Inicializa el mempool.
+
+        Args:
+            max_size: Número máximo de transacciones pendientes
+        """
+        self.max_size = max_size
+        self._lock = threading.RLock()
+        self._seq = itertools.count()
+        self._entries: Dict[int, _Entry] = {}  # seq -> entrada, en orden de llegada
+        self._seq_by_id: Dict[int, int] = {}  # id(tx) -> seq
+        self._seq_by_hash: Dict[str, int] = {}  # hash de la transacción -> seq
+        self._by_sender: Dict[str, Dict[int, int]] = {}  # remitente -> nonce -> seq
+        self._sender_heads: Dict[str, List[int]] = {}  # remitente -> montículo de nonces
+        self._sender_tails: Dict[str, int] = {}  # remitente -> mayor nonce pendiente
+        self._ready: List[Tuple[float, int, int]] = []  # (-prioridad, seq, versión)
+        self._eviction: List[Tuple[float, int, int]] = []  # (prioridad, -seq, seq)
+
+    # ==================== SECUENCIA ====================
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __bool__(self) -> bool:
+        return bool(self._entries)
+
+    def __iter__(self) -> Iterator[Dict]:
+        with self._lock:
+            return iter([entry.tx for entry in self._entries.values()])
+
+    def __getitem__(self, item):
+        with self._lock:
+            if item == -1 and self._entries:
+                return next(reversed(self._entries.values())).tx
+            return [entry.tx for entry in self._entries.values()][item]
+
+    def append(self, tx: Dict) -> None:
+        """Añade una transacción ignorando el rechazo (compatibilidad con list)."""
+        accepted, reason = self.add(tx)
+        if not accepted:
+            logger.warning(f"Transaction dropped by mempool: {reason}")
+
+    # ==================== ADMISIÓN ====================
+
+    def get(self, sender: str, nonce: int) -> Optional[Dict]:
+        """Transacción pendiente de un remitente con ese nonce, o None."""
+        with self._lock:
+            seq = self._by_sender.get(sender, {}).get(nonce)
+            return self._entries[seq].tx if seq is not None else None
+
+    def get_by_hash(self, tx_hash: str) -> Optional[Dict]:
+        """Transacción pendiente con ese hash (en minúsculas, sin 0x), o None."""
+        with self._lock:
+            seq = self._seq_by_hash.get(tx_hash)
+            return self._entries[seq].tx if seq is not None else None
+
+    def next_nonce(self, sender: str, confirmed: int) -> int:
+        """
+        Siguiente nonce libre de un remitente.
+
+        Args:
+            sender: Remitente
+            confirmed: Siguiente nonce según los bloques aplicados
+
+        Returns:
+            El primer nonce desde confirmed que no tiene transacción pendiente
+        """
+        with self._lock:
+            queue = self._by_sender.get(sender, {})
+            nonce = confirmed
+            while nonce in queue:
+                nonce += 1
+            return nonce
+
+    def add(self, tx: Dict) -> Tuple[bool, Optional[str]]:
+        """
+        Añade una transacción ya validada.
+
+        Si el remitente ya tiene una pendiente con el mismo nonce, la nueva la
+        reemplaza solo si tiene mayor prioridad. Si el pool está lleno se
+        expulsa la cola de remitente de menor prioridad, siempre que sea peor
+        que la nueva y no sea un nonce anterior del mismo remitente.
+
+        Args:
+            tx: Transacción
+
+        Returns:
+            Tupla (aceptada, motivo del rechazo)
+        """
+        with self._lock:
+            entry = _Entry(next(self._seq), tx)
+
+            if entry.nonce is not None:
+                existing = self._by_sender.get(entry.sender, {}).get(entry.nonce)
+                if existing is not None:
+                    old = self._entries[existing]
+                    if entry.priority <= old.priority:
+                        return False, (f"Replacement for nonce {entry.nonce} needs a higher "
+                                       f"priority than {old.priority}")
+                    self._remove(existing)
+                    logger.info(f"Replaced pending transaction {entry.sender[:10]}... nonce={entry.nonce}")
+
+            if len(self._entries) >= self.max_size:
+                lowest = self._peek_lowest()
+                if lowest is None or lowest.priority >= entry.priority \
+                        or (lowest.sender == entry.sender and entry.nonce is not None):
+                    return False, "Mempool is full"
+                self._remove(lowest.seq)
+                logger.info(f"Evicted pending transaction with priority {lowest.priority}")
+
+            self._insert(entry)
+            return True, None
+
+    def _insert(self, entry: _Entry) -> None:
+        self._entries[entry.seq] = entry
+        self._seq_by_id[id(entry.tx)] = entry.seq
+        if entry.tx.get('hash'):
+            self._seq_by_hash[entry.tx['hash']] = entry.seq
+
+        if entry.nonce is None:
+            self._push_evictable(entry)
+            self._push_ready(entry)
+            return
+
+        self._by_sender.setdefault(entry.sender, {})[entry.nonce] = entry.seq
+        nonces = self._sender_heads.setdefault(entry.sender, [])
+        heapq.heappush(nonces, entry.nonce)
+        if nonces[0] == entry.nonce:
+            self._push_ready(entry)
+        if entry.nonce > self._sender_tails.get(entry.sender, -1):
+            self._sender_tails[entry.sender] = entry.nonce
+            self._push_evictable(entry)
+
+    def _push_ready(self, entry: _Entry) -> None:
+        entry.version += 1
+        heapq.heappush(self._ready, (-entry.priority, entry.seq, entry.version))
+
+    def _push_evictable(self, entry: _Entry) -> None:
+        heapq.heappush(self._eviction, (entry.priority, -entry.seq, entry.seq))
+
+    # ==================== ELIMINACIÓN ====================
+
+    def remove_many(self, transactions: List[Dict]) -> int:
+        """
+        Quita transacciones (por ejemplo, las recién minadas).
+
+        Args:
+            transactions: Los mismos objetos devueltos por select() o copias
+                con el mismo hash (las de un bloque recibido)
+
+        Returns:
+            Número de transacciones eliminadas
+        """
+        removed = 0
+        with self._lock:
+            for tx in transactions:
+                seq = self._seq_by_id.get(id(tx))
+                if seq is None or self._entries[seq].tx is not tx:
+                    seq = self._seq_by_hash.get(tx.get('hash'))
+                if seq is not None:
+                    self._remove(seq)
+                    removed += 1
+            self._compact()
+        return removed
+
+    def remove_confirmed(self, confirmed_nonces: Dict[str, int]) -> int:
+        """
+        Quita las transacciones cuyo nonce ya usó un bloque.
+
+        Un bloque confirma una versión de cada (remitente, nonce); otra con
+        el mismo nonce (un reemplazo que llegó mientras se minaba, o la que
+        otro nodo no incluyó) ya no puede entrar en ningún bloque.
+
+        Args:
+            confirmed_nonces: Remitente -> siguiente nonce confirmado
+
+        Returns:
+            Número de transacciones eliminadas
+        """
+        removed = 0
+        with self._lock:
+            for sender, next_nonce in confirmed_nonces.items():
+                queue = self._by_sender.get(sender, {})
+                for nonce in [nonce for nonce in queue if nonce < next_nonce]:
+                    self._remove(queue[nonce])
+                    removed += 1
+            self._compact()
+        return removed
+
+    def clear(self) -> None:
+        """Vacía el mempool."""
+        with self._lock:
+            self._entries.clear()
+            self._seq_by_id.clear()
+            self._seq_by_hash.clear()
+            self._by_sender.clear()
+            self._sender_heads.clear()
+            self._sender_tails.clear()
+            self._ready.clear()
+            self._eviction.clear()
+
+    def _remove(self, seq: int) -> None:
+        entry = self._entries.pop(seq)
+        del self._seq_by_id[id(entry.tx)]
+        if self._seq_by_hash.get(entry.tx.get('hash')) == seq:
+            del self._seq_by_hash[entry.tx['hash']]
+        if entry.nonce is None:
+            return
+
+        queue = self._by_sender[entry.sender]
+        del queue[entry.nonce]
+        nonces = self._sender_heads[entry.sender]
+        if not queue:
+            del self._by_sender[entry.sender]
+            del self._sender_heads[entry.sender]
+            del self._sender_tails[entry.sender]
+            return
+
+        # Si se fue la cola, el nonce anterior pasa a ser expulsable
+        if entry.nonce == self._sender_tails[entry.sender]:
+            tail = max(queue)
+            self._sender_tails[entry.sender] = tail
+            self._push_evictable(self._entries[queue[tail]])
+
+        # Descartar nonces ya eliminados de la cabeza y publicar la nueva cabeza
+        while nonces[0] not in queue:
+            heapq.heappop(nonces)
+        head = self._entries[queue[nonces[0]]]
+        if entry.nonce < head.nonce:
+            self._push_ready(head)
+
+    def _compact(self) -> None:
+        """Reconstruye los montículos cuando acumulan demasiadas entradas obsoletas."""
+        if len(self._eviction) > 2 * len(self._entries) + 64:
+            self._eviction = list({item for item in self._eviction if self._is_evictable(item[2])})
+            heapq.heapify(self._eviction)
+        if len(self._ready) > 2 * len(self._entries) + 64:
+            self._ready = [item for item in self._ready if self._is_ready(item)]
+            heapq.heapify(self._ready)
+
+    # ==================== SELECCIÓN ====================
+
+    def select(self, limit: int) -> List[Dict]:
+        """
+        Elige las transacciones para el siguiente bloque sin quitarlas.
+
+        Toma siempre la cabeza de mayor prioridad; al tomar la de un remitente,
+        su siguiente nonce pasa a competir. Coste O(limit · log n).
+
+        Args:
+            limit: Máximo de transacciones
+
+        Returns:
+            Transacciones en orden de inclusión
+        """
+        with self._lock:
+            selected: List[Dict] = []
+            popped: List[Tuple[float, int, int]] = []
+            successors: List[Tuple[float, int]] = []  # siguientes nonces ya liberados
+            cursors: Dict[str, List[int]] = {}
+
+            while len(selected) < limit:
+                while self._ready and not self._is_ready(self._ready[0]):
+                    heapq.heappop(self._ready)
+
+                if self._ready and (not successors or self._ready[0][:2] < successors[0]):
+                    item = heapq.heappop(self._ready)
+                    popped.append(item)
+                    entry = self._entries[item[1]]
+                elif successors:
+                    entry = self._entries[heapq.heappop(successors)[1]]
+                else:
+                    break
+
+                selected.append(entry.tx)
+                if entry.nonce is not None:
+                    following = self._next_in_queue(entry, cursors)
+                    if following is not None:
+                        heapq.heappush(successors, (-following.priority, following.seq))
+
+            for item in popped:
+                heapq.heappush(self._ready, item)
+            return selected
+
+    def _is_ready(self, item: Tuple[float, int, int]) -> bool:
+        entry = self._entries.get(item[1])
+        if entry is None or entry.version != item[2]:
+            return False
+        if entry.nonce is None:
+            return True
+        return self._sender_heads[entry.sender][0] == entry.nonce
+
+    def _next_in_queue(self, entry: _Entry, cursors: Dict[str, List[int]]) -> Optional[_Entry]:
+        """Siguiente nonce pendiente del remitente durante una selección."""
+        remaining = cursors.get(entry.sender)
+        if remaining is None:
+            queue = self._by_sender[entry.sender]
+            remaining = sorted(nonce for nonce in queue if nonce > entry.nonce)
+            remaining.reverse()
+            cursors[entry.sender] = remaining
+        if not remaining:
+            return None
+        return self._entries[self._by_sender[entry.sender][remaining.pop()]]
+
+    def _is_evictable(self, seq: int) -> bool:
+        entry = self._entries.get(seq)
+        if entry is None:
+            return False
+        return entry.nonce is None or self._sender_tails[entry.sender] == entry.nonce
+
+    def _peek_lowest(self) -> Optional[_Entry]:
+        while self._eviction and not self._is_evictable(self._eviction[0][2]):
+            heapq.heappop(self._eviction)
+        if not self._eviction:
+            return None
+        return self._entries[self._eviction[0][2]]
@@ -0,0 +1,119 @@
+"""
+ORILUXCHAIN - Merkle Tree
+Árbol de Merkle sobre las transacciones de un bloque con pruebas de inclusión
+"""
+
+import hashlib
+from typing import Dict, List, Optional
+
+# Prefijos de dominio para que una hoja nunca pueda hacerse pasar por un nodo interno
+LEAF_PREFIX = b'\x00'
+NODE_PREFIX = b'\x01'
+EMPTY_ROOT = hashlib.sha256(b'').hexdigest()
+
+
+def _hash_leaf(leaf: str) -> bytes:
+    return hashlib.sha256(LEAF_PREFIX + leaf.encode()).digest()
+
+
+def _hash_node(left: bytes, right: bytes) -> bytes:
+    return hashlib.sha256(NODE_PREFIX + left + right).digest()
+
+
+class MerkleTree:
+    """
+    Árbol de Merkle construido una vez sobre los hashes de transacciones.
+
+    Un nodo sin pareja al final de un nivel sube sin re-hashear, por lo que
+    las pruebas tienen como mucho ceil(log2(n)) pasos.
+    """
+
+    def __init__(self, leaves: List[str]):
+        """
+        Construye el árbol.
+
+        Args:
+            leaves: Hashes de las transacciones en orden de bloque
+        """
+        self.leaves = list(leaves)
+        self._positions: Optional[Dict[str, int]] = None
+        self.levels: List[List[bytes]] = [[_hash_leaf(leaf) for leaf in self.leaves]]
+
+        while len(self.levels[-1]) > 1:
+            level = self.levels[-1]
+            parents = [
+                _hash_node(level[i], level[i + 1])
+                for i in range(0, len(level) - 1, 2)
+            ]
+            if len(level) % 2:
+                parents.append(level[-1])
+            self.levels.append(parents)
+
+    @property
+    def root(self) -> str:
+        """Raíz hexadecimal del árbol (EMPTY_ROOT si no hay hojas)."""
+        if not self.leaves:
+            return EMPTY_ROOT
+        return self.levels[-1][0].hex()
+
+    def index_of(self, leaf: str) -> Optional[int]:
+        """Posición de una hoja en el bloque, o None si no está."""
+        if self._positions is None:
+            self._positions = {}
+            for position, value in enumerate(self.leaves):
+                self._positions.setdefault(value, position)
+        return self._positions.get(leaf)
+
+    def get_proof(self, position: int) -> List[Dict]:
+        """
+        Genera la prueba de inclusión de una hoja.
+
+        Args:
+            position: Posición de la transacción en el bloque
+
+        Returns:
+            Lista de pasos {'hash', 'position'} desde la hoja hasta la raíz
+
+        Raises:
+            IndexError: Si la posición no existe
+        """
+        if not 0 <= position < len(self.leaves):
+            raise IndexError(f"Leaf position {position} out of range")
+
+        proof = []
+        for level in self.levels[:-1]:
+            sibling = position ^ 1
+            if sibling < len(level):
+                proof.append({
+                    'hash': level[sibling].hex(),
+                    'position': 'left' if sibling < position else 'right'
+                })
+            position //= 2
+        return proof
+
+    @staticmethod
+    def verify_proof(leaf: str, proof: List[Dict], root: str) -> bool:
+        """
+        Verifica una prueba de inclusión sin necesitar el resto del bloque.
+
+        Args:
+            leaf: Hash de la transacción
+            proof: Pasos devueltos por get_proof
+            root: Raíz de Merkle del bloque
+
+        Returns:
+            True si la hoja pertenece al árbol con esa raíz
+        """
+        try:
+            current = _hash_leaf(leaf)
+            for step in proof:
+                sibling = bytes.fromhex(step['hash'])
+                if step['position'] == 'left':
+                    current = _hash_node(sibling, current)
+                elif step['position'] == 'right':
+                    current = _hash_node(current, sibling)
+                else:
+                    return False
+        except (KeyError, TypeError, ValueError):
+            return False
+        return current.hex() == root
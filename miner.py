@@ -0,0 +1,203 @@
+"""
+ORILUXCHAIN - Parallel Miner
+Motor de Proof of Work multiproceso con cancelación cooperativa
+"""
+
+import hashlib
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+from typing import Optional
+from block import BlockHeaderTemplate
+
+logger = logging.getLogger(__name__)
+
+# Configuración del minero
+MINING_WORKERS = int(os.getenv('MINING_WORKERS', str(os.cpu_count() or 1)))
+PARALLEL_MIN_DIFFICULTY = 4  # Por debajo, arrancar procesos cuesta más que minar
+STOP_CHECK_INTERVAL = 20000  # Intentos entre chequeos de la señal de parada
+RESULT_POLL_INTERVAL = 0.1  # segundos
+
+
+def _get_context():
+    """
+    Contexto de multiprocessing para los procesos de trabajo.
+
+    Nunca usa fork: el nodo corre dentro del servidor Flask con varios
+    hilos y un fork podría heredar locks tomados por otro hilo. forkserver
+    arranca los procesos desde un servidor limpio; spawn es la alternativa
+    donde no existe. Ambos re-importan el script principal, que por tanto
+    debe protegerse con if __name__ == '__main__'.
+    """
+    methods = multiprocessing.get_all_start_methods()
+    for method in ('forkserver', 'spawn'):
+        if method in methods:
+            return multiprocessing.get_context(method)
+    return multiprocessing.get_context()
+
+
+def _search_nonces(prefix: bytes, suffix: bytes, difficulty: int, start: int, step: int,
+                   stop_event, result_queue) -> None:
+    """
+    Recorre el espacio de nonces start, start+step, start+2*step...
+
+    Args:
+        prefix: Serialización del bloque anterior al proof
+        suffix: Serialización del bloque posterior al proof
+        difficulty: Número de ceros hexadecimales iniciales requeridos
+        start: Primer nonce a probar
+        step: Salto entre nonces (número de workers)
+        stop_event: Señal compartida para detener la búsqueda
+        result_queue: Cola donde se publica el nonce encontrado
+    """
+    # Comparar bytes del digest evita generar el hexdigest en cada intento
+    zero_bytes, half_byte = divmod(difficulty, 2)
+    zero_prefix = bytes(zero_bytes)
+    midstate = hashlib.sha256(prefix)
+    nonce = start
+    attempts = 0
+
+    while True:
+        h = midstate.copy()
+        h.update(b'%d' % nonce)
+        h.update(suffix)
+        digest = h.digest()
+        if digest.startswith(zero_prefix) and (not half_byte or digest[zero_bytes] < 0x10):
+            result_queue.put(nonce)
+            stop_event.set()
+            return
+
+        nonce += step
+        attempts += 1
+        if attempts % STOP_CHECK_INTERVAL == 0 and stop_event.is_set():
+            return
+
+
+class ParallelMiner:
+    """
+    Reparte el espacio de nonces entre un pool de procesos.
+
+    El primer worker que encuentra un proof válido detiene a los demás.
+    Una minería en curso puede cancelarse desde otro hilo con cancel(),
+    por ejemplo cuando llega un bloque de un peer por /blocks/new. Cada
+    llamada a mine() tiene su propia señal de parada, así que varias
+    búsquedas concurrentes no se pisan y cancel() las detiene todas.
+    """
+
+    def __init__(self, workers: Optional[int] = None):
+        """
+        Inicializa el minero.
+
+        Args:
+            workers: Número de procesos (por defecto MINING_WORKERS)
+        """
+        self.workers = max(1, workers or MINING_WORKERS)
+        self._ctx = _get_context()
+        self._lock = threading.Lock()
+        # Señal de parada de cada búsqueda en curso -> si fue cancelada
+        self._runs = {}
+
+    @property
+    def is_mining(self) -> bool:
+        """Indica si hay alguna búsqueda en curso."""
+        return bool(self._runs)
+
+    def mine(self, template: BlockHeaderTemplate, difficulty: int) -> Optional[int]:
+        """
+        Busca un proof que satisfaga la dificultad.
+
+        Args:
+            template: Plantilla pre-serializada del bloque (Block.mining_template)
+            difficulty: Número de ceros iniciales requeridos en el hash
+
+        Returns:
+            Proof encontrado, o None si la minería fue cancelada
+        """
+        serial = self.workers == 1 or difficulty < PARALLEL_MIN_DIFFICULTY
+        # La búsqueda en el propio proceso no necesita un Event compartido
+        stop_event = threading.Event() if serial else self._ctx.Event()
+        with self._lock:
+            self._runs[stop_event] = False
+
+        try:
+            if serial:
+                proof = self._mine_serial(template, difficulty, stop_event)
+            else:
+                proof = self._mine_parallel(template, difficulty, stop_event)
+        finally:
+            with self._lock:
+                cancelled = self._runs.pop(stop_event)
+        return None if cancelled else proof
+
+    def cancel(self) -> bool:
+        """
+        Cancela todas las búsquedas en curso.
+
+        Returns:
+            True si había alguna búsqueda activa
+        """
+        with self._lock:
+            if not self._runs:
+                return False
+            for stop_event in self._runs:
+                self._runs[stop_event] = True
+                stop_event.set()
+        logger.info("Mining cancelled")
+        return True
+
+    def _is_cancelled(self, stop_event) -> bool:
+        """Indica si la búsqueda de stop_event fue cancelada."""
+        with self._lock:
+            return self._runs.get(stop_event, False)
+
+    def _mine_serial(self, template: BlockHeaderTemplate, difficulty: int,
+                     stop_event) -> Optional[int]:
+        """Búsqueda en el proceso actual (dificultades bajas o un solo worker)."""
+        results = queue.Queue()
+        _search_nonces(template.prefix, template.suffix, difficulty, 0, 1,
+                       stop_event, results)
+        if results.empty():
+            return None
+        return results.get()
+
+    def _mine_parallel(self, template: BlockHeaderTemplate, difficulty: int,
+                       stop_event) -> Optional[int]:
+        """Búsqueda repartida entre self.workers procesos."""
+        results = self._ctx.Queue()
+        processes = [
+            self._ctx.Process(
+                target=_search_nonces,
+                args=(template.prefix, template.suffix, difficulty, i, self.workers,
+                      stop_event, results),
+                daemon=True
+            )
+            for i in range(self.workers)
+        ]
+        for process in processes:
+            process.start()
+
+        proof = None
+        try:
+            while proof is None:
+                try:
+                    proof = results.get(timeout=RESULT_POLL_INTERVAL)
+                except queue.Empty:
+                    if self._is_cancelled(stop_event):
+                        break
+                    if not any(process.is_alive() for process in processes):
+                        # Último intento: el worker pudo salir tras publicar
+                        try:
+                            proof = results.get(timeout=RESULT_POLL_INTERVAL)
+                        except queue.Empty:
+                            pass
+                        break
+        finally:
+            stop_event.set()
+            for process in processes:
+                process.join(timeout=5)
+                if process.is_alive():
+                    process.terminate()
+            results.close()
+        return proof
@@ -1,16 +1,32 @@
 import requests
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from urllib.parse import urlparse
 import logging
+import threading
 import time
+from binary_codec import BINARY_CONTENT_TYPE, decode_blocks
+from block import block_work
+from compact_block import PartialBlock, build_compact_block
+from peer_transport import PeerTransport, GOSSIP_FANOUT
 
 # Configurar logging
 logger = logging.getLogger(__name__)
 
 # Constantes de seguridad
-MAX_REORG_DEPTH = 10  # Máximo de bloques para reorganización
 MAX_BLOCK_SIZE = 1000000  # 1MB
 MAX_TRANSACTIONS_PER_BLOCK = 1000
 
+# Sincronización headers-first
+MAX_LOCATOR_SIZE = 64  # Hashes máximos en un localizador
+MAX_HEADERS_PER_REQUEST = 2000
+MAX_BLOCKS_PER_REQUEST = 50  # Bloques por rango de descarga
+SYNC_WORKERS = 4  # Descargas de rangos en paralelo
+SYNC_TIMEOUT = 10  # segundos
+
+# Bloques compactos
+MAX_PARTIAL_BLOCKS = 16  # Reconstrucciones a la espera de transacciones
+
 class Node:
     """
     Representa un nodo en la red P2P de Oriluxchain.
@@ -26,6 +42,10 @@ class Node:
         """
         self.blockchain = blockchain
         self.peers = set()  # Conjunto de nodos conectados
+        self.transport = PeerTransport()  # Sesiones keep-alive y estadísticas por peer
+        self.gossip_fanout = GOSSIP_FANOUT  # 0 = difundir a todos los peers
+        self._partial_blocks = OrderedDict()  # hash -> PartialBlock
+        self._partial_lock = threading.Lock()
     
     def register_peer(self, address):
         """
@@ -56,6 +76,15 @@ class Node:
         """
         return list(self.peers)
     
+    def get_peer_stats(self):
+        """
+        Obtiene la latencia y los fallos observados de cada peer.
+        
+        Returns:
+            dict: Estadísticas por dirección de peer
+        """
+        return self.transport.get_stats()
+    
     def validate_received_block(self, block_data):
         """
         Valida un bloque recibido de otro nodo antes de agregarlo.
@@ -98,17 +127,17 @@ class Node:
             if block_data['timestamp'] > current_time + 300:  # 5 minutos de tolerancia
                 return False, "Timestamp del futuro"
             
-            # Validar que el índice sea el siguiente esperado
-            expected_index = len(self.blockchain.chain)
+            # Validar que enlace con la punta o con un bloque reciente (rama lateral)
+            last_block = self.blockchain.chain[-1]
+            extends_tip = block_data['previous_hash'] == last_block.hash
+            parent = last_block if extends_tip else self.blockchain.find_branch_parent(block_data['previous_hash'])
+            if parent is None:
+                return False, "Previous hash no coincide con ningún bloque reciente"
+            
+            expected_index = parent.index + 1
             if block_data['index'] != expected_index:
                 return False, f"Índice incorrecto (esperado: {expected_index}, recibido: {block_data['index']})"
             
-            # Validar previous_hash
-            if len(self.blockchain.chain) > 0:
-                last_block = self.blockchain.chain[-1]
-                if block_data['previous_hash'] != last_block.hash:
-                    return False, "Previous hash no coincide"
-            
             # Reconstruir bloque y validar hash
             from block import Block
             block = Block.from_dict(block_data)
@@ -118,14 +147,20 @@ class Node:
                 return False, "Hash del bloque inválido"
             
             # Validar proof of work
-            if not self.blockchain.valid_proof(block_data['proof'], block_data['previous_hash']):
+            if not self.blockchain.is_valid_proof(block):
                 return False, "Proof of work inválido"
             
-            # Validar todas las transacciones del bloque
-            for tx_data in block_data['transactions']:
-                is_valid, error_msg = self.blockchain.validate_transaction(tx_data)
-                if not is_valid:
-                    return False, f"Transacción inválida: {error_msg}"
+            # Verificar todas las firmas en paralelo; las válidas quedan en caché
+            # y la cadena ya no repite el trabajo RSA al añadir el bloque
+            signatures = self.blockchain.verify_signatures(block_data['transactions'])
+            if False in signatures:
+                position = signatures.index(False)
+                return False, f"Transacción inválida: firma inválida en posición {position}"
+            
+            # Nonces y balances no se validan aquí contra el mempool: la cadena
+            # ejecuta las transacciones sobre el estado confirmado al añadir el
+            # bloque (o al reorganizar, si es de una rama lateral) y lo rechaza
+            # entero si alguna falla
             
             logger.info(f"Bloque #{block_data['index']} validado correctamente")
             return True, "Bloque válido"
@@ -134,94 +169,443 @@ class Node:
             logger.error(f"Error validando bloque: {e}")
             return False, f"Error de validación: {str(e)}"
     
-    def broadcast_block(self, block):
+    def broadcast_block(self, block, background=False):
         """
-        Transmite un nuevo bloque a todos los peers.
+        Transmite un nuevo bloque a los peers en paralelo como bloque compacto.
+        
+        Cada peer recibe la cabecera y los IDs cortos de las transacciones,
+        reconstruye el bloque con su mempool y solo pide las que le faltan.
+        En modo gossip (gossip_fanout > 0) solo se envía a un subconjunto de
+        peers, y cada nodo que acepta el bloque lo reenvía a su vez (ver
+        relay_block). Los peers en backoff por fallos recientes se omiten.
         
         Args:
             block (Block): Bloque a transmitir
+            background (bool): No esperar a las respuestas
+            
+        Returns:
+            int: Número de peers que aceptaron el bloque (0 en segundo plano)
         """
-        for peer in self.peers:
-            try:
-                url = f"http://{peer}/blocks/new"
-                requests.post(url, json=block.to_dict(), timeout=5)
-            except requests.exceptions.RequestException as e:
-                logger.warning(f"Error al transmitir a {peer}: {e}")
+        targets = self.transport.gossip_targets(self.peers, self.gossip_fanout)
+        compact = build_compact_block(block)
+        results = self.transport.run_each(
+            targets, lambda peer: self._send_block(peer, block, compact), background
+        )
+        return sum(1 for accepted in results.values() if accepted is True)
+    
+    def _send_block(self, peer, block, compact):
+        """
+        Envía un bloque compacto a un peer y completa las transacciones que pida.
+        
+        Returns:
+            bool: True si el peer aceptó el bloque
+        """
+        try:
+            response = self.transport.post(peer, '/blocks/compact', json=compact)
+            if response.status_code == 404:
+                # Peer sin soporte de bloques compactos
+                response = self.transport.post(peer, '/blocks/new', json=block.to_dict())
+            elif response.status_code == 202:
+                missing = response.json().get('missing', [])
+                response = self.transport.post(peer, '/blocks/compact/transactions', json={
+                    'hash': block.hash,
+                    'transactions': [
+                        {'index': position, 'tx': block.transactions[position]}
+                        for position in missing
+                        if isinstance(position, int) and 0 <= position < len(block.transactions)
+                    ]
+                })
+            return response.status_code < 300
+        except (requests.exceptions.RequestException, ValueError) as e:
+            logger.warning(f"Error al transmitir a {peer}: {e}")
+            return False
+    
+    def broadcast_transactions(self, transactions, background=True):
+        """
+        Difunde transacciones recién admitidas en el mempool a los peers.
+        
+        Así llegan a los demás mempools antes que el bloque que las incluya,
+        y el bloque compacto se reconstruye sin pedirlas. Cada peer reenvía
+        solo las que admite; las que ya tiene las rechaza, así que la
+        difusión se detiene sola.
+        
+        Args:
+            transactions (list): Transacciones tal como quedaron en el mempool
+                (con nonce y hash)
+            background (bool): No esperar a las respuestas
+            
+        Returns:
+            int: Número de peers que admitieron alguna (0 en segundo plano)
+        """
+        if not transactions:
+            return 0
+        targets = self.transport.gossip_targets(self.peers, self.gossip_fanout)
+        results = self.transport.fan_out(
+            targets, 'POST', '/api/transactions/batch', background, json={'transactions': transactions}
+        )
+        return sum(
+            1 for response in results.values()
+            if isinstance(response, requests.Response) and response.status_code < 300
+        )
+    
+    def receive_compact_block(self, message):
+        """
+        Reconstruye un bloque compacto con las transacciones del mempool.
+        
+        Args:
+            message (dict): Mensaje creado por build_compact_block
+            
+        Returns:
+            tuple: (dict | None, list) - (bloque completo, posiciones que faltan)
+            
+        Raises:
+            ValueError: Si el mensaje está mal formado o el bloque no es nuevo
+        """
+        try:
+            partial = PartialBlock(message)
+        except (KeyError, TypeError, StopIteration) as e:
+            raise ValueError(f"Bloque compacto mal formado: {e}")
+        if self.blockchain.has_block(partial.hash):
+            raise ValueError("Bloque ya conocido")
+        
+        partial.fill_from_pool(self.blockchain.pending_transactions)
+        return self._complete_block(partial)
+    
+    def fill_compact_block(self, block_hash, transactions):
+        """
+        Completa un bloque compacto con las transacciones enviadas por el emisor.
+        
+        Args:
+            block_hash (str): Hash del bloque en reconstrucción
+            transactions (list): Lista de {'index', 'tx'}
+            
+        Returns:
+            tuple: (dict | None, list) - (bloque completo, posiciones que faltan)
+            
+        Raises:
+            ValueError: Si el bloque es desconocido o las transacciones no encajan
+        """
+        with self._partial_lock:
+            partial = self._partial_blocks.get(block_hash)
+        if partial is None:
+            raise ValueError("Bloque compacto desconocido")
+        try:
+            partial.fill(transactions)
+        except (KeyError, TypeError) as e:
+            raise ValueError(f"Transacciones mal formadas: {e}")
+        return self._complete_block(partial)
+    
+    def _complete_block(self, partial):
+        """Devuelve el bloque si está completo o guarda la reconstrucción."""
+        from block import Block
+        
+        missing = partial.missing
+        if not missing:
+            block_dict = partial.to_dict()
+            if Block.from_dict(block_dict).hash == partial.hash:
+                with self._partial_lock:
+                    self._partial_blocks.pop(partial.hash, None)
+                return block_dict, []
+            # Colisión de ID corto con otra transacción local: pedir todas
+            partial.reset()
+            missing = partial.missing
+            if not missing:
+                raise ValueError("El bloque compacto no coincide con su hash")
+        
+        with self._partial_lock:
+            self._partial_blocks[partial.hash] = partial
+            self._partial_blocks.move_to_end(partial.hash)
+            while len(self._partial_blocks) > MAX_PARTIAL_BLOCKS:
+                self._partial_blocks.popitem(last=False)
+        return None, missing
+    
+    def relay_block(self, block):
+        """
+        Reenvía un bloque recibido y aceptado, solo en modo gossip.
+        
+        Un peer que ya tiene el bloque lo rechaza sin reenviarlo, así que la
+        difusión se detiene sola.
+        
+        Args:
+            block (Block): Bloque recién añadido a la cadena
+        """
+        if self.gossip_fanout > 0:
+            self.broadcast_block(block, background=True)
+    
+    def build_locator(self):
+        """
+        Construye el localizador de bloques de la cadena local.
+        
+        Los 10 hashes más recientes van uno a uno y después el paso se
+        duplica, terminando siempre en génesis. Así el peer encuentra el
+        último bloque común con O(log n) hashes.
+        
+        Returns:
+            list: Hashes de la punta hacia génesis
+        """
+        locator = []
+        height = len(self.blockchain.chain) - 1
+        step = 1
+        while height > 0 and len(locator) < MAX_LOCATOR_SIZE - 1:
+            locator.append(self.blockchain.hash_at(height))
+            if len(locator) >= 10:
+                step *= 2
+            height -= step
+        locator.append(self.blockchain.hash_at(0))
+        return locator
     
     def sync_chain(self):
         """
-        Sincroniza la blockchain con los peers.
-        Implementa el algoritmo de consenso (cadena más larga) con protección contra reorgs profundas.
+        Sincroniza la blockchain con los peers (headers-first).
+        
+        1. Pide la punta a cada peer y elige el de más trabajo acumulado.
+        2. Envía el localizador y recibe las cabeceras desde el último
+           bloque común, comprobando que enlazan entre sí.
+        3. Descarga solo los cuerpos que faltan, en rangos paralelos
+           repartidos entre los peers que los tienen.
+        4. Aplica los bloques de forma incremental (o reorganiza si el
+           punto común está por debajo de la punta, hasta
+           Blockchain.MAX_REORG_DEPTH).
         
         Returns:
-            bool: True si la cadena fue reemplazada
+            bool: True si la cadena cambió
         """
-        longest_chain = None
-        max_length = len(self.blockchain.chain)
         current_length = len(self.blockchain.chain)
+        current_work = self.blockchain.chain_work()
+        tips = self._fetch_tips()
+        candidates = sorted(
+            (peer for peer, tip in tips.items() if self._tip_is_better(tip, current_length, current_work)),
+            key=lambda peer: (tips[peer].get('work', 0), tips[peer]['length']),
+            reverse=True
+        )
         
-        # Consultar todos los peers
-        for peer in self.peers:
+        for peer in candidates:
             try:
-                url = f"http://{peer}/chain"
-                response = requests.get(url, timeout=5)
-                
-                if response.status_code == 200:
-                    data = response.json()
-                    length = data['length']
-                    chain_data = data['chain']
-                    
-                    # Verificar si la cadena es más larga
-                    if length > max_length:
-                        # SEGURIDAD: Protección contra reorganizaciones profundas
-                        reorg_depth = abs(length - current_length)
-                        if reorg_depth > MAX_REORG_DEPTH:
-                            logger.warning(
-                                f"Reorganización rechazada: profundidad {reorg_depth} > límite {MAX_REORG_DEPTH}"
-                            )
-                            continue
-                        
-                        # Reconstruir la cadena desde los datos
-                        from block import Block
-                        chain = [Block.from_dict(block_dict) for block_dict in chain_data]
-                        
-                        # Validar la cadena completa
-                        if self.blockchain.is_chain_valid(chain):
-                            # Validar cada bloque individualmente
-                            all_valid = True
-                            for i, block_dict in enumerate(chain_data):
-                                if i == 0:  # Skip genesis
-                                    continue
-                                # Validación básica de cada bloque
-                                if not isinstance(block_dict.get('index'), int):
-                                    all_valid = False
-                                    break
-                                if not isinstance(block_dict.get('hash'), str):
-                                    all_valid = False
-                                    break
-                            
-                            if all_valid:
-                                max_length = length
-                                longest_chain = chain
-                                logger.info(f"Cadena válida encontrada de longitud {length}")
-                            else:
-                                logger.warning(f"Cadena de {peer} contiene bloques inválidos")
-                        else:
-                            logger.warning(f"Cadena de {peer} no es válida")
-            
+                if self._sync_from_peer(peer, tips):
+                    logger.info(f"Cadena sincronizada con {peer}: "
+                                f"{current_length} -> {len(self.blockchain.chain)} bloques")
+                    return True
             except requests.exceptions.RequestException as e:
                 logger.warning(f"Error al sincronizar con {peer}: {e}")
             except Exception as e:
                 logger.error(f"Error inesperado sincronizando con {peer}: {e}")
         
-        # Reemplazar la cadena si encontramos una más larga y válida
-        if longest_chain:
-            logger.info(f"Reemplazando cadena: {current_length} -> {max_length} bloques")
-            self.blockchain.chain = longest_chain
-            return True
-        
         return False
     
+    def _fetch_tips(self):
+        """Consulta la punta de todos los peers en paralelo."""
+        tips = {}
+        for peer, response in self.transport.fan_out(self.peers, 'GET', '/chain/tip').items():
+            if isinstance(response, Exception) or response.status_code != 200:
+                continue
+            try:
+                data = response.json()
+            except ValueError as e:
+                logger.warning(f"Punta inválida de {peer}: {e}")
+                continue
+            if isinstance(data.get('length'), int) and isinstance(data.get('hash'), str):
+                if not isinstance(data.get('work'), int):
+                    data.pop('work', None)
+                tips[peer] = data
+        return tips
+    
+    @staticmethod
+    def _tip_is_better(tip, length, work):
+        """Compara por trabajo acumulado; los peers que no lo publican, por longitud."""
+        if 'work' in tip:
+            return tip['work'] > work
+        return tip['length'] > length
+    
+    def _sync_from_peer(self, peer, tips):
+        """
+        Sincroniza contra un peer concreto.
+        
+        Returns:
+            bool: True si se aplicó al menos un bloque
+        """
+        
+        applied = False
+        while True:
+            response = self.transport.post(
+                peer, '/headers',
+                json={'locator': self.build_locator(), 'limit': MAX_HEADERS_PER_REQUEST},
+                timeout=SYNC_TIMEOUT
+            )
+            response.raise_for_status()
+            data = response.json()
+            fork_height = data['fork_height']
+            headers = data['headers']
+            
+            if not headers:
+                return applied
+            
+            # SEGURIDAD: Protección contra reorganizaciones profundas
+            reorg_depth = len(self.blockchain.chain) - 1 - fork_height
+            max_depth = self.blockchain.MAX_REORG_DEPTH
+            if reorg_depth > max_depth:
+                logger.warning(
+                    f"Reorganización rechazada: profundidad {reorg_depth} > límite {max_depth}"
+                )
+                return applied
+            
+            if fork_height >= len(self.blockchain.chain) or \
+                    data.get('fork_hash') != self.blockchain.hash_at(fork_height):
+                logger.warning(f"Punto común inválido de {peer}")
+                return applied
+            
+            error = self._check_headers(headers, fork_height)
+            if error:
+                logger.warning(f"Cabeceras inválidas de {peer}: {error}")
+                return applied
+            
+            # El trabajo que publica el peer no se cree: se calcula con las
+            # cabeceras ya verificadas (cada hash cumple su dificultad)
+            if fork_height < len(self.blockchain.chain) - 1:
+                branch_work = self.blockchain.chain_work(fork_height) + sum(
+                    block_work(self._header_difficulty(header)) for header in headers
+                )
+                if branch_work <= self.blockchain.chain_work():
+                    logger.warning(
+                        f"Rama de {peer} sin más trabajo que la local ({branch_work} <= "
+                        f"{self.blockchain.chain_work()})"
+                    )
+                    return applied
+            
+            blocks = self._download_bodies(peer, headers, tips)
+            if blocks is None:
+                return applied
+            
+            if fork_height == len(self.blockchain.chain) - 1:
+                for block in blocks:
+                    self.blockchain.add_block(block)
+            else:
+                self.blockchain.reorganize(fork_height, blocks)
+            applied = True
+            
+            if len(headers) < MAX_HEADERS_PER_REQUEST:
+                return applied
+    
+    def _check_headers(self, headers, fork_height):
+        """
+        Comprueba que las cabeceras forman una cadena desde el punto común.
+        
+        Las cabeceras con raíz de estado llevan todo lo que cubre el hash
+        (las transacciones entran por el merkle root), así que su hash y su
+        PoW se verifican aquí. En el formato antiguo el hash cubre las
+        transacciones y solo se puede comprobar al recibir cada cuerpo.
+        
+        Returns:
+            str | None: Motivo del fallo o None
+        """
+        from block import Block
+        
+        previous_hash = self.blockchain.hash_at(fork_height)
+        for offset, header in enumerate(headers):
+            expected_index = fork_height + 1 + offset
+            if header.get('index') != expected_index:
+                return f"índice {header.get('index')} (esperado {expected_index})"
+            if header.get('previous_hash') != previous_hash:
+                return f"enlace roto en el bloque {expected_index}"
+            # La dificultad exacta se comprueba con el bloque completo; aquí el
+            # hash debe cumplir al menos la que declara la cabecera
+            difficulty = self._header_difficulty(header)
+            if not isinstance(difficulty, int) or difficulty < self.blockchain.MIN_DIFFICULTY:
+                return f"dificultad inválida en el bloque {expected_index}"
+            if not isinstance(header.get('hash'), str) or not header['hash'].startswith('0' * difficulty):
+                return f"hash sin la dificultad requerida en el bloque {expected_index}"
+            try:
+                computed_hash = Block.header_hash(header)
+            except (KeyError, TypeError, ValueError):
+                return f"cabecera incompleta en el bloque {expected_index}"
+            if computed_hash is not None and computed_hash != header['hash']:
+                return f"hash de cabecera inválido en el bloque {expected_index}"
+            if header.get('tx_count', 0) > MAX_TRANSACTIONS_PER_BLOCK:
+                return f"demasiadas transacciones en el bloque {expected_index}"
+            previous_hash = header['hash']
+        return None
+    
+    def _header_difficulty(self, header):
+        """Dificultad que declara una cabecera (la base en el formato antiguo)."""
+        if header.get('state_root') is not None:
+            return header.get('difficulty')
+        return self.blockchain.base_difficulty
+    
+    def _download_bodies(self, peer, headers, tips):
+        """
+        Descarga en paralelo los cuerpos de los bloques de las cabeceras.
+        
+        Los rangos se reparten entre los peers cuya punta llega a ellos; si
+        un rango falla o no coincide con las cabeceras, se reintenta con el
+        peer que envió las cabeceras.
+        
+        Returns:
+            list | None: Bloques en orden, o None si algún rango no se pudo obtener
+        """
+        first_height = headers[0]['index']
+        end_height = headers[-1]['index'] + 1
+        ranges = [
+            (start, min(start + MAX_BLOCKS_PER_REQUEST, end_height))
+            for start in range(first_height, end_height, MAX_BLOCKS_PER_REQUEST)
+        ]
+        sources = [p for p, tip in tips.items() if tip['length'] >= end_height] or [peer]
+        
+        def fetch(job):
+            position, (start, end) = job
+            expected = headers[start - first_height:end - first_height]
+            for source in dict.fromkeys([sources[position % len(sources)], peer]):
+                blocks = self._fetch_range(source, start, end, expected)
+                if blocks is not None:
+                    return blocks
+            return None
+        
+        with ThreadPoolExecutor(max_workers=min(SYNC_WORKERS, len(ranges))) as executor:
+            results = list(executor.map(fetch, enumerate(ranges)))
+        
+        if any(blocks is None for blocks in results):
+            logger.warning(f"No se pudieron descargar todos los bloques desde {peer}")
+            return None
+        return [block for blocks in results for block in blocks]
+    
+    def _fetch_range(self, source, start, end, expected_headers):
+        """
+        Descarga un rango y comprueba cada cuerpo contra su cabecera.
+        
+        Se pide el formato binario; los peers que no lo soportan responden
+        en JSON y también se acepta.
+        """
+        from block import Block
+        
+        try:
+            response = self.transport.get(
+                source, '/blocks/range',
+                params={'start': start, 'end': end},
+                headers={'Accept': f"{BINARY_CONTENT_TYPE}, application/json;q=0.5"},
+                timeout=SYNC_TIMEOUT
+            )
+            if response.status_code != 200:
+                return None
+            if response.headers.get('Content-Type', '').startswith(BINARY_CONTENT_TYPE):
+                # decode_blocks recalcula cada hash igual que from_dict
+                blocks = decode_blocks(response.content)
+            else:
+                blocks = [Block.from_dict(block_dict)
+                          for block_dict in response.json().get('blocks', [])]
+        except (requests.exceptions.RequestException, ValueError, KeyError, TypeError) as e:
+            logger.warning(f"Error descargando bloques {start}-{end} de {source}: {e}")
+            return None
+        
+        if len(blocks) != len(expected_headers):
+            return None
+        
+        for block, header in zip(blocks, expected_headers):
+            if len(block.transactions) > MAX_TRANSACTIONS_PER_BLOCK:
+                return None
+            # El hash se recalcula al decodificar: debe coincidir con la cabecera
+            if block.hash != header['hash']:
+                logger.warning(f"El bloque {block.index} de {source} no coincide con su cabecera")
+                return None
+        return blocks
+    
     def resolve_conflicts(self):
         """
         Resuelve conflictos entre nodos usando el consenso de cadena más larga.
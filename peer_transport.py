@@ -0,0 +1,281 @@
+"""
+ORILUXCHAIN - Peer Transport
+Transporte HTTP entre nodos: sesiones persistentes, envío concurrente y
+seguimiento de latencia y fallos por peer
+"""
+
+import logging
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Iterable, List, Optional
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+# Configuración del transporte
+PEER_TIMEOUT = float(os.getenv('PEER_TIMEOUT', '5'))  # segundos
+PEER_WORKERS = int(os.getenv('PEER_WORKERS', '16'))  # peticiones concurrentes
+GOSSIP_FANOUT = int(os.getenv('GOSSIP_FANOUT', '0'))  # 0 = enviar a todos los peers
+BACKOFF_BASE = 2.0  # segundos tras el primer fallo
+BACKOFF_MAX = 300.0
+LATENCY_ALPHA = 0.2  # peso de la última medida en la media móvil
+
+
+class PeerStats:
+    """Latencia y fallos observados de un peer."""
+
+    __slots__ = ('latency', 'failures', 'successes', 'retry_at', 'last_error')
+
+    def __init__(self):
+        self.latency: Optional[float] = None  # media móvil exponencial, en segundos
+        self.failures = 0  # fallos consecutivos
+        self.successes = 0
+        self.retry_at = 0.0
+        self.last_error: Optional[str] = None
+
+    def record_success(self, elapsed: float) -> None:
+        if self.latency is None:
+            self.latency = elapsed
+        else:
+            self.latency += LATENCY_ALPHA * (elapsed - self.latency)
+        self.failures = 0
+        self.successes += 1
+        self.retry_at = 0.0
+        self.last_error = None
+
+    def record_failure(self, error: Exception) -> None:
+        self.failures += 1
+        delay = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** (self.failures - 1))
+        self.retry_at = time.time() + delay
+        self.last_error = str(error)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'latency_ms': round(self.latency * 1000, 1) if self.latency is not None else None,
+            'failures': self.failures,
+            'successes': self.successes,
+            'backoff_seconds': max(0.0, round(self.retry_at - time.time(), 1)),
+            'last_error': self.last_error
+        }
+
+
+class PeerTransport:
+    """
+    Cliente HTTP compartido para hablar con los peers.
+
+    Cada peer tiene una sesión keep-alive propia, así las peticiones
+    repetidas (sincronización, difusión de bloques) reutilizan la conexión.
+    Las difusiones se envían en paralelo en un pool de hilos, de modo que un
+    peer lento solo retrasa su propia entrega. Un peer que falla entra en
+    backoff exponencial y se omite en las difusiones hasta que vence.
+    """
+
+    def __init__(self, timeout: float = PEER_TIMEOUT, workers: int = PEER_WORKERS):
+        """
+        Inicializa el transporte.
+
+        Args:
+            timeout: Timeout por defecto de cada petición, en segundos
+            workers: Máximo de peticiones simultáneas en las difusiones
+        """
+        self.timeout = timeout
+        self.workers = max(1, workers)
+        self._sessions: Dict[str, requests.Session] = {}
+        self._stats: Dict[str, PeerStats] = {}
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    # ==================== PETICIONES ====================
+
+    def get(self, peer: str, path: str, **kwargs) -> requests.Response:
+        """GET a http://peer/path. Lanza RequestException si falla."""
+        return self.request('GET', peer, path, **kwargs)
+
+    def post(self, peer: str, path: str, **kwargs) -> requests.Response:
+        """POST a http://peer/path. Lanza RequestException si falla."""
+        return self.request('POST', peer, path, **kwargs)
+
+    def request(self, method: str, peer: str, path: str, **kwargs) -> requests.Response:
+        """
+        Envía una petición a un peer y registra su latencia o su fallo.
+
+        Las respuestas 5xx cuentan como fallo del peer; las 4xx no (el peer
+        funciona, simplemente rechazó la petición).
+
+        Args:
+            method: Método HTTP
+            peer: Dirección host:puerto del peer
+            path: Ruta, empezando por /
+            **kwargs: Argumentos de requests (json, params, timeout...)
+
+        Returns:
+            Respuesta del peer
+
+        Raises:
+            requests.exceptions.RequestException: Error de red o respuesta 5xx
+        """
+        kwargs.setdefault('timeout', self.timeout)
+        stats = self._get_stats(peer)
+        started = time.monotonic()
+        try:
+            response = self._get_session(peer).request(method, f"http://{peer}{path}", **kwargs)
+            if response.status_code >= 500:
+                response.raise_for_status()
+        except requests.exceptions.RequestException as e:
+            with self._lock:
+                stats.record_failure(e)
+            raise
+        with self._lock:
+            stats.record_success(time.monotonic() - started)
+        return response
+
+    def fan_out(self, peers: Iterable[str], method: str, path: str,
+                background: bool = False, **kwargs) -> Dict[str, Any]:
+        """
+        Envía la misma petición a varios peers en paralelo.
+
+        Los peers en backoff se omiten.
+
+        Args:
+            peers: Peers destino
+            method: Método HTTP
+            path: Ruta, empezando por /
+            background: No esperar las respuestas (devuelve un diccionario vacío)
+            **kwargs: Argumentos de requests
+
+        Returns:
+            Diccionario peer -> respuesta, o la excepción si falló
+        """
+        return self.run_each(
+            peers, lambda peer: self._request_quietly(method, peer, path, **kwargs), background
+        )
+
+    def run_each(self, peers: Iterable[str], function: Callable[[str], Any],
+                 background: bool = False) -> Dict[str, Any]:
+        """
+        Ejecuta function(peer) en paralelo para cada peer disponible.
+
+        Sirve para intercambios de varias peticiones con cada peer, como la
+        difusión de bloques compactos.
+
+        Args:
+            peers: Peers destino
+            function: Función que recibe la dirección del peer
+            background: No esperar los resultados (devuelve un diccionario vacío)
+
+        Returns:
+            Diccionario peer -> resultado, o la excepción si falló
+        """
+        targets = [peer for peer in peers if self.is_available(peer)]
+        if not targets:
+            return {}
+
+        executor = self._get_executor()
+        futures = {executor.submit(function, peer): peer for peer in targets}
+        if background:
+            return {}
+        wait(futures)
+
+        results: Dict[str, Any] = {}
+        for future, peer in futures.items():
+            error = future.exception()
+            results[peer] = error if error is not None else future.result()
+        return results
+
+    def _request_quietly(self, method: str, peer: str, path: str, **kwargs) -> requests.Response:
+        try:
+            return self.request(method, peer, path, **kwargs)
+        except requests.exceptions.RequestException as e:
+            logger.warning(f"Error al contactar con {peer}{path}: {e}")
+            raise
+
+    # ==================== SELECCIÓN DE PEERS ====================
+
+    def is_available(self, peer: str) -> bool:
+        """False mientras el peer está en backoff tras un fallo."""
+        stats = self._stats.get(peer)
+        return stats is None or stats.retry_at <= time.time()
+
+    def gossip_targets(self, peers: Iterable[str], fanout: int = GOSSIP_FANOUT) -> List[str]:
+        """
+        Elige a qué peers difundir en modo gossip.
+
+        La mitad son los de menor latencia, para que el bloque avance rápido,
+        y el resto se elige al azar, para que toda la red acabe recibiéndolo
+        aunque las latencias no cambien.
+
+        Args:
+            peers: Peers conocidos
+            fanout: Número de destinos; 0 o menos significa todos
+
+        Returns:
+            Peers disponibles elegidos
+        """
+        available = [peer for peer in peers if self.is_available(peer)]
+        if fanout <= 0 or len(available) <= fanout:
+            return available
+
+        available.sort(key=self._latency_key)
+        fastest = available[:(fanout + 1) // 2]
+        rest = available[len(fastest):]
+        return fastest + random.sample(rest, fanout - len(fastest))
+
+    def _latency_key(self, peer: str) -> float:
+        # Los peers sin medidas van primero para que se midan
+        stats = self._stats.get(peer)
+        return stats.latency if stats is not None and stats.latency is not None else 0.0
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Estadísticas de cada peer contactado."""
+        with self._lock:
+            return {peer: stats.to_dict() for peer, stats in self._stats.items()}
+
+    # ==================== RECURSOS ====================
+
+    def forget(self, peer: str) -> None:
+        """Cierra la sesión de un peer y descarta sus estadísticas."""
+        with self._lock:
+            session = self._sessions.pop(peer, None)
+            self._stats.pop(peer, None)
+        if session is not None:
+            session.close()
+
+    def close(self) -> None:
+        """Cierra todas las sesiones y el pool de hilos."""
+        with self._lock:
+            sessions = list(self._sessions.values())
+            self._sessions.clear()
+            executor, self._executor = self._executor, None
+        for session in sessions:
+            session.close()
+        if executor is not None:
+            executor.shutdown(wait=False)
+
+    def _get_session(self, peer: str) -> requests.Session:
+        with self._lock:
+            session = self._sessions.get(peer)
+            if session is None:
+                session = requests.Session()
+                # Varias descargas de rangos pueden ir al mismo peer a la vez
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.workers)
+                session.mount('http://', adapter)
+                self._sessions[peer] = session
+            return session
+
+    def _get_stats(self, peer: str) -> PeerStats:
+        with self._lock:
+            stats = self._stats.get(peer)
+            if stats is None:
+                stats = self._stats[peer] = PeerStats()
+            return stats
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers,
+                                                    thread_name_prefix='peer-transport')
+            return self._executor
@@ -11,6 +11,7 @@ import re
 from time import time
 from typing import Dict, Optional, Set
 from flask import request, jsonify
+from block import transaction_hash
 import logging
 
 logging.basicConfig(level=logging.INFO)
@@ -308,17 +309,8 @@ class DoubleSpendingProtection:
         self.transaction_nonces: Dict[str, int] = {}
     
     def generate_tx_id(self, transaction: Dict) -> str:
-        """Genera ID único para transacción"""
-        tx_string = json.dumps({
-            'sender': transaction['sender'],
-            'recipient': transaction['recipient'],
-            'amount': transaction['amount'],
-            'token': transaction['token'],
-            'timestamp': transaction['timestamp'],
-            'nonce': transaction.get('nonce', 0)
-        }, sort_keys=True)
-        
-        return hashlib.sha256(tx_string.encode()).hexdigest()
+        """ID único de la transacción: su hash canónico (el mismo que usa la cadena)"""
+        return transaction_hash(transaction)
     
     def is_spent(self, tx_id: str) -> bool:
         """Verifica si una transacción ya fue gastada"""
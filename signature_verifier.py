@@ -0,0 +1,142 @@
+"""
+ORILUXCHAIN - Batch Signature Verifier
+Verificación de firmas en lote repartida en un pool de procesos
+"""
+
+import logging
+import math
+import os
+import threading
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import List, Optional, Tuple
+from miner import _get_context
+from wallet import SignatureCache, Wallet, signature_cache
+
+logger = logging.getLogger(__name__)
+
+# Configuración del verificador
+VERIFY_WORKERS = int(os.getenv('VERIFY_WORKERS', str(os.cpu_count() or 1)))
+PARALLEL_MIN_BATCH = 32  # Por debajo, repartir cuesta más que verificar
+MIN_CHUNK_SIZE = 8
+CHUNKS_PER_WORKER = 4  # Trozos pequeños para poder cortar pronto al primer fallo
+
+SignatureItem = Tuple[str, str, str]  # (clave pública PEM, datos firmados, firma)
+
+
+def _verify_chunk(items: List[SignatureItem], stop_on_failure: bool) -> List[Optional[bool]]:
+    """
+    Verifica un trozo del lote dentro de un worker.
+
+    Returns:
+        Resultado por firma; None para las que no se llegaron a verificar
+    """
+    results: List[Optional[bool]] = [None] * len(items)
+    for position, (public_key, data, signature) in enumerate(items):
+        results[position] = Wallet.verify_signature(public_key, data, signature)
+        if stop_on_failure and not results[position]:
+            break
+    return results
+
+
+class BatchSignatureVerifier:
+    """
+    Verifica muchas firmas RSA a la vez.
+
+    Las firmas que ya están en la caché de wallet no se envían al pool. El
+    resto se reparte en trozos entre procesos. Si stop_on_failure está
+    activo, el primer fallo cancela los trozos que aún no han empezado, y
+    sus firmas quedan como None en el resultado.
+    """
+
+    def __init__(self, workers: Optional[int] = None):
+        """
+        Inicializa el verificador.
+
+        Args:
+            workers: Número de procesos (por defecto VERIFY_WORKERS)
+        """
+        self.workers = max(1, workers or VERIFY_WORKERS)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def verify(self, items: List[SignatureItem], stop_on_failure: bool = True) -> List[Optional[bool]]:
+        """
+        Verifica un lote de firmas.
+
+        Args:
+            items: Tuplas (clave pública PEM, datos firmados, firma)
+            stop_on_failure: Dejar de verificar tras la primera firma inválida
+
+        Returns:
+            Lista paralela a items con True, False o None (no verificada)
+        """
+        results: List[Optional[bool]] = [None] * len(items)
+        pending = []
+        for position, (public_key, data, signature) in enumerate(items):
+            try:
+                cached = signature_cache.contains(SignatureCache.make_key(public_key, data, signature))
+            except AttributeError:
+                cached = False
+            if cached:
+                results[position] = True
+            else:
+                pending.append(position)
+
+        if not pending:
+            return results
+
+        if self.workers == 1 or len(pending) < PARALLEL_MIN_BATCH:
+            verified = _verify_chunk([items[i] for i in pending], stop_on_failure)
+        else:
+            verified = self._verify_parallel([items[i] for i in pending], stop_on_failure)
+
+        for position, result in zip(pending, verified):
+            results[position] = result
+            if result:
+                # Los workers tienen su propia caché: registrar en la del proceso principal
+                signature_cache.add(SignatureCache.make_key(*items[position]))
+        return results
+
+    def shutdown(self) -> None:
+        """Detiene el pool de procesos si se llegó a crear."""
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=_get_context())
+            return self._executor
+
+    def _verify_parallel(self, items: List[SignatureItem], stop_on_failure: bool) -> List[Optional[bool]]:
+        """Reparte el lote en trozos entre los procesos del pool."""
+        chunk_size = max(MIN_CHUNK_SIZE, math.ceil(len(items) / (self.workers * CHUNKS_PER_WORKER)))
+        executor = self._get_executor()
+        futures = {
+            executor.submit(_verify_chunk, items[start:start + chunk_size], stop_on_failure): start
+            for start in range(0, len(items), chunk_size)
+        }
+
+        results: List[Optional[bool]] = [None] * len(items)
+        remaining = set(futures)
+        failed = False
+        while remaining and not failed:
+            done, remaining = wait(remaining, return_when=FIRST_COMPLETED)
+            for future in done:
+                start = futures[future]
+                chunk = future.result()
+                results[start:start + len(chunk)] = chunk
+                if stop_on_failure and any(result is False for result in chunk):
+                    failed = True
+
+        if failed:
+            for future in remaining:
+                future.cancel()
+            logger.info(f"Batch verification stopped at first invalid signature "
+                        f"({len(remaining)} chunk(s) skipped)")
+        return results
+
+
+batch_verifier = BatchSignatureVerifier()
@@ -3,13 +3,272 @@ ORILUXCHAIN - Smart Contract System
 Sistema de contratos inteligentes con lenguaje de scripting propio
 """
 
+import copy
+import functools
 import hashlib
 import json
+import os
 from time import time
-from typing import Dict, List, Any, Optional
+from typing import Callable, Dict, List, Any, Optional, Set, Tuple
 import re
 
 
+# Límites de ejecución
+MAX_ITERATIONS = 10000  # SECURITY FIX: previene loops infinitos
+INSTRUCTION_GAS = 10  # gas base por instrucción
+COMPILED_CACHE_SIZE = int(os.getenv('COMPILED_CACHE_SIZE', '1024'))  # programas compilados en caché
+VIEW_CACHE_SIZE = int(os.getenv('VIEW_CACHE_SIZE', '256'))  # resultados de vistas en caché por contrato
+
+# Opcodes del programa compilado
+(OP_NOP, OP_PUSH, OP_PUSH_VAR, OP_POP, OP_STORE, OP_LOAD, OP_ADD, OP_SUB, OP_MUL,
+ OP_DIV, OP_EQ, OP_GT, OP_LT, OP_RETURN, OP_REVERT, OP_INVALID) = range(16)
+
+_OPCODES = {
+    'POP': OP_POP, 'ADD': OP_ADD, 'SUB': OP_SUB, 'MUL': OP_MUL, 'DIV': OP_DIV,
+    'EQ': OP_EQ, 'GT': OP_GT, 'LT': OP_LT, 'RETURN': OP_RETURN, 'REVERT': OP_REVERT
+}
+
+
+class CompiledProgram:
+    """
+    Bytecode compilado: un opcode por instrucción y su operando ya decodificado
+    
+    Es inmutable, así que varios contratos con el mismo bytecode lo comparten.
+    """
+    
+    __slots__ = ('opcodes', 'operands')
+    
+    def __init__(self, opcodes: bytes, operands: Tuple[Any, ...]):
+        self.opcodes = opcodes
+        self.operands = operands
+    
+    def __len__(self) -> int:
+        return len(self.opcodes)
+
+
+def _decode_literal(value: str) -> Tuple[int, Any]:
+    """Operando de PUSH: número, variable de memoria ($nombre) o string"""
+    try:
+        if '.' in value:
+            return OP_PUSH, float(value)
+        return OP_PUSH, int(value)
+    except ValueError:
+        if value.startswith('$'):
+            return OP_PUSH_VAR, value[1:]
+        return OP_PUSH, value
+
+
+@functools.lru_cache(maxsize=COMPILED_CACHE_SIZE)
+def compile_bytecode(bytecode: str) -> CompiledProgram:
+    """
+    Compila el código de un contrato una sola vez
+    
+    Las líneas vacías y los comentarios desaparecen, cada instrucción pasa a
+    un opcode y los literales de PUSH se decodifican aquí en vez de en cada
+    ejecución. Las instrucciones desconocidas se conservan como NOP (siguen
+    gastando gas) y las mal formadas fallan al ejecutarse, no al compilar.
+    
+    Args:
+        bytecode: Código del contrato
+        
+    Returns:
+        Programa compilado
+    """
+    opcodes = []
+    operands = []
+    for line in bytecode.strip().split('\n'):
+        parts = line.split()
+        if not parts or parts[0].startswith('#'):
+            continue
+        
+        op, args = parts[0], parts[1:]
+        if op in ('PUSH', 'STORE', 'LOAD') and not args:
+            opcode, operand = OP_INVALID, f"{op} requires an operand"
+        elif op == 'PUSH':
+            opcode, operand = _decode_literal(args[0])
+        elif op == 'STORE':
+            opcode, operand = OP_STORE, args[0]
+        elif op == 'LOAD':
+            opcode, operand = OP_LOAD, args[0]
+        else:
+            opcode, operand = _OPCODES.get(op, OP_NOP), None
+        opcodes.append(opcode)
+        operands.append(operand)
+    
+    return CompiledProgram(bytes(opcodes), tuple(operands))
+
+
+# Manejadores de la tabla de despacho: (stack, storage, memory, operando)
+
+def _op_nop(stack, storage, memory, operand):
+    pass
+
+
+def _op_push(stack, storage, memory, operand):
+    stack.append(operand)
+
+
+def _op_push_var(stack, storage, memory, operand):
+    stack.append(memory.get(operand))
+
+
+def _op_pop(stack, storage, memory, operand):
+    if stack:
+        stack.pop()
+
+
+def _op_store(stack, storage, memory, operand):
+    storage[operand] = stack.pop() if stack else None
+
+
+def _op_load(stack, storage, memory, operand):
+    stack.append(storage.get(operand))
+
+
+def _op_add(stack, storage, memory, operand):
+    # SECURITY FIX: Validar stack underflow
+    if len(stack) < 2:
+        raise Exception("Stack underflow: ADD requires 2 values")
+    b = stack.pop()
+    stack.append(stack.pop() + b)
+
+
+def _op_sub(stack, storage, memory, operand):
+    if len(stack) < 2:
+        raise Exception("Stack underflow: SUB requires 2 values")
+    b = stack.pop()
+    stack.append(stack.pop() - b)
+
+
+def _op_mul(stack, storage, memory, operand):
+    if len(stack) < 2:
+        raise Exception("Stack underflow: MUL requires 2 values")
+    b = stack.pop()
+    stack.append(stack.pop() * b)
+
+
+def _op_div(stack, storage, memory, operand):
+    if len(stack) < 2:
+        raise Exception("Stack underflow: DIV requires 2 values")
+    b = stack.pop()
+    a = stack.pop()
+    # SECURITY FIX: Lanzar error en división por cero
+    if b == 0:
+        raise Exception("Division by zero")
+    stack.append(a / b)
+
+
+def _op_eq(stack, storage, memory, operand):
+    b = stack.pop()
+    stack.append(1 if stack.pop() == b else 0)
+
+
+def _op_gt(stack, storage, memory, operand):
+    b = stack.pop()
+    stack.append(1 if stack.pop() > b else 0)
+
+
+def _op_lt(stack, storage, memory, operand):
+    b = stack.pop()
+    stack.append(1 if stack.pop() < b else 0)
+
+
+def _op_revert(stack, storage, memory, operand):
+    raise Exception("Contract reverted")
+
+
+def _op_invalid(stack, storage, memory, operand):
+    raise Exception(operand)
+
+
+_DISPATCH = [None] * (OP_INVALID + 1)
+for _opcode, _handler in ((OP_NOP, _op_nop), (OP_PUSH, _op_push), (OP_PUSH_VAR, _op_push_var),
+                          (OP_POP, _op_pop), (OP_STORE, _op_store), (OP_LOAD, _op_load),
+                          (OP_ADD, _op_add), (OP_SUB, _op_sub), (OP_MUL, _op_mul),
+                          (OP_DIV, _op_div), (OP_EQ, _op_eq), (OP_GT, _op_gt), (OP_LT, _op_lt),
+                          (OP_REVERT, _op_revert), (OP_INVALID, _op_invalid)):
+    _DISPATCH[_opcode] = _handler
+
+
+class ContractStorage:
+    """
+    Storage de un contrato con diario de escrituras por llamada
+    
+    Cada marco (begin) guarda sus escrituras aparte del storage confirmado:
+    commit las pasa al marco padre (o al storage si es el exterior) y revert
+    las descarta sin tocar nada, en O(1) sea cual sea el tamaño del storage.
+    Los marcos se anidan. Los slots que llegan al storage confirmado quedan
+    en dirty hasta que alguien los recoge con take_dirty.
+    """
+    
+    def __init__(self, base: Dict[str, Any], dirty: Optional[Set[str]] = None,
+                 on_write: Optional[Callable[[], None]] = None):
+        """
+        Args:
+            base: Storage confirmado del contrato (se modifica en sitio)
+            dirty: Conjunto donde anotar los slots confirmados
+            on_write: Se llama cada vez que cambia el storage confirmado
+        """
+        self.base = base
+        self.dirty = dirty if dirty is not None else set()
+        self.on_write = on_write
+        self._frames: List[Dict[str, Any]] = []
+    
+    @property
+    def depth(self) -> int:
+        """Marcos abiertos"""
+        return len(self._frames)
+    
+    def begin(self) -> None:
+        """Abre un marco para las escrituras de una llamada"""
+        self._frames.append({})
+    
+    def commit(self) -> None:
+        """Cierra el marco actual conservando sus escrituras"""
+        frame = self._frames.pop()
+        if self._frames:
+            self._frames[-1].update(frame)
+        elif frame:
+            self.base.update(frame)
+            self.dirty.update(frame)
+            if self.on_write is not None:
+                self.on_write()
+    
+    def revert(self) -> None:
+        """Cierra el marco actual descartando sus escrituras"""
+        self._frames.pop()
+    
+    def take_dirty(self) -> Set[str]:
+        """Slots confirmados desde la última llamada (y los olvida)"""
+        dirty = set(self.dirty)
+        self.dirty.clear()
+        return dirty
+    
+    def get(self, key: str, default: Any = None) -> Any:
+        for frame in reversed(self._frames):
+            if key in frame:
+                return frame[key]
+        return self.base.get(key, default)
+    
+    def __getitem__(self, key: str) -> Any:
+        for frame in reversed(self._frames):
+            if key in frame:
+                return frame[key]
+        return self.base[key]
+    
+    def __setitem__(self, key: str, value: Any) -> None:
+        if self._frames:
+            self._frames[-1][key] = value
+        else:
+            self.base[key] = value
+            self.dirty.add(key)
+            if self.on_write is not None:
+                self.on_write()
+    
+    def __contains__(self, key: str) -> bool:
+        return any(key in frame for frame in self._frames) or key in self.base
+
+
 class SmartContractVM:
     """
     Virtual Machine para ejecutar smart contracts
@@ -32,6 +291,19 @@ class SmartContractVM:
             bytecode: Código a ejecutar
             context: Contexto de ejecución (sender, value, etc.)
             
+        Returns:
+            Resultado de la ejecución
+        """
+        return self.run(compile_bytecode(bytecode), context)
+    
+    def run(self, program: CompiledProgram, context: Dict) -> Dict:
+        """
+        Ejecuta un programa ya compilado
+        
+        Args:
+            program: Resultado de compile_bytecode
+            context: Contexto de ejecución (sender, value, etc.)
+            
         Returns:
             Resultado de la ejecución
         """
@@ -45,9 +317,7 @@ class SmartContractVM:
         }
         
         try:
-            # Parsear y ejecutar instrucciones
-            instructions = self._parse_bytecode(bytecode)
-            return_value = self._execute_instructions(instructions, context)
+            return_value = self._run_program(program, context)
             
             result['success'] = True
             result['return_value'] = return_value
@@ -59,125 +329,43 @@ class SmartContractVM:
             
         return result
     
-    def _parse_bytecode(self, bytecode: str) -> List[Dict]:
-        """Parsea el bytecode en instrucciones"""
-        instructions = []
-        lines = bytecode.strip().split('\n')
-        
-        for line in lines:
-            line = line.strip()
-            if not line or line.startswith('#'):
-                continue
-                
-            parts = line.split()
-            if len(parts) > 0:
-                instructions.append({
-                    'op': parts[0],
-                    'args': parts[1:] if len(parts) > 1 else []
-                })
-        
-        return instructions
-    
-    def _execute_instructions(self, instructions: List[Dict], context: Dict) -> Any:
-        """Ejecuta las instrucciones del contrato"""
-        self.memory['sender'] = context.get('sender')
-        self.memory['value'] = context.get('value', 0)
-        self.memory['contract_address'] = context.get('contract_address')
-        
-        # SECURITY FIX: Límite de iteraciones para prevenir loops infinitos
-        MAX_ITERATIONS = 10000
-        iteration_count = 0
-        
-        for instruction in instructions:
-            # Verificar límite de iteraciones
-            iteration_count += 1
-            if iteration_count > MAX_ITERATIONS:
+    def _run_program(self, program: CompiledProgram, context: Dict) -> Any:
+        """Bucle de despacho: un manejador por opcode, sin parsear nada"""
+        memory = self.memory
+        memory['sender'] = context.get('sender')
+        memory['value'] = context.get('value', 0)
+        memory['contract_address'] = context.get('contract_address')
+        
+        stack = self.stack
+        storage = self.storage
+        opcodes = program.opcodes
+        operands = program.operands
+        dispatch = _DISPATCH
+        
+        # El gas y las iteraciones se conocen de antemano: no hay saltos
+        gas_steps = self.gas_limit // INSTRUCTION_GAS
+        limit = min(len(opcodes), MAX_ITERATIONS, gas_steps)
+        pc = 0
+        try:
+            while pc < limit:
+                opcode = opcodes[pc]
+                pc += 1
+                if opcode == OP_RETURN:
+                    return stack.pop() if stack else None
+                dispatch[opcode](stack, storage, memory, operands[pc - 1])
+        finally:
+            self.gas_used = pc * INSTRUCTION_GAS
+        
+        if len(opcodes) > limit:
+            if MAX_ITERATIONS <= gas_steps:
                 raise Exception(
                     f"Execution limit exceeded: {MAX_ITERATIONS} iterations. "
                     "Possible infinite loop detected."
                 )
-            self._consume_gas(10)  # Gas base por instrucción
-            
-            op = instruction['op']
-            args = instruction['args']
-            
-            if op == 'PUSH':
-                self.stack.append(self._parse_value(args[0]))
-            elif op == 'POP':
-                if self.stack:
-                    self.stack.pop()
-            elif op == 'STORE':
-                key = args[0]
-                value = self.stack.pop() if self.stack else None
-                self.storage[key] = value
-            elif op == 'LOAD':
-                key = args[0]
-                self.stack.append(self.storage.get(key))
-            elif op == 'ADD':
-                # SECURITY FIX: Validar stack underflow
-                if len(self.stack) < 2:
-                    raise Exception("Stack underflow: ADD requires 2 values")
-                b = self.stack.pop()
-                a = self.stack.pop()
-                self.stack.append(a + b)
-            elif op == 'SUB':
-                if len(self.stack) < 2:
-                    raise Exception("Stack underflow: SUB requires 2 values")
-                b = self.stack.pop()
-                a = self.stack.pop()
-                self.stack.append(a - b)
-            elif op == 'MUL':
-                if len(self.stack) < 2:
-                    raise Exception("Stack underflow: MUL requires 2 values")
-                b = self.stack.pop()
-                a = self.stack.pop()
-                self.stack.append(a * b)
-            elif op == 'DIV':
-                if len(self.stack) < 2:
-                    raise Exception("Stack underflow: DIV requires 2 values")
-                b = self.stack.pop()
-                a = self.stack.pop()
-                # SECURITY FIX: Lanzar error en división por cero
-                if b == 0:
-                    raise Exception("Division by zero")
-                self.stack.append(a / b)
-            elif op == 'EQ':
-                b = self.stack.pop()
-                a = self.stack.pop()
-                self.stack.append(1 if a == b else 0)
-            elif op == 'GT':
-                b = self.stack.pop()
-                a = self.stack.pop()
-                self.stack.append(1 if a > b else 0)
-            elif op == 'LT':
-                b = self.stack.pop()
-                a = self.stack.pop()
-                self.stack.append(1 if a < b else 0)
-            elif op == 'RETURN':
-                return self.stack.pop() if self.stack else None
-            elif op == 'REVERT':
-                raise Exception("Contract reverted")
-            
-        return self.stack[-1] if self.stack else None
-    
-    def _parse_value(self, value: str) -> Any:
-        """Parsea un valor del bytecode"""
-        # Intentar parsear como número
-        try:
-            if '.' in value:
-                return float(value)
-            return int(value)
-        except:
-            # Es una variable o string
-            if value.startswith('$'):
-                return self.memory.get(value[1:])
-            return value
-    
-    def _consume_gas(self, amount: int):
-        """Consume gas de la ejecución"""
-        self.gas_used += amount
-        if self.gas_used > self.gas_limit:
+            self.gas_used = (gas_steps + 1) * INSTRUCTION_GAS
             raise Exception("Out of gas")
+        
+        return stack[-1] if stack else None
 
 
 class SmartContract:
@@ -188,20 +376,31 @@ class SmartContract:
         self.owner = owner
         self.bytecode = bytecode
         self.abi = abi
+        self.program = compile_bytecode(bytecode)  # compilado una vez al desplegar
         self.storage = {}
+        self.dirty_slots: Set[str] = set()  # slots escritos desde el último take_dirty_slots
+        self.storage_version = 0  # sube con cada escritura confirmada en el storage
+        self.metadata_dirty = True  # metadatos cambiados desde el último take_dirty_storage
+        self._view_cache: Dict[Tuple, Dict] = {}
         self.balance = {'ORX': 0, 'VRX': 0}
         self.created_at = time()
         self.last_executed = None
         self.execution_count = 0
         
-    def execute(self, function_name: str, params: Dict, context: Dict) -> Dict:
+    def execute(self, function_name: str, params: Dict, context: Dict,
+                storage: Optional[ContractStorage] = None) -> Dict:
         """
         Ejecuta una función del contrato
         
+        Las escrituras van a un marco propio del diario de storage: si la
+        ejecución falla o revierte se descartan y el storage queda intacto.
+        
         Args:
             function_name: Nombre de la función a ejecutar
             params: Parámetros de la función
             context: Contexto de ejecución
+            storage: Diario de una llamada exterior; la llamada abre un marco
+                anidado en él y el llamador decide si se confirma
             
         Returns:
             Resultado de la ejecución
@@ -210,24 +409,91 @@ class SmartContract:
         if function_name not in self.abi.get('functions', {}):
             return {'success': False, 'error': 'Function not found'}
         
-        # Crear VM y ejecutar
+        # Crear VM y ejecutar sobre un marco nuevo del diario
+        if storage is None:
+            storage = self.journal()
+        storage.begin()
         vm = SmartContractVM()
-        vm.storage = self.storage
+        vm.storage = storage
         
         # Añadir parámetros al contexto
         context['params'] = params
         context['contract_address'] = self.address
         
-        result = vm.execute(self.bytecode, context)
+        result = vm.run(self.program, context)
         
-        # Actualizar storage si la ejecución fue exitosa
+        # Confirmar el storage solo si la ejecución fue exitosa
         if result['success']:
-            self.storage = vm.storage
-            self.last_executed = time()
+            storage.commit()
+            self.last_executed = context.get('timestamp', time())
             self.execution_count += 1
+            self.metadata_dirty = True
+        else:
+            storage.revert()
         
         return result
     
+    def call_view(self, function_name: str, params: Dict, context: Dict) -> Dict:
+        """
+        Ejecuta una función en modo solo lectura
+        
+        Las escrituras se descartan siempre y no cuentan como ejecución. El
+        resultado se guarda en caché por (función, parámetros, sender,
+        versión del storage): mientras el storage no cambie, repetir la
+        consulta no vuelve a pasar por la VM.
+        
+        Args:
+            function_name: Nombre de la función a consultar
+            params: Parámetros de la función
+            context: Contexto de ejecución (sender)
+            
+        Returns:
+            Resultado de la ejecución
+        """
+        if function_name not in self.abi.get('functions', {}):
+            return {'success': False, 'error': 'Function not found'}
+        
+        try:
+            key = (function_name, json.dumps(params, sort_keys=True), context.get('sender'),
+                   self.storage_version)
+        except (TypeError, ValueError):
+            key = None  # parámetros no serializables: se ejecuta sin caché
+        
+        result = self._view_cache.get(key) if key is not None else None
+        if result is None:
+            storage = self.journal()
+            storage.begin()
+            vm = SmartContractVM()
+            vm.storage = storage
+            try:
+                result = vm.run(self.program, {
+                    'sender': context.get('sender'),
+                    'value': 0,
+                    'params': params,
+                    'contract_address': self.address
+                })
+            finally:
+                storage.revert()
+            
+            if key is not None:
+                if len(self._view_cache) >= VIEW_CACHE_SIZE:
+                    del self._view_cache[next(iter(self._view_cache))]
+                self._view_cache[key] = result
+        
+        return dict(result, logs=list(result['logs']))
+    
+    def journal(self) -> ContractStorage:
+        """Diario sobre el storage confirmado del contrato"""
+        return ContractStorage(self.storage, self.dirty_slots, self._storage_written)
+    
+    def _storage_written(self) -> None:
+        """Invalida las vistas en caché: cambió el storage confirmado"""
+        self.storage_version += 1
+    
+    def take_dirty_slots(self) -> Set[str]:
+        """Slots de storage confirmados desde la última llamada (y los olvida)"""
+        return self.journal().take_dirty()
+    
     def to_dict(self) -> Dict:
         """Convierte el contrato a diccionario"""
         return {
@@ -240,6 +506,39 @@ class SmartContract:
             'last_executed': self.last_executed,
             'execution_count': self.execution_count
         }
+    
+    def metadata_state(self) -> Dict:
+        """Estado del contrato sin el storage (entrada contracts/<dirección> del árbol de estado)"""
+        state = copy.deepcopy({name: value for name, value in self.to_dict().items() if name != 'storage'})
+        state['bytecode'] = self.bytecode
+        return state
+    
+    def restore_metadata(self, state: Dict) -> None:
+        """Restaura los campos de metadata_state conservando el storage"""
+        self.owner = state['owner']
+        self.abi = copy.deepcopy(state['abi'])
+        self.balance = dict(state['balance'])
+        self.created_at = state['created_at']
+        self.last_executed = state['last_executed']
+        self.execution_count = state['execution_count']
+    
+    def to_state(self) -> Dict:
+        """Estado completo del contrato (incluido el bytecode) para los snapshots"""
+        state = copy.deepcopy(self.to_dict())
+        state['bytecode'] = self.bytecode
+        return state
+    
+    @classmethod
+    def from_state(cls, state: Dict) -> 'SmartContract':
+        """Reconstruye un contrato desde to_state"""
+        contract = cls(state['address'], state['owner'], state['bytecode'], copy.deepcopy(state['abi']))
+        contract.storage = copy.deepcopy(state['storage'])
+        contract.balance = dict(state['balance'])
+        contract.created_at = state['created_at']
+        contract.last_executed = state['last_executed']
+        contract.execution_count = state['execution_count']
+        contract.metadata_dirty = False  # coincide con el estado del que viene
+        return contract
 
 
 class ContractTemplates:
@@ -483,6 +782,18 @@ RETURN 1
         return {'bytecode': bytecode, 'abi': abi}
 
 
+def contract_address(owner: str, nonce: int) -> str:
+    """
+    Dirección de un contrato desplegado por una transacción
+    
+    Depende solo del remitente y del nonce de la transacción, así todos
+    los nodos que aplican el bloque crean el contrato en la misma dirección
+    y el remitente la conoce antes de que se mine.
+    """
+    data = f"{owner}:{nonce}"
+    return '0x' + hashlib.sha256(data.encode()).hexdigest()[:40]
+
+
 class ContractManager:
     """Gestor de smart contracts"""
     
@@ -491,7 +802,8 @@ class ContractManager:
         self.contract_counter = 0
         
     def deploy_contract(self, owner: str, bytecode: str, abi: Dict, 
-                       constructor_params: Dict = None) -> SmartContract:
+                       constructor_params: Dict = None, address: Optional[str] = None,
+                       timestamp: Optional[float] = None) -> SmartContract:
         """
         Despliega un nuevo contrato
         
@@ -500,12 +812,14 @@ class ContractManager:
             bytecode: Código del contrato
             abi: Interface del contrato
             constructor_params: Parámetros del constructor
+            address: Dirección del contrato (en la cadena, contract_address(owner, nonce))
+            timestamp: Momento del despliegue (en la cadena, el timestamp del bloque)
             
         Returns:
             Contrato desplegado
         """
         # Generar dirección del contrato
-        contract_address = self._generate_contract_address(owner)
+        contract_address = address or self._generate_contract_address(owner)
         
         # Crear contrato
         contract = SmartContract(
@@ -514,10 +828,14 @@ class ContractManager:
             bytecode=bytecode,
             abi=abi
         )
+        if timestamp is not None:
+            contract.created_at = timestamp
         
         # Ejecutar constructor si hay parámetros
         if constructor_params:
             context = {'sender': owner, 'value': 0}
+            if timestamp is not None:
+                context['timestamp'] = timestamp
             contract.execute('constructor', constructor_params, context)
         
         # Guardar contrato
@@ -527,8 +845,9 @@ class ContractManager:
         return contract
     
     def deploy_from_template(self, owner: str, template_name: str, 
-                            params: Dict) -> SmartContract:
-        """Despliega un contrato desde un template"""
+                            params: Dict, address: Optional[str] = None,
+                            timestamp: Optional[float] = None) -> SmartContract:
+        """Despliega un contrato desde un template (address y timestamp como en deploy_contract)"""
         templates = {
             'erc20': ContractTemplates.erc20_token,
             'multisig': ContractTemplates.multisig_wallet,
@@ -546,11 +865,14 @@ class ContractManager:
         return self.deploy_contract(
             owner=owner,
             bytecode=template_data['bytecode'],
-            abi=template_data['abi']
+            abi=template_data['abi'],
+            address=address,
+            timestamp=timestamp
         )
     
     def call_contract(self, contract_address: str, function_name: str,
-                     params: Dict, sender: str, value: int = 0) -> Dict:
+                     params: Dict, sender: str, value: int = 0,
+                     timestamp: Optional[float] = None) -> Dict:
         """
         Llama a una función de un contrato
         
@@ -560,6 +882,7 @@ class ContractManager:
             params: Parámetros de la función
             sender: Dirección del llamador
             value: Valor enviado (para funciones payable)
+            timestamp: Momento de la llamada (en la cadena, el timestamp del bloque)
             
         Returns:
             Resultado de la ejecución
@@ -571,15 +894,51 @@ class ContractManager:
         context = {
             'sender': sender,
             'value': value,
-            'timestamp': time()
+            'timestamp': time() if timestamp is None else timestamp
         }
         
         return contract.execute(function_name, params, context)
     
+    def view_contract(self, contract_address: str, function_name: str,
+                      params: Dict, sender: Optional[str] = None) -> Dict:
+        """
+        Consulta una función de un contrato sin modificar su estado
+        
+        Args:
+            contract_address: Dirección del contrato
+            function_name: Nombre de la función
+            params: Parámetros de la función
+            sender: Dirección del llamador (opcional)
+            
+        Returns:
+            Resultado de la ejecución (posiblemente desde la caché)
+        """
+        if contract_address not in self.contracts:
+            return {'success': False, 'error': 'Contract not found'}
+        
+        return self.contracts[contract_address].call_view(function_name, params, {'sender': sender})
+    
     def get_contract(self, contract_address: str) -> Optional[SmartContract]:
         """Obtiene un contrato por su dirección"""
         return self.contracts.get(contract_address)
     
+    def take_dirty_storage(self) -> Set[str]:
+        """
+        Entradas de los contratos modificadas desde la última llamada
+        
+        Returns:
+            Claves 'storage/<contrato>/<slot>' de los slots confirmados y
+            'contracts/<contrato>' de los contratos nuevos o ejecutados, en el
+            formato del árbol de estado (y las olvida)
+        """
+        keys = set()
+        for address, contract in self.contracts.items():
+            keys.update(f"storage/{address}/{slot}" for slot in contract.take_dirty_slots())
+            if contract.metadata_dirty:
+                contract.metadata_dirty = False
+                keys.add(f"contracts/{address}")
+        return keys
+    
     def get_all_contracts(self) -> List[Dict]:
         """Obtiene todos los contratos"""
         return [contract.to_dict() for contract in self.contracts.values()]
@@ -590,6 +949,20 @@ class ContractManager:
         hash_obj = hashlib.sha256(data.encode())
         return '0x' + hash_obj.hexdigest()[:40]
     
+    def export_state(self) -> Dict[str, Dict]:
+        """Contratos desplegados para los snapshots (copia independiente)"""
+        return {
+            'contracts': {address: contract.to_state() for address, contract in self.contracts.items()},
+            'contract_registry': {'contract_counter': self.contract_counter}
+        }
+    
+    def import_state(self, state: Dict[str, Dict]) -> None:
+        """Restaura en sitio el estado creado por export_state"""
+        self.contracts.clear()
+        for address, contract_state in state['contracts'].items():
+            self.contracts[address] = SmartContract.from_state(contract_state)
+        self.contract_counter = state['contract_registry']['contract_counter']
+    
     def to_dict(self) -> Dict:
         """Convierte el manager a diccionario"""
         return {
@@ -0,0 +1,209 @@
+"""
+ORILUXCHAIN - State Snapshots
+Instantáneas periódicas del estado de cuentas (balances, allowances,
+staking, nonces y contratos) ligadas a una altura y un hash de bloque
+"""
+
+import json
+import logging
+import os
+import re
+from time import time
+from typing import Any, Callable, Dict, Iterator, List, Optional
+from state_trie import StateTrie, state_entries
+
+logger = logging.getLogger(__name__)
+
+# Configuración de los snapshots
+SNAPSHOT_INTERVAL = int(os.getenv('SNAPSHOT_INTERVAL', '1000'))  # bloques entre snapshots (0 = desactivado)
+SNAPSHOTS_KEPT = int(os.getenv('SNAPSHOTS_KEPT', '3'))
+SNAPSHOT_VERSION = 2
+SNAPSHOT_PATTERN = 'state-{:010d}.json'
+
+_SNAPSHOT_RE = re.compile(r'^state-(\d{10})\.json$')
+
+
+class SnapshotError(Exception):
+    """Snapshot ilegible o que no corresponde a su raíz de estado"""
+    pass
+
+
+class StateSnapshot:
+    """Estado de cuentas tras aplicar el bloque height (con hash block_hash)."""
+
+    def __init__(self, height: int, block_hash: str, state: Dict[str, Dict[str, Any]],
+                 root: Optional[str] = None, created_at: Optional[float] = None):
+        self.height = height
+        self.block_hash = block_hash
+        self.state = state
+        self.created_at = created_at if created_at is not None else time()
+        self._entries: Optional[Dict[str, Any]] = None
+        self._trie: Optional[StateTrie] = None
+        self.state_root = root if root is not None else self.trie().root
+
+    def entries(self) -> Dict[str, Any]:
+        """Entradas del árbol de estado (calculadas una vez)."""
+        if self._entries is None:
+            self._entries = state_entries(self.state)
+        return self._entries
+
+    def trie(self) -> StateTrie:
+        """Árbol de estado del snapshot (construido una vez)."""
+        if self._trie is None:
+            self._trie = StateTrie(self.entries())
+        return self._trie
+
+    def verify(self) -> bool:
+        """True si el estado coincide con su raíz (reconstruye el árbol)."""
+        self._entries = None
+        self._trie = None
+        return self.trie().root == self.state_root
+
+    def to_dict(self) -> Dict:
+        return {
+            'version': SNAPSHOT_VERSION,
+            'height': self.height,
+            'block_hash': self.block_hash,
+            'state_root': self.state_root,
+            'created_at': self.created_at,
+            'state': self.state
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'StateSnapshot':
+        """
+        Crea el snapshot desde su diccionario.
+
+        Raises:
+            SnapshotError: Si la versión no es compatible o faltan campos
+        """
+        if data.get('version') != SNAPSHOT_VERSION:
+            raise SnapshotError(f"Unsupported snapshot version: {data.get('version')}")
+        try:
+            return cls(data['height'], data['block_hash'], data['state'],
+                       data['state_root'], data['created_at'])
+        except KeyError as e:
+            raise SnapshotError(f"Snapshot is missing field {e}")
+
+
+class SnapshotStore:
+    """
+    Directorio de snapshots, uno por archivo con nombre según su altura.
+
+    Cada archivo se escribe en un temporal, se sincroniza con fsync y se
+    renombra, así un corte a mitad de escritura nunca deja un snapshot
+    parcial con nombre válido. Solo se conservan los `keep` más recientes.
+    """
+
+    def __init__(self, directory: str, keep: int = SNAPSHOTS_KEPT):
+        """
+        Abre (o crea) el directorio de snapshots.
+
+        Args:
+            directory: Directorio de los archivos
+            keep: Número de snapshots a conservar
+        """
+        self.directory = directory
+        self.keep = max(1, keep)
+        os.makedirs(directory, exist_ok=True)
+
+    def heights(self) -> List[int]:
+        """Alturas con snapshot, de menor a mayor."""
+        heights = []
+        for name in os.listdir(self.directory):
+            match = _SNAPSHOT_RE.match(name)
+            if match:
+                heights.append(int(match.group(1)))
+        return sorted(heights)
+
+    def save(self, snapshot: StateSnapshot) -> str:
+        """
+        Escribe un snapshot y elimina los más antiguos.
+
+        Returns:
+            Ruta del archivo escrito
+        """
+        path = self._path(snapshot.height)
+        temp_path = path + '.tmp'
+        with open(temp_path, 'w') as f:
+            json.dump(snapshot.to_dict(), f, separators=(',', ':'))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+
+        for height in self.heights()[:-self.keep]:
+            self._remove(height)
+        logger.info(f"State snapshot saved at height {snapshot.height} (root {snapshot.state_root[:16]}...)")
+        return path
+
+    def load(self, height: int) -> StateSnapshot:
+        """
+        Lee el snapshot de una altura.
+
+        Raises:
+            SnapshotError: Si el archivo no existe o está corrupto
+        """
+        try:
+            with open(self._path(height)) as f:
+                return StateSnapshot.from_dict(json.load(f))
+        except (OSError, ValueError) as e:
+            raise SnapshotError(f"Cannot read snapshot at height {height}: {e}")
+
+    def iter_latest(self, max_height: Optional[int] = None) -> Iterator[StateSnapshot]:
+        """Snapshots legibles de más reciente a más antiguo, hasta max_height incluida."""
+        for height in reversed(self.heights()):
+            if max_height is not None and height > max_height:
+                continue
+            try:
+                yield self.load(height)
+            except SnapshotError as e:
+                logger.warning(str(e))
+
+    def find_valid(self, hash_at: Callable[[int], str], length: int,
+                   max_height: Optional[int] = None,
+                   recorded_root: Optional[Callable[[int], Optional[str]]] = None
+                   ) -> Optional[StateSnapshot]:
+        """
+        Snapshot más reciente que pertenece a la cadena y cuadra con su raíz.
+
+        Si se indica recorded_root, la raíz del snapshot debe ser además la
+        que registró su propio bloque (la raíz del estado posterior a él).
+
+        Args:
+            hash_at: Altura -> hash del bloque en la cadena actual
+            length: Longitud de la cadena actual
+            max_height: Altura máxima admitida
+            recorded_root: Altura -> state_root registrado en ese bloque
+
+        Returns:
+            El snapshot, o None si ninguno sirve
+        """
+        limit = length - 1 if max_height is None else min(max_height, length - 1)
+        for snapshot in self.iter_latest(limit):
+            if hash_at(snapshot.height) != snapshot.block_hash:
+                logger.warning(f"Snapshot at height {snapshot.height} is not on the current chain")
+            elif not snapshot.verify():
+                logger.warning(f"Snapshot at height {snapshot.height} does not match its state root")
+            elif recorded_root is not None and recorded_root(snapshot.height) not in (None, snapshot.state_root):
+                logger.warning(
+                    f"Snapshot at height {snapshot.height} differs from the state root "
+                    f"recorded in its block"
+                )
+            else:
+                return snapshot
+        return None
+
+    def discard_above(self, height: int) -> None:
+        """Elimina los snapshots de bloques por encima de height (tras una reorganización)."""
+        for snapshot_height in self.heights():
+            if snapshot_height > height:
+                self._remove(snapshot_height)
+
+    def _path(self, height: int) -> str:
+        return os.path.join(self.directory, SNAPSHOT_PATTERN.format(height))
+
+    def _remove(self, height: int) -> None:
+        try:
+            os.remove(self._path(height))
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,291 @@
+"""
+ORILUXCHAIN - State Trie
+Árbol de Merkle disperso (trie binario comprimido sobre sha256 de la clave)
+con raíz de estado incremental y pruebas de inclusión O(log n)
+"""
+
+import hashlib
+import json
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+
+# Prefijos de dominio (hoja / rama)
+LEAF_PREFIX = b'\x00'
+BRANCH_PREFIX = b'\x01'
+KEY_BITS = 256
+EMPTY_ROOT = hashlib.sha256(b'').hexdigest()
+
+
+def trie_key(key: str) -> int:
+    """Posición de una clave en el árbol: sha256 como entero de 256 bits."""
+    return int.from_bytes(hashlib.sha256(key.encode()).digest(), 'big')
+
+
+def canonical_value(value: Any) -> Any:
+    """
+    Forma canónica de un valor para hashearlo.
+
+    Los números que Python considera iguales (1, 1.0, True) se hashean
+    igual, así comparar valores con == basta para saber si su hoja cambia.
+    """
+    kind = type(value)
+    if kind is bool:
+        return int(value)
+    if kind is float and value.is_integer():
+        return int(value)
+    if kind is dict:
+        return {str(k): canonical_value(v) for k, v in value.items()}
+    if kind in (list, tuple):
+        return [canonical_value(v) for v in value]
+    return value
+
+
+def value_hash(value: Any) -> bytes:
+    """sha256 del JSON canónico de un valor."""
+    data = json.dumps(canonical_value(value), sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(data.encode()).digest()
+
+
+def _bit(key: int, depth: int) -> int:
+    return (key >> (KEY_BITS - 1 - depth)) & 1
+
+
+def _first_difference(a: int, b: int) -> int:
+    return KEY_BITS - (a ^ b).bit_length()
+
+
+class _Leaf:
+    __slots__ = ('key', 'value_hash', 'hash')
+
+    def __init__(self, key: int, value_digest: bytes):
+        self.key = key
+        self.value_hash = value_digest
+        self.hash = hashlib.sha256(LEAF_PREFIX + key.to_bytes(32, 'big') + value_digest).digest()
+
+
+class _Branch:
+    __slots__ = ('depth', 'key', 'children', 'hash')
+
+    def __init__(self, depth: int, key: int, children: List):
+        self.depth = depth  # primer bit en que difieren los hijos
+        self.key = key  # cualquier clave del subárbol (comparten los bits [0, depth))
+        self.children = children
+        self.hash: Optional[bytes] = None
+
+
+_Node = Union[_Leaf, _Branch]
+
+
+def _branch_hash(depth: int, left: bytes, right: bytes) -> bytes:
+    return hashlib.sha256(BRANCH_PREFIX + bytes([depth]) + left + right).digest()
+
+
+class StateTrie:
+    """
+    Compromiso autenticado sobre un conjunto clave -> valor.
+
+    Es un árbol de Merkle disperso de 256 niveles (la posición de cada
+    clave es su sha256) en el que las ramas sin bifurcación se omiten: un
+    subárbol con una sola hoja se representa por la hoja, y cada rama
+    guarda el bit en que se separan sus hijos. Así la profundidad es
+    O(log n) y la raíz no depende del orden de inserción.
+
+    Actualizar una clave solo invalida los hashes de su camino; la raíz se
+    recalcula de forma perezosa rehasheando únicamente esas ramas.
+    """
+
+    def __init__(self, entries: Optional[Dict[str, Any]] = None):
+        """
+        Inicializa el árbol.
+
+        Args:
+            entries: Contenido inicial clave -> valor
+        """
+        self._root: Optional[_Node] = None
+        self._size = 0
+        if entries:
+            self.update(entries)
+
+    def __len__(self) -> int:
+        return self._size
+
+    # ==================== ACTUALIZACIÓN ====================
+
+    def update(self, changed: Dict[str, Any], removed: Iterable[str] = ()) -> None:
+        """
+        Aplica un lote de cambios.
+
+        Args:
+            changed: Claves nuevas o modificadas -> valor
+            removed: Claves eliminadas
+        """
+        for key, value in changed.items():
+            self._root = self._insert(self._root, _Leaf(trie_key(key), value_hash(value)))
+        for key in removed:
+            self._root = self._delete(self._root, trie_key(key))
+
+    def _insert(self, node: Optional[_Node], leaf: _Leaf) -> _Node:
+        if node is None:
+            self._size += 1
+            return leaf
+        if type(node) is _Leaf:
+            if node.key == leaf.key:
+                return leaf
+            self._size += 1
+            return self._split(node, leaf, _first_difference(node.key, leaf.key))
+
+        difference = _first_difference(node.key, leaf.key)
+        if difference < node.depth:
+            self._size += 1
+            return self._split(node, leaf, difference)
+        side = _bit(leaf.key, node.depth)
+        node.children[side] = self._insert(node.children[side], leaf)
+        node.hash = None
+        return node
+
+    @staticmethod
+    def _split(node: _Node, leaf: _Leaf, depth: int) -> _Branch:
+        children = [node, leaf] if _bit(leaf.key, depth) else [leaf, node]
+        return _Branch(depth, leaf.key, children)
+
+    def _delete(self, node: Optional[_Node], key: int) -> Optional[_Node]:
+        if node is None:
+            return None
+        if type(node) is _Leaf:
+            if node.key != key:
+                return node
+            self._size -= 1
+            return None
+
+        if _first_difference(node.key, key) < node.depth:
+            return node
+        side = _bit(key, node.depth)
+        child = self._delete(node.children[side], key)
+        if child is None:
+            # La rama ya no bifurca: la sustituye el otro hijo
+            return node.children[1 - side]
+        node.children[side] = child
+        node.hash = None
+        return node
+
+    # ==================== RAÍZ Y PRUEBAS ====================
+
+    @property
+    def root(self) -> str:
+        """Raíz hexadecimal (EMPTY_ROOT si el árbol está vacío)."""
+        if self._root is None:
+            return EMPTY_ROOT
+        return self._hash(self._root).hex()
+
+    def _hash(self, node: _Node) -> bytes:
+        if node.hash is None:
+            left, right = node.children
+            node.hash = _branch_hash(node.depth, self._hash(left), self._hash(right))
+        return node.hash
+
+    def get_proof(self, key: str) -> Optional[List[Dict]]:
+        """
+        Prueba de inclusión de una clave.
+
+        Args:
+            key: Clave
+
+        Returns:
+            Lista de pasos {'depth', 'sibling'} desde la hoja hacia la raíz,
+            o None si la clave no está en el árbol
+        """
+        position = trie_key(key)
+        steps: List[Tuple[int, bytes]] = []
+        node = self._root
+        while node is not None and type(node) is _Branch:
+            if _first_difference(node.key, position) < node.depth:
+                return None
+            side = _bit(position, node.depth)
+            steps.append((node.depth, self._hash(node.children[1 - side])))
+            node = node.children[side]
+        if node is None or node.key != position:
+            return None
+        return [{'depth': depth, 'sibling': sibling.hex()} for depth, sibling in reversed(steps)]
+
+    @staticmethod
+    def verify_proof(key: str, value: Any, proof: List[Dict], root: str) -> bool:
+        """
+        Verifica que key -> value está en el árbol con esa raíz.
+
+        Args:
+            key: Clave
+            value: Valor esperado
+            proof: Pasos devueltos por get_proof
+            root: Raíz hexadecimal de confianza
+
+        Returns:
+            True si la prueba es válida
+        """
+        position = trie_key(key)
+        current = _Leaf(position, value_hash(value)).hash
+        previous_depth = KEY_BITS
+        try:
+            for step in proof:
+                depth = step['depth']
+                if not 0 <= depth < previous_depth:
+                    return False
+                sibling = bytes.fromhex(step['sibling'])
+                if _bit(position, depth):
+                    current = _branch_hash(depth, sibling, current)
+                else:
+                    current = _branch_hash(depth, current, sibling)
+                previous_depth = depth
+        except (KeyError, TypeError, ValueError):
+            return False
+        return current.hex() == root
+
+
+def state_entries(state: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Claves del árbol de estado a partir de las secciones de un estado.
+
+    Cada par (sección, clave) es una entrada 'sección/clave'. El storage de
+    cada contrato se separa en entradas 'storage/<contrato>/<slot>' para
+    poder probar un slot sin el contrato entero.
+    """
+    entries: Dict[str, Any] = {}
+    for section, values in state.items():
+        if section == 'contracts':
+            for address, contract in values.items():
+                for slot, slot_value in contract.get('storage', {}).items():
+                    entries[f"storage/{address}/{slot}"] = slot_value
+                entries[f"contracts/{address}"] = {
+                    name: field for name, field in contract.items() if name != 'storage'
+                }
+            continue
+        for key, value in values.items():
+            entries[f"{section}/{key}"] = value
+    return entries
+
+
+def state_from_entries(entries: Dict[str, Any], sections: Iterable[str] = ()) -> Dict[str, Dict[str, Any]]:
+    """
+    Secciones de un estado a partir de sus entradas (inversa de state_entries).
+
+    Args:
+        entries: Entradas 'sección/clave' -> valor
+        sections: Secciones que deben existir aunque no tengan entradas
+    """
+    state: Dict[str, Dict[str, Any]] = {section: {} for section in sections}
+    storage: List[Tuple[str, str, Any]] = []
+    for entry, value in entries.items():
+        section, key = entry.split('/', 1)
+        if section == 'storage':
+            address, slot = key.split('/', 1)
+            storage.append((address, slot, value))
+        elif section == 'contracts':
+            state.setdefault(section, {})[key] = {**value, 'storage': {}}
+        else:
+            state.setdefault(section, {})[key] = value
+    for address, slot, value in storage:
+        state['contracts'][address]['storage'][slot] = value
+    return state
+
+
+def state_root(state: Dict[str, Dict[str, Any]]) -> str:
+    """Raíz del árbol de estado construido desde cero."""
+    return StateTrie(state_entries(state)).root
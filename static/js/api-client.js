@@ -160,17 +160,17 @@ class OriluxAPIClient {
 
     // ==================== STAKING ====================
     
-    async stakeTokens(address, amount) {
+    async stakeTokens(address, amount, token = 'VRX') {
         return this.request('/staking/stake', {
             method: 'POST',
-            body: JSON.stringify({ address, amount })
+            body: JSON.stringify({ address, amount, token })
         });
     }
 
-    async unstakeTokens(address, amount) {
+    async unstakeTokens(address, amount, token = 'VRX', force = false) {
         return this.request('/staking/unstake', {
             method: 'POST',
-            body: JSON.stringify({ address, amount })
+            body: JSON.stringify({ address, amount, token, force })
         });
     }
 
@@ -188,24 +188,24 @@ class OriluxAPIClient {
         return this.request(`/contracts/${address}`);
     }
 
-    async deployContract(owner, code, initialState = {}) {
+    async deployContract(owner, bytecode, abi, constructorParams = {}) {
         return this.request('/contracts/deploy', {
             method: 'POST',
-            body: JSON.stringify({ owner, code, initial_state: initialState })
+            body: JSON.stringify({ owner, bytecode, abi, constructor_params: constructorParams })
         });
     }
 
     async deployContractTemplate(owner, templateName, params = {}) {
         return this.request('/contracts/deploy/template', {
             method: 'POST',
-            body: JSON.stringify({ owner, template_name: templateName, params })
+            body: JSON.stringify({ owner, template: templateName, params })
         });
     }
 
-    async callContract(contractAddress, functionName, params = {}, caller = '') {
+    async callContract(contractAddress, functionName, params = {}, sender = '', value = 0) {
         return this.request(`/contracts/${contractAddress}/call`, {
             method: 'POST',
-            body: JSON.stringify({ function: functionName, params, caller })
+            body: JSON.stringify({ function: functionName, params, sender, value })
         });
     }
 
@@ -253,8 +253,8 @@ class SmartContractsUI {
                 this.closeModal('deployModal');
                 this.loadContracts();
                 
-                // Show success animation
-                this.showDeploySuccess(data.contract);
+                // Show success animation (the contract exists once its block is mined)
+                this.showDeploySuccess(data.contract_address);
             } else {
                 showAlert(`❌ ${data.error}`, 'error');
             }
@@ -267,14 +267,14 @@ class SmartContractsUI {
         }
     }
     
-    showDeploySuccess(contract) {
+    showDeploySuccess(contractAddress) {
         const successDiv = document.createElement('div');
         successDiv.className = 'deploy-success-animation';
         successDiv.innerHTML = `
             <div class="success-content">
                 <div class="success-icon">✅</div>
-                <h2>Contract Deployed!</h2>
-                <p>Address: ${contract.address}</p>
+                <h2>Contract Deployment Submitted!</h2>
+                <p>Address: ${contractAddress}</p>
                 <button class="btn btn-primary" onclick="this.parentElement.parentElement.remove()">
                     Continue
                 </button>
@@ -345,12 +345,12 @@ class SmartContractsUI {
             const result = await response.json();
             
             if (result.success) {
-                showAlert(`✅ Function executed successfully! Gas used: ${result.gas_used}`, 'success');
+                // The call runs when its transaction is mined; show its hash to follow it
+                showAlert(`✅ ${result.message}`, 'success');
                 document.getElementById('functionResult').innerHTML = `
                     <div class="result-success">
-                        <h4>✅ Success</h4>
-                        <p><strong>Return Value:</strong> ${JSON.stringify(result.return_value)}</p>
-                        <p><strong>Gas Used:</strong> ${result.gas_used}</p>
+                        <h4>✅ Submitted</h4>
+                        <p><strong>Transaction:</strong> <code>${result.hash}</code></p>
                     </div>
                 `;
             } else {
@@ -0,0 +1,88 @@
+"""
+Tests del codec binario: ida y vuelta de transacciones y bloques sin
+perder tipos, secuencias de bloques y rechazo de payloads corruptos.
+
+Ejecutar con: python -m pytest test_binary_codec.py
+"""
+
+import json
+
+import pytest
+
+from binary_codec import (CodecError, decode_block, decode_blocks, decode_transaction,
+                          encode_block, encode_blocks, encode_transaction, is_binary,
+                          join_blocks)
+from conftest import signed_transaction
+
+
+@pytest.fixture
+def blocks(funded, wallet):
+    """Cadena con una transferencia firmada en cada bloque posterior."""
+    for number in range(2):
+        funded.add_transactions([signed_transaction(funded, wallet, 'BOB', 1, data={'memo': number})])
+        funded.mine_pending_transactions('MINER')
+    return list(funded.chain)
+
+
+# ==================== IDA Y VUELTA ====================
+
+def test_signed_transaction_round_trips_smaller_than_json(funded, wallet):
+    transaction = signed_transaction(funded, wallet, 'BOB', 5, fee=1)
+    payload = encode_transaction(transaction)
+
+    assert is_binary(payload) and not is_binary(json.dumps(transaction).encode())
+    assert decode_transaction(payload) == transaction
+    assert len(payload) < len(json.dumps(transaction).encode()) * 0.7
+
+
+def test_values_keep_their_exact_type():
+    transaction = {
+        'amount': 1, 'fee': 1.0, 'nonce': 2 ** 70, 'value': -(2 ** 40), 'status': True,
+        'data': {'memo': 'ñandú', 'items': [None, False, 255, 256], 'ABCDEF0123456789': 'x'},
+        'hash': 'ab' * 32, 'reason': 'ABCDEF0123456789',  # hex en mayúsculas no se compacta
+    }
+    decoded = decode_transaction(encode_transaction(transaction))
+
+    assert decoded == transaction
+    assert type(decoded['amount']) is int and type(decoded['fee']) is float
+    assert json.dumps(decoded, sort_keys=True) == json.dumps(transaction, sort_keys=True)
+
+
+def test_blocks_round_trip_with_the_same_hash(blocks):
+    for block in blocks:
+        decoded = decode_block(encode_block(block))
+        assert decoded.hash == block.hash
+        assert decoded.to_dict() == block.to_dict()
+
+
+def test_block_sequences_round_trip_and_join_without_decoding(blocks):
+    payload = encode_blocks(blocks)
+
+    assert [block.hash for block in decode_blocks(payload)] == [block.hash for block in blocks]
+    assert join_blocks([encode_block(block) for block in blocks]) == payload
+    assert decode_blocks(encode_blocks([])) == []
+
+
+# ==================== PAYLOADS INVÁLIDOS ====================
+
+def test_corrupt_payloads_raise_codec_error(blocks):
+    payload = encode_block(blocks[-1])
+    tampered = bytearray(payload)
+    tampered[12] ^= 0x01  # un byte del proof
+
+    cases = [
+        b'', b'{"index": 1}', payload[:-3], payload + b'\x00', bytes(tampered),
+        encode_transaction({'amount': 1}),  # otro tipo de contenido
+        payload[:3] + bytes([99]) + payload[4:],  # versión desconocida
+    ]
+    for data in cases:
+        with pytest.raises(CodecError):
+            decode_block(data)
+    with pytest.raises(CodecError, match='not a transaction'):
+        decode_transaction(encode_transaction([1, 2]))
+
+
+@pytest.mark.parametrize('transaction', [{'amount': object()}, {'data': {1: 'x'}}])
+def test_unsupported_values_are_rejected(transaction):
+    with pytest.raises(CodecError):
+        encode_transaction(transaction)
@@ -0,0 +1,102 @@
+"""
+Tests del almacenamiento de bloques: lectura por altura y hash, CRC de los
+registros y recuperación tras una escritura interrumpida.
+
+Ejecutar con: python -m pytest test_block_store.py
+"""
+
+import os
+
+import pytest
+
+from block_store import INDEX_ENTRY, BlockStore, BlockStoreError
+
+
+@pytest.fixture
+def blocks(funded, wallet):
+    for _ in range(3):
+        funded.mine_pending_transactions(wallet.address)
+    return list(funded.chain)
+
+
+def fill(directory, blocks, **options):
+    store = BlockStore(str(directory), **options)
+    for block in blocks:
+        store.append(block)
+    return store
+
+
+def segment(directory, number=0):
+    return os.path.join(str(directory), f"blk{number:05d}.dat")
+
+
+# ==================== LECTURA ====================
+
+@pytest.mark.parametrize('encoding', ['binary', 'json'])
+def test_blocks_read_back_after_reopening(tmp_path, blocks, encoding):
+    fill(tmp_path, blocks, encoding=encoding).close()
+    store = BlockStore(str(tmp_path))
+
+    assert [block.hash for block in store] == [block.hash for block in blocks]
+    assert store[-1].to_dict() == blocks[-1].to_dict()
+    assert [block.index for block in store[1:3]] == [1, 2]
+    assert store.get_by_hash(blocks[2].hash).index == 2
+    assert store.get_by_hash('0' * 64) is None
+    assert store.hash_at(3) == blocks[3].hash
+
+
+def test_append_rejects_a_height_gap(tmp_path, blocks):
+    store = fill(tmp_path, blocks[:2])
+    with pytest.raises(BlockStoreError, match='Expected block height 2'):
+        store.append(blocks[3])
+
+
+def test_truncate_drops_blocks_and_later_segments(tmp_path, blocks):
+    store = fill(tmp_path, blocks, segment_size=1)  # un registro por segmento
+    assert os.path.exists(segment(tmp_path, 4))
+
+    store.truncate(2)
+    assert len(store) == 2 and store.height_of(blocks[3].hash) is None
+    assert not os.path.exists(segment(tmp_path, 3))
+    store.append(blocks[2])
+    store.close()
+    assert [block.hash for block in BlockStore(str(tmp_path))] == [block.hash for block in blocks[:3]]
+
+
+# ==================== INTEGRIDAD Y RECUPERACIÓN ====================
+
+def test_corrupted_record_fails_its_crc(tmp_path, blocks):
+    fill(tmp_path, blocks).close()
+    with open(segment(tmp_path), 'r+b') as f:
+        f.seek(-1, os.SEEK_END)
+        last = f.read(1)
+        f.seek(-1, os.SEEK_END)
+        f.write(bytes([last[0] ^ 0xFF]))
+
+    store = BlockStore(str(tmp_path))
+    assert store[2].hash == blocks[2].hash
+    with pytest.raises(BlockStoreError, match='Corrupted record for block 4'):
+        store.get(4)
+
+
+def test_truncated_tail_record_is_dropped(tmp_path, blocks):
+    fill(tmp_path, blocks).close()
+    with open(segment(tmp_path), 'r+b') as f:
+        f.truncate(os.path.getsize(segment(tmp_path)) - 5)
+
+    store = BlockStore(str(tmp_path))
+    assert len(store) == 4
+    assert os.path.getsize(str(tmp_path / 'index.dat')) == 4 * INDEX_ENTRY.size
+    store.append(blocks[4])
+    assert store[4].hash == blocks[4].hash
+
+
+def test_records_missing_from_the_index_are_recovered(tmp_path, blocks):
+    fill(tmp_path, blocks).close()
+    index = str(tmp_path / 'index.dat')
+    with open(index, 'r+b') as f:
+        f.truncate(2 * INDEX_ENTRY.size + 7)  # dos entradas y media
+
+    store = BlockStore(str(tmp_path))
+    assert [block.hash for block in store] == [block.hash for block in blocks]
+    assert os.path.getsize(index) == len(blocks) * INDEX_ENTRY.size
@@ -0,0 +1,118 @@
+"""
+Tests de la exportación en streaming: JSON por trozos, NDJSON y binario,
+rangos por cabecera o parámetros y corte explícito si la cadena se
+reorganiza durante la descarga.
+
+Ejecutar con: python -m pytest test_chain_export.py
+"""
+
+import json
+
+import pytest
+from flask import Flask
+
+from binary_codec import BINARY_CONTENT_TYPE, decode_blocks
+from chain_export import (REORG_ERROR, RangeNotSatisfiable, buffered, iter_ndjson,
+                          linked_blocks, parse_block_range, stream_chain)
+from conftest import copy_block
+
+
+@pytest.fixture
+def chain(funded, wallet):
+    for _ in range(3):
+        funded.mine_pending_transactions(wallet.address)
+    return funded
+
+
+@pytest.fixture
+def client(chain):
+    """Cliente de una app con la cadena exportada en /chain."""
+    app = Flask(__name__)
+    app.add_url_rule('/chain', 'chain', lambda: stream_chain(
+        chain, head=lambda start, end: {'length': len(chain.chain)}))
+    return app.test_client()
+
+
+# ==================== FORMATOS ====================
+
+def test_json_export_matches_the_chain(client, chain):
+    response = client.get('/chain')
+
+    assert response.status_code == 200 and response.headers['Accept-Ranges'] == 'blocks'
+    assert response.get_json() == {'length': 5, 'chain': [block.to_dict() for block in chain.chain]}
+
+
+def test_ndjson_export_emits_one_block_per_line(client, chain):
+    for query, headers in (('?format=ndjson', {}), ('', {'Accept': 'application/x-ndjson'})):
+        response = client.get('/chain' + query, headers=headers)
+        assert response.mimetype == 'application/x-ndjson'
+        lines = response.get_data(as_text=True).splitlines()
+        assert [json.loads(line) for line in lines] == [block.to_dict() for block in chain.chain]
+
+
+def test_binary_export_decodes_to_the_same_blocks(client, chain):
+    response = client.get('/chain', headers={'Accept': BINARY_CONTENT_TYPE, 'Range': 'blocks=2-'})
+
+    assert response.status_code == 206 and response.mimetype == BINARY_CONTENT_TYPE
+    assert [block.hash for block in decode_blocks(response.get_data())] == \
+        [block.hash for block in chain.chain[2:]]
+
+
+# ==================== RANGOS ====================
+
+@pytest.mark.parametrize('headers, query, heights', [
+    ({'Range': 'blocks=1-2'}, '', [1, 2]),
+    ({'Range': 'blocks=3-'}, '', [3, 4]),
+    ({'Range': 'blocks=-2'}, '', [3, 4]),
+    ({'Range': 'blocks=2-99'}, '', [2, 3, 4]),
+    ({}, '?from_height=1&to_height=3', [1, 2, 3]),
+    ({'Range': 'blocks=0-0'}, '?from_height=3', [0]),  # la cabecera tiene prioridad
+])
+def test_ranges_return_partial_content(client, headers, query, heights):
+    response = client.get('/chain' + query, headers=headers)
+
+    assert response.status_code == 206
+    assert [block['index'] for block in response.get_json()['chain']] == heights
+    assert response.headers['Content-Range'] == f"blocks {heights[0]}-{heights[-1]}/5"
+
+
+@pytest.mark.parametrize('headers', [{'Range': 'blocks=5-'}, {'Range': 'bytes=0-10'},
+                                     {'Range': 'blocks=-'}, {'Range': 'blocks=3-1'}])
+def test_unsatisfiable_ranges_are_rejected(client, headers):
+    response = client.get('/chain', headers=headers)
+
+    assert response.status_code == 416
+    assert response.headers['Content-Range'] == 'blocks */5'
+
+
+def test_parse_block_range_without_a_range_is_the_whole_chain():
+    assert parse_block_range(None, None, None, 7) == (0, 7, False)
+    assert parse_block_range(None, 2, None, 7) == (2, 7, True)
+    with pytest.raises(RangeNotSatisfiable):
+        parse_block_range(None, 7, None, 7)
+
+
+# ==================== REORGANIZACIONES Y TROZOS ====================
+
+def test_export_stops_with_an_error_when_the_chain_changes(chain):
+    blocks = [copy_block(block) for block in chain.chain]
+    blocks[3].previous_hash = 'f' * 64  # otra rama a partir de la altura 3
+
+    errors = []
+    exported = list(linked_blocks(blocks, 0, len(blocks), errors))
+    assert [block.index for block in exported] == [0, 1, 2]
+    assert errors == [REORG_ERROR]
+
+    lines = ''.join(iter_ndjson(({'index': block.index} for block in exported), errors)).splitlines()
+    assert json.loads(lines[-1]) == {'error': REORG_ERROR}
+
+
+def test_shortened_chain_is_reported_as_a_reorganization(chain):
+    errors = []
+    assert len(list(linked_blocks(chain.chain[1:3], 1, 5, errors))) == 2
+    assert errors == [REORG_ERROR]
+
+
+def test_buffered_groups_small_parts_into_chunks():
+    chunks = list(buffered(['ab'] * 10, chunk_size=5))
+    assert chunks == [b'ababab'] * 3 + [b'ab']
@@ -0,0 +1,123 @@
+"""
+Tests del índice de la cadena: búsquedas de bloques y transacciones por
+hash, por prefijo y por hash de data, e historial paginado con cursores.
+
+Ejecutar con: python -m pytest test_chain_index.py
+"""
+
+import pytest
+
+from block import transaction_hash
+from chain_index import ChainIndex, data_hash, format_cursor, parse_cursor
+from conftest import signed_transaction
+
+
+@pytest.fixture
+def transfers(funded, wallet):
+    """Cadena con tres transferencias de wallet en bloques distintos."""
+    transactions = []
+    for number, recipient in enumerate(('BOB', 'CAROL', 'BOB')):
+        transaction = signed_transaction(funded, wallet, recipient, 1, data={'memo': number})
+        funded.add_transactions([transaction])
+        funded.mine_pending_transactions('MINER')
+        transactions.append(transaction)
+    return funded, transactions
+
+
+# ==================== BÚSQUEDAS POR HASH ====================
+
+def test_blocks_and_transactions_are_found_by_hash(transfers):
+    chain, transactions = transfers
+    index = chain.index
+
+    for block in chain.chain:
+        assert index.block_height(block.hash) == block.index
+        assert index.block_height('0x' + block.hash.upper()) == block.index
+    for height, transaction in enumerate(transactions, start=2):
+        tx_hash = transaction_hash(transaction)
+        assert index.locate_transaction(tx_hash) == (height, 0)
+        assert index.locate_transaction('0x' + tx_hash) == (height, 0)
+        assert index.locate_transaction(data_hash(transaction)) == (height, 0)
+        assert chain.find_transaction(tx_hash)[0].index == height
+    assert index.block_height('f' * 64) is None
+    assert index.locate_transaction('f' * 64) is None
+
+
+def test_prefix_search_returns_every_match_up_to_the_limit(transfers):
+    chain, transactions = transfers
+    index = chain.index
+    tx_hash = transaction_hash(transactions[0])
+
+    assert index.find_transactions_by_prefix(tx_hash[:12]) == [(2, 0)]
+    assert index.find_blocks_by_prefix(chain.chain[3].hash[:12]) == [3]
+    assert len(index.find_transactions_by_prefix('', limit=100)) == 0
+    assert len(index.find_blocks_by_prefix('0', limit=2)) == 2  # dificultad 1: todos empiezan por 0
+
+
+def test_truncate_forgets_the_removed_blocks(transfers):
+    chain, transactions = transfers
+    index = ChainIndex()
+    index.rebuild(chain.chain)
+    index.truncate(3)
+
+    assert len(index) == 3
+    assert index.block_height(chain.chain[3].hash) is None
+    assert index.locate_transaction(transaction_hash(transactions[1])) is None
+    assert index.locate_transaction(transaction_hash(transactions[0])) == (2, 0)
+    assert index.transaction_count == sum(len(block.transactions) for block in chain.chain[:3])
+
+
+# ==================== HISTORIAL CON CURSORES ====================
+
+def walk(chain, address=None, limit=2):
+    """Todas las páginas del historial siguiendo next_cursor."""
+    pages, cursor = [], None
+    while True:
+        page = chain.get_transaction_history(address, cursor, limit)
+        pages.append([(tx['block_index'], tx['hash']) for tx in page['transactions']])
+        cursor = page['next_cursor']
+        if cursor is None:
+            return pages, page['total']
+
+
+def test_address_history_pages_cover_every_transaction_once(transfers, wallet):
+    chain, transactions = transfers
+    pages, total = walk(chain, 'BOB', limit=1)
+
+    assert total == 2
+    assert pages == [[(4, transaction_hash(transactions[2]))], [(2, transaction_hash(transactions[0]))]]
+
+    pages, total = walk(chain, wallet.address, limit=2)
+    seen = [entry for page in pages for entry in page]
+    assert total == len(seen) == 4  # su recompensa y los tres envíos
+    assert seen == sorted(seen, reverse=True) and len(set(seen)) == len(seen)
+
+
+def test_global_history_matches_the_chain_order(transfers):
+    chain, _ = transfers
+    pages, total = walk(chain, limit=3)
+    expected = [(block.index, tx['hash']) for block in chain.chain for tx in block.transactions][::-1]
+
+    assert [entry for page in pages for entry in page] == expected
+    assert total == len(expected)
+    assert all(len(page) == 3 for page in pages[:-1])
+
+
+def test_cursor_stays_valid_when_new_blocks_arrive(transfers, wallet):
+    chain, transactions = transfers
+    first = chain.get_transaction_history('BOB', None, 1)
+    chain.add_transactions([signed_transaction(chain, wallet, 'BOB', 1)])
+    chain.mine_pending_transactions('MINER')
+
+    second = chain.get_transaction_history('BOB', first['next_cursor'], 1)
+    assert [tx['hash'] for tx in second['transactions']] == [transaction_hash(transactions[0])]
+    assert second['total'] == 3
+
+
+def test_cursor_format_round_trips():
+    assert parse_cursor(format_cursor((12, 3))) == (12, 3)
+    assert parse_cursor('7') == (7, 0)
+    assert parse_cursor(None) is None
+    for cursor in ('x:1', '-1:0', '3:-2'):
+        with pytest.raises(ValueError):
+            parse_cursor(cursor)
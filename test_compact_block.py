@@ -0,0 +1,131 @@
+"""
+Tests de los bloques compactos: reconstrucción desde el mempool, huecos
+que completa el emisor y cancelación de la minería al recibir un bloque.
+
+Ejecutar con: python -m pytest test_compact_block.py
+"""
+
+import pytest
+from flask import Flask
+
+from api import BlockchainAPI
+from block import Block
+from blockchain import Blockchain
+from compact_block import PartialBlock, build_compact_block, short_id
+from conftest import copy_block, signed_transaction
+from node import Node
+
+
+@pytest.fixture
+def peers(funded):
+    """Cadena del emisor y nodo receptor con la misma cadena."""
+    receiver = Blockchain(difficulty=1)
+    receiver.add_block(copy_block(funded.chain[1]))
+    return funded, Node(receiver)
+
+
+def mine_with(sender, wallet, count):
+    transactions = [signed_transaction(sender, wallet, f"R{i}", 1, nonce=i) for i in range(count)]
+    assert all(result['accepted'] for result in sender.add_transactions(transactions))
+    return sender.mine_pending_transactions('MINER'), transactions
+
+
+# ==================== RECONSTRUCCIÓN ====================
+
+def test_block_is_rebuilt_from_the_receiver_mempool(peers, wallet):
+    sender, node = peers
+    block, transactions = mine_with(sender, wallet, 3)
+    node.blockchain.add_transactions(transactions)
+    message = build_compact_block(block)
+
+    assert len(message['short_ids']) == 3
+    assert [item['tx']['sender'] for item in message['prefilled']] == ['NETWORK']
+
+    block_dict, missing = node.receive_compact_block(message)
+    assert missing == []
+    assert Block.from_dict(block_dict).hash == block.hash
+    assert node.blockchain.accept_block(Block.from_dict(block_dict)) == 'extended'
+
+
+def test_missing_transactions_are_filled_by_the_sender(peers, wallet):
+    sender, node = peers
+    block, transactions = mine_with(sender, wallet, 3)
+    node.blockchain.add_transactions(transactions[:1])
+
+    block_dict, missing = node.receive_compact_block(build_compact_block(block))
+    assert block_dict is None and missing == [1, 2]
+
+    with pytest.raises(ValueError, match='short ID'):
+        node.fill_compact_block(block.hash, [{'index': 1, 'tx': block.transactions[2]}])
+    block_dict, missing = node.fill_compact_block(
+        block.hash, [{'index': position, 'tx': block.transactions[position]} for position in missing]
+    )
+    assert missing == [] and Block.from_dict(block_dict).hash == block.hash
+    with pytest.raises(ValueError, match='desconocido'):
+        node.fill_compact_block(block.hash, [])
+
+
+def test_short_ids_depend_on_the_block_hash():
+    assert short_id('a' * 64, 'tx') != short_id('b' * 64, 'tx')
+
+
+def test_ambiguous_short_id_is_left_for_the_sender(funded, wallet):
+    block, transactions = mine_with(funded, wallet, 1)
+    partial = PartialBlock(build_compact_block(block))
+
+    assert partial.fill_from_pool([transactions[0], dict(transactions[0])]) == 0
+    assert partial.missing == [0]
+
+
+def test_malformed_or_known_messages_are_rejected(peers, wallet):
+    sender, node = peers
+    message = build_compact_block(sender.get_latest_block())
+
+    with pytest.raises(ValueError, match='mal formado'):
+        node.receive_compact_block({key: value for key, value in message.items() if key != 'short_ids'})
+    with pytest.raises(ValueError, match='counts'):
+        PartialBlock(dict(message, tx_count=message['tx_count'] + 1))
+    with pytest.raises(ValueError, match='conocido'):
+        node.receive_compact_block(message)
+
+
+# ==================== CANCELACIÓN DE LA MINERÍA ====================
+
+@pytest.fixture
+def api(peers):
+    """API del receptor sin servidor, con un contador de cancelaciones."""
+    _, node = peers
+    instance = BlockchainAPI.__new__(BlockchainAPI)
+    instance.blockchain, instance.node = node.blockchain, node
+    instance.cancelled = 0
+
+    def cancel_mining():
+        instance.cancelled += 1
+        return True
+
+    node.blockchain.cancel_mining = cancel_mining
+    with Flask(__name__).app_context():
+        yield instance
+
+
+def test_mining_is_cancelled_only_when_the_tip_changes(api, peers, wallet):
+    sender, node = peers
+    block, _ = mine_with(sender, wallet, 1)
+
+    assert api._accept_block(block.to_dict())[1] == 201
+    assert node.blockchain.get_latest_block().hash == block.hash
+    assert api.cancelled == 1
+
+    assert api._accept_block(block.to_dict())[1] == 200
+    assert api.cancelled == 1
+
+
+def test_side_or_invalid_blocks_do_not_cancel_mining(api, peers, wallet):
+    sender, node = peers
+    node.blockchain.mine_pending_transactions('LOCAL')
+    side, _ = mine_with(sender, wallet, 1)
+
+    assert api._accept_block(side.to_dict())[1] == 202
+    forged = dict(side.to_dict(), proof=side.proof + 1, hash='f' * 64)
+    assert api._accept_block(forged)[1] == 400
+    assert api.cancelled == 0
@@ -0,0 +1,136 @@
+"""
+Tests de las reglas de consenso: génesis, recompensa de minería,
+validación de bloques contra el estado anterior, raíz de estado y
+elección de rama por trabajo acumulado.
+
+Ejecutar con: python -m pytest test_consensus.py
+"""
+
+import time
+
+import pytest
+
+from block import Block, block_work
+from blockchain import Blockchain, InvalidBlockError
+from conftest import copy_block, forge_block, signed_transaction
+
+
+def test_genesis_is_deterministic():
+    assert Blockchain(difficulty=1).chain[0].hash == Blockchain(difficulty=1).chain[0].hash
+    assert Blockchain(difficulty=1).chain[0].hash != Blockchain(difficulty=2).chain[0].hash
+
+
+# ==================== RECOMPENSA Y TRANSACCIONES ====================
+
+@pytest.mark.parametrize('transactions, reason', [
+    (lambda chain: [], 'must end with its mining reward'),
+    (lambda chain: [chain._reward_transaction('X')] * 2, 'Only the mining reward can issue coins'),
+    (lambda chain: [{'sender': 'NETWORK', 'recipient': 'X', 'amount': 5, 'token': 'VRX', 'timestamp': 1},
+                    chain._reward_transaction('X')], 'Only the mining reward can issue coins'),
+    (lambda chain: [{'sender': 'MINING_POOL', 'recipient': 'X', 'amount': 5, 'token': 'VRX', 'timestamp': 1},
+                    chain._reward_transaction('X')], 'System sender MINING_POOL'),
+])
+def test_block_rewards_are_enforced(funded, transactions, reason):
+    state = funded.capture_state()
+    with pytest.raises(InvalidBlockError, match=reason):
+        funded.add_block(forge_block(funded, transactions(funded)))
+    assert funded.capture_state() == state
+
+
+def test_inflated_reward_is_rejected(funded):
+    reward = funded._reward_transaction('X')
+    reward['amount'] = 10 ** 6
+    reward.pop('hash')
+    with pytest.raises(InvalidBlockError, match='must end with its mining reward'):
+        funded.add_block(forge_block(funded, [reward]))
+
+
+def test_block_is_validated_against_the_pre_block_state(funded, wallet):
+    state, root = funded.capture_state(), funded.state_trie.root
+    transactions = [
+        signed_transaction(funded, wallet, 'BOB', 30, nonce=0),
+        signed_transaction(funded, wallet, 'BOB', 30, nonce=1),  # ya sin fondos
+        funded._reward_transaction('X')
+    ]
+    with pytest.raises(InvalidBlockError, match='Insufficient balance'):
+        funded.add_block(forge_block(funded, transactions))
+    assert funded.capture_state() == state
+    assert funded.state_trie.root == root
+
+
+def test_wrong_state_root_is_rejected(funded, wallet):
+    state, root, length = funded.capture_state(), funded.state_trie.root, len(funded.chain)
+    block = forge_block(funded, [signed_transaction(funded, wallet, 'BOB', 5),
+                                 funded._reward_transaction('X')])
+    with pytest.raises(InvalidBlockError, match='Invalid state root'):
+        funded.add_block(block)
+    assert (funded.capture_state(), funded.state_trie.root, len(funded.chain)) == (state, root, length)
+
+
+# ==================== ELECCIÓN DE RAMA ====================
+
+def test_heavier_branch_wins_and_ties_keep_first_seen(funded):
+    other = Blockchain(difficulty=1)
+    other.add_block(copy_block(funded.chain[1]))
+    funded.mine_pending_transactions('MINER_A')
+    first, second = other.mine_pending_transactions('MINER_B'), other.mine_pending_transactions('MINER_B')
+
+    assert funded.accept_block(copy_block(first)) == 'side'
+    assert funded.get_latest_block().transactions[-1]['recipient'] == 'MINER_A'
+    assert funded.accept_block(copy_block(second)) == 'reorganized'
+    assert funded.get_latest_block().hash == second.hash
+    assert funded.chain_work() == other.chain_work()
+    assert funded.capture_state() == other.capture_state()
+
+
+def test_chain_work_uses_required_difficulty(funded):
+    funded.mine_pending_transactions('MINER')
+    assert funded.chain_work() == sum(block_work(funded.block_difficulty(block)) for block in funded.chain)
+    assert funded.chain_work(1) == sum(block_work(funded.block_difficulty(block)) for block in funded.chain[:2])
+
+
+def test_side_branch_with_invalid_transactions_is_rolled_back(funded, wallet):
+    other = Blockchain(difficulty=1)
+    other.add_block(copy_block(funded.chain[1]))
+    tip, state = funded.get_latest_block().hash, funded.capture_state()
+
+    # Rama más pesada cuyo segundo bloque gasta más de lo que hay
+    other.add_transactions([signed_transaction(other, wallet, 'CAROL', 40)])
+    valid = other.mine_pending_transactions('MINER_B')
+    invalid = forge_block(other, [signed_transaction(other, wallet, 'CAROL', 40, nonce=1),
+                                  other._reward_transaction('MINER_B')])
+
+    with pytest.raises(InvalidBlockError, match='Insufficient balance'):
+        funded.reorganize(1, [copy_block(valid), invalid])
+
+    assert funded.get_latest_block().hash == tip
+    assert funded.capture_state() == state
+    assert funded.is_chain_valid(full=True)
+
+
+def test_failed_reorganization_keeps_the_current_chain(funded):
+    funded.mine_pending_transactions('MINER_A')
+    tip, state, root = funded.get_latest_block().hash, funded.capture_state(), funded.state_trie.root
+    other = Blockchain(difficulty=1)
+    other.add_block(copy_block(funded.chain[1]))
+    other.mine_pending_transactions('MINER_B')
+    parent = other.get_latest_block()
+    bad = Block(
+        index=parent.index + 1,
+        timestamp=time.time(),
+        transactions=[other._reward_transaction('MINER_B')],
+        proof=0,
+        previous_hash=parent.hash,
+        state_root='0' * 64,
+        difficulty=other.expected_difficulty(parent)
+    )
+    other.proof_of_work(bad)
+    bad.hash = bad.calculate_hash()
+
+    with pytest.raises(InvalidBlockError):
+        funded.reorganize(1, [copy_block(parent), bad])
+
+    assert funded.get_latest_block().hash == tip
+    assert funded.capture_state() == state
+    assert funded.state_trie.root == root
+    assert funded.is_chain_valid(full=True)
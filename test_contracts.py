@@ -0,0 +1,134 @@
+"""
+Tests de los smart contracts: programas compilados de la VM, diario de
+storage y caché de vistas.
+
+Ejecutar con: python -m pytest test_contracts.py
+"""
+
+from smart_contract import (
+    OP_INVALID, OP_NOP, ContractStorage, SmartContract, SmartContractVM, compile_bytecode
+)
+
+COUNTER = """
+# Contador: suma el valor enviado al guardado
+LOAD count
+PUSH $value
+ADD
+STORE count
+LOAD count
+RETURN
+"""
+ABI = {'functions': {'deposit': {'params': []}, 'get': {'params': []}}}
+
+
+def make_contract(bytecode=COUNTER):
+    contract = SmartContract('0xcontract', 'owner', bytecode, ABI)
+    contract.storage['count'] = 0
+    return contract
+
+
+def run(bytecode, **memory):
+    """Ejecuta un programa con variables de memoria ya cargadas."""
+    vm = SmartContractVM()
+    vm.memory.update(memory)
+    return vm.run(compile_bytecode(bytecode), {})
+
+
+# ==================== VM COMPILADA ====================
+
+def test_program_is_compiled_once_per_bytecode():
+    program = compile_bytecode(COUNTER)
+    assert compile_bytecode(COUNTER) is program
+    assert len(program) == 6  # sin comentarios ni líneas vacías
+    assert make_contract().program is program
+
+
+def test_compiled_program_decodes_operands():
+    program = compile_bytecode("PUSH 2\nPUSH 1.5\nPUSH $x\nPUSH text\nFOO\nSTORE")
+    assert program.operands[:4] == (2, 1.5, 'x', 'text')
+    assert program.opcodes[4] == OP_NOP
+    assert program.opcodes[5] == OP_INVALID
+
+
+def test_vm_arithmetic_and_errors():
+    assert run("PUSH 6\nPUSH $x\nMUL\nRETURN", x=7)['return_value'] == 42
+    assert run("PUSH 1\nPUSH 0\nDIV")['error'] == "Division by zero"
+    assert run("ADD")['error'] == "Stack underflow: ADD requires 2 values"
+    assert not run("STORE")['success']  # la instrucción mal formada falla al ejecutarse
+    assert run("PUSH 1\nREVERT")['error'] == "Contract reverted"
+
+
+def test_counter_adds_the_sent_value():
+    contract = make_contract()
+    assert contract.execute('deposit', {}, {'sender': 'x', 'value': 5})['return_value'] == 5
+    assert contract.execute('deposit', {}, {'sender': 'x', 'value': 2})['return_value'] == 7
+    assert contract.storage == {'count': 7}
+
+
+# ==================== DIARIO DE STORAGE ====================
+
+def test_storage_frames_commit_and_revert():
+    base, dirty, writes = {'a': 1}, set(), []
+    storage = ContractStorage(base, dirty, on_write=lambda: writes.append(1))
+
+    storage.begin()
+    storage['a'] = 2
+    storage.begin()
+    storage['b'] = 3
+    assert storage.get('b') == 3
+    storage.revert()
+    assert 'b' not in storage and storage['a'] == 2
+    assert base == {'a': 1}
+    storage.commit()
+
+    assert base == {'a': 2}
+    assert dirty == {'a'} and writes == [1]
+    assert storage.take_dirty() == {'a'} and not dirty
+
+
+def test_failed_call_leaves_storage_untouched():
+    contract = make_contract(COUNTER.replace("RETURN", "REVERT"))
+    contract.execute('deposit', {}, {'sender': 'x', 'value': 5})
+    assert contract.storage == {'count': 0}
+    assert contract.execution_count == 0
+    assert contract.take_dirty_slots() == set()
+
+
+def test_nested_call_is_confirmed_by_the_outer_frame():
+    contract = make_contract()
+    journal = contract.journal()
+    journal.begin()
+    result = contract.execute('deposit', {}, {'sender': 'x', 'value': 5}, storage=journal)
+    assert result['return_value'] == 5
+    assert contract.storage == {'count': 0}
+    journal.commit()
+    assert contract.storage == {'count': 5}
+    assert contract.take_dirty_slots() == {'count'}
+
+
+# ==================== CACHÉ DE VISTAS ====================
+
+def test_view_cache_is_invalidated_by_storage_writes(monkeypatch):
+    contract = make_contract()
+    runs = []
+    vm_run = SmartContractVM.run
+    monkeypatch.setattr(SmartContractVM, 'run',
+                        lambda self, program, context: runs.append(1) or vm_run(self, program, context))
+
+    first = contract.call_view('get', {}, {'sender': 'x'})
+    second = contract.call_view('get', {}, {'sender': 'x'})
+    assert first == second and first['return_value'] == 0
+    assert len(runs) == 1
+    assert contract.storage == {'count': 0}  # la vista no escribe
+    assert contract.call_view('get', {}, {'sender': 'y'}) == first
+    assert len(runs) == 2  # el sender forma parte de la clave
+
+    contract.execute('deposit', {}, {'sender': 'x', 'value': 10})
+    assert contract.call_view('get', {}, {'sender': 'x'})['return_value'] == 10
+    assert len(runs) == 4
+
+
+def test_view_cache_skips_unserializable_params():
+    contract = make_contract()
+    result = contract.call_view('get', {'extra': object()}, {'sender': 'x'})
+    assert result['success'] and not contract._view_cache
@@ -0,0 +1,128 @@
+"""
+Tests del mempool: orden por fee con colas por nonce, reemplazos,
+expulsión cuando se llena y cobro del fee al aplicar el bloque.
+
+Ejecutar con: python -m pytest test_mempool.py
+"""
+
+import pytest
+
+from blockchain import Blockchain, InvalidBlockError
+from conftest import copy_block, forge_block, signed_transaction
+from mempool import Mempool
+
+
+def pending(sender, nonce, fee):
+    """Transacción pendiente mínima para el mempool (ya validada)."""
+    return {'sender': sender, 'nonce': nonce, 'fee': fee, 'hash': f"{sender}-{nonce}-{fee}"}
+
+
+def keys(transactions):
+    return [(tx['sender'], tx['nonce']) for tx in transactions]
+
+
+# ==================== ORDEN Y REEMPLAZOS ====================
+
+def test_select_orders_by_fee_without_skipping_nonces():
+    pool = Mempool()
+    for tx in (pending('A', 0, 1), pending('A', 1, 9), pending('B', 0, 5), pending('C', 0, 3)):
+        assert pool.add(tx) == (True, None)
+
+    assert keys(pool.select(10)) == [('B', 0), ('C', 0), ('A', 0), ('A', 1)]
+    assert keys(pool.select(2)) == [('B', 0), ('C', 0)]
+    assert len(pool) == 4  # select no quita nada
+
+
+def test_replacement_needs_a_higher_fee():
+    pool = Mempool()
+    pool.add(pending('A', 0, 2))
+
+    accepted, reason = pool.add(pending('A', 0, 2))
+    assert not accepted and 'higher priority' in reason
+    assert pool.add(pending('A', 0, 3)) == (True, None)
+    assert [tx['fee'] for tx in pool] == [3]
+
+
+def test_unsigned_priority_field_is_ignored():
+    pool = Mempool()
+    pool.add(pending('A', 0, 1))
+    assert not pool.add(dict(pending('A', 0, 1), priority=100, hash='other'))[0]
+
+
+# ==================== EXPULSIÓN ====================
+
+def test_full_pool_evicts_the_cheapest_sender_tail():
+    pool = Mempool(max_size=3)
+    for tx in (pending('A', 0, 1), pending('A', 1, 5), pending('B', 0, 3)):
+        pool.add(tx)
+
+    # A0 es la más barata pero A1 depende de ella: solo compiten las colas
+    assert pool.add(pending('C', 0, 2)) == (False, "Mempool is full")
+    assert pool.add(pending('C', 0, 4)) == (True, None)
+    assert sorted(keys(pool)) == [('A', 0), ('A', 1), ('C', 0)]
+
+
+def test_eviction_moves_to_the_previous_nonce_when_the_tail_leaves():
+    pool = Mempool(max_size=3)
+    for tx in (pending('A', 0, 1), pending('A', 1, 9), pending('B', 0, 5)):
+        pool.add(tx)
+    pool.remove_many([pending('A', 1, 9)])
+    pool.add(pending('D', 0, 6))
+
+    assert pool.add(pending('C', 0, 2)) == (True, None)
+    assert sorted(keys(pool)) == [('B', 0), ('C', 0), ('D', 0)]
+
+
+def test_full_pool_never_evicts_an_earlier_nonce_of_the_same_sender():
+    pool = Mempool(max_size=2)
+    pool.add(pending('A', 0, 1))
+    pool.add(pending('A', 1, 1))
+
+    assert pool.add(pending('A', 2, 50)) == (False, "Mempool is full")
+    assert keys(pool.select(5)) == [('A', 0), ('A', 1)]
+
+
+# ==================== FEES EN LA CADENA ====================
+
+def test_fee_is_charged_and_paid_to_the_miner(funded, wallet):
+    assert funded.add_transactions([signed_transaction(funded, wallet, 'BOB', 10, fee=2)])[0]['accepted']
+    funded.mine_pending_transactions('MINER')
+
+    assert funded.get_balance('BOB', 'VRX') == 10
+    assert funded.get_balance(wallet.address, 'VRX') == 50 - 12
+    assert funded.get_balance('MINER', 'VRX') == 50 + 2
+
+
+def test_fee_counts_against_the_balance(funded, wallet):
+    result = funded.add_transactions([signed_transaction(funded, wallet, 'BOB', 50, fee=1)])[0]
+    assert not result['accepted'] and result['error'].startswith('Insufficient balance')
+
+    block = forge_block(funded, [signed_transaction(funded, wallet, 'BOB', 50, fee=1),
+                                 funded._reward_transaction('X')])
+    with pytest.raises(InvalidBlockError, match='Insufficient balance'):
+        funded.add_block(block)
+
+
+def test_sender_replaces_a_pending_transaction_with_a_higher_fee(funded, wallet):
+    funded.add_transactions([signed_transaction(funded, wallet, 'BOB', 10, fee=1)])
+    same_fee = signed_transaction(funded, wallet, 'CAROL', 10, nonce=0, fee=1)
+    higher_fee = signed_transaction(funded, wallet, 'CAROL', 10, nonce=0, fee=2)
+
+    assert not funded.add_transactions([same_fee])[0]['accepted']
+    assert funded.add_transactions([higher_fee])[0]['accepted']
+    funded.mine_pending_transactions('MINER')
+    assert (funded.get_balance('BOB', 'VRX'), funded.get_balance('CAROL', 'VRX')) == (0, 10)
+
+
+def test_confirmed_nonce_drops_pending_replacements(funded, wallet):
+    other = Blockchain(difficulty=1)
+    other.add_block(copy_block(funded.chain[1]))
+    funded.add_transactions([signed_transaction(funded, wallet, 'BOB', 1)])
+    other.add_transactions([signed_transaction(other, wallet, 'CAROL', 2)])
+
+    funded.add_block(copy_block(other.mine_pending_transactions('MINER_B')))
+
+    assert len(funded.pending_transactions) == 0
+    block = funded.mine_pending_transactions('MINER_A')
+    assert [tx['recipient'] for tx in block.transactions] == ['MINER_A']
+    assert funded.get_balance('BOB', 'VRX') == 0
@@ -0,0 +1,93 @@
+"""
+Tests del árbol de Merkle de los bloques: pruebas de inclusión ancladas al
+hash del bloque y caché del árbol.
+
+Ejecutar con: python -m pytest test_merkle.py
+"""
+
+import pytest
+
+from block import Block, compute_transaction_hash, transaction_hash
+from conftest import copy_block, signed_transaction
+from merkle import EMPTY_ROOT, MerkleTree
+
+
+# ==================== PRUEBAS DE INCLUSIÓN ====================
+
+@pytest.mark.parametrize('size', [1, 2, 3, 5, 8, 13])
+def test_every_leaf_has_a_valid_proof(size):
+    leaves = [f"tx{i}" for i in range(size)]
+    tree = MerkleTree(leaves)
+
+    for position, leaf in enumerate(leaves):
+        proof = tree.get_proof(position)
+        assert MerkleTree.verify_proof(leaf, proof, tree.root)
+        assert len(proof) <= (size - 1).bit_length()
+
+
+def test_tampered_proofs_are_rejected():
+    tree = MerkleTree(['a', 'b', 'c', 'd'])
+    proof = tree.get_proof(1)
+
+    assert not MerkleTree.verify_proof('x', proof, tree.root)
+    assert not MerkleTree.verify_proof('b', proof, EMPTY_ROOT)
+    assert not MerkleTree.verify_proof('b', [dict(proof[0], position='right')] + proof[1:], tree.root)
+    assert not MerkleTree.verify_proof('b', [{'hash': 'zz', 'position': 'left'}], tree.root)
+    with pytest.raises(IndexError):
+        tree.get_proof(4)
+
+
+def test_leaf_cannot_pass_as_an_inner_node():
+    tree = MerkleTree(['a', 'b'])
+    inner = tree.levels[0][0].hex() + tree.levels[0][1].hex()
+    assert not MerkleTree.verify_proof(inner, [], tree.root)
+
+
+def test_chain_proof_is_anchored_to_the_block_hash(funded, wallet):
+    transaction = signed_transaction(funded, wallet, 'BOB', 10)
+    funded.add_transactions([transaction])
+    block = funded.mine_pending_transactions('MINER')
+
+    proof = funded.get_transaction_proof(transaction_hash(transaction))
+    assert proof['block_hash'] == block.hash
+    assert Block.header_hash(proof['header']) == block.hash
+    assert proof['header']['merkle_root'] == proof['merkle_root']
+    assert MerkleTree.verify_proof(proof['tx_hash'], proof['proof'], proof['merkle_root'])
+    assert funded.get_transaction_proof('0' * 64) is None
+
+
+# ==================== CACHÉ DEL ÁRBOL ====================
+
+def test_hashing_reuses_the_cached_tree(funded):
+    block = copy_block(funded.get_latest_block())
+    tree = block.merkle_tree
+
+    for proof in range(3):
+        block.proof = proof
+        block.calculate_hash()
+    assert block.merkle_tree is tree
+
+
+def test_assigning_transactions_rebuilds_the_tree(funded):
+    block = copy_block(funded.get_latest_block())
+    original_hash, tree = block.hash, block.merkle_tree
+
+    block.transactions = block.transactions + [funded._reward_transaction('X')]
+    assert block.merkle_tree is not tree
+    assert block.calculate_hash() != original_hash
+
+    block.transactions = block.transactions[:-1]
+    assert block.calculate_hash() == original_hash
+
+
+def test_in_place_edits_need_an_explicit_invalidation(funded):
+    block = copy_block(funded.get_latest_block())
+    original_hash = block.hash
+
+    reward = block.transactions[-1]
+    reward['amount'] = 10 ** 6
+    reward['hash'] = compute_transaction_hash(reward)
+    assert block.calculate_hash() == original_hash
+
+    block.invalidate_merkle_tree()
+    assert block.calculate_hash() != original_hash
@@ -0,0 +1,124 @@
+"""
+Tests del minero: proofs válidos en serie y en paralelo, cancelación de
+búsquedas concurrentes y bloques minados sobre una punta que ya cambió.
+
+Ejecutar con: python -m pytest test_miner.py
+"""
+
+import hashlib
+import threading
+import time
+
+import pytest
+
+from block import Block
+from blockchain import Blockchain, InvalidBlockError, MiningCancelledError
+from conftest import copy_block
+from miner import PARALLEL_MIN_DIFFICULTY, ParallelMiner
+
+# Dificultad que no se resuelve durante el test
+UNREACHABLE = 64
+
+
+def template_block(difficulty):
+    return Block(index=1, timestamp=1.0, transactions=[], proof=0, previous_hash='0' * 64,
+                 state_root='0' * 64, difficulty=difficulty)
+
+
+def solves(block, proof):
+    block.proof = proof
+    return block.calculate_hash().startswith('0' * block.difficulty)
+
+
+def start_mining(miner, difficulty):
+    """Lanza miner.mine en un hilo y devuelve el hilo y su resultado."""
+    result = {}
+    thread = threading.Thread(
+        target=lambda: result.setdefault('proof', miner.mine(template_block(difficulty).mining_template(),
+                                                               difficulty))
+    )
+    thread.start()
+    return thread, result
+
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.time() + timeout
+    while not condition():
+        assert time.time() < deadline
+        time.sleep(0.01)
+
+
+# ==================== PROOFS ====================
+
+def test_template_serializes_like_calculate_hash():
+    block = template_block(2)
+    template = block.mining_template()
+    for proof in (0, 7, 123456):
+        block.proof = proof
+        digest = hashlib.sha256(template.prefix + b'%d' % proof + template.suffix).hexdigest()
+        assert digest == block.calculate_hash()
+
+
+def test_serial_search_returns_the_lowest_valid_proof():
+    block = template_block(2)
+    proof = ParallelMiner(workers=1).mine(block.mining_template(), 2)
+
+    assert solves(block, proof)
+    assert not any(solves(block, lower) for lower in range(proof))
+
+
+def test_parallel_search_returns_a_valid_proof():
+    block = template_block(PARALLEL_MIN_DIFFICULTY)
+    proof = ParallelMiner(workers=2).mine(block.mining_template(), PARALLEL_MIN_DIFFICULTY)
+    assert solves(block, proof)
+
+
+# ==================== CANCELACIÓN ====================
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_cancel_stops_every_concurrent_search(workers):
+    miner = ParallelMiner(workers=workers)
+    runs = [start_mining(miner, UNREACHABLE) for _ in range(2)]
+    wait_until(lambda: len(miner._runs) == 2)
+
+    assert miner.cancel()
+    for thread, result in runs:
+        thread.join(timeout=10)
+        assert not thread.is_alive() and result['proof'] is None
+    assert not miner.is_mining and not miner.cancel()
+
+
+def test_finished_search_does_not_detach_a_running_one():
+    miner = ParallelMiner(workers=1)
+    thread, result = start_mining(miner, UNREACHABLE)
+    wait_until(lambda: miner.is_mining)
+
+    assert miner.mine(template_block(1).mining_template(), 1) is not None
+    assert miner.is_mining
+    assert miner.cancel()
+    thread.join(timeout=10)
+    assert result['proof'] is None
+
+
+def test_cancelled_mining_leaves_the_chain_untouched(funded, wallet, monkeypatch):
+    monkeypatch.setattr(funded.miner, 'mine', lambda template, difficulty: None)
+    with pytest.raises(MiningCancelledError):
+        funded.mine_pending_transactions(wallet.address)
+    assert len(funded.chain) == 2
+
+
+def test_block_mined_on_a_stale_tip_is_rejected(funded, wallet, monkeypatch):
+    rival = Blockchain(difficulty=1)
+    rival.add_block(copy_block(funded.chain[1]))
+    competing = copy_block(rival.mine_pending_transactions('RIVAL'))
+
+    proof_of_work = Blockchain.proof_of_work
+
+    def tip_changes_while_mining(self, block):
+        self.add_block(competing)
+        return proof_of_work(self, block)
+
+    monkeypatch.setattr(Blockchain, 'proof_of_work', tip_changes_while_mining)
+    with pytest.raises(InvalidBlockError):
+        funded.mine_pending_transactions(wallet.address)
+    assert funded.get_latest_block().hash == competing.hash
@@ -0,0 +1,162 @@
+"""
+Tests de las operaciones de estado (staking, swaps y contratos) como
+transacciones: se aplican al minarse su bloque, igual en todos los nodos, y
+las rutas de la API siguen admitiendo la petición anterior sin firmar de la
+wallet del nodo.
+
+Ejecutar con: python -m pytest test_operations.py
+"""
+
+import threading
+
+import pytest
+from flask import Flask
+
+from api import BlockchainAPI
+from block import Block
+from blockchain import Blockchain
+from conftest import signed_transaction
+from node import Node
+from smart_contract import contract_address
+from state_trie import state_root
+
+# Depósito: devuelve el último valor guardado y guarda el enviado
+DEPOSIT = """
+LOAD deposit
+PUSH $value
+STORE deposit
+RETURN
+"""
+ABI = {'functions': {'deposit': {'params': []}, 'get': {'params': []}}}
+
+
+def call(chain, wallet, address, value, function='deposit'):
+    return signed_transaction(chain, wallet, address, value,
+                              data={'op': 'contract_call', 'function': function, 'params': {}})
+
+
+@pytest.fixture
+def deployed(funded, wallet):
+    """Cadena con el contrato de depósito desplegado por una transacción de wallet."""
+    funded.add_transactions([signed_transaction(funded, wallet, 'CONTRACTS', 0, data={
+        'op': 'contract_deploy', 'bytecode': DEPOSIT, 'abi': ABI
+    })])
+    funded.mine_pending_transactions('MINER')
+    return funded, contract_address(wallet.address, 0)
+
+
+# ==================== CONTRATOS EN LA CADENA ====================
+
+def test_contract_calls_are_applied_by_blocks(deployed, wallet):
+    chain, address = deployed
+    results = chain.add_transactions([call(chain, wallet, address, 3)])
+    results += chain.add_transactions([call(chain, wallet, address, 0, function='missing')])
+    assert all(result['accepted'] for result in results)
+    contract = chain.contract_manager.get_contract(address)
+    assert contract.storage == {}  # nada cambia hasta que se mina
+
+    block = chain.mine_pending_transactions('MINER')
+
+    assert contract.storage == {'deposit': 3}
+    assert contract.last_executed == block.timestamp
+    assert chain.get_balance(address, 'VRX') == 3
+    assert chain.transaction_nonces[wallet.address] == 3  # la llamada fallida consume su nonce
+    assert block.state_root == chain.state_trie.root == state_root(chain.capture_state())
+    assert chain.get_state_proof(f"storage/{address}/deposit")['value'] == 3
+
+
+def test_peers_reach_the_same_contract_state(deployed, wallet):
+    chain, address = deployed
+    chain.add_transactions([call(chain, wallet, address, 0)])
+    chain.add_transactions([call(chain, wallet, address, 4)])
+    chain.mine_pending_transactions('MINER')
+
+    peer = Blockchain(difficulty=1)
+    for block in chain.iter_blocks(1):
+        peer.add_block(Block.from_dict(block.to_dict()))
+
+    assert peer.capture_state() == chain.capture_state()
+    assert peer.state_trie.root == chain.state_trie.root
+
+
+def test_rollback_restores_contract_storage_and_views(deployed, wallet):
+    chain, address = deployed
+    height, state = len(chain.chain) - 1, chain.capture_state()
+    chain.add_transactions([call(chain, wallet, address, 7)])
+    chain.mine_pending_transactions('MINER')
+    assert chain.view_contract(address, 'get', {})['return_value'] == 7
+
+    assert chain._rollback_state(height)
+
+    assert chain.capture_state() == state
+    assert chain.view_contract(address, 'get', {})['return_value'] is None
+
+
+def test_writes_outside_a_block_are_discarded(deployed):
+    chain, address = deployed
+    chain.contract_manager.call_contract(address, 'deposit', {}, 'someone', value=9)
+    assert chain.contract_manager.get_contract(address).storage == {'deposit': 9}
+
+    block = chain.mine_pending_transactions('MINER')
+
+    assert chain.contract_manager.get_contract(address).storage == {}
+    assert block.state_root == chain.state_trie.root == state_root(chain.capture_state())
+
+
+# ==================== PETICIONES SIN FIRMAR DE LA API ====================
+
+@pytest.fixture
+def api(funded, wallet):
+    """API sin servidor cuya wallet de nodo es wallet."""
+    instance = BlockchainAPI.__new__(BlockchainAPI)
+    instance.blockchain, instance.node, instance.wallet = funded, Node(funded), wallet
+    instance._wallet_lock = threading.Lock()
+    with Flask(__name__).app_context():
+        yield instance
+
+
+def submit(api, values, operation, contract=None):
+    response, status = api._submit_operation(values, operation, contract)
+    return status, response.get_json()
+
+
+def test_node_wallet_stakes_with_the_legacy_request(api, funded, wallet):
+    status, body = submit(api, {'address': wallet.address, 'amount': 20, 'token': 'vrx'}, 'stake')
+    assert status == 202 and body['success']
+
+    pending = funded.find_pending_transaction(body['hash'])
+    assert pending['recipient'] == 'STAKING_POOL' and pending['data'] == {'op': 'stake'}
+    funded.mine_pending_transactions('MINER')
+    assert funded.staking_pool.get_stake_info(wallet.address)['VRX']['amount'] == 20
+    assert funded.get_balance(wallet.address, 'VRX') == 30
+
+
+def test_node_wallet_deploys_and_calls_with_legacy_requests(api, funded, wallet):
+    status, body = submit(api, {'owner': wallet.address, 'bytecode': DEPOSIT, 'abi': ABI},
+                          'contract_deploy')
+    assert status == 202
+    address = body['contract_address']
+
+    status, _ = submit(api, {'function': 'deposit', 'params': {}, 'sender': wallet.address,
+                             'value': 4}, 'contract_call', address)
+    assert status == 202
+    funded.mine_pending_transactions('MINER')
+
+    assert funded.contract_manager.get_contract(address).storage == {'deposit': 4}
+    assert funded.transaction_nonces[wallet.address] == 2
+
+
+@pytest.mark.parametrize('values, error', [
+    ({'address': 'SOMEONE_ELSE', 'amount': 5, 'token': 'VRX'}, 'transacción firmada'),
+    ({'address': 'SOMEONE_ELSE', 'amount': 5}, 'Faltan campos requeridos'),
+])
+def test_other_addresses_need_a_signed_transaction(api, funded, values, error):
+    status, body = submit(api, values, 'stake')
+    assert status == 400 and error in body['error']
+    assert len(funded.pending_transactions) == 0
+
+
+def test_signed_operations_are_still_admitted(api, funded, wallet):
+    transaction = signed_transaction(funded, wallet, 'STAKING_POOL', 5, data={'op': 'stake'})
+    assert submit(api, transaction, 'stake')[0] == 202
+    assert submit(api, dict(transaction, data={'op': 'swap'}), 'stake')[0] == 400
@@ -0,0 +1,119 @@
+"""
+Tests del transporte entre nodos: backoff exponencial de los peers que
+fallan, respuestas 4xx/5xx, difusión concurrente y elección de destinos.
+
+Ejecutar con: python -m pytest test_peer_transport.py
+"""
+
+import pytest
+import requests
+
+import peer_transport
+from peer_transport import BACKOFF_BASE, BACKOFF_MAX, PeerTransport
+
+
+class FakeSession:
+    """Sesión que responde con el código configurado o falla la conexión."""
+
+    def __init__(self, status=200):
+        self.status = status
+        self.calls = 0
+
+    def request(self, method, url, **kwargs):
+        self.calls += 1
+        if self.status is None:
+            raise requests.exceptions.ConnectionError(f"{url} unreachable")
+        response = requests.Response()
+        response.status_code = self.status
+        return response
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Reloj de peer_transport controlado por el test."""
+    now = [1000.0]
+    monkeypatch.setattr(peer_transport.time, 'time', lambda: now[0])
+    return now
+
+
+@pytest.fixture
+def transport(monkeypatch):
+    """Transporte cuyas sesiones por peer son FakeSession, sin red."""
+    sessions = {}
+    instance = PeerTransport(workers=4)
+    monkeypatch.setattr(instance, '_get_session', lambda peer: sessions.setdefault(peer, FakeSession()))
+    instance.sessions = sessions
+    yield instance
+    instance.close()
+
+
+# ==================== BACKOFF ====================
+
+def test_consecutive_failures_back_off_exponentially(transport, clock):
+    transport.sessions['a:1'] = FakeSession(status=None)
+    delays = []
+    for _ in range(12):
+        with pytest.raises(requests.exceptions.ConnectionError):
+            transport.get('a:1', '/chain')
+        delays.append(transport._stats['a:1'].retry_at - clock[0])
+
+    assert delays[:3] == [BACKOFF_BASE, BACKOFF_BASE * 2, BACKOFF_BASE * 4]
+    assert delays[-1] == BACKOFF_MAX
+    assert not transport.is_available('a:1')
+    clock[0] += BACKOFF_MAX
+    assert transport.is_available('a:1')
+
+
+def test_success_resets_the_backoff(transport, clock):
+    transport.sessions['a:1'] = FakeSession(status=None)
+    with pytest.raises(requests.exceptions.ConnectionError):
+        transport.get('a:1', '/chain')
+    transport.sessions['a:1'].status = 200
+    transport.get('a:1', '/chain')
+
+    stats = transport.get_stats()['a:1']
+    assert (stats['failures'], stats['successes'], stats['backoff_seconds']) == (0, 1, 0.0)
+    assert stats['last_error'] is None and transport.is_available('a:1')
+
+
+def test_server_errors_count_as_failures_but_rejections_do_not(transport, clock):
+    transport.sessions['a:1'] = FakeSession(status=503)
+    transport.sessions['b:1'] = FakeSession(status=400)
+
+    with pytest.raises(requests.exceptions.HTTPError):
+        transport.post('a:1', '/blocks/new')
+    assert transport.post('b:1', '/blocks/new').status_code == 400
+    assert not transport.is_available('a:1') and transport.is_available('b:1')
+
+
+# ==================== DIFUSIÓN ====================
+
+def test_fan_out_skips_peers_in_backoff(transport, clock):
+    transport.sessions['down:1'] = FakeSession(status=None)
+    results = transport.fan_out(['up:1', 'down:1'], 'POST', '/blocks/new', json={})
+    assert results['up:1'].status_code == 200
+    assert isinstance(results['down:1'], requests.exceptions.ConnectionError)
+
+    results = transport.fan_out(['up:1', 'down:1'], 'POST', '/blocks/new', json={})
+    assert list(results) == ['up:1']
+    assert transport.sessions['down:1'].calls == 1
+
+
+def test_gossip_prefers_fast_peers_and_samples_the_rest(transport, clock):
+    peers = [f"p{i}:1" for i in range(6)]
+    for i, peer in enumerate(peers):
+        transport._get_stats(peer).record_success(0.01 * (i + 1))
+    transport._get_stats('p0:1').record_failure(Exception('down'))
+
+    targets = transport.gossip_targets(peers, fanout=4)
+    assert len(targets) == 4 and len(set(targets)) == 4
+    assert targets[:2] == ['p1:1', 'p2:1']
+    assert 'p0:1' not in targets
+    assert transport.gossip_targets(peers, fanout=0) == peers[1:]
+
+
+def test_latency_is_a_moving_average(transport):
+    stats = transport._get_stats('a:1')
+    stats.record_success(1.0)
+    stats.record_success(2.0)
+    assert stats.latency == pytest.approx(1.0 + peer_transport.LATENCY_ALPHA)
@@ -0,0 +1,142 @@
+"""
+Tests del estado de cuentas: raíz de estado, pruebas del árbol de estado,
+snapshots con reproducción de bloques y reorganizaciones con los diarios
+de deshacer.
+
+Ejecutar con: python -m pytest test_state.py
+"""
+
+import blockchain as blockchain_module
+from blockchain import Blockchain
+from conftest import copy_block, signed_transaction
+from state_snapshot import StateSnapshot
+from state_trie import StateTrie, state_entries, state_root
+
+
+def assert_committed(chain):
+    """El árbol de estado incremental coincide con uno construido desde cero."""
+    assert chain._state_entries == state_entries(chain.capture_state())
+    assert chain.state_trie.root == state_root(chain.capture_state())
+
+
+# ==================== RAÍZ Y PRUEBAS DE ESTADO ====================
+
+def test_block_commits_post_state_root(funded, wallet):
+    funded.add_transactions([signed_transaction(funded, wallet, 'BOB', 10)])
+    block = funded.mine_pending_transactions('MINER')
+
+    assert block.state_root == funded.state_trie.root
+    assert funded.get_balance('BOB', 'VRX') == 10
+    assert_committed(funded)
+
+
+def test_state_proof_verifies_against_block_root(funded, wallet):
+    key = f"balances/{wallet.address}"
+    proof = funded.get_state_proof(key)
+    root = funded.get_latest_block().state_root
+
+    assert proof['state_root'] == root
+    assert proof['height'] == funded.get_latest_block().index
+    assert StateTrie.verify_proof(key, proof['value'], proof['proof'], root)
+    assert not StateTrie.verify_proof(key, proof['value'] + 1, proof['proof'], root)
+    assert funded.get_state_proof('balances/NOBODY') is None
+
+
+def test_trie_updates_match_fresh_build():
+    entries = {f"balances/{i}": i for i in range(50)}
+    trie = StateTrie(entries)
+    trie.update({'balances/7': 70, 'balances/new': 1}, removed=['balances/3', 'balances/4'])
+
+    expected = dict(entries, **{'balances/7': 70, 'balances/new': 1})
+    del expected['balances/3'], expected['balances/4']
+    assert trie.root == StateTrie(expected).root
+    assert trie.get_proof('balances/3') is None
+    assert StateTrie.verify_proof('balances/7', 70, trie.get_proof('balances/7'), trie.root)
+
+
+# ==================== SNAPSHOTS Y REPRODUCCIÓN ====================
+
+def test_reload_replays_blocks_after_latest_snapshot(tmp_path, wallet, monkeypatch):
+    monkeypatch.setattr(blockchain_module, 'SNAPSHOT_INTERVAL', 3)
+    chain = Blockchain(difficulty=1, data_dir=str(tmp_path))
+    for _ in range(4):
+        chain.mine_pending_transactions(wallet.address)
+    chain.add_transactions([signed_transaction(chain, wallet, 'BOB', 5)])
+    for _ in range(3):
+        chain.mine_pending_transactions(wallet.address)
+    state, root = chain.capture_state(), chain.state_trie.root
+    chain.block_store.close()
+
+    replayed = []
+    apply_block = Blockchain._apply_block
+    monkeypatch.setattr(Blockchain, '_apply_block',
+                        lambda self, block: replayed.append(block.index) or apply_block(self, block))
+    reloaded = Blockchain(difficulty=1, data_dir=str(tmp_path))
+
+    assert chain.snapshots.heights()[-1] == 6
+    assert replayed == [7]
+    assert reloaded.capture_state() == state
+    assert reloaded.state_trie.root == root
+    assert_committed(reloaded)
+
+
+def test_snapshot_not_matching_block_root_is_skipped(tmp_path, wallet, monkeypatch):
+    monkeypatch.setattr(blockchain_module, 'SNAPSHOT_INTERVAL', 0)
+    chain = Blockchain(difficulty=1, data_dir=str(tmp_path))
+    for _ in range(3):
+        chain.mine_pending_transactions(wallet.address)
+    state = chain.capture_state()
+
+    # Snapshot coherente consigo mismo pero con otro estado que el del bloque
+    forged = chain.capture_state()
+    forged['balances']['MALLORY'] = 10 ** 6
+    chain.snapshots.save(StateSnapshot(3, chain.hash_at(3), forged))
+    chain.block_store.close()
+
+    reloaded = Blockchain(difficulty=1, data_dir=str(tmp_path))
+    assert reloaded.capture_state() == state
+    assert reloaded.get_balance('MALLORY', 'VRX') == 0
+
+
+# ==================== REORGANIZACIONES ====================
+
+def branch_from(chain, height):
+    """Otro nodo con los bloques [1, height] de chain."""
+    other = Blockchain(difficulty=1)
+    for block in chain.iter_blocks(1, height + 1):
+        other.add_block(copy_block(block))
+    return other
+
+
+def test_reorganization_rolls_back_with_undo_journals(funded, wallet, monkeypatch):
+    other = branch_from(funded, len(funded.chain) - 1)
+    funded.add_transactions([signed_transaction(funded, wallet, 'BOB', 10)])
+    funded.mine_pending_transactions('MINER_A')
+    other.add_transactions([signed_transaction(other, wallet, 'CAROL', 7)])
+    other.mine_pending_transactions('MINER_B')
+    other.mine_pending_transactions('MINER_B')
+
+    def no_rebuild(self, height):
+        raise AssertionError("the undo journals should cover the reorganization")
+    monkeypatch.setattr(Blockchain, '_rebuild_state', no_rebuild)
+
+    statuses = [funded.accept_block(copy_block(block)) for block in other.chain[-2:]]
+
+    assert statuses == ['side', 'reorganized']
+    assert funded.get_latest_block().hash == other.get_latest_block().hash
+    assert funded.capture_state() == other.capture_state()
+    assert funded.get_balance('BOB', 'VRX') == 0
+    assert_committed(funded)
+
+
+def test_rollback_without_journals_rebuilds_state(funded, wallet):
+    other = branch_from(funded, 1)
+    other.add_transactions([signed_transaction(other, wallet, 'CAROL', 7)])
+    for _ in range(3):
+        other.mine_pending_transactions('MINER_B')
+    funded._undo_journals.clear()
+
+    funded.replace_chain(list(other.chain))
+
+    assert funded.capture_state() == other.capture_state()
+    assert_committed(funded)
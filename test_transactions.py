@@ -0,0 +1,122 @@
+"""
+Tests de la admisión de transacciones firmadas: lo que cubre la firma, el
+rechazo de transacciones reenviadas y el hash canónico que se guarda en
+cada transacción.
+
+Ejecutar con: python -m pytest test_transactions.py
+"""
+
+import pytest
+from flask import Flask
+
+from block import compute_transaction_hash, transaction_hash, transaction_signing_data
+from blockchain import InvalidBlockError
+from conftest import forge_block, signed_transaction
+from evm_rpc import create_evm_rpc_blueprint
+
+
+# ==================== FIRMAS ====================
+
+def test_confirmed_transaction_cannot_be_replayed(funded, wallet):
+    transaction = signed_transaction(funded, wallet, 'BOB', 10)
+    assert funded.add_transactions([transaction])[0]['accepted']
+    funded.mine_pending_transactions('MINER')
+    assert funded.get_balance('BOB', 'VRX') == 10
+
+    replay = {key: value for key, value in transaction.items() if key not in ('nonce', 'hash')}
+    results = funded.add_transactions([
+        replay,
+        dict(replay, nonce=funded.get_next_nonce(wallet.address)),
+        dict(transaction)
+    ])
+
+    assert [result['error'] for result in results] == [
+        "Invalid transaction signature",
+        "Invalid transaction signature",
+        "Transaction already spent (double-spending detected)"
+    ]
+    assert funded.validate_transaction(dict(replay)) == (False, "Missing transaction nonce")
+    funded.mine_pending_transactions('MINER')
+    assert funded.get_balance('BOB', 'VRX') == 10
+
+
+@pytest.mark.parametrize('field, value', [
+    ('nonce', 1), ('token', 'ORX'), ('fee', 5), ('amount', 11), ('recipient', 'MALLORY')
+])
+def test_signature_covers_every_field_that_matters(funded, wallet, field, value):
+    tampered = dict(signed_transaction(funded, wallet, 'BOB', 10), **{field: value})
+    result = funded.add_transactions([tampered])[0]
+    assert result == {'accepted': False, 'error': "Invalid transaction signature"}
+    assert len(funded.pending_transactions) == 0
+
+
+def test_public_key_must_belong_to_the_sender(funded, wallet):
+    transaction = signed_transaction(funded, wallet, 'BOB', 10)
+    transaction['sender'] = 'SOMEONE_ELSE'
+    transaction['signature'] = wallet.sign_transaction(transaction_signing_data(transaction))
+
+    is_valid, error = funded.validate_transaction(dict(transaction))
+    assert not is_valid and error == "Public key does not match sender"
+    assert not funded.add_transactions([transaction])[0]['accepted']
+
+    with pytest.raises(InvalidBlockError, match='Invalid transaction signature'):
+        funded.add_block(forge_block(funded, [transaction, funded._reward_transaction('X')]))
+
+
+# ==================== HASH DE LA TRANSACCIÓN ====================
+
+def test_hash_is_stored_at_admission_and_ignores_key_order(funded, wallet):
+    transaction = signed_transaction(funded, wallet, 'BOB', 10)
+    reordered = dict(reversed(list(transaction.items())))
+    expected = compute_transaction_hash(reordered)
+
+    result = funded.add_transactions([dict(transaction, hash='f' * 64)])[0]
+
+    assert result == {'accepted': True, 'error': None, 'hash': expected}
+    assert compute_transaction_hash(transaction) == expected
+    assert funded.find_pending_transaction('0x' + expected.upper())['hash'] == expected
+
+
+def test_stored_hash_does_not_change_the_canonical_hash(funded, wallet):
+    transaction = signed_transaction(funded, wallet, 'BOB', 10)
+    stored = dict(transaction, hash=compute_transaction_hash(transaction))
+
+    assert compute_transaction_hash(stored) == stored['hash']
+    assert transaction_hash(dict(stored, amount=11)) == stored['hash']  # no se recalcula
+    assert compute_transaction_hash(dict(stored, amount=11)) != stored['hash']
+
+
+def test_mined_transaction_keeps_its_hash(funded, wallet):
+    tx_hash = funded.add_transactions([signed_transaction(funded, wallet, 'BOB', 10)])[0]['hash']
+    block = funded.mine_pending_transactions('MINER')
+
+    assert block.transactions[0]['hash'] == tx_hash
+    assert funded.find_transaction(tx_hash) == (block, 0)
+    assert funded.find_pending_transaction(tx_hash) is None
+
+
+def test_block_with_a_wrong_stored_hash_is_rejected(funded, wallet):
+    transaction = signed_transaction(funded, wallet, 'BOB', 10)
+    transaction['hash'] = 'f' * 64
+
+    with pytest.raises(InvalidBlockError, match='Invalid transaction hash'):
+        funded.add_block(forge_block(funded, [transaction, funded._reward_transaction('X')]))
+
+
+def test_rpc_finds_pending_and_mined_transactions_by_hash(funded, wallet):
+    app = Flask(__name__)
+    app.register_blueprint(create_evm_rpc_blueprint(funded, wallet))
+    client = app.test_client()
+
+    def get_transaction(tx_hash):
+        return client.post('/rpc', json={'jsonrpc': '2.0', 'id': 1, 'method': 'eth_getTransactionByHash',
+                                         'params': ['0x' + tx_hash]}).get_json()['result']
+
+    tx_hash = funded.add_transactions([signed_transaction(funded, wallet, 'BOB', 10)])[0]['hash']
+    pending = get_transaction(tx_hash)
+    assert pending['hash'] == '0x' + tx_hash and pending['blockNumber'] is None
+
+    funded.mine_pending_transactions('MINER')
+    mined = get_transaction(tx_hash)
+    assert mined['hash'] == '0x' + tx_hash and mined['blockNumber'] == hex(2)
+    assert get_transaction('f' * 64) is None
@@ -5,7 +5,7 @@ Usado para transacciones, fees, minería, staking y gobernanza
 """
 
 from time import time
-from typing import Dict, List
+from typing import Dict, List, Optional
 import logging
 
 # Configurar logging
@@ -118,6 +118,18 @@ class Token:
         logger.info(f"Mint exitoso: {amount} {self.symbol} para {address} por {minter}")
         return True, f"Minteados {amount} {self.symbol} exitosamente"
     
+    def issue(self, address: str, amount: float) -> None:
+        """
+        Emisión del protocolo (recompensas de bloque al aplicar un bloque).
+
+        A diferencia de mint no consulta permisos ni cooldown, que dependen
+        de la hora local: aplicar el mismo bloque debe dar siempre el mismo
+        estado, también al reproducir la cadena tras un reinicio.
+        """
+        self.balances[address] = self.balances.get(address, 0) + amount
+        self.total_supply += amount
+        self.total_minted += amount
+    
     def burn(self, address: str, amount: float) -> bool:
         """Quema tokens"""
         if address not in self.balances or self.balances[address] < amount:
@@ -221,6 +233,7 @@ class TokenManager:
         self.liquidity_pool = {
             'VRX': 0
         }
+        self.exchange_rate = 1.0  # ORX es un alias de VRX: el cambio es 1:1
         
     def initialize_tokens(self, genesis_address: str):
         """
@@ -234,6 +247,38 @@ class TokenManager:
         
         logger.info("VRX inicializado como token nativo de OriluxChain")
     
+    def export_state(self) -> Dict[str, Dict]:
+        """
+        Estado de cuentas de VRX para los snapshots (copia independiente).
+        
+        Returns:
+            Secciones balances, allowances, token y liquidity_pool
+        """
+        return {
+            'balances': dict(self.vrx.balances),
+            'allowances': {owner: dict(spenders) for owner, spenders in self.vrx.allowances.items()},
+            'token': {
+                'total_supply': self.vrx.total_supply,
+                'total_minted': self.vrx.total_minted,
+                'minters': sorted(self.vrx.minters)
+            },
+            'liquidity_pool': dict(self.liquidity_pool)
+        }
+    
+    def import_state(self, state: Dict[str, Dict]) -> None:
+        """Restaura en sitio el estado creado por export_state."""
+        self.vrx.balances.clear()
+        self.vrx.balances.update(state['balances'])
+        self.vrx.allowances.clear()
+        self.vrx.allowances.update(
+            {owner: dict(spenders) for owner, spenders in state['allowances'].items()}
+        )
+        self.vrx.total_supply = state['token']['total_supply']
+        self.vrx.total_minted = state['token']['total_minted']
+        self.vrx.minters = set(state['token']['minters'])
+        self.liquidity_pool.clear()
+        self.liquidity_pool.update(state['liquidity_pool'])
+    
     def get_token(self, symbol: str) -> Token:
         """Obtiene un token por su símbolo (VRX es el único token nativo)"""
         if symbol in ['ORX', 'VRX']:
@@ -371,11 +416,15 @@ class StakingPool:
         self.reward_rate = 0.15  # 15% APY
         self.total_staked = 0
         
-    def stake(self, address: str, amount: float, token: str = 'VRX') -> tuple:
+    def stake(self, address: str, amount: float, token: str = 'VRX',
+              now: Optional[float] = None) -> tuple:
         """
         Stakea tokens con lock period.
         PARCHE 2.4: Implementado con período de bloqueo
         
+        Args:
+            now: Momento del stake (en la cadena, el timestamp del bloque)
+        
         Returns:
             tuple: (success: bool, message: str)
         """
@@ -395,7 +444,7 @@ class StakingPool:
                     'VRX': {'amount': 0, 'timestamp': 0, 'lock_end': 0}
                 }
             
-            current_time = time()
+            current_time = time() if now is None else now
             self.stakes[address][token]['amount'] += amount
             self.stakes[address][token]['timestamp'] = current_time
             
@@ -414,7 +463,7 @@ class StakingPool:
         return False, "Error al transferir tokens"
     
     def unstake(self, address: str, amount: float, token: str = 'VRX', 
-                force: bool = False) -> tuple:
+                force: bool = False, now: Optional[float] = None) -> tuple:
         """
         Retira tokens stakeados con validación de lock period.
         PARCHE 2.4: Con penalidad por unstake temprano
@@ -424,6 +473,7 @@ class StakingPool:
             amount: Cantidad a retirar
             token: Token a retirar
             force: Si es True, permite unstake temprano con penalidad
+            now: Momento del unstake (en la cadena, el timestamp del bloque)
             
         Returns:
             tuple: (success: bool, message: str, amount_received: float, penalty: float)
@@ -435,7 +485,7 @@ class StakingPool:
             return False, "La cantidad debe ser positiva", 0, 0
         
         token_obj = self.token_manager.get_token(token)
-        current_time = time()
+        current_time = time() if now is None else now
         
         # PARCHE 2.4: Verificar lock period
         lock_end = self.stakes[address][token]['lock_end']
@@ -465,7 +515,7 @@ class StakingPool:
             )
         
         # Calcular rewards
-        rewards = self.calculate_rewards(address, token)
+        rewards = self.calculate_rewards(address, token, current_time)
         
         # PARCHE 2.4: Ajustar cantidad con penalidad si aplica
         total_to_transfer = actual_amount + rewards
@@ -490,8 +540,27 @@ class StakingPool:
         
         return False, "Error al transferir tokens", 0, 0
     
-    def calculate_rewards(self, address: str, token: str) -> float:
-        """Calcula las recompensas de staking"""
+    def export_state(self) -> Dict[str, Dict]:
+        """Posiciones de staking para los snapshots (copia independiente)."""
+        return {
+            'stakes': {
+                address: {token: dict(position) for token, position in positions.items()}
+                for address, positions in self.stakes.items()
+            },
+            'staking': {'total_staked': self.total_staked}
+        }
+    
+    def import_state(self, state: Dict[str, Dict]) -> None:
+        """Restaura en sitio el estado creado por export_state."""
+        self.stakes.clear()
+        self.stakes.update({
+            address: {token: dict(position) for token, position in positions.items()}
+            for address, positions in state['stakes'].items()
+        })
+        self.total_staked = state['staking']['total_staked']
+    
+    def calculate_rewards(self, address: str, token: str, now: Optional[float] = None) -> float:
+        """Calcula las recompensas de staking (hasta now, por defecto el momento actual)"""
         if address not in self.stakes:
             return 0
         
@@ -500,7 +569,7 @@ class StakingPool:
             return 0
         
         # Calcular tiempo stakeado en años
-        time_staked = (time() - stake_info['timestamp']) / (365 * 24 * 60 * 60)
+        time_staked = ((time() if now is None else now) - stake_info['timestamp']) / (365 * 24 * 60 * 60)
         
         # Calcular rewards
         # VRX tiene mayor reward rate
@@ -1,7 +1,116 @@
 from Crypto.PublicKey import RSA
 from Crypto.Signature import pkcs1_15
 from Crypto.Hash import SHA256
+from collections import OrderedDict
+from functools import lru_cache
 import binascii
+import hashlib
+import os
+import threading
+
+# Tamaños de las cachés de verificación
+KEY_CACHE_SIZE = int(os.getenv('KEY_CACHE_SIZE', '1024'))
+SIGNATURE_CACHE_SIZE = int(os.getenv('SIGNATURE_CACHE_SIZE', '100000'))
+
+
+@lru_cache(maxsize=KEY_CACHE_SIZE)
+def load_public_key(public_key_str):
+    """
+    Importa una clave pública PEM reutilizando el objeto ya parseado.
+    
+    Args:
+        public_key_str (str): Clave pública en formato PEM
+        
+    Returns:
+        RsaKey: Clave pública
+        
+    Raises:
+        ValueError: Si la clave no es válida
+    """
+    return RSA.import_key(public_key_str)
+
+
+def key_address(public_key):
+    """
+    Dirección de una clave pública RSA.
+    
+    Args:
+        public_key (RsaKey): Clave pública
+        
+    Returns:
+        str: Primeros 40 caracteres hexadecimales de la clave en DER
+    """
+    return binascii.hexlify(public_key.export_key(format='DER')).decode('ascii')[:40]
+
+
+@lru_cache(maxsize=KEY_CACHE_SIZE)
+def address_from_public_key(public_key_str):
+    """
+    Dirección que corresponde a una clave pública PEM.
+    
+    Args:
+        public_key_str (str): Clave pública en formato PEM
+        
+    Returns:
+        str: Dirección, igual que Wallet.address para esa clave
+        
+    Raises:
+        ValueError: Si la clave no es válida
+    """
+    return key_address(load_public_key(public_key_str))
+
+
+class SignatureCache:
+    """
+    Caché LRU acotada de firmas ya verificadas.
+    
+    La clave es un digest de (clave pública, datos firmados, firma), así que
+    una entrada solo vale para exactamente la misma verificación. Una
+    transacción verificada al entrar al mempool no se vuelve a verificar
+    cuando llega dentro de un bloque de un peer.
+    """
+    
+    def __init__(self, max_size=SIGNATURE_CACHE_SIZE):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    @staticmethod
+    def make_key(public_key_str, transaction_data, signature):
+        h = hashlib.sha256()
+        for part in (public_key_str, transaction_data, signature):
+            encoded = part.encode('utf-8')
+            h.update(len(encoded).to_bytes(4, 'big'))
+            h.update(encoded)
+        return h.digest()
+    
+    def contains(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return True
+            self.misses += 1
+            return False
+    
+    def add(self, key):
+        with self._lock:
+            self._entries[key] = True
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+    
+    def __len__(self):
+        return len(self._entries)
+
+
+signature_cache = SignatureCache()
 
 
 class Wallet:
@@ -28,9 +137,7 @@ class Wallet:
         self.public_key = key.publickey()
         
         # La dirección es la representación hexadecimal de la clave pública
-        self.address = binascii.hexlify(
-            self.public_key.export_key(format='DER')
-        ).decode('ascii')[:40]  # Primeros 40 caracteres como dirección
+        self.address = key_address(self.public_key)
     
     def sign_transaction(self, transaction_data):
         """
@@ -67,8 +174,12 @@ class Wallet:
             bool: True si la firma es válida, False en caso contrario
         """
         try:
-            # Importar la clave pública
-            public_key = RSA.import_key(public_key_str)
+            cache_key = SignatureCache.make_key(public_key_str, transaction_data, signature)
+            if signature_cache.contains(cache_key):
+                return True
+            
+            # Importar la clave pública (cacheada por PEM)
+            public_key = load_public_key(public_key_str)
             
             # Crear hash de los datos
             h = SHA256.new(transaction_data.encode('utf-8'))
@@ -78,8 +189,9 @@ class Wallet:
             
             # Verificar la firma
             pkcs1_15.new(public_key).verify(h, signature_bytes)
+            signature_cache.add(cache_key)
             return True
-        except (ValueError, TypeError):
+        except (ValueError, TypeError, AttributeError):
             return False
     
     def export_keys(self):
@@ -105,9 +217,7 @@ class Wallet:
         self.private_key = RSA.import_key(private_key_pem)
         self.public_key = self.private_key.publickey()
         
-        self.address = binascii.hexlify(
-            self.public_key.export_key(format='DER')
-        ).decode('ascii')[:40]
+        self.address = key_address(self.public_key)
     
     def __repr__(self):
         return f"Wallet(address={self.address})"